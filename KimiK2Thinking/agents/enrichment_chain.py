@@ -17,13 +17,36 @@ plain text parsing.
 from __future__ import annotations
 
 import asyncio
+import copy
 import json
-from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
 from kimi_client import KimiClient, get_kimi_client
 
-from .prerequisite_explorer_kimi import KnowledgeNode
+from .prerequisite_explorer_kimi import CanonicalDict, KnowledgeNode, SingleFlight
+
+# Per-node scheduling shared with the Claude orchestrator
+try:
+    from src.agents.node_dataflow import NodeDataflow
+except ImportError:
+    try:
+        from node_dataflow import NodeDataflow
+    except ImportError:
+        print("Warning: Could not import node dataflow scheduler")
+        NodeDataflow = None  # type: ignore[assignment,misc]
+
+# Content and specs persisted across runs, shared with the Claude agents
+try:
+    from src.agents.enrichment_cache import EnrichmentCache, get_enrichment_cache
+except ImportError:
+    try:
+        from enrichment_cache import EnrichmentCache, get_enrichment_cache
+    except ImportError:
+        print("Warning: Could not import enrichment cache")
+        EnrichmentCache = None  # type: ignore[assignment,misc]
+        get_enrichment_cache = None  # type: ignore[assignment]
 
 
 # ---------------------------------------------------------------------------
@@ -59,6 +82,89 @@ def _extract_tool_payload(response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         return None
 
 
+def _preorder(root: KnowledgeNode) -> List[KnowledgeNode]:
+    """Nodes in the order a depth-first walk visits them."""
+    nodes: List[KnowledgeNode] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.prerequisites))
+    return nodes
+
+
+async def _coalesced(single_flight, kind: str, concept: str, factory):
+    """Share one in-flight generation between concurrent requests for a concept."""
+    if single_flight is None:
+        return await factory()
+    return await single_flight.do(SingleFlight.concept_key(kind, concept), factory)
+
+
+def _batch_tool(tool: Dict[str, Any], name: str, description: str) -> Dict[str, Any]:
+    """Array form of a single-concept tool: one item per concept, echoing its name."""
+    item = copy.deepcopy(tool["function"]["parameters"])
+    item["properties"] = {
+        "concept": {"type": "string", "description": "The concept exactly as it was given."},
+        **item["properties"],
+    }
+    item["required"] = ["concept", *item["required"]]
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {
+                "type": "object",
+                "properties": {"items": {"type": "array", "items": item}},
+                "required": ["items"],
+            },
+        },
+    }
+
+
+def _pack_batches(
+    blocks: List[Tuple[KnowledgeNode, str]],
+    batch_size: int,
+    token_budget: int,
+    answer_tokens: int,
+) -> List[List[Tuple[KnowledgeNode, str]]]:
+    """Split per-concept prompt blocks into requests of at most ``batch_size``
+    concepts whose prompts plus expected answers fit ``token_budget`` (~4
+    characters per token). A block that alone exceeds the budget still gets
+    a request of its own."""
+    batches: List[List[Tuple[KnowledgeNode, str]]] = []
+    current: List[Tuple[KnowledgeNode, str]] = []
+    used = 0
+    for node, block in blocks:
+        cost = len(block) // 4 + 1 + answer_tokens
+        if current and (len(current) >= batch_size or used + cost > token_budget):
+            batches.append(current)
+            current, used = [], 0
+        current.append((node, block))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _numbered(blocks: List[str]) -> str:
+    """Number per-concept blocks the way batched prompts list them."""
+    return "\n".join(f"{i}. {block}" for i, block in enumerate(blocks, 1))
+
+
+def _batch_items(client: KimiClient, response: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Per-concept payloads of a batched tool call, keyed by canonical concept."""
+    payload = _extract_tool_payload(response)
+    if payload is None:
+        payload = _parse_json_fallback(client.get_text_content(response)) or {}
+    items = payload.get("items") if isinstance(payload, dict) else None
+    answers: Dict[str, Dict[str, Any]] = CanonicalDict()
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get("concept"), str) and item["concept"] not in answers:
+            answers[item["concept"]] = item
+    return answers
+
+
 def _parse_json_fallback(text: str) -> Optional[Dict[str, Any]]:
     """Fallback parser when model returned raw JSON instead of a tool call."""
     if not text:
@@ -128,6 +234,57 @@ MATHEMATICAL_CONTENT_TOOL = {
 }
 
 
+MATHEMATICAL_CONTENT_BATCH_TOOL = _batch_tool(
+    MATHEMATICAL_CONTENT_TOOL,
+    "write_mathematical_content_batch",
+    "Return the key mathematical information for each listed concept, one item per concept.",
+)
+
+MATH_CONTENT_SYSTEM_PROMPT = (
+    "You are an expert mathematical physicist preparing content for a "
+    "Manim animation. Provide rigorous, properly formatted LaTeX and "
+    "clear symbol definitions. Respond by calling the tool "
+    "'write_mathematical_content'. Do not include plain text responses."
+)
+
+MATH_CONTENT_BATCH_SYSTEM_PROMPT = (
+    "You are an expert mathematical physicist preparing content for a "
+    "Manim animation. Provide rigorous, properly formatted LaTeX and "
+    "clear symbol definitions. Respond by calling the tool "
+    "'write_mathematical_content_batch' with one item per concept. "
+    "Do not include plain text responses."
+)
+
+MATH_CONTENT_INSTRUCTIONS = (
+    "Return 2-5 LaTeX equations (raw strings with escaped backslashes), "
+    "definitions for every symbol, at least one interpretation paragraph, "
+    "and any illustrative examples/typical values that help teach the idea."
+)
+
+MATH_CONTENT_MAX_TOKENS = 1200  # Per concept, also the answer allowance when packing batches
+
+MATH_CONTENT_PROMPT_VERSION = "kimi-math-v1"  # Bump with the prompts above to retire cached content
+MATH_CONTENT_BATCH_PROMPT_VERSION = "kimi-math-batch-v1"  # Same, for content from the batch prompt
+
+
+def _valid_math_payload(payload: Dict[str, Any]) -> bool:
+    """Whether a batched item has the fields the single-concept tool requires."""
+    equations = payload.get("equations")
+    interpretation = payload.get("interpretation")
+    return (
+        isinstance(equations, list)
+        and bool(equations)
+        and all(isinstance(eq, str) for eq in equations)
+        and isinstance(payload.get("definitions"), dict)
+        and isinstance(interpretation, str)
+        and bool(interpretation.strip())
+    )
+
+
+def _complexity(node: KnowledgeNode) -> str:
+    return "high school level" if node.is_foundation else "upper-undergraduate level"
+
+
 @dataclass
 class MathematicalContent:
     """Mathematical content for a concept."""
@@ -150,64 +307,169 @@ class MathematicalContent:
 
 
 class KimiMathematicalEnricher:
-    """Populate equations/definitions for each knowledge node via Kimi K2."""
+    """Populate equations/definitions for each knowledge node via Kimi K2.
 
-    def __init__(self, client: Optional[KimiClient] = None):
-        self.client = client or get_kimi_client()
-        self.cache: Dict[str, MathematicalContent] = {}
+    With ``batch_size`` set, up to that many concepts share one request
+    (``MATHEMATICAL_CONTENT_BATCH_TOOL``) as long as their prompts and
+    answers fit ``batch_token_budget``; concepts whose item is missing or
+    invalid are asked for individually.
 
-    async def enrich_tree(self, root: KnowledgeNode) -> KnowledgeNode:
-        await self._enrich_node(root)
+    ``cache`` holds this instance's content by concept; ``enrichment_cache``
+    persists it across runs, keyed by concept, complexity, depth, model and
+    prompt version.
+    """
+
+    def __init__(
+        self,
+        client: Optional[KimiClient] = None,
+        batch_size: Optional[int] = None,
+        batch_token_budget: int = 12000,
+        enrichment_cache: Optional["EnrichmentCache"] = None,
+    ):
+        self.client = client or get_kimi_client()
+        self.cache: Dict[str, MathematicalContent] = CanonicalDict()  # Keyed by canonical concept
+        if enrichment_cache is None and get_enrichment_cache is not None:
+            enrichment_cache = get_enrichment_cache()
+        self.enrichment_cache = enrichment_cache
+        self.single_flight = SingleFlight() if SingleFlight is not None else None
+        self.batch_size = batch_size  # Concepts per request; None sends one request per concept
+        self.batch_token_budget = batch_token_budget
+
+    async def enrich_tree(self, root: KnowledgeNode, max_concurrency: Optional[int] = None) -> KnowledgeNode:
+        """Enrich every node, one at a time or, with ``max_concurrency``, all at once.
+
+        In the concurrent mode each distinct concept is generated once, for
+        the first node that names it as in the sequential walk, with at most
+        ``max_concurrency`` requests in flight; the content is then written
+        into every node that names the concept. In batched mode the cache is
+        filled with batched requests first.
+        """
+        groups: Dict[str, List[KnowledgeNode]] = CanonicalDict()
+        for node in _preorder(root):
+            if node.concept in groups:
+                groups[node.concept].append(node)
+            else:
+                groups[node.concept] = [node]
+
+        if self.batch_size:
+            await self._prefetch_batched([nodes[0] for nodes in groups.values()], max_concurrency)
+
+        if max_concurrency is None:
+            await self._enrich_node(root)
+            return root
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def enrich(nodes: List[KnowledgeNode]) -> None:
+            async with semaphore:
+                math_content = await self._content_for(nodes[0])
+            for node in nodes:
+                self._apply(node, math_content)
+
+        await asyncio.gather(*(enrich(nodes) for nodes in groups.values()))
         return root
 
     async def _enrich_node(self, node: KnowledgeNode) -> None:
-        if node.concept in self.cache:
-            cached = self.cache[node.concept]
-            node.equations = cached.equations
-            node.definitions = cached.definitions
-            if node.visual_spec is None:
-                node.visual_spec = {}
-            node.visual_spec.setdefault("interpretation", cached.interpretation)
-            node.visual_spec.setdefault("examples", cached.examples)
-            node.visual_spec.setdefault("typical_values", cached.typical_values)
-            for prereq in node.prerequisites:
-                await self._enrich_node(prereq)
-            return
+        self._apply(node, await self._content_for(node))
+        for prereq in node.prerequisites:
+            await self._enrich_node(prereq)
 
-        complexity = "high school level" if node.is_foundation else "upper-undergraduate level"
+    async def _content_for(self, node: KnowledgeNode) -> MathematicalContent:
+        if node.concept in self.cache:
+            return self.cache[node.concept]
 
-        system_prompt = (
-            "You are an expert mathematical physicist preparing content for a "
-            "Manim animation. Provide rigorous, properly formatted LaTeX and "
-            "clear symbol definitions. Respond by calling the tool "
-            "'write_mathematical_content'. Do not include plain text responses."
+        # Keyed like the cache: the first node to ask for a concept decides its content
+        math_content = await _coalesced(
+            self.single_flight, "math_content", node.concept, partial(self._stored_or_generated, node)
         )
+        self.cache[node.concept] = math_content
+        return math_content
+
+    def _cache_address(self, node: KnowledgeNode, prompt_version: str) -> Dict[str, Any]:
+        return {
+            "model": getattr(self.client, "model", None) or "kimi",
+            "prompt_version": prompt_version,
+            "complexity": _complexity(node),
+            "context": {"depth": node.depth},
+        }
+
+    def _stored(self, node: KnowledgeNode) -> Optional[MathematicalContent]:
+        """Content stored by either the single-concept or the batch prompt."""
+        if self.enrichment_cache is None:
+            return None
+        for prompt_version in (MATH_CONTENT_PROMPT_VERSION, MATH_CONTENT_BATCH_PROMPT_VERSION):
+            address = self._cache_address(node, prompt_version)
+            payload = self.enrichment_cache.get("math_content", node.concept, **address)
+            if payload is not None:
+                return MathematicalContent.from_payload(payload)
+        return None
 
+    def _store(
+        self, node: KnowledgeNode, math_content: MathematicalContent, prompt_version: str = MATH_CONTENT_PROMPT_VERSION
+    ) -> None:
+        if self.enrichment_cache is not None:
+            self.enrichment_cache.set(
+                "math_content", node.concept, asdict(math_content), **self._cache_address(node, prompt_version)
+            )
+
+    async def _stored_or_generated(self, node: KnowledgeNode) -> MathematicalContent:
+        math_content = self._stored(node)
+        if math_content is None:
+            math_content = await self._generate_math_content(node.concept, node.depth, _complexity(node))
+            self._store(node, math_content)
+        return math_content
+
+    async def _prefetch_batched(self, nodes: List[KnowledgeNode], max_concurrency: Optional[int]) -> None:
+        """Cache content for uncached ``nodes`` with batched requests."""
+        blocks = []
+        for node in nodes:
+            if node.concept in self.cache:
+                continue
+            stored = self._stored(node)
+            if stored is not None:
+                self.cache[node.concept] = stored
+                continue
+            blocks.append(
+                (node, f"Concept: {node.concept}\n   Depth: {node.depth}\n   Complexity target: {_complexity(node)}")
+            )
+        batches = _pack_batches(blocks, self.batch_size, self.batch_token_budget, MATH_CONTENT_MAX_TOKENS)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or 1))
+
+        async def run(batch: List[Tuple[KnowledgeNode, str]]) -> None:
+            async with semaphore:
+                answers = await self._generate_math_content_batch([block for _, block in batch])
+            for node, _ in batch:
+                payload = answers.get(node.concept)
+                if payload is not None and _valid_math_payload(payload):
+                    self.cache[node.concept] = MathematicalContent.from_payload(payload)
+                    self._store(node, self.cache[node.concept], MATH_CONTENT_BATCH_PROMPT_VERSION)
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        missing = [node.concept for node, _ in blocks if node.concept not in self.cache]
+        if missing:
+            print(f"  -> {len(missing)} concepts missing from batched math content, asking individually")
+
+    async def _generate_math_content_batch(self, blocks: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Ask Kimi K2 for the mathematical content of several concepts at once."""
         user_prompt = (
-            f"Concept: {node.concept}\n"
-            f"Depth: {node.depth}\n"
-            f"Complexity target: {complexity}\n"
-            "Return 2-5 LaTeX equations (raw strings with escaped backslashes), "
-            "definitions for every symbol, at least one interpretation paragraph, "
-            "and any illustrative examples/typical values that help teach the idea."
+            "Write the mathematical content for each of these concepts:\n"
+            f"{_numbered(blocks)}\n\n"
+            f"For every concept: {MATH_CONTENT_INSTRUCTIONS} "
+            "Echo each concept name exactly in the item's \"concept\" field."
         )
 
-        response = self.client.chat_completion(
+        response = await self.client.chat_completion_async(
             messages=[{"role": "user", "content": user_prompt}],
-            system=system_prompt,
-            tools=[MATHEMATICAL_CONTENT_TOOL],
+            system=MATH_CONTENT_BATCH_SYSTEM_PROMPT,
+            tools=[MATHEMATICAL_CONTENT_BATCH_TOOL],
             tool_choice="auto",
-            max_tokens=1200,
+            max_tokens=MATH_CONTENT_MAX_TOKENS * len(blocks),
             temperature=0.2,
         )
+        return _batch_items(self.client, response)
 
-        payload = _extract_tool_payload(response)
-        if payload is None:
-            payload = _parse_json_fallback(self.client.get_text_content(response)) or {}
-
-        math_content = MathematicalContent.from_payload(payload)
-        self.cache[node.concept] = math_content
-
+    @staticmethod
+    def _apply(node: KnowledgeNode, math_content: MathematicalContent) -> None:
         node.equations = math_content.equations
         node.definitions = math_content.definitions
 
@@ -217,8 +479,29 @@ class KimiMathematicalEnricher:
         node.visual_spec.setdefault("examples", math_content.examples)
         node.visual_spec.setdefault("typical_values", math_content.typical_values)
 
-        for prereq in node.prerequisites:
-            await self._enrich_node(prereq)
+    async def _generate_math_content(self, concept: str, depth: int, complexity: str) -> MathematicalContent:
+        """Ask Kimi K2 for the mathematical content of one concept."""
+        user_prompt = (
+            f"Concept: {concept}\n"
+            f"Depth: {depth}\n"
+            f"Complexity target: {complexity}\n"
+            f"{MATH_CONTENT_INSTRUCTIONS}"
+        )
+
+        response = await self.client.chat_completion_async(
+            messages=[{"role": "user", "content": user_prompt}],
+            system=MATH_CONTENT_SYSTEM_PROMPT,
+            tools=[MATHEMATICAL_CONTENT_TOOL],
+            tool_choice="auto",
+            max_tokens=MATH_CONTENT_MAX_TOKENS,
+            temperature=0.2,
+        )
+
+        payload = _extract_tool_payload(response)
+        if payload is None:
+            payload = _parse_json_fallback(self.client.get_text_content(response)) or {}
+
+        return MathematicalContent.from_payload(payload)
 
 
 # ---------------------------------------------------------------------------
@@ -284,6 +567,53 @@ VISUAL_DESIGN_TOOL = {
 }
 
 
+VISUAL_DESIGN_BATCH_TOOL = _batch_tool(
+    VISUAL_DESIGN_TOOL,
+    "design_visual_plan_batch",
+    "Describe the visual presentation for each listed concept, one item per concept.",
+)
+
+VISUAL_DESIGN_SYSTEM_PROMPT = (
+    "You are a visual designer describing what should appear in an animation. "
+    "Focus on describing the visual content and effects, not specific implementation "
+    "details. Manim will handle the rendering automatically. Respond by calling "
+    "the 'design_visual_plan' tool."
+)
+
+VISUAL_DESIGN_BATCH_SYSTEM_PROMPT = (
+    "You are a visual designer describing what should appear in an animation. "
+    "Focus on describing the visual content and effects, not specific implementation "
+    "details. Manim will handle the rendering automatically. Respond by calling "
+    "the 'design_visual_plan_batch' tool with one item per concept."
+)
+
+VISUAL_DESIGN_INSTRUCTIONS = (
+    "Describe what should appear visually: what objects, shapes, or elements should be shown. "
+    "Describe colors in natural language (e.g., 'red and blue', 'gold'). "
+    "Describe animations as visual effects (e.g., 'slowly rotate', 'fade in', 'zoom into'). "
+    "Do NOT specify Manim classes like MathTex or VGroup - just describe what should be visible. "
+    "Estimate duration in seconds."
+)
+
+VISUAL_DESIGN_MAX_TOKENS = 1200  # Per concept, also the answer allowance when packing batches
+
+VISUAL_DESIGN_PROMPT_VERSION = "kimi-visual-v1"  # Bump with the prompts above to retire cached specs
+VISUAL_DESIGN_BATCH_PROMPT_VERSION = "kimi-visual-batch-v1"  # Same, for specs from the batch prompt
+
+
+def _valid_visual_payload(payload: Dict[str, Any]) -> bool:
+    """Whether a batched item has the fields the single-concept tool requires."""
+    description = payload.get("visual_description")
+    duration = payload.get("duration")
+    return (
+        isinstance(description, str)
+        and bool(description.strip())
+        and isinstance(payload.get("animation_description"), str)
+        and isinstance(duration, int)
+        and not isinstance(duration, bool)
+    )
+
+
 @dataclass
 class VisualSpec:
     concept: str
@@ -321,85 +651,198 @@ class VisualSpec:
         }
 
 
+def _visual_context(node: KnowledgeNode, parent_spec: Optional[VisualSpec]) -> List[str]:
+    """Prompt lines describing one concept to design, and the spec before it."""
+    lines = [
+        f"Concept: {node.concept}",
+        f"Depth: {node.depth}",
+        f"Is foundational: {node.is_foundation}",
+        f"Equations to feature: {node.equations or 'None provided'}",
+        f"Prerequisites: {[p.concept for p in node.prerequisites]}",
+    ]
+    if parent_spec:
+        lines += [
+            f"Previous concept: {parent_spec.concept}",
+            f"Previous visual: {parent_spec.visual_description}",
+            f"Previous colors: {parent_spec.color_scheme}",
+        ]
+    return lines
+
+
 class KimiVisualDesigner:
-    """Design Manim visual specifications using Kimi tool calls."""
+    """Design Manim visual specifications using Kimi tool calls.
 
-    def __init__(self, client: Optional[KimiClient] = None):
-        self.client = client or get_kimi_client()
-        self.cache: Dict[str, VisualSpec] = {}
+    With ``batch_size`` set, ``design_tree`` designs the tree level by level
+    with up to that many concepts per request (``VISUAL_DESIGN_BATCH_TOOL``),
+    each still seeing its parent's spec; concepts whose item is missing or
+    invalid are designed individually.
 
-    async def design_tree(self, root: KnowledgeNode) -> KnowledgeNode:
+    ``cache`` holds this instance's specs by concept; ``enrichment_cache``
+    persists them across runs, keyed by everything the prompt shows,
+    including the parent spec.
+    """
+
+    def __init__(
+        self,
+        client: Optional[KimiClient] = None,
+        batch_size: Optional[int] = None,
+        batch_token_budget: int = 12000,
+        enrichment_cache: Optional["EnrichmentCache"] = None,
+    ):
+        self.client = client or get_kimi_client()
+        self.cache: Dict[str, VisualSpec] = CanonicalDict()  # Keyed by canonical concept
+        if enrichment_cache is None and get_enrichment_cache is not None:
+            enrichment_cache = get_enrichment_cache()
+        self.enrichment_cache = enrichment_cache
+        self.single_flight = SingleFlight() if SingleFlight is not None else None
+        self.batch_size = batch_size  # Concepts per request; None sends one request per concept
+        self.batch_token_budget = batch_token_budget
+
+    async def design_tree(self, root: KnowledgeNode, max_concurrency: Optional[int] = None) -> KnowledgeNode:
+        if self.batch_size:
+            await self._prefetch_levels_batched(root, max_concurrency)
         await self._design_node(root, parent_spec=None)
         return root
 
+    async def _prefetch_levels_batched(self, root: KnowledgeNode, max_concurrency: Optional[int]) -> None:
+        """Cache specs top-down, one round of batched requests per tree level."""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or 1))
+        missing = 0
+        level: List[Tuple[KnowledgeNode, Optional[KnowledgeNode]]] = [(root, None)]
+        while level:
+            blocks: List[Tuple[KnowledgeNode, Optional[VisualSpec]]] = []
+            queued: Dict[str, bool] = CanonicalDict()
+            for node, parent in level:
+                if node.concept in self.cache or node.concept in queued:
+                    continue
+                if parent is not None and parent.concept not in self.cache:
+                    continue  # Designed individually after its parent, like the parent
+                parent_spec = self.cache[parent.concept] if parent is not None else None
+                stored = self._stored(node, parent_spec)
+                if stored is not None:
+                    self.cache[node.concept] = stored
+                    continue
+                queued[node.concept] = True
+                blocks.append((node, parent_spec))
+
+            async def run(batch: List[Tuple[Tuple[KnowledgeNode, Optional[VisualSpec]], str]]) -> None:
+                async with semaphore:
+                    answers = await self._generate_visual_spec_batch([block for _, block in batch])
+                for (node, parent_spec), _ in batch:
+                    payload = answers.get(node.concept)
+                    if payload is not None and _valid_visual_payload(payload):
+                        self.cache[node.concept] = VisualSpec.from_payload(node.concept, payload)
+                        self._store(node, parent_spec, self.cache[node.concept], VISUAL_DESIGN_BATCH_PROMPT_VERSION)
+
+            packed = [(entry, "\n   ".join(_visual_context(*entry))) for entry in blocks]
+            batches = _pack_batches(packed, self.batch_size, self.batch_token_budget, VISUAL_DESIGN_MAX_TOKENS)
+            await asyncio.gather(*(run(batch) for batch in batches))
+            missing += sum(node.concept not in self.cache for node, _ in blocks)
+            level = [(prereq, node) for node, _ in level for prereq in node.prerequisites]
+        if missing:
+            print(f"  -> {missing} concepts missing from batched visual plans, designing individually")
+
+    async def _generate_visual_spec_batch(self, blocks: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Ask Kimi K2 for the visual plans of several concepts at once."""
+        user_prompt = (
+            "Design the visuals for each of these concepts:\n"
+            f"{_numbered(blocks)}\n\n"
+            f"For every concept: {VISUAL_DESIGN_INSTRUCTIONS} "
+            "Echo each concept name exactly in the item's \"concept\" field."
+        )
+
+        response = await self.client.chat_completion_async(
+            messages=[{"role": "user", "content": user_prompt}],
+            system=VISUAL_DESIGN_BATCH_SYSTEM_PROMPT,
+            tools=[VISUAL_DESIGN_BATCH_TOOL],
+            tool_choice="auto",
+            temperature=0.4,
+            max_tokens=VISUAL_DESIGN_MAX_TOKENS * len(blocks),
+        )
+        return _batch_items(self.client, response)
+
     async def _design_node(
         self,
         node: KnowledgeNode,
         parent_spec: Optional[VisualSpec],
     ) -> VisualSpec:
+        visual_spec = await self.design_one(node, parent_spec)
+        for prereq in node.prerequisites:
+            await self._design_node(prereq, visual_spec)
+        return visual_spec
+
+    async def design_one(self, node: KnowledgeNode, parent_spec: Optional[VisualSpec] = None) -> VisualSpec:
+        """Design ``node`` alone, reusing the spec of a concept designed before."""
         if node.concept in self.cache:
-            cached_spec = self.cache[node.concept]
-            if node.visual_spec is None:
-                node.visual_spec = {}
-            node.visual_spec.update(cached_spec.to_dict())
-            for prereq in node.prerequisites:
-                await self._design_node(prereq, cached_spec)
-            return cached_spec
-
-        previous_info = ""
-        if parent_spec:
-            previous_info = (
-                f"Previous concept: {parent_spec.concept}\n"
-                f"Previous visual: {parent_spec.visual_description}\n"
-                f"Previous colors: {parent_spec.color_scheme}\n"
+            visual_spec = self.cache[node.concept]
+        else:
+            visual_spec = await _coalesced(
+                self.single_flight, "visual_spec", node.concept, partial(self._stored_or_generated, node, parent_spec)
             )
+            self.cache[node.concept] = visual_spec
 
-        system_prompt = (
-            "You are a visual designer describing what should appear in an animation. "
-            "Focus on describing the visual content and effects, not specific implementation "
-            "details. Manim will handle the rendering automatically. Respond by calling "
-            "the 'design_visual_plan' tool."
-        )
+        if node.visual_spec is None:
+            node.visual_spec = {}
+        node.visual_spec.update(visual_spec.to_dict())
+        return visual_spec
 
-        user_prompt = (
-            f"Concept: {node.concept}\n"
-            f"Depth: {node.depth}\n"
-            f"Is foundational: {node.is_foundation}\n"
-            f"Equations to feature: {node.equations or 'None provided'}\n"
-            f"Prerequisites: {[p.concept for p in node.prerequisites]}\n"
-            f"{previous_info}\n"
-            "Describe what should appear visually: what objects, shapes, or elements should be shown. "
-            "Describe colors in natural language (e.g., 'red and blue', 'gold'). "
-            "Describe animations as visual effects (e.g., 'slowly rotate', 'fade in', 'zoom into'). "
-            "Do NOT specify Manim classes like MathTex or VGroup - just describe what should be visible. "
-            "Estimate duration in seconds."
-        )
+    def _cache_address(
+        self, node: KnowledgeNode, parent_spec: Optional[VisualSpec], prompt_version: str
+    ) -> Dict[str, Any]:
+        return {
+            "model": getattr(self.client, "model", None) or "kimi",
+            "prompt_version": prompt_version,
+            "complexity": "foundation" if node.is_foundation else "advanced",
+            "context": _visual_context(node, parent_spec)[1:],  # Everything the prompt says besides the concept
+        }
+
+    def _stored(self, node: KnowledgeNode, parent_spec: Optional[VisualSpec]) -> Optional[VisualSpec]:
+        """Spec stored by either the single-concept or the batch prompt."""
+        if self.enrichment_cache is None:
+            return None
+        for prompt_version in (VISUAL_DESIGN_PROMPT_VERSION, VISUAL_DESIGN_BATCH_PROMPT_VERSION):
+            address = self._cache_address(node, parent_spec, prompt_version)
+            payload = self.enrichment_cache.get("visual_spec", node.concept, **address)
+            if payload is not None:
+                return VisualSpec.from_payload(node.concept, payload)
+        return None
+
+    def _store(
+        self,
+        node: KnowledgeNode,
+        parent_spec: Optional[VisualSpec],
+        visual_spec: VisualSpec,
+        prompt_version: str = VISUAL_DESIGN_PROMPT_VERSION,
+    ) -> None:
+        if self.enrichment_cache is not None:
+            address = self._cache_address(node, parent_spec, prompt_version)
+            self.enrichment_cache.set("visual_spec", node.concept, visual_spec.to_dict(), **address)
+
+    async def _stored_or_generated(self, node: KnowledgeNode, parent_spec: Optional[VisualSpec]) -> VisualSpec:
+        visual_spec = self._stored(node, parent_spec)
+        if visual_spec is None:
+            visual_spec = await self._generate_visual_spec(node, parent_spec)
+            self._store(node, parent_spec, visual_spec)
+        return visual_spec
+
+    async def _generate_visual_spec(self, node: KnowledgeNode, parent_spec: Optional[VisualSpec]) -> VisualSpec:
+        """Ask Kimi K2 for the visual plan of one concept."""
+        user_prompt = "\n".join(_visual_context(node, parent_spec)) + "\n\n" + VISUAL_DESIGN_INSTRUCTIONS
 
-        response = self.client.chat_completion(
+        response = await self.client.chat_completion_async(
             messages=[{"role": "user", "content": user_prompt}],
-            system=system_prompt,
+            system=VISUAL_DESIGN_SYSTEM_PROMPT,
             tools=[VISUAL_DESIGN_TOOL],
             tool_choice="auto",
             temperature=0.4,
-            max_tokens=1200,
+            max_tokens=VISUAL_DESIGN_MAX_TOKENS,
         )
 
         payload = _extract_tool_payload(response)
         if payload is None:
             payload = _parse_json_fallback(self.client.get_text_content(response)) or {}
 
-        visual_spec = VisualSpec.from_payload(node.concept, payload)
-
-        if node.visual_spec is None:
-            node.visual_spec = {}
-        node.visual_spec.update(visual_spec.to_dict())
-
-        self.cache[node.concept] = visual_spec
-
-        for prereq in node.prerequisites:
-            await self._design_node(prereq, visual_spec)
-
-        return visual_spec
+        return VisualSpec.from_payload(node.concept, payload)
 
 
 # ---------------------------------------------------------------------------
@@ -512,7 +955,7 @@ class KimiNarrativeComposer:
             "Return your work by calling the tool."
         )
 
-        response = client.chat_completion(
+        response = await client.chat_completion_async(
             messages=[{"role": "user", "content": user_prompt}],
             system=system_prompt,
             tools=[NARRATIVE_TOOL],
@@ -596,17 +1039,44 @@ class EnrichmentResult:
 class KimiEnrichmentPipeline:
     """Run mathematical enrichment, visual design, and narrative composition."""
 
-    def __init__(self, client: Optional[KimiClient] = None):
+    def __init__(
+        self,
+        client: Optional[KimiClient] = None,
+        max_concurrency: Optional[int] = 8,
+        batch_size: Optional[int] = None,
+        enrichment_cache: Optional["EnrichmentCache"] = None,
+    ):
         client = client or get_kimi_client()
-        self.math = KimiMathematicalEnricher(client=client)
-        self.visual = KimiVisualDesigner(client=client)
+        self.math = KimiMathematicalEnricher(client=client, batch_size=batch_size, enrichment_cache=enrichment_cache)
+        self.visual = KimiVisualDesigner(client=client, batch_size=batch_size, enrichment_cache=enrichment_cache)
         self.narrative = KimiNarrativeComposer(client=client)
+        self.max_concurrency = max_concurrency  # Concurrent requests; None runs the stages node by node
+        self.batch_size = batch_size  # Concepts per math/visual request; None sends one per concept
 
     async def run_async(self, root: KnowledgeNode) -> EnrichmentResult:
-        await self.math.enrich_tree(root)
-        await self.visual.design_tree(root)
+        # Batches are packed from whole levels, so batched runs go stage by stage
+        if self.max_concurrency is None or NodeDataflow is None or self.batch_size:
+            await self.math.enrich_tree(root, max_concurrency=self.max_concurrency)
+            await self.visual.design_tree(root, max_concurrency=self.max_concurrency)
+        else:
+            await self._stream_nodes(root)
         narrative = await self.narrative.compose_async(root)
         return EnrichmentResult(enriched_tree=root, narrative=narrative)
 
+    async def _stream_nodes(self, root: KnowledgeNode) -> None:
+        """Design each node as soon as it and its parent are ready, not after the whole tree."""
+        dataflow = NodeDataflow(
+            self.math._content_for,
+            self.math._apply,
+            lambda node, prerequisites, parent_spec: self.visual.design_one(node, parent_spec),
+            max_concurrency=self.max_concurrency,
+        )
+        stack = [(root, None)]
+        while stack:
+            node, parent = stack.pop()
+            dataflow.submit(node, [p.concept for p in node.prerequisites], parent)
+            stack.extend((prereq, node) for prereq in reversed(node.prerequisites))
+        await dataflow.join()
+
     def run(self, root: KnowledgeNode) -> EnrichmentResult:
         return asyncio.run(self.run_async(root))
@@ -13,7 +13,8 @@ import json
 import os
 import re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
 
 # Import Kimi K2 components
 import sys
@@ -38,6 +39,101 @@ except ImportError:
         print("Warning: Could not import custom tools")
         ALL_TOOLS = []
 
+# Shared on-disk foundation verdicts (same store as the Claude explorers)
+try:
+    from src.agents.foundation_cache import FoundationVerdictCache, get_foundation_cache
+except ImportError:
+    try:
+        from foundation_cache import FoundationVerdictCache, get_foundation_cache
+    except ImportError:
+        print("Warning: Could not import foundation verdict cache")
+        FoundationVerdictCache = None  # type: ignore[assignment]
+        get_foundation_cache = None  # type: ignore[assignment]
+
+# Canonical concept keys shared with the Claude agents
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict
+except ImportError:
+    try:
+        from concept_canonicalizer import CanonicalDict
+    except ImportError:
+        print("Warning: Could not import concept canonicalizer")
+        CanonicalDict = dict  # type: ignore[assignment,misc]
+
+# Combined classify-and-decompose prompt shared with the Claude/DeepSeek explorers
+try:
+    from src.agents.classify_and_decompose import (
+        CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+        CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        build_classify_and_decompose_prompt,
+        parse_classify_and_decompose,
+    )
+except ImportError:
+    try:
+        from classify_and_decompose import (
+            CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+            CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+            build_classify_and_decompose_prompt,
+            parse_classify_and_decompose,
+        )
+    except ImportError:
+        print("Warning: Could not import classify-and-decompose helpers")
+        parse_classify_and_decompose = None  # type: ignore[assignment]
+
+# Shared prerequisite store (same store as the Claude/DeepSeek explorers)
+try:
+    from src.agents.prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+except ImportError:
+    try:
+        from prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+    except ImportError:
+        print("Warning: Could not import prerequisite store")
+        PrerequisiteStore = None  # type: ignore[assignment,misc]
+        get_prerequisite_store = None  # type: ignore[assignment]
+        prompt_hash = None  # type: ignore[assignment]
+
+# In-flight coalescing shared with the Claude explorers
+try:
+    from src.agents.single_flight import SingleFlight
+except ImportError:
+    try:
+        from single_flight import SingleFlight
+    except ImportError:
+        print("Warning: Could not import single-flight helper")
+        SingleFlight = None  # type: ignore[assignment,misc]
+
+# Bump whenever the is_foundation prompt changes so cached verdicts are re-asked.
+FOUNDATION_PROMPT_VERSION = "kimi-foundation-v1"
+
+PREREQUISITES_SYSTEM_PROMPT = """You are an expert educator and curriculum designer.
+
+Your task is to identify the ESSENTIAL prerequisite concepts someone must
+understand BEFORE they can grasp a given concept.
+
+Rules:
+1. Only list concepts that are NECESSARY for understanding (not just helpful)
+2. Order from most to least important
+3. Assume high school education as baseline (don't list truly basic things)
+4. Focus on concepts that enable understanding, not just historical context
+5. Be specific - prefer "special relativity" over "relativity"
+6. Limit to 3-5 prerequisites maximum
+
+Return ONLY a JSON array of concept names, nothing else."""
+
+PREREQUISITES_USER_PROMPT = '''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
+
+Return format: ["concept1", "concept2", "concept3"]'''
+
+# Shared PrerequisiteStore entries are keyed by prompt, so editing one starts fresh.
+PREREQUISITES_PROMPT_HASH = (
+    prompt_hash(PREREQUISITES_SYSTEM_PROMPT, PREREQUISITES_USER_PROMPT) if prompt_hash else None
+)
+COMBINED_PROMPT_HASH = (
+    prompt_hash(CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT)
+    if prompt_hash and parse_classify_and_decompose is not None
+    else None
+)
+
 
 @dataclass
 class KnowledgeNode:
@@ -85,17 +181,42 @@ class KimiPrerequisiteExplorer:
     - Same interface as EnhancedPrerequisiteExplorer for compatibility
     """
 
-    def __init__(self, max_depth: int = 4, use_tools: bool = True):
+    def __init__(
+        self,
+        max_depth: int = 4,
+        use_tools: bool = True,
+        foundation_cache: Optional["FoundationVerdictCache"] = None,
+        combined_mode: bool = False,
+        prerequisite_store: Optional["PrerequisiteStore"] = None,
+        max_concurrency: int = 8,
+    ):
         """
         Initialize Kimi prerequisite explorer.
 
         Args:
             max_depth: Maximum depth for prerequisite exploration
             use_tools: Whether to attempt using tools (may fallback to verbose)
+            foundation_cache: Persistent is_foundation verdict store
+                (defaults to the shared on-disk cache)
+            combined_mode: Ask for foundation status and prerequisites in one
+                call per node, falling back to two calls on unparseable output
+            prerequisite_store: Decompositions shared across runs and workers
+                (defaults to the process-wide store)
+            max_concurrency: Max Kimi calls in flight while exploring siblings
         """
         self.max_depth = max_depth
+        self.max_concurrency = max(1, max_concurrency)
+        self.combined_mode = combined_mode and parse_classify_and_decompose is not None
         self.use_tools = use_tools and TOOLS_ENABLED
-        self.cache: Dict[str, List[str]] = {}
+        self.cache: Dict[str, List[str]] = CanonicalDict()  # Keyed by canonical concept
+        if foundation_cache is None and get_foundation_cache is not None:
+            foundation_cache = get_foundation_cache()
+        self.foundation_cache = foundation_cache
+        if prerequisite_store is None and get_prerequisite_store is not None:
+            prerequisite_store = get_prerequisite_store()
+        self.prerequisite_store = prerequisite_store
+        # Concurrent lookups of one concept share a call
+        self.single_flight = SingleFlight() if SingleFlight is not None else None
         self.client = get_kimi_client()
         self.tool_adapter = ToolAdapter()
 
@@ -142,6 +263,16 @@ class KimiPrerequisiteExplorer:
         Returns:
             KnowledgeNode representing the concept and its prerequisites
         """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await self._explore_node_async(concept, depth, verbose, semaphore)
+
+    async def _explore_node_async(
+        self,
+        concept: str,
+        depth: int,
+        verbose: bool,
+        semaphore: asyncio.Semaphore,
+    ) -> KnowledgeNode:
         if verbose:
             print(f"{'  ' * depth}Exploring: {concept} (depth {depth})")
 
@@ -157,7 +288,15 @@ class KimiPrerequisiteExplorer:
             )
 
         # Check if it's a foundation concept
-        is_foundation = await self._is_foundation_async(concept)
+        prerequisites: Optional[List[str]] = None
+        if self.combined_mode:
+            async with semaphore:
+                is_foundation, prerequisites = await self._coalesced(
+                    "classify", concept, partial(self._classify_and_decompose_async, concept, verbose)
+                )
+        else:
+            async with semaphore:
+                is_foundation = await self._is_foundation_async(concept)
         if is_foundation:
             if verbose:
                 print(f"{'  ' * depth}  -> Foundation concept")
@@ -169,23 +308,33 @@ class KimiPrerequisiteExplorer:
             )
 
         # Get prerequisites (using tools if available, or verbose instructions)
-        prerequisites = await self._get_prerequisites_async(concept, verbose)
+        if prerequisites is None:
+            async with semaphore:
+                prerequisites = await self._get_prerequisites_async(concept, verbose)
 
-        # Recursively explore prerequisites
-        prereq_nodes = []
-        for prereq in prerequisites:
-            node = await self.explore_async(prereq, depth + 1, verbose)
-            prereq_nodes.append(node)
+        # Recursively explore prerequisites; siblings overlap, order is kept
+        prereq_nodes = await asyncio.gather(
+            *(self._explore_node_async(prereq, depth + 1, verbose, semaphore) for prereq in prerequisites)
+        )
 
         return KnowledgeNode(
             concept=concept,
             depth=depth,
             is_foundation=False,
-            prerequisites=prereq_nodes
+            prerequisites=list(prereq_nodes)
         )
 
     async def _is_foundation_async(self, concept: str) -> bool:
         """Check if a concept is foundational using Kimi K2."""
+        if self.foundation_cache is not None:
+            cached = self.foundation_cache.get(
+                concept, model=self.client.model, prompt_version=FOUNDATION_PROMPT_VERSION
+            )
+            if cached is not None:
+                return cached
+        return await self._coalesced("foundation", concept, partial(self._ask_is_foundation_async, concept))
+
+    async def _ask_is_foundation_async(self, concept: str) -> bool:
         system_prompt = """You are an expert educator analyzing whether a concept is foundational.
 
 A concept is foundational if a typical high school graduate would understand it
@@ -212,7 +361,7 @@ Answer with ONLY "yes" or "no"."""
         user_prompt = f'Is "{concept}" a foundational concept?'
 
         # Make API call
-        response = self.client.chat_completion(
+        response = await self.client.chat_completion_async(
             messages=[{"role": "user", "content": user_prompt}],
             system=system_prompt,
             max_tokens=50,  # Short response expected
@@ -220,7 +369,97 @@ Answer with ONLY "yes" or "no"."""
         )
 
         response_text = self.client.get_text_content(response)
-        return response_text.strip().lower().startswith('yes')
+        is_foundation = response_text.strip().lower().startswith('yes')
+        if self.foundation_cache is not None:
+            self.foundation_cache.set(
+                concept,
+                is_foundation,
+                model=self.client.model,
+                prompt_version=FOUNDATION_PROMPT_VERSION,
+            )
+        return is_foundation
+
+    async def _classify_and_decompose_async(
+        self,
+        concept: str,
+        verbose: bool = True
+    ) -> Tuple[bool, List[str]]:
+        """Get foundation status and prerequisites from a single Kimi K2 call."""
+        cached = None
+        if self.foundation_cache is not None:
+            cached = self.foundation_cache.get(
+                concept, model=self.client.model, prompt_version=CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION
+            )
+            if cached is None:
+                # Verdicts recorded by the two-call path are just as good
+                cached = self.foundation_cache.get(
+                    concept, model=self.client.model, prompt_version=FOUNDATION_PROMPT_VERSION
+                )
+        if cached is True:
+            return True, []
+        if cached is False and concept in self.cache:
+            if verbose:
+                print(f"  -> Using in-memory cache for {concept}")
+            return False, self.cache[concept]
+        if cached is False:
+            stored = self._stored_prerequisites(concept, COMBINED_PROMPT_HASH, PREREQUISITES_PROMPT_HASH)
+            if stored is not None:
+                if verbose:
+                    print(f"  -> Using prerequisite store for {concept}")
+                return False, stored
+
+        response = await self.client.chat_completion_async(
+            messages=[{"role": "user", "content": build_classify_and_decompose_prompt(concept)}],
+            system=CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+            max_tokens=1000,
+            temperature=0.3,
+        )
+
+        parsed = parse_classify_and_decompose(self.client.get_text_content(response))
+        if parsed is None:
+            if verbose:
+                print(f"  -> Combined response unusable for {concept}, using two-call path")
+            if await self._is_foundation_async(concept):
+                return True, []
+            return False, await self._get_prerequisites_async(concept, verbose)
+
+        is_foundation, prerequisites = parsed
+        if self.foundation_cache is not None:
+            self.foundation_cache.set(
+                concept,
+                is_foundation,
+                model=self.client.model,
+                prompt_version=CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+            )
+        if not is_foundation:
+            self.cache[concept] = prerequisites
+            self._store_prerequisites(concept, prerequisites, COMBINED_PROMPT_HASH)
+        return is_foundation, prerequisites
+
+    async def _coalesced(self, kind: str, concept: str, factory):
+        """Share one in-flight call between concurrent requests for ``concept``."""
+        if self.single_flight is None:
+            return await factory()
+        return await self.single_flight.do(SingleFlight.concept_key(kind, concept), factory)
+
+    def _stored_prerequisites(self, concept: str, *prompt_hashes: Optional[str]) -> Optional[List[str]]:
+        """Check the shared store and warm the in-memory cache on a hit."""
+        if self.prerequisite_store is None:
+            return None
+        for key in prompt_hashes:
+            if key is None:
+                continue
+            stored = self.prerequisite_store.get(concept, model=self.client.model, prompt_hash=key)
+            if stored is not None:
+                self.cache[concept] = stored
+                return stored
+        return None
+
+    def _store_prerequisites(self, concept: str, prerequisites: List[str], key: Optional[str]) -> None:
+        if self.prerequisite_store is not None and key is not None:
+            self.prerequisite_store.set(
+                concept, prerequisites, model=self.client.model, prompt_hash=key
+            )
 
     async def _get_prerequisites_async(
         self,
@@ -234,32 +473,26 @@ Answer with ONLY "yes" or "no"."""
             if verbose:
                 print(f"  -> Using in-memory cache for {concept}")
             return self.cache[concept]
+        return await self._coalesced(
+            "prerequisites", concept, partial(self._fetch_prerequisites_async, concept, verbose)
+        )
 
-        # Prepare system prompt
-        system_prompt = """You are an expert educator and curriculum designer.
-
-Your task is to identify the ESSENTIAL prerequisite concepts someone must
-understand BEFORE they can grasp a given concept.
-
-Rules:
-1. Only list concepts that are NECESSARY for understanding (not just helpful)
-2. Order from most to least important
-3. Assume high school education as baseline (don't list truly basic things)
-4. Focus on concepts that enable understanding, not just historical context
-5. Be specific - prefer "special relativity" over "relativity"
-6. Limit to 3-5 prerequisites maximum
-
-Return ONLY a JSON array of concept names, nothing else."""
-
-        user_prompt = f'''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
+    async def _fetch_prerequisites_async(self, concept: str, verbose: bool) -> List[str]:
+        # Then the shared store (other runs / workers)
+        stored = self._stored_prerequisites(concept, PREREQUISITES_PROMPT_HASH, COMBINED_PROMPT_HASH)
+        if stored is not None:
+            if verbose:
+                print(f"  -> Using prerequisite store for {concept}")
+            return stored
 
-Return format: ["concept1", "concept2", "concept3"]'''
+        system_prompt = PREREQUISITES_SYSTEM_PROMPT
+        user_prompt = PREREQUISITES_USER_PROMPT.format(concept=concept)
 
         # Handle tools vs verbose instructions
         if self.use_tools and self.tools:
             # Try with tools first
             try:
-                response = self.client.chat_completion(
+                response = await self.client.chat_completion_async(
                     messages=[{"role": "user", "content": user_prompt}],
                     system=system_prompt,
                     tools=self.tools,
@@ -297,6 +530,7 @@ Return format: ["concept1", "concept2", "concept3"]'''
 
         # Cache the result
         self.cache[concept] = prerequisites
+        self._store_prerequisites(concept, prerequisites, PREREQUISITES_PROMPT_HASH)
 
         return prerequisites
 
@@ -322,7 +556,7 @@ Return format: ["concept1", "concept2", "concept3"]'''
             )
 
         # Make API call
-        response = self.client.chat_completion(
+        response = await self.client.chat_completion_async(
             messages=[{"role": "user", "content": enhanced_prompt}],
             system=system_prompt,
             max_tokens=1000,
@@ -6,11 +6,15 @@ from Moonshot AI. The API is OpenAI-compatible, making integration straightforwa
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
 import os
+import weakref
+from functools import partial
 from typing import Any, Dict, List, Optional, Union
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 # Try relative import first (when used as package), then direct import
 try:
@@ -32,6 +36,39 @@ except ImportError:
         MOONSHOT_BASE_URL,
     )
 
+# Shared rate limiter / AIMD concurrency controller from the main agents
+try:
+    from src.agents.rate_limiter import estimate_tokens, get_rate_limiter
+except ImportError:
+    try:
+        from rate_limiter import estimate_tokens, get_rate_limiter
+    except ImportError:
+        print("Warning: Could not import rate limiter")
+        get_rate_limiter = None  # type: ignore[assignment]
+
+# Per-run token/latency accounting shared with the main agents
+try:
+    from src.agents.run_metrics import llm_call
+except ImportError:
+    try:
+        from run_metrics import llm_call
+    except ImportError:
+        print("Warning: Could not import run metrics")
+        llm_call = None  # type: ignore[assignment]
+
+# Record/replay cassettes for offline runs
+try:
+    from src.agents.llm_cassette import cassette_call, cassette_call_async
+except ImportError:
+    try:
+        from llm_cassette import cassette_call, cassette_call_async
+    except ImportError:
+        print("Warning: Could not import LLM cassettes")
+        cassette_call = cassette_call_async = None  # type: ignore[assignment]
+
+# The limiter owns retries when present so 429s reach it
+_CLIENT_MAX_RETRIES = {"max_retries": 0} if get_rate_limiter is not None else {}
+
 
 class KimiClient:
     """
@@ -72,6 +109,13 @@ class KimiClient:
         self.client = OpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
+            **_CLIENT_MAX_RETRIES,
+        )
+
+        # Async clients are created lazily, one per event loop, because their
+        # pooled HTTP connections are bound to the loop that opened them.
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
         )
 
     def chat_completion(
@@ -103,6 +147,108 @@ class KimiClient:
         Returns:
             Response dict with 'choices', 'usage', etc.
         """
+        params = self._build_params(
+            messages, system, max_tokens, temperature, top_p, tools, tool_choice, stream, **kwargs
+        )
+
+        # Make API call
+        try:
+            create = partial(self.client.chat.completions.create, **params)
+            if cassette_call is not None and not stream:
+                create = partial(cassette_call, "moonshot", params, create)
+            with self._metrics_call() as call:
+                if get_rate_limiter is None:
+                    response = create()
+                else:
+                    response = get_rate_limiter("moonshot", self.model).call_sync(
+                        create, estimated_tokens=self._estimate_tokens(params), usage=self._usage_tokens
+                    )
+                if call is not None and not stream:
+                    call.openai_usage(response.usage)
+        except Exception as e:
+            auth_error = self._authentication_error(e)
+            if auth_error is not None:
+                raise auth_error from e
+            raise
+
+        # Convert response to dict format
+        if stream:
+            return response  # Return stream object as-is
+        else:
+            return self._format_response(response)
+
+    async def chat_completion_async(
+        self,
+        messages: List[Dict[str, str]],
+        system: Optional[str] = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        temperature: float = DEFAULT_TEMPERATURE,
+        top_p: float = DEFAULT_TOP_P,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[Union[str, Dict[str, Any]]] = None,
+        stream: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Async version of ``chat_completion`` that does not block the event loop.
+
+        Uses a pooled ``AsyncOpenAI`` client bound to the running loop, so
+        concurrent calls issued with ``asyncio.gather`` really overlap.
+        """
+        params = self._build_params(
+            messages, system, max_tokens, temperature, top_p, tools, tool_choice, stream, **kwargs
+        )
+
+        try:
+            create = partial(self._get_async_client().chat.completions.create, **params)
+            if cassette_call_async is not None and not stream:
+                create = partial(cassette_call_async, "moonshot", params, create)
+            with self._metrics_call() as call:
+                if get_rate_limiter is None:
+                    response = await create()
+                else:
+                    response = await get_rate_limiter("moonshot", self.model).call(
+                        create, estimated_tokens=self._estimate_tokens(params), usage=self._usage_tokens
+                    )
+                if call is not None and not stream:
+                    call.openai_usage(response.usage)
+        except Exception as e:
+            auth_error = self._authentication_error(e)
+            if auth_error is not None:
+                raise auth_error from e
+            raise
+
+        if stream:
+            return response  # Return stream object as-is
+        return self._format_response(response)
+
+    def _metrics_call(self):
+        """Record this call's tokens and latency with the active run metrics."""
+        if llm_call is None:
+            return contextlib.nullcontext()
+        return llm_call(self.model, agent="kimi")
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, **_CLIENT_MAX_RETRIES)
+            self._async_clients[loop] = client
+        return client
+
+    def _build_params(
+        self,
+        messages: List[Dict[str, str]],
+        system: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        top_p: float,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_choice: Optional[Union[str, Dict[str, Any]]],
+        stream: bool,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Build chat.completions request parameters."""
         # Prepare messages
         api_messages = []
         if system:
@@ -126,29 +272,33 @@ class KimiClient:
             if tool_choice:
                 params["tool_choice"] = tool_choice
 
-        # Make API call
-        try:
-            response = self.client.chat.completions.create(**params)
-        except Exception as e:
-            # Provide more helpful error message for authentication issues
-            error_msg = str(e)
-            if "401" in error_msg or "Invalid Authentication" in error_msg or "AuthenticationError" in str(type(e)):
-                raise ValueError(
-                    f"Authentication failed (401). Please verify:\n"
-                    f"1. Your MOONSHOT_API_KEY is valid and active at https://platform.moonshot.ai/\n"
-                    f"2. The API key is correctly set in your .env file (no extra spaces)\n"
-                    f"3. Your Moonshot account has API access enabled\n"
-                    f"4. The API endpoint is correct: {self.base_url}\n"
-                    f"5. Check if your API key has expired or been revoked\n"
-                    f"\nOriginal error: {error_msg}"
-                ) from e
-            raise
-
-        # Convert response to dict format
-        if stream:
-            return response  # Return stream object as-is
-        else:
-            return self._format_response(response)
+        return params
+
+    @staticmethod
+    def _estimate_tokens(params: Dict[str, Any]) -> int:
+        """Prompt plus completion budget, for the limiter's TPM bucket."""
+        texts = [m.get("content") for m in params["messages"] if isinstance(m.get("content"), str)]
+        return estimate_tokens(*texts) + params.get("max_tokens", 0)
+
+    @staticmethod
+    def _usage_tokens(response: Any) -> Optional[int]:
+        usage = getattr(response, "usage", None)
+        return getattr(usage, "total_tokens", None)
+
+    def _authentication_error(self, e: Exception) -> Optional[ValueError]:
+        """Provide more helpful error message for authentication issues."""
+        error_msg = str(e)
+        if "401" in error_msg or "Invalid Authentication" in error_msg or "AuthenticationError" in str(type(e)):
+            return ValueError(
+                f"Authentication failed (401). Please verify:\n"
+                f"1. Your MOONSHOT_API_KEY is valid and active at https://platform.moonshot.ai/\n"
+                f"2. The API key is correctly set in your .env file (no extra spaces)\n"
+                f"3. Your Moonshot account has API access enabled\n"
+                f"4. The API endpoint is correct: {self.base_url}\n"
+                f"5. Check if your API key has expired or been revoked\n"
+                f"\nOriginal error: {error_msg}"
+            )
+        return None
 
     def _format_response(self, response) -> Dict[str, Any]:
         """Format OpenAI response to consistent dict format."""
@@ -34,6 +34,88 @@ try:
 except ImportError:
     from nomic_atlas_client import AtlasClient, AtlasConcept, NomicNotInstalledError  # type: ignore
 
+try:
+    from src.agents.foundation_cache import FoundationVerdictCache, get_foundation_cache
+except ImportError:
+    from foundation_cache import FoundationVerdictCache, get_foundation_cache  # type: ignore
+
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict, ConceptCanonicalizer, get_canonicalizer
+except ImportError:
+    from concept_canonicalizer import CanonicalDict, ConceptCanonicalizer, get_canonicalizer  # type: ignore
+
+try:
+    from src.agents.prerequisite_store import (
+        InMemoryPrerequisiteStore,
+        JSONLPrerequisiteStore,
+        PrerequisiteStore,
+        SQLitePrerequisiteStore,
+        get_prerequisite_store,
+    )
+except ImportError:
+    from prerequisite_store import (  # type: ignore
+        InMemoryPrerequisiteStore,
+        JSONLPrerequisiteStore,
+        PrerequisiteStore,
+        SQLitePrerequisiteStore,
+        get_prerequisite_store,
+    )
+
+try:
+    from src.agents.enrichment_cache import EnrichmentCache, get_enrichment_cache
+except ImportError:
+    from enrichment_cache import EnrichmentCache, get_enrichment_cache  # type: ignore
+
+try:
+    from src.agents.single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight  # type: ignore
+
+try:
+    from src.agents.llm_provider import LLMProvider, ModelRouter, get_model_router
+except ImportError:
+    from llm_provider import LLMProvider, ModelRouter, get_model_router  # type: ignore
+
+try:
+    from src.agents.hedging import HedgePolicy
+except ImportError:
+    from hedging import HedgePolicy  # type: ignore
+
+try:
+    from src.agents.rate_limiter import RateLimiter, get_rate_limiter, rate_limiter_stats
+except ImportError:
+    from rate_limiter import RateLimiter, get_rate_limiter, rate_limiter_stats  # type: ignore
+
+try:
+    from src.agents.llm_transport import prompt_cache_stats
+except ImportError:
+    from llm_transport import prompt_cache_stats  # type: ignore
+
+try:
+    from src.agents.message_batches import AnthropicBatchBackend, BatchRunner, LocalBatchBackend
+except ImportError:
+    from message_batches import AnthropicBatchBackend, BatchRunner, LocalBatchBackend  # type: ignore
+
+try:
+    from src.agents.run_metrics import RunMetrics, collect_metrics, metrics_stage
+except ImportError:
+    from run_metrics import RunMetrics, collect_metrics, metrics_stage  # type: ignore
+
+try:
+    from src.agents.llm_cassette import Cassette, CassetteMiss, use_cassette
+except ImportError:
+    from llm_cassette import Cassette, CassetteMiss, use_cassette  # type: ignore
+
+try:
+    from src.agents.claude_session_pool import ClaudeSessionPool, get_session_pool
+except ImportError:
+    from claude_session_pool import ClaudeSessionPool, get_session_pool  # type: ignore
+
+try:
+    from src.agents.knowledge_graph import ConceptNode, KnowledgeGraph
+except ImportError:
+    from knowledge_graph import ConceptNode, KnowledgeGraph  # type: ignore
+
 try:
     from src.agents.orchestrator import ReverseKnowledgeTreeOrchestrator, AnimationResult
 except ImportError:
@@ -53,6 +135,8 @@ __all__ = [
 
     # Data structures
     "KnowledgeNode",
+    "KnowledgeGraph",
+    "ConceptNode",
     "MathematicalContent",
     "VisualSpec",
     "Narrative",
@@ -66,5 +150,49 @@ __all__ = [
     "AtlasClient",
     "AtlasConcept",
     "NomicNotInstalledError",
+
+    # Caching
+    "FoundationVerdictCache",
+    "get_foundation_cache",
+    "CanonicalDict",
+    "ConceptCanonicalizer",
+    "get_canonicalizer",
+    "PrerequisiteStore",
+    "InMemoryPrerequisiteStore",
+    "SQLitePrerequisiteStore",
+    "JSONLPrerequisiteStore",
+    "get_prerequisite_store",
+    "EnrichmentCache",
+    "get_enrichment_cache",
+    "SingleFlight",
+
+    # Providers and routing
+    "LLMProvider",
+    "ModelRouter",
+    "get_model_router",
+    "HedgePolicy",
+    "RateLimiter",
+    "get_rate_limiter",
+    "rate_limiter_stats",
+    "prompt_cache_stats",
+
+    # Offline batch builds
+    "BatchRunner",
+    "AnthropicBatchBackend",
+    "LocalBatchBackend",
+
+    # Run metrics
+    "RunMetrics",
+    "collect_metrics",
+    "metrics_stage",
+
+    # Record/replay cassettes
+    "Cassette",
+    "CassetteMiss",
+    "use_cassette",
+
+    # Agent SDK sessions
+    "ClaudeSessionPool",
+    "get_session_pool",
 ]
 
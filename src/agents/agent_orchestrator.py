@@ -20,13 +20,7 @@ from enum import Enum
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from claude_agent_sdk import (
-    AssistantMessage,
-    ClaudeAgentOptions,
-    ClaudeSDKClient,
-    TextBlock,
-    create_sdk_mcp_server,
-)
+from claude_agent_sdk import create_sdk_mcp_server
 from dotenv import load_dotenv
 
 # Import agents
@@ -50,6 +44,16 @@ except ImportError:
         EnhancedPrerequisiteExplorer = None  # type: ignore
         ALL_TOOLS = []
 
+try:
+    from src.agents.claude_session_pool import get_session_pool, run_in_background_loop
+except ImportError:
+    from claude_session_pool import get_session_pool, run_in_background_loop
+
+try:
+    from src.agents.run_metrics import RunMetrics, collect_metrics, metrics_stage
+except ImportError:
+    from run_metrics import RunMetrics, collect_metrics, metrics_stage
+
 load_dotenv()
 
 
@@ -67,6 +71,14 @@ class PipelineState(Enum):
     FAILED = "failed"
 
 
+# Agent credited in run metrics for the LLM calls of each stage
+_STAGE_AGENTS = {
+    PipelineState.CONCEPT_ANALYSIS: "AgentOrchestrator",
+    PipelineState.PREREQUISITE_DISCOVERY: "EnhancedPrerequisiteExplorer",
+    PipelineState.VIDEO_REVIEW: "VideoReviewAgent",
+}
+
+
 @dataclass
 class PipelineContext:
     """Shared context across all agents in the pipeline."""
@@ -105,6 +117,7 @@ class AgentOrchestrator:
         self.verbose = verbose
         self.state = PipelineState.INIT
         self.context: Optional[PipelineContext] = None
+        self.metrics: Optional[RunMetrics] = None  # Token, cost and latency totals of the last run
 
         # Initialize MCP server with tools
         self.mcp_server = None
@@ -136,36 +149,40 @@ class AgentOrchestrator:
             Dict containing results from all pipeline stages
         """
         self.context = PipelineContext(user_input=user_input)
+        with collect_metrics() as metrics:
+            self.metrics = metrics
+            return await self._run_stages()
 
+    async def _run_stages(self) -> Dict[str, Any]:
         try:
             # Stage 1: Concept Analysis
-            self.state = PipelineState.CONCEPT_ANALYSIS
-            await self._analyze_concept()
+            with self._enter(PipelineState.CONCEPT_ANALYSIS):
+                await self._analyze_concept()
 
             # Stage 2: Prerequisite Discovery
-            self.state = PipelineState.PREREQUISITE_DISCOVERY
-            await self._discover_prerequisites()
+            with self._enter(PipelineState.PREREQUISITE_DISCOVERY):
+                await self._discover_prerequisites()
 
             # Stage 3: Mathematical Enrichment (TODO)
-            self.state = PipelineState.MATHEMATICAL_ENRICHMENT
-            await self._enrich_mathematics()
+            with self._enter(PipelineState.MATHEMATICAL_ENRICHMENT):
+                await self._enrich_mathematics()
 
             # Stage 4: Visual Design (TODO)
-            self.state = PipelineState.VISUAL_DESIGN
-            await self._design_visuals()
+            with self._enter(PipelineState.VISUAL_DESIGN):
+                await self._design_visuals()
 
             # Stage 5: Narrative Composition (TODO)
-            self.state = PipelineState.NARRATIVE_COMPOSITION
-            await self._compose_narrative()
+            with self._enter(PipelineState.NARRATIVE_COMPOSITION):
+                await self._compose_narrative()
 
             # Stage 6: Code Generation (TODO)
-            self.state = PipelineState.CODE_GENERATION
-            await self._generate_code()
+            with self._enter(PipelineState.CODE_GENERATION):
+                await self._generate_code()
 
             # Stage 7: Video Review (if video exists)
-            self.state = PipelineState.VIDEO_REVIEW
-            if self.context.video_path and self.context.video_path.exists():
-                await self._review_video()
+            with self._enter(PipelineState.VIDEO_REVIEW):
+                if self.context.video_path and self.context.video_path.exists():
+                    await self._review_video()
 
             self.state = PipelineState.COMPLETE
             return self._build_result()
@@ -175,6 +192,11 @@ class AgentOrchestrator:
             self.context.errors.append(str(e))
             return self._build_result()
 
+    def _enter(self, state: PipelineState):
+        """Move to ``state``; run metrics recorded inside are attributed to it."""
+        self.state = state
+        return metrics_stage(state.value, agent=_STAGE_AGENTS.get(state))
+
     async def _analyze_concept(self):
         """Stage 1: Analyze user input to extract core concept and metadata."""
         if self.verbose:
@@ -206,45 +228,34 @@ Example:
   "goal": "Understand how entangled particles maintain correlation across distances"
 }}'''
 
-        options = ClaudeAgentOptions()
-        options.system_prompt = system_prompt
-        if self.use_tools and self.mcp_server:
-            options.mcp_servers = [self.mcp_server]
-
-        async with ClaudeSDKClient(options=options) as client:
-            await client.connect(prompt=user_prompt)
-
-            response_text = ""
-            async for message in client.messages():
-                if isinstance(message, AssistantMessage):
-                    for block in message.content:
-                        if isinstance(block, TextBlock):
-                            response_text += block.text
-
-            # Parse JSON response
-            try:
-                analysis = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Try to extract from code blocks
-                if "```" in response_text:
-                    response_text = response_text.split("```")[1]
-                    if response_text.startswith("json"):
-                        response_text = response_text[4:]
-                    analysis = json.loads(response_text.strip())
+        mcp_servers = [self.mcp_server] if self.use_tools and self.mcp_server else None
+        pool = get_session_pool(system_prompt, mcp_servers=mcp_servers)
+        response_text = await pool.query_text(user_prompt)
+
+        # Parse JSON response
+        try:
+            analysis = json.loads(response_text)
+        except json.JSONDecodeError:
+            # Try to extract from code blocks
+            if "```" in response_text:
+                response_text = response_text.split("```")[1]
+                if response_text.startswith("json"):
+                    response_text = response_text[4:]
+                analysis = json.loads(response_text.strip())
+            else:
+                import re
+                match = re.search(r'\{.*?\}', response_text, re.DOTALL)
+                if match:
+                    analysis = json.loads(match.group(0))
                 else:
-                    import re
-                    match = re.search(r'\{.*?\}', response_text, re.DOTALL)
-                    if match:
-                        analysis = json.loads(match.group(0))
-                    else:
-                        raise ValueError(f"Could not parse analysis from: {response_text}")
+                    raise ValueError(f"Could not parse analysis from: {response_text}")
 
-            self.context.concept_analysis = analysis
+        self.context.concept_analysis = analysis
 
-            if self.verbose:
-                print(f"  ✓ Core concept: {analysis.get('core_concept')}")
-                print(f"  ✓ Domain: {analysis.get('domain')}")
-                print(f"  ✓ Level: {analysis.get('level')}")
+        if self.verbose:
+            print(f"  ✓ Core concept: {analysis.get('core_concept')}")
+            print(f"  ✓ Domain: {analysis.get('domain')}")
+            print(f"  ✓ Level: {analysis.get('level')}")
 
     async def _discover_prerequisites(self):
         """Stage 2: Build knowledge tree of prerequisites."""
@@ -343,12 +354,13 @@ Example:
             ),
             "errors": self.context.errors,
             "warnings": self.context.warnings,
+            "metrics": self.metrics.to_dict() if self.metrics else None,
         }
 
     # Synchronous wrapper
     def process(self, user_input: str) -> Dict[str, Any]:
-        """Synchronous wrapper around process_async."""
-        return asyncio.run(self.process_async(user_input))
+        """Synchronous wrapper around process_async (pooled sessions persist)."""
+        return run_in_background_loop(self.process_async(user_input))
 
 
 async def demo():
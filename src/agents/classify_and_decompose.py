@@ -0,0 +1,203 @@
+"""Shared prompt and parser for the combined "classify-and-decompose" call.
+
+The explorers normally need two sequential round trips per non-leaf node:
+one to ask whether a concept is foundational and a second to list its
+prerequisites. The combined mode asks both questions at once and expects a
+single structured answer::
+
+    {"is_foundation": false, "prerequisites": ["special relativity", ...]}
+
+Explorers that opt in (``combined_mode=True``) fall back to the original
+two-call path whenever :func:`parse_classify_and_decompose` cannot make sense
+of the model output, so a malformed response never breaks tree building.
+
+The batch variants ask the same question for a whole frontier of concepts at
+once and expect a JSON object keyed by concept name; they back the
+level-synchronous exploration strategy.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bump whenever the combined prompt changes so cached verdicts are re-asked.
+CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION = "classify-decompose-v1"
+
+_CLASSIFY_AND_DECOMPOSE_RULES = """You are an expert educator and curriculum designer.
+
+For a given concept you answer two questions at once:
+
+1. Is the concept foundational? A concept is foundational if a typical high
+   school graduate would understand it without further mathematical or
+   scientific explanation.
+
+   Examples of foundational concepts:
+   - velocity, distance, time, acceleration
+   - force, mass, energy
+   - waves, frequency, wavelength
+   - numbers, addition, multiplication
+   - basic geometry (points, lines, angles)
+   - functions, graphs
+
+   Examples of non-foundational concepts:
+   - Lorentz transformations
+   - gauge theory
+   - differential geometry
+   - tensor calculus
+   - quantum operators
+   - Hilbert spaces
+
+2. If it is NOT foundational, what are the ESSENTIAL prerequisite concepts
+   someone must understand BEFORE they can grasp it?
+
+   Rules:
+   - Only list concepts that are NECESSARY for understanding (not just helpful)
+   - Order from most to least important
+   - Assume high school education as baseline (don't list truly basic things)
+   - Focus on concepts that enable understanding, not just historical context
+   - Be specific - prefer "special relativity" over "relativity"
+   - Limit to 3-5 prerequisites maximum"""
+
+CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT = _CLASSIFY_AND_DECOMPOSE_RULES + """
+
+Return ONLY a JSON object with exactly these keys, nothing else:
+- is_foundation: true or false
+- prerequisites: JSON array of concept names (empty when is_foundation is true)"""
+
+BATCH_CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT = _CLASSIFY_AND_DECOMPOSE_RULES + """
+
+You will be given several concepts at once. Return ONLY a JSON object that maps
+each concept name, spelled exactly as given, to an object with these keys:
+- is_foundation: true or false
+- prerequisites: JSON array of concept names (empty when is_foundation is true)"""
+
+
+def build_classify_and_decompose_prompt(concept: str) -> str:
+    """Return the user prompt for the combined call."""
+
+    return f'''Concept: "{concept}"
+
+Is it foundational, and if not, what are its 3-5 ESSENTIAL prerequisite concepts?
+
+Return format: {{"is_foundation": false, "prerequisites": ["concept1", "concept2", "concept3"]}}'''
+
+
+def _load_json_object(content: str) -> Optional[Any]:
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+
+    if "```" in content:
+        for section in content.split("```")[1::2]:
+            section = section.strip()
+            if section.startswith("json"):
+                section = section[4:]
+            try:
+                return json.loads(section.strip())
+            except json.JSONDecodeError:
+                continue
+
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def parse_classify_and_decompose(
+    content: Optional[str],
+    max_prerequisites: int = 5,
+) -> Optional[Tuple[bool, List[str]]]:
+    """Parse a combined response into ``(is_foundation, prerequisites)``.
+
+    Returns ``None`` when the output is not a usable answer so the caller can
+    fall back to the two-call path. A non-foundational concept without any
+    prerequisites is treated as unusable as well.
+    """
+
+    if not content:
+        return None
+
+    data = _load_json_object(content.strip())
+    if not isinstance(data, dict) or "is_foundation" not in data:
+        return None
+
+    verdict = data["is_foundation"]
+    if isinstance(verdict, str):
+        if verdict.strip().lower() not in ("true", "false", "yes", "no"):
+            return None
+        verdict = verdict.strip().lower() in ("true", "yes")
+    elif not isinstance(verdict, bool):
+        return None
+
+    if verdict:
+        return True, []
+
+    prerequisites = data.get("prerequisites")
+    if not isinstance(prerequisites, list):
+        return None
+    prerequisites = [p.strip() for p in prerequisites if isinstance(p, str) and p.strip()]
+    if not prerequisites:
+        return None
+
+    return False, prerequisites[:max_prerequisites]
+
+
+def build_batch_classify_and_decompose_prompt(concepts: List[str]) -> str:
+    """Return the user prompt asking about several concepts in one request."""
+
+    listing = "\n".join(f"- {json.dumps(concept)}" for concept in concepts)
+    return f'''For EACH of the following concepts, decide whether it is foundational and,
+if not, list its 3-5 ESSENTIAL prerequisite concepts:
+
+{listing}
+
+Return ONLY a JSON object mapping every concept name (exactly as given) to its answer.
+Return format: {{"concept A": {{"is_foundation": false, "prerequisites": ["concept1", "concept2"]}}, "concept B": {{"is_foundation": true, "prerequisites": []}}}}'''
+
+
+def parse_batch_classify_and_decompose(
+    content: Optional[str],
+    concepts: List[str],
+    max_prerequisites: int = 5,
+) -> Dict[str, Tuple[bool, List[str]]]:
+    """Parse a batched response into ``{concept: (is_foundation, prerequisites)}``.
+
+    Keys are matched case-insensitively against ``concepts`` and reported
+    using the caller's spelling. Concepts that are missing or malformed are
+    simply left out so the caller can retry them individually.
+    """
+
+    if not content:
+        return {}
+
+    data = _load_json_object(content.strip())
+    if not isinstance(data, dict):
+        return {}
+
+    wanted = {concept.strip().lower(): concept for concept in concepts}
+    results: Dict[str, Tuple[bool, List[str]]] = {}
+    for key, answer in data.items():
+        concept = wanted.get(str(key).strip().lower())
+        if concept is None or not isinstance(answer, dict):
+            continue
+        parsed = parse_classify_and_decompose(json.dumps(answer), max_prerequisites)
+        if parsed is not None:
+            results[concept] = parsed
+    return results
+
+
+__all__ = [
+    "BATCH_CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT",
+    "CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION",
+    "CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT",
+    "build_batch_classify_and_decompose_prompt",
+    "build_classify_and_decompose_prompt",
+    "parse_batch_classify_and_decompose",
+    "parse_classify_and_decompose",
+]
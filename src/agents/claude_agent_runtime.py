@@ -11,16 +11,12 @@ model that now lives exclusively in Claude Code).
 
 from __future__ import annotations
 
-import asyncio
-from typing import Optional
+from typing import Dict, Optional
 
-from claude_agent_sdk import (
-    AssistantMessage,
-    ClaudeAgentOptions,
-    TextBlock,
-    ToolResultBlock,
-    query,
-)
+try:
+    from src.agents.claude_session_pool import get_session_pool, run_in_background_loop
+except ImportError:
+    from claude_session_pool import get_session_pool, run_in_background_loop
 
 
 async def _run_query_async(
@@ -30,36 +26,34 @@ async def _run_query_async(
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
 ) -> str:
-    """Internal async helper that streams responses from Claude Code."""
-
-    options = ClaudeAgentOptions()
-    if system_prompt is not None:
-        options.system_prompt = system_prompt
+    """Internal async helper that asks Claude Code on a pooled session."""
 
     # Pass temperature/max tokens as extra CLI arguments when provided.
+    extra_args: Dict[str, Optional[str]] = {}
     if temperature is not None:
-        options.extra_args["temperature"] = str(temperature)
+        extra_args["temperature"] = str(temperature)
     if max_tokens is not None:
-        options.extra_args["max-tokens"] = str(max_tokens)
+        extra_args["max-tokens"] = str(max_tokens)
+
+    pool = get_session_pool(system_prompt, extra_args=extra_args)
+    return await pool.query_text(prompt)
 
-    chunks: list[str] = []
 
-    async for message in query(prompt=prompt, options=options):
-        if isinstance(message, AssistantMessage):
-            for block in message.content:
-                if isinstance(block, TextBlock):
-                    chunks.append(block.text)
-                elif isinstance(block, ToolResultBlock):
-                    content = block.content
-                    if isinstance(content, str):
-                        chunks.append(content)
-                    elif isinstance(content, list):
-                        for item in content:
-                            text = item.get("text")
-                            if text:
-                                chunks.append(text)
+async def run_query_via_sdk_async(
+    prompt: str,
+    *,
+    system_prompt: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Public async wrapper for call sites already running inside an event loop."""
 
-    return "".join(chunks).strip()
+    return await _run_query_async(
+        prompt,
+        system_prompt=system_prompt,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
 
 
 def run_query_via_sdk(
@@ -69,9 +63,12 @@ def run_query_via_sdk(
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
 ) -> str:
-    """Public synchronous wrapper used by legacy call sites."""
+    """Public synchronous wrapper used by legacy call sites.
 
-    return asyncio.run(
+    Runs on a shared background loop so pooled sessions outlive the call.
+    """
+
+    return run_in_background_loop(
         _run_query_async(
             prompt,
             system_prompt=system_prompt,
@@ -81,6 +78,4 @@ def run_query_via_sdk(
     )
 
 
-__all__ = ["run_query_via_sdk"]
-
-
+__all__ = ["run_query_via_sdk", "run_query_via_sdk_async"]
@@ -17,8 +17,25 @@ from typing import Any, Dict, List, Optional
 
 from claude_agent_sdk import tool
 
-# Cache for prerequisites (in-memory for now, can be Redis/DB later)
-_PREREQUISITE_CACHE: Dict[str, List[str]] = {}
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict, get_canonicalizer
+except ImportError:
+    from concept_canonicalizer import CanonicalDict, get_canonicalizer
+
+try:
+    from src.agents.prerequisite_store import get_prerequisite_store, prompt_hash
+except ImportError:
+    from prerequisite_store import get_prerequisite_store, prompt_hash
+
+# In-process cache for prerequisites, backed by the shared PrerequisiteStore
+# so other workers and later runs see what the agent cached.
+# Keyed by canonical concept, so spelling variants share an entry.
+_PREREQUISITE_CACHE: Dict[str, List[str]] = CanonicalDict()
+
+# Entries written through the tool are whatever the agent decided to cache,
+# so they live under their own model/prompt key in the shared store.
+TOOL_STORE_MODEL = "claude-agent-sdk"
+TOOL_PROMPT_HASH = prompt_hash("claude_sdk_tools.cache_prerequisites")
 
 
 @tool(
@@ -32,6 +49,9 @@ async def cache_prerequisites(args: Dict[str, Any]) -> Dict[str, Any]:
     prerequisites = args["prerequisites"]
 
     _PREREQUISITE_CACHE[concept] = prerequisites
+    get_prerequisite_store().set(
+        concept, prerequisites, model=TOOL_STORE_MODEL, prompt_hash=TOOL_PROMPT_HASH
+    )
 
     return {
         "content": [
@@ -52,6 +72,13 @@ async def get_cached_prerequisites(args: Dict[str, Any]) -> Dict[str, Any]:
     """Retrieve prerequisites from cache if they exist."""
     concept = args["concept"]
 
+    if concept not in _PREREQUISITE_CACHE:
+        stored = get_prerequisite_store().get(
+            concept, model=TOOL_STORE_MODEL, prompt_hash=TOOL_PROMPT_HASH
+        )
+        if stored is not None:
+            _PREREQUISITE_CACHE[concept] = stored
+
     if concept in _PREREQUISITE_CACHE:
         prerequisites = _PREREQUISITE_CACHE[concept]
         return {
@@ -202,12 +229,13 @@ async def search_knowledge_tree(args: Dict[str, Any]) -> Dict[str, Any]:
 
     # Search in cache for similar concepts
     results = []
-    concept_lower = concept.lower()
+    canonicalizer = get_canonicalizer()
+    concept_key = canonicalizer.resolve(concept)
 
     for cached_concept, prerequisites in _PREREQUISITE_CACHE.items():
-        # Simple similarity check
-        if (concept_lower in cached_concept.lower() or
-            cached_concept.lower() in concept_lower):
+        # Simple similarity check on canonical forms
+        cached_key = canonicalizer.resolve(cached_concept)
+        if concept_key in cached_key or cached_key in concept_key:
             results.append({
                 "concept": cached_concept,
                 "prerequisites": prerequisites,
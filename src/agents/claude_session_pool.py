@@ -0,0 +1,337 @@
+"""Long-lived pool of Claude Agent SDK sessions.
+
+Every ``ClaudeSDKClient`` context starts a Claude Code CLI subprocess, and
+for short questions such as foundation checks that startup dominates the
+time to answer. ``ClaudeSessionPool`` keeps connected clients around and
+reuses them across queries:
+
+- up to ``size`` sessions per pool, handed out one query at a time;
+- each query gets its own ``session_id`` so answers do not see each other,
+  and a session is recycled after ``max_queries_per_session`` queries to
+  keep the CLI's context small;
+- health checks: idle sessions older than ``max_idle_seconds`` are dropped,
+  ``health_check()`` pings every idle session, and a session that fails
+  mid-query is discarded and the query retried once on a fresh one.
+
+Subprocess transports belong to the event loop that started them, so pools
+are registered per loop (``get_session_pool``). The synchronous
+``claude_agent_runtime.run_query_via_sdk`` wrapper runs on one background
+loop so its pool survives between calls instead of a new loop per call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from claude_agent_sdk import (
+    AssistantMessage,
+    ClaudeAgentOptions,
+    ClaudeSDKClient,
+    ResultMessage,
+    TextBlock,
+    ToolResultBlock,
+)
+
+try:
+    from src.agents.run_metrics import llm_call, record_retry
+except ImportError:
+    from run_metrics import llm_call, record_retry
+
+try:
+    from src.agents.llm_cassette import cassette_call_async
+except ImportError:
+    from llm_cassette import cassette_call_async
+
+DEFAULT_POOL_SIZE = 4
+
+# Recorded in run metrics when the SDK does not say which model answered
+SDK_MODEL = "claude-agent-sdk"
+
+
+def collect_text(message: Any, chunks: List[str]) -> None:
+    """Append the text carried by an SDK message to ``chunks``."""
+    if not isinstance(message, AssistantMessage):
+        return
+    for block in message.content:
+        if isinstance(block, TextBlock):
+            chunks.append(block.text)
+        elif isinstance(block, ToolResultBlock):
+            content = block.content
+            if isinstance(content, str):
+                chunks.append(content)
+            elif isinstance(content, list):
+                for item in content:
+                    text = item.get("text")
+                    if text:
+                        chunks.append(text)
+
+
+@dataclass
+class _Session:
+    client: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    queries: int = 0
+
+
+class ClaudeSessionPool:
+    """Reusable connected ``ClaudeSDKClient`` sessions sharing one set of options."""
+
+    def __init__(
+        self,
+        options_factory: Callable[[], ClaudeAgentOptions] = ClaudeAgentOptions,
+        *,
+        size: int = DEFAULT_POOL_SIZE,
+        max_queries_per_session: int = 50,
+        max_idle_seconds: float = 300.0,
+        client_factory: Callable[..., Any] = ClaudeSDKClient,
+    ) -> None:
+        self.options_factory = options_factory
+        self.size = max(1, size)
+        self.max_queries_per_session = max(1, max_queries_per_session)
+        self.max_idle_seconds = max_idle_seconds
+        self.client_factory = client_factory
+        self._idle: List[_Session] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._query_ids = itertools.count(1)
+        self._closed = False
+        self.stats: Dict[str, int] = {
+            "queries": 0,
+            "sessions_started": 0,
+            "sessions_reused": 0,
+            "sessions_discarded": 0,
+            "retries": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    async def query_text(self, prompt: str) -> str:
+        """Ask ``prompt`` on a pooled session and return the collected text."""
+        if self._closed:
+            raise RuntimeError("ClaudeSessionPool is closed")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            self.stats["queries"] += 1
+            with llm_call(SDK_MODEL, agent="claude_agent_sdk") as call:
+                reply = await cassette_call_async(
+                    "claude_agent_sdk", self._request(prompt), lambda: self._ask_with_retry(prompt), decode=dict
+                )
+                call.anthropic_usage(reply["usage"])
+                call.cost_usd = reply["total_cost_usd"]
+                if reply["model_usage"] and len(reply["model_usage"]) == 1:
+                    call.model = next(iter(reply["model_usage"]))
+            return reply["text"]
+
+    def _request(self, prompt: str) -> Dict[str, Any]:
+        """What identifies a query for record/replay: the prompt and the session options."""
+        options = self.options_factory()
+        return {
+            "prompt": prompt,
+            "system_prompt": options.system_prompt,
+            "model": options.model,
+            "extra_args": options.extra_args,
+        }
+
+    async def _ask_with_retry(self, prompt: str) -> Dict[str, Any]:
+        try:
+            return await self._ask_on_pooled_session(prompt)
+        except Exception:
+            # A dead CLI subprocess looks like any other failure: retry once fresh.
+            self.stats["retries"] += 1
+            record_retry(SDK_MODEL)
+            return await self._ask_on_pooled_session(prompt)
+
+    async def _ask_on_pooled_session(self, prompt: str) -> Dict[str, Any]:
+        session = await self._acquire()
+        try:
+            reply = await self._ask(session, prompt)
+        except BaseException:
+            await self._discard(session)
+            raise
+        await self._release(session)
+        return reply
+
+    async def _ask(self, session: _Session, prompt: str) -> Dict[str, Any]:
+        """The answer's text plus the usage and cost from its ``ResultMessage``."""
+        session.queries += 1
+        await session.client.query(prompt, session_id=f"q{next(self._query_ids)}")
+        chunks: List[str] = []
+        reply: Dict[str, Any] = {"usage": None, "total_cost_usd": None, "model_usage": None}
+        async for message in session.client.receive_response():
+            collect_text(message, chunks)
+            if isinstance(message, ResultMessage):
+                reply.update(
+                    usage=message.usage, total_cost_usd=message.total_cost_usd, model_usage=message.model_usage
+                )
+        reply["text"] = "".join(chunks).strip()
+        return reply
+
+    # ------------------------------------------------------------------
+    # Session lifecycle
+    # ------------------------------------------------------------------
+    async def _acquire(self) -> _Session:
+        while self._idle:
+            session = self._idle.pop()
+            if self._is_stale(session):
+                await self._discard(session)
+                continue
+            self.stats["sessions_reused"] += 1
+            return session
+        client = self.client_factory(options=self.options_factory())
+        await client.connect()
+        self.stats["sessions_started"] += 1
+        return _Session(client=client)
+
+    async def _release(self, session: _Session) -> None:
+        session.last_used = time.monotonic()
+        if self._closed or session.queries >= self.max_queries_per_session:
+            await self._discard(session)
+        else:
+            self._idle.append(session)
+
+    def _is_stale(self, session: _Session) -> bool:
+        return (
+            session.queries >= self.max_queries_per_session
+            or time.monotonic() - session.last_used > self.max_idle_seconds
+        )
+
+    async def _discard(self, session: _Session) -> None:
+        self.stats["sessions_discarded"] += 1
+        try:
+            await session.client.disconnect()
+        except Exception:
+            pass  # The subprocess is already gone; nothing else to clean up.
+
+    async def health_check(self, timeout: float = 10.0) -> int:
+        """Ping idle sessions, dropping stale or unresponsive ones.
+
+        Returns the number of healthy idle sessions left.
+        """
+        sessions, self._idle = self._idle, []
+        for session in sessions:
+            healthy = not self._is_stale(session)
+            if healthy:
+                try:
+                    await asyncio.wait_for(session.client.get_server_info(), timeout)
+                except Exception:
+                    healthy = False
+            if healthy:
+                self._idle.append(session)
+            else:
+                await self._discard(session)
+        return len(self._idle)
+
+    async def close(self) -> None:
+        self._closed = True
+        sessions, self._idle = self._idle, []
+        for session in sessions:
+            await self._discard(session)
+
+    def idle_sessions(self) -> int:
+        return len(self._idle)
+
+
+# ----------------------------------------------------------------------
+# Per-loop registry
+# ----------------------------------------------------------------------
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, ClaudeSessionPool]]" = (
+    weakref.WeakKeyDictionary()
+)
+_pools_lock = threading.Lock()
+
+
+def _profile_key(
+    system_prompt: Optional[str],
+    mcp_servers: Any,
+    extra_args: Optional[Dict[str, Optional[str]]],
+) -> Tuple[Hashable, ...]:
+    # Callers build a fresh servers list per call; key on the servers themselves.
+    if isinstance(mcp_servers, dict):
+        servers_key: Hashable = tuple(sorted((name, id(s)) for name, s in mcp_servers.items()))
+    elif mcp_servers is not None:
+        servers_key = tuple(id(s) for s in mcp_servers)
+    else:
+        servers_key = None
+    return (
+        system_prompt,
+        servers_key,
+        tuple(sorted((extra_args or {}).items())),
+    )
+
+
+def get_session_pool(
+    system_prompt: Optional[str] = None,
+    *,
+    mcp_servers: Any = None,
+    extra_args: Optional[Dict[str, Optional[str]]] = None,
+    size: int = DEFAULT_POOL_SIZE,
+) -> ClaudeSessionPool:
+    """Return the running loop's pool for this system prompt / tool set."""
+    loop = asyncio.get_running_loop()
+    key = _profile_key(system_prompt, mcp_servers, extra_args)
+    with _pools_lock:
+        pools = _pools.setdefault(loop, {})
+        pool = pools.get(key)
+        if pool is None:
+            def options_factory() -> ClaudeAgentOptions:
+                options = ClaudeAgentOptions()
+                if system_prompt is not None:
+                    options.system_prompt = system_prompt
+                if mcp_servers is not None:
+                    options.mcp_servers = mcp_servers
+                options.extra_args.update(extra_args or {})
+                return options
+
+            pool = ClaudeSessionPool(options_factory, size=size)
+            pools[key] = pool
+        return pool
+
+
+async def close_session_pools() -> None:
+    """Close every pool registered on the running loop."""
+    loop = asyncio.get_running_loop()
+    with _pools_lock:
+        pools = _pools.pop(loop, {})
+    for pool in pools.values():
+        await pool.close()
+
+
+# ----------------------------------------------------------------------
+# Background loop for synchronous callers
+# ----------------------------------------------------------------------
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def run_in_background_loop(coro: Any) -> Any:
+    """Run ``coro`` on a long-lived daemon loop and wait for its result.
+
+    Lets synchronous code reuse pooled sessions instead of paying for a new
+    loop (and new CLI subprocesses) on every call.
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="claude-session-pool", daemon=True)
+            thread.start()
+            _background_loop = loop
+        loop = _background_loop
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+__all__ = [
+    "ClaudeSessionPool",
+    "close_session_pools",
+    "collect_text",
+    "get_session_pool",
+    "run_in_background_loop",
+]
@@ -0,0 +1,298 @@
+"""Concept canonicalization shared by every prerequisite/enrichment cache.
+
+Models spell the same idea many ways: "Special Relativity", "special
+relativity", "Lorentz transformations" vs "Lorentz transformation",
+"$\\psi$ functions" vs "ψ function". Caches keyed on raw strings treat all of
+those as separate misses and pay for another LLM call. This module turns a
+concept name into a canonical lookup key while callers keep showing the
+original display name.
+
+Resolution happens in three steps:
+
+1. ``canonicalize``: deterministic normalization - Unicode NFKC, LaTeX
+   markup stripped (``\\mathrm{}``, ``$``, Greek commands spelled out),
+   possessives dropped, case folded, punctuation and whitespace collapsed,
+   and each word reduced to its singular form.
+2. Alias table: explicit ``alias -> canonical`` mappings, learned from prior
+   runs (fuzzy matches are remembered) and optionally persisted as JSON.
+3. Optional fuzzy matching against keys seen so far, accepted only above
+   ``fuzzy_threshold`` (``difflib`` ratio, 0-1). Disabled by default.
+
+``CanonicalDict`` wraps a plain dict with this logic and counts the hits
+that an exact-string cache would have missed, i.e. LLM calls avoided:
+
+>>> canon = ConceptCanonicalizer()
+>>> cache = CanonicalDict(canon)
+>>> cache["Special Relativity"] = ["Lorentz transformations"]
+>>> cache["special  relativity"]
+['Lorentz transformations']
+>>> canon.canonicalize("Lorentz Transformations")
+'lorentz transformation'
+>>> canon.stats()["calls_avoided"]
+1
+"""
+
+from __future__ import annotations
+
+import difflib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+# Greek letters are spelled out so "$\psi$" and "ψ" resolve to the same key.
+_GREEK = {
+    "α": "alpha", "β": "beta", "γ": "gamma", "δ": "delta", "ε": "epsilon",
+    "ζ": "zeta", "η": "eta", "θ": "theta", "ι": "iota", "κ": "kappa",
+    "λ": "lambda", "μ": "mu", "ν": "nu", "ξ": "xi", "π": "pi", "ρ": "rho",
+    "σ": "sigma", "ς": "sigma", "τ": "tau", "υ": "upsilon", "φ": "phi",
+    "χ": "chi", "ψ": "psi", "ω": "omega",
+}
+
+_LATEX_WRAPPERS = re.compile(r"\\(?:mathrm|mathbf|mathit|mathcal|text|textbf|textit|operatorname)\s*\{([^{}]*)\}")
+_LATEX_COMMAND = re.compile(r"\\([A-Za-z]+)")
+_POSSESSIVE = re.compile(r"(\w)'s\b")
+_NON_WORD = re.compile(r"[^\w\s-]+")
+_LEADING_ARTICLE = re.compile(r"^(?:the|a|an)\s+")
+
+# Words that end in "s" in their singular form.
+_SINGULAR_S_ENDINGS = ("ss", "us", "is", "ics", "ous", "sis")
+_SINGULAR_S_WORDS = {"gas", "lens", "bias", "atlas", "chaos", "cosmos", "series", "species", "calculus"}
+_IRREGULAR_PLURALS = {
+    "matrices": "matrix", "vertices": "vertex", "indices": "index",
+    "spectra": "spectrum", "quanta": "quantum", "maxima": "maximum", "minima": "minimum",
+}
+
+
+def _singularize(word: str) -> str:
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or not word.endswith("s") or word in _SINGULAR_S_WORDS:
+        return word
+    if word.endswith(_SINGULAR_S_ENDINGS):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "xes", "zes", "sses")):
+        return word[:-2]
+    return word[:-1]
+
+
+class ConceptCanonicalizer:
+    """Map concept names to canonical cache keys.
+
+    Thread-safe; counters describe how lookups were resolved so callers can
+    see how many LLM calls canonicalization saved.
+    """
+
+    def __init__(
+        self,
+        aliases: Optional[Dict[str, str]] = None,
+        alias_path: Optional[Union[str, Path]] = None,
+        fuzzy_threshold: Optional[float] = None,
+    ) -> None:
+        if fuzzy_threshold is not None and not 0 < fuzzy_threshold <= 1:
+            raise ValueError("fuzzy_threshold must be in (0, 1]")
+        self.alias_path = str(alias_path) if alias_path not in (None, "", ":memory:") else None
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = threading.Lock()
+        self._aliases: Dict[str, str] = {}
+        self._known: Dict[str, None] = {}  # ordered set of canonical keys seen so far
+        self.calls_avoided = 0
+        self.alias_hits = 0
+        self.fuzzy_hits = 0
+
+        if self.alias_path and os.path.exists(self.alias_path):
+            try:
+                with open(self.alias_path, encoding="utf-8") as handle:
+                    stored = json.load(handle)
+            except (OSError, json.JSONDecodeError):
+                stored = {}
+            for alias, canonical in stored.items():
+                self._aliases[self.canonicalize(alias)] = self.canonicalize(canonical)
+        for alias, canonical in (aliases or {}).items():
+            self._aliases[self.canonicalize(alias)] = self.canonicalize(canonical)
+
+    # ------------------------------------------------------------------
+    # Normalization
+    # ------------------------------------------------------------------
+    @staticmethod
+    def canonicalize(concept: str) -> str:
+        """Deterministic normalization (no alias table, no fuzzy matching)."""
+        text = unicodedata.normalize("NFKC", concept)
+        text = _LATEX_WRAPPERS.sub(r" \1 ", text)
+        text = _LATEX_COMMAND.sub(r" \1 ", text)
+        text = text.replace("$", " ").replace("{", " ").replace("}", " ")
+        text = text.replace("’", "'")
+        text = _POSSESSIVE.sub(r"\1", text)
+        text = "".join(_GREEK.get(ch, ch) for ch in text.casefold())
+        text = text.replace("_", " ")
+        text = _NON_WORD.sub(" ", text)
+        text = " ".join(text.split())
+        text = _LEADING_ARTICLE.sub("", text)
+        return " ".join(_singularize(word) for word in text.split())
+
+    def resolve(self, concept: str) -> str:
+        """Return the canonical key for ``concept`` using aliases and fuzzy matching."""
+        key = self.canonicalize(concept)
+        with self._lock:
+            if key in self._aliases:
+                return self._aliases[key]
+            if key in self._known or self.fuzzy_threshold is None:
+                return key
+            match = self._fuzzy_match(key)
+        if match is None:
+            return key
+        with self._lock:
+            self.fuzzy_hits += 1
+        self.learn_alias(concept, match)
+        return match
+
+    def _fuzzy_match(self, key: str) -> Optional[str]:
+        best, best_score = None, self.fuzzy_threshold or 1.0
+        for known in self._known:
+            score = difflib.SequenceMatcher(None, key, known).ratio()
+            if score >= best_score:
+                best, best_score = known, score
+        return best
+
+    # ------------------------------------------------------------------
+    # Learning
+    # ------------------------------------------------------------------
+    def register(self, concept: str) -> str:
+        """Resolve ``concept`` and remember the key as a fuzzy-match target."""
+        key = self.resolve(concept)
+        with self._lock:
+            self._known.setdefault(key, None)
+        return key
+
+    def learn_alias(self, alias: str, canonical: str) -> None:
+        """Record that ``alias`` means ``canonical`` and persist it if configured."""
+        alias_key = self.canonicalize(alias)
+        canonical_key = self.canonicalize(canonical)
+        canonical_key = self._aliases.get(canonical_key, canonical_key)
+        if alias_key == canonical_key:
+            return
+        with self._lock:
+            if self._aliases.get(alias_key) == canonical_key:
+                return
+            self._aliases[alias_key] = canonical_key
+            self._known.setdefault(canonical_key, None)
+            self._save_aliases()
+
+    def _save_aliases(self) -> None:
+        if not self.alias_path:
+            return
+        try:
+            Path(self.alias_path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{self.alias_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump(self._aliases, handle, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.alias_path)
+        except OSError as exc:
+            print(f"Could not save concept aliases: {exc}")
+
+    @property
+    def aliases(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._aliases)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+    def record_call_avoided(self, alias: bool = False) -> None:
+        with self._lock:
+            self.calls_avoided += 1
+            if alias:
+                self.alias_hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls_avoided": self.calls_avoided,
+                "alias_hits": self.alias_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "aliases": len(self._aliases),
+                "known_concepts": len(self._known),
+            }
+
+
+class CanonicalDict(MutableMapping):
+    """Dict keyed by canonical concept that remembers the first display name.
+
+    Iteration yields display names, so existing code that prints or searches
+    cache keys keeps working. Lookups that hit under a different spelling
+    than the one stored are counted as avoided LLM calls.
+    """
+
+    def __init__(self, canonicalizer: Optional[ConceptCanonicalizer] = None) -> None:
+        self.canonicalizer = canonicalizer or get_canonicalizer()
+        self._data: Dict[str, Tuple[str, Any]] = {}
+
+    def __getitem__(self, concept: str) -> Any:
+        display, value = self._data[self.canonicalizer.resolve(concept)]
+        if display != concept:
+            self.canonicalizer.record_call_avoided(
+                alias=self.canonicalizer.canonicalize(display) != self.canonicalizer.canonicalize(concept)
+            )
+        return value
+
+    def __setitem__(self, concept: str, value: Any) -> None:
+        key = self.canonicalizer.register(concept)
+        display = self._data[key][0] if key in self._data else concept
+        self._data[key] = (display, value)
+
+    def __delitem__(self, concept: str) -> None:
+        del self._data[self.canonicalizer.resolve(concept)]
+
+    def __contains__(self, concept: object) -> bool:
+        return isinstance(concept, str) and self.canonicalizer.resolve(concept) in self._data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([display for display, _ in self._data.values()])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def display_name(self, concept: str) -> str:
+        """Return the spelling the concept was first stored under."""
+        return self._data[self.canonicalizer.resolve(concept)][0]
+
+    def __repr__(self) -> str:
+        return f"CanonicalDict({dict(self.items())!r})"
+
+
+_DEFAULT_CANONICALIZER: Optional[ConceptCanonicalizer] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_canonicalizer() -> ConceptCanonicalizer:
+    """Return the process-wide canonicalizer.
+
+    ``MATH_TO_MANIM_CONCEPT_ALIASES`` overrides the alias file location
+    (``:memory:`` keeps aliases in-process only) and
+    ``MATH_TO_MANIM_FUZZY_THRESHOLD`` enables fuzzy matching.
+    """
+    global _DEFAULT_CANONICALIZER
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CANONICALIZER is None:
+            try:
+                from src.agents.foundation_cache import DEFAULT_CACHE_DIR
+            except ImportError:
+                from foundation_cache import DEFAULT_CACHE_DIR
+            alias_path = os.getenv(
+                "MATH_TO_MANIM_CONCEPT_ALIASES", str(DEFAULT_CACHE_DIR / "concept_aliases.json")
+            )
+            threshold = os.getenv("MATH_TO_MANIM_FUZZY_THRESHOLD")
+            _DEFAULT_CANONICALIZER = ConceptCanonicalizer(
+                alias_path=alias_path,
+                fuzzy_threshold=float(threshold) if threshold else None,
+            )
+        return _DEFAULT_CANONICALIZER
+
+
+__all__ = ["CanonicalDict", "ConceptCanonicalizer", "get_canonicalizer"]
@@ -1,7 +1,7 @@
 """Enhanced Prerequisite Explorer using full Claude Agent SDK features.
 
 This version uses:
-- ClaudeSDKClient for stateful conversations
+- Pooled, long-lived ClaudeSDKClient sessions
 - Custom MCP tools for caching and validation
 - Async streaming for better performance
 - Error recovery and retries
@@ -13,16 +13,11 @@ import asyncio
 import json
 import os
 from dataclasses import dataclass
+from functools import partial
 from typing import Any, Dict, List, Optional
 
 from anthropic import NotFoundError
-from claude_agent_sdk import (
-    AssistantMessage,
-    ClaudeAgentOptions,
-    ClaudeSDKClient,
-    TextBlock,
-    create_sdk_mcp_server,
-)
+from claude_agent_sdk import create_sdk_mcp_server
 from dotenv import load_dotenv
 
 # Import custom tools
@@ -35,8 +30,61 @@ except ImportError:
         print("Warning: Could not import custom tools")
         ALL_TOOLS = []
 
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict
+except ImportError:
+    from concept_canonicalizer import CanonicalDict
+
+try:
+    from src.agents.foundation_cache import FoundationVerdictCache, get_foundation_cache
+except ImportError:
+    from foundation_cache import FoundationVerdictCache, get_foundation_cache
+
+try:
+    from src.agents.prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+except ImportError:
+    from prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+
+try:
+    from src.agents.single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight
+
+try:
+    from src.agents.claude_session_pool import get_session_pool, run_in_background_loop
+except ImportError:
+    from claude_session_pool import get_session_pool, run_in_background_loop
+
 load_dotenv()
 
+# The Agent SDK picks the model itself, so verdicts are keyed under this name.
+SDK_MODEL_KEY = "claude-agent-sdk"
+
+# Bump whenever the is_foundation prompt changes so cached verdicts are re-asked.
+FOUNDATION_PROMPT_VERSION = "sdk-foundation-v1"
+
+PREREQUISITES_SYSTEM_PROMPT = """You are an expert educator and curriculum designer.
+
+Your task is to identify the ESSENTIAL prerequisite concepts someone must
+understand BEFORE they can grasp a given concept.
+
+Rules:
+1. Only list concepts that are NECESSARY for understanding (not just helpful)
+2. Order from most to least important
+3. Assume high school education as baseline (don't list truly basic things)
+4. Focus on concepts that enable understanding, not just historical context
+5. Be specific - prefer "special relativity" over "relativity"
+6. Limit to 3-5 prerequisites maximum
+
+Return ONLY a JSON array of concept names, nothing else."""
+
+PREREQUISITES_USER_PROMPT = '''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
+
+Return format: ["concept1", "concept2", "concept3"]'''
+
+# Shared PrerequisiteStore entries are keyed by prompt, so editing one starts fresh.
+PREREQUISITES_PROMPT_HASH = prompt_hash(PREREQUISITES_SYSTEM_PROMPT, PREREQUISITES_USER_PROMPT)
+
 
 @dataclass
 class KnowledgeNode:
@@ -79,16 +127,29 @@ class EnhancedPrerequisiteExplorer:
     Enhanced prerequisite explorer using full Claude Agent SDK.
 
     Key improvements over basic version:
-    - Uses ClaudeSDKClient for stateful conversations
+    - Reuses pooled ClaudeSDKClient sessions instead of a CLI start per question
     - Integrates custom MCP tools for caching
     - Better error handling and retries
     - Streaming support for real-time updates
     """
 
-    def __init__(self, max_depth: int = 4, use_tools: bool = True):
+    def __init__(
+        self,
+        max_depth: int = 4,
+        use_tools: bool = True,
+        foundation_cache: Optional[FoundationVerdictCache] = None,
+        prerequisite_store: Optional[PrerequisiteStore] = None,
+    ):
         self.max_depth = max_depth
         self.use_tools = use_tools
-        self.cache: Dict[str, List[str]] = {}
+        self.cache: Dict[str, List[str]] = CanonicalDict()  # Keyed by canonical concept
+        if foundation_cache is None:
+            foundation_cache = get_foundation_cache()
+        self.foundation_cache = foundation_cache  # Persistent is_foundation verdicts
+        if prerequisite_store is None:
+            prerequisite_store = get_prerequisite_store()
+        self.prerequisite_store = prerequisite_store  # Decompositions shared across runs and workers
+        self.single_flight = SingleFlight()  # Concurrent lookups of one concept share a call
 
         # Set up MCP server with custom tools
         self.mcp_server = None
@@ -159,6 +220,17 @@ class EnhancedPrerequisiteExplorer:
 
     async def _is_foundation_async(self, concept: str) -> bool:
         """Check if a concept is foundational using Claude Agent SDK."""
+        cached = self.foundation_cache.get(
+            concept, model=SDK_MODEL_KEY, prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        if cached is not None:
+            return cached
+        return await self.single_flight.do(
+            SingleFlight.concept_key("foundation", concept),
+            partial(self._ask_is_foundation_async, concept),
+        )
+
+    async def _ask_is_foundation_async(self, concept: str) -> bool:
         system_prompt = """You are an expert educator analyzing whether a concept is foundational.
 
 A concept is foundational if a typical high school graduate would understand it
@@ -184,26 +256,13 @@ Answer with ONLY "yes" or "no"."""
 
         user_prompt = f'Is "{concept}" a foundational concept?'
 
-        # Use ClaudeSDKClient for better context management
-        options = ClaudeAgentOptions()
-        options.system_prompt = system_prompt
+        response_text = await self._ask_claude(system_prompt, user_prompt)
 
-        # Set up MCP server if using tools
-        if self.use_tools and self.mcp_server:
-            options.mcp_servers = [self.mcp_server]
-
-        async with ClaudeSDKClient(options=options) as client:
-            await client.connect(prompt=user_prompt)
-
-            # Collect response
-            response_text = ""
-            async for message in client.messages():
-                if isinstance(message, AssistantMessage):
-                    for block in message.content:
-                        if isinstance(block, TextBlock):
-                            response_text += block.text
-
-            return response_text.strip().lower().startswith('yes')
+        is_foundation = response_text.strip().lower().startswith('yes')
+        self.foundation_cache.set(
+            concept, is_foundation, model=SDK_MODEL_KEY, prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        return is_foundation
 
     async def _get_prerequisites_async(
         self,
@@ -217,52 +276,43 @@ Answer with ONLY "yes" or "no"."""
             if verbose:
                 print(f"  -> Using in-memory cache for {concept}")
             return self.cache[concept]
+        return await self.single_flight.do(
+            SingleFlight.concept_key("prerequisites", concept),
+            partial(self._fetch_prerequisites_async, concept, verbose),
+        )
 
-        # Query Claude for prerequisites
-        system_prompt = """You are an expert educator and curriculum designer.
-
-Your task is to identify the ESSENTIAL prerequisite concepts someone must
-understand BEFORE they can grasp a given concept.
-
-Rules:
-1. Only list concepts that are NECESSARY for understanding (not just helpful)
-2. Order from most to least important
-3. Assume high school education as baseline (don't list truly basic things)
-4. Focus on concepts that enable understanding, not just historical context
-5. Be specific - prefer "special relativity" over "relativity"
-6. Limit to 3-5 prerequisites maximum
-
-Return ONLY a JSON array of concept names, nothing else."""
-
-        user_prompt = f'''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
-
-Return format: ["concept1", "concept2", "concept3"]'''
-
-        options = ClaudeAgentOptions()
-        options.system_prompt = system_prompt
+    async def _fetch_prerequisites_async(self, concept: str, verbose: bool) -> List[str]:
+        # Then the shared store (other runs / workers)
+        stored = self.prerequisite_store.get(
+            concept, model=SDK_MODEL_KEY, prompt_hash=PREREQUISITES_PROMPT_HASH
+        )
+        if stored is not None:
+            if verbose:
+                print(f"  -> Using prerequisite store for {concept}")
+            self.cache[concept] = stored
+            return stored
 
-        # Add tools if available
-        if self.use_tools and self.mcp_server:
-            options.mcp_servers = [self.mcp_server]
+        # Query Claude for prerequisites
+        user_prompt = PREREQUISITES_USER_PROMPT.format(concept=concept)
 
-        async with ClaudeSDKClient(options=options) as client:
-            await client.connect(prompt=user_prompt)
+        response_text = await self._ask_claude(PREREQUISITES_SYSTEM_PROMPT, user_prompt)
 
-            # Collect response
-            response_text = ""
-            async for message in client.messages():
-                if isinstance(message, AssistantMessage):
-                    for block in message.content:
-                        if isinstance(block, TextBlock):
-                            response_text += block.text
+        # Parse JSON response
+        prerequisites = self._parse_prerequisites(response_text)
 
-            # Parse JSON response
-            prerequisites = self._parse_prerequisites(response_text)
+        # Cache the result
+        self.cache[concept] = prerequisites
+        self.prerequisite_store.set(
+            concept, prerequisites, model=SDK_MODEL_KEY, prompt_hash=PREREQUISITES_PROMPT_HASH
+        )
 
-            # Cache the result
-            self.cache[concept] = prerequisites
+        return prerequisites
 
-            return prerequisites
+    async def _ask_claude(self, system_prompt: str, user_prompt: str) -> str:
+        """Ask Claude on a pooled, already-connected Agent SDK session."""
+        mcp_servers = [self.mcp_server] if self.use_tools and self.mcp_server else None
+        pool = get_session_pool(system_prompt, mcp_servers=mcp_servers)
+        return await pool.query_text(user_prompt)
 
     def _parse_prerequisites(self, response_text: str) -> List[str]:
         """Parse prerequisites from Claude's response."""
@@ -287,8 +337,12 @@ Return format: ["concept1", "concept2", "concept3"]'''
 
     # Synchronous wrapper for backwards compatibility
     def explore(self, concept: str, depth: int = 0, verbose: bool = True) -> KnowledgeNode:
-        """Synchronous wrapper around explore_async."""
-        return asyncio.run(self.explore_async(concept, depth, verbose))
+        """Synchronous wrapper around explore_async.
+
+        Runs on the shared background loop so pooled sessions stay connected
+        between calls.
+        """
+        return run_in_background_loop(self.explore_async(concept, depth, verbose))
 
 
 async def demo():
@@ -299,7 +353,7 @@ async def demo():
 ======================================================================
 
 Features:
-  * Stateful conversations with ClaudeSDKClient
+  * Pooled, long-lived ClaudeSDKClient sessions
   * Custom MCP tools for caching and validation
   * Better error handling and retries
   * Async streaming for real-time updates
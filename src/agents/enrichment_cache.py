@@ -0,0 +1,390 @@
+"""Persistent, content-addressed cache for enrichment and visual design results.
+
+``MathematicalContent`` and ``VisualSpec`` answers are the bulk of a
+pipeline run's calls, yet they only depend on a handful of inputs: the
+concept, its complexity tier, the model, the prompt template and (for visual
+specs) the parent context the prompt describes. Re-running a tree after a
+narrative tweak used to pay for all of them again. This module stores each
+answer under a hash of exactly those inputs, so identical requests are
+answered from disk in any later run or process, while a changed parent spec
+or prompt version is a different address and simply misses.
+
+Entries are JSON payloads in a WAL-mode SQLite file, bounded by entry count
+and total payload size; the least recently used entries are evicted first.
+Stale entries can be dropped explicitly with the command line interface::
+
+    python src/agents/enrichment_cache.py stats
+    python src/agents/enrichment_cache.py invalidate --concept "special relativity"
+    python src/agents/enrichment_cache.py invalidate --kind visual_spec --older-than 7
+    python src/agents/enrichment_cache.py clear
+
+>>> cache = EnrichmentCache(":memory:")
+>>> cache.set("math_content", "Calculus", {"equations": ["$f'(x)$"]}, model="m", prompt_version="v1")
+>>> cache.get("math_content", " calculus", model="m", prompt_version="v1")
+{'equations': ["$f'(x)$"]}
+>>> cache.get("math_content", "calculus", model="m", prompt_version="v2") is None
+True
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+try:
+    from src.agents.concept_canonicalizer import get_canonicalizer
+    from src.agents.foundation_cache import DEFAULT_CACHE_DIR
+except ImportError:
+    from concept_canonicalizer import get_canonicalizer
+    from foundation_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_ENRICHMENT_CACHE_PATH = DEFAULT_CACHE_DIR / "enrichment.sqlite3"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_key(
+    kind: str,
+    concept: str,
+    *,
+    model: str,
+    prompt_version: str,
+    complexity: str = "",
+    context: Any = None,
+) -> str:
+    """Address of one answer: a hash of every input that shapes it.
+
+    ``concept`` must already be canonical. ``context`` is any JSON-serializable
+    description of the rest of the prompt (depth, equations, parent spec).
+    """
+
+    material = json.dumps(
+        [kind, concept, complexity, model, prompt_version, context],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class EnrichmentCache:
+    """SQLite-backed, size-bounded LRU store of enrichment payloads.
+
+    Like :class:`FoundationVerdictCache`, the connection is opened lazily and
+    shared by all threads of the process behind a lock; other processes reach
+    the same file through SQLite's own locking.
+
+    Args:
+        path: Database file, or ``":memory:"``
+        max_entries: Keep at most this many entries (``None`` for no limit)
+        max_bytes: Keep at most this many bytes of payload (``None`` for no limit)
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        self.path = str(path) if path is not None else str(DEFAULT_ENRICHMENT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # ------------------------------------------------------------------
+    # Connection management
+    # ------------------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS enrichment_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    concept TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS enrichment_cache_last_used ON enrichment_cache (last_used)")
+            conn.execute("CREATE INDEX IF NOT EXISTS enrichment_cache_concept ON enrichment_cache (concept)")
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """Close the underlying connection (it is reopened on next use)."""
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def get(
+        self,
+        kind: str,
+        concept: str,
+        *,
+        model: str,
+        prompt_version: str,
+        complexity: str = "",
+        context: Any = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Return the stored payload, or ``None`` (and count a miss) if absent."""
+
+        key = content_key(
+            kind,
+            get_canonicalizer().resolve(concept),
+            model=model,
+            prompt_version=prompt_version,
+            complexity=complexity,
+            context=context,
+        )
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT payload FROM enrichment_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            conn.execute("UPDATE enrichment_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def set(
+        self,
+        kind: str,
+        concept: str,
+        payload: Dict[str, Any],
+        *,
+        model: str,
+        prompt_version: str,
+        complexity: str = "",
+        context: Any = None,
+    ) -> None:
+        """Store (or overwrite) a payload, then evict down to the size bounds."""
+
+        canonical = get_canonicalizer().register(concept)
+        key = content_key(
+            kind, canonical, model=model, prompt_version=prompt_version, complexity=complexity, context=context
+        )
+        data = json.dumps(payload, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO enrichment_cache "
+                    "(key, kind, concept, model, prompt_version, payload, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, kind, canonical, model, prompt_version, data, len(data.encode("utf-8")), now, now),
+                )
+                self.evictions += self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        evicted = 0
+        if self.max_entries is not None:
+            cursor = conn.execute(
+                "DELETE FROM enrichment_cache WHERE rowid IN ("
+                " SELECT rowid FROM enrichment_cache ORDER BY last_used DESC, rowid DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+            evicted += max(cursor.rowcount, 0)
+        if self.max_bytes is not None:
+            cursor = conn.execute(
+                "DELETE FROM enrichment_cache WHERE rowid IN ("
+                " SELECT rowid FROM ("
+                "  SELECT rowid, SUM(size) OVER (ORDER BY last_used DESC, rowid DESC) AS running"
+                "  FROM enrichment_cache"
+                " ) WHERE running > ?"
+                ")",
+                (self.max_bytes,),
+            )
+            evicted += max(cursor.rowcount, 0)
+        return evicted
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def invalidate(
+        self,
+        *,
+        kind: Optional[str] = None,
+        concept: Optional[str] = None,
+        model: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+        older_than: Optional[float] = None,
+    ) -> int:
+        """Delete every entry matching all given filters; return how many.
+
+        ``older_than`` is an age in seconds. With no filters nothing is
+        deleted; use :meth:`clear` to drop everything.
+        """
+
+        clauses: List[str] = []
+        params: List[Any] = []
+        for column, value in (("kind", kind), ("model", model), ("prompt_version", prompt_version)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if concept is not None:
+            clauses.append("concept = ?")
+            params.append(get_canonicalizer().resolve(concept))
+        if older_than is not None:
+            clauses.append("created_at < ?")
+            params.append(time.time() - older_than)
+        if not clauses:
+            return 0
+        with self._lock:
+            cursor = self._connection().execute(
+                f"DELETE FROM enrichment_cache WHERE {' AND '.join(clauses)}", params
+            )
+            return max(cursor.rowcount, 0)
+
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+
+        with self._lock:
+            self._connection().execute("DELETE FROM enrichment_cache")
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM enrichment_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process and the stored totals."""
+
+        lookups = self.hits + self.misses
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM enrichment_cache GROUP BY kind"
+            ).fetchall()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": sum(count for _, count, _ in rows),
+            "bytes": sum(size for _, _, size in rows),
+            "by_kind": {kind: count for kind, count, _ in rows},
+            "path": self.path,
+        }
+
+
+_default_cache: Optional[EnrichmentCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def _cache_from_env(path: Optional[str] = None) -> EnrichmentCache:
+    max_entries = os.getenv("MATH_TO_MANIM_ENRICHMENT_CACHE_MAX_ENTRIES")
+    max_bytes = os.getenv("MATH_TO_MANIM_ENRICHMENT_CACHE_MAX_BYTES")
+    return EnrichmentCache(
+        path or os.getenv("MATH_TO_MANIM_ENRICHMENT_CACHE") or DEFAULT_ENRICHMENT_CACHE_PATH,
+        max_entries=int(max_entries) if max_entries else None,
+        max_bytes=int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES,
+    )
+
+
+def get_enrichment_cache() -> EnrichmentCache:
+    """Return the process-wide cache shared by the enrichers and designers.
+
+    The location can be overridden with ``MATH_TO_MANIM_ENRICHMENT_CACHE``
+    (use ``:memory:`` to keep results for the current process only), the
+    bounds with ``MATH_TO_MANIM_ENRICHMENT_CACHE_MAX_ENTRIES`` and
+    ``MATH_TO_MANIM_ENRICHMENT_CACHE_MAX_BYTES`` (256 MiB by default).
+    """
+
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = _cache_from_env()
+        return _default_cache
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Inspect or invalidate the on-disk enrichment cache."""
+
+    parser = argparse.ArgumentParser(
+        prog="python src/agents/enrichment_cache.py",
+        description="Inspect or invalidate cached mathematical content and visual specs.",
+    )
+    parser.add_argument("--path", help="Cache file (defaults to $MATH_TO_MANIM_ENRICHMENT_CACHE or the user cache)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show entry counts and size")
+
+    invalidate = subparsers.add_parser("invalidate", help="Delete entries matching every given filter")
+    invalidate.add_argument("--kind", choices=["math_content", "visual_spec"], help="Entry kind")
+    invalidate.add_argument("--concept", help="Concept name (matched canonically)")
+    invalidate.add_argument("--model", help="Model that produced the entry")
+    invalidate.add_argument("--prompt-version", help="Prompt template version")
+    invalidate.add_argument("--older-than", type=float, metavar="DAYS", help="Created more than DAYS ago")
+
+    subparsers.add_parser("clear", help="Delete every entry")
+
+    args = parser.parse_args(argv)
+    cache = _cache_from_env(args.path)
+    try:
+        if args.command == "stats":
+            print(json.dumps(cache.stats(), indent=2))
+        elif args.command == "invalidate":
+            filters = {
+                "kind": args.kind,
+                "concept": args.concept,
+                "model": args.model,
+                "prompt_version": args.prompt_version,
+                "older_than": args.older_than * 86400 if args.older_than is not None else None,
+            }
+            if all(value is None for value in filters.values()):
+                parser.error("invalidate needs at least one filter (use 'clear' to drop everything)")
+            print(f"Invalidated {cache.invalidate(**filters)} entries in {cache.path}")
+        else:
+            entries = len(cache)
+            cache.clear()
+            print(f"Cleared {entries} entries from {cache.path}")
+    finally:
+        cache.close()
+    return 0
+
+
+__all__ = [
+    "DEFAULT_ENRICHMENT_CACHE_PATH",
+    "EnrichmentCache",
+    "content_key",
+    "get_enrichment_cache",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Persistent, process-shared cache for foundation verdicts.
+
+Every explorer asks the model "is this concept foundational?" before it
+decomposes a concept. The answer for a given concept rarely changes, yet
+nightly batches re-ask it for "calculus" or "vectors" hundreds of times.
+This module stores those yes/no verdicts in a small SQLite database so all
+explorers (and all processes on the same machine) can reuse them.
+
+Entries are keyed by the normalized concept, the model that produced the
+verdict and the version of the prompt used to ask for it. Bumping an
+explorer's ``FOUNDATION_PROMPT_VERSION`` therefore invalidates its old
+verdicts without touching anyone else's.
+
+Example usage:
+
+>>> cache = FoundationVerdictCache(":memory:")
+>>> cache.get("Calculus", model="claude-sonnet-4-5", prompt_version="v1") is None
+True
+>>> cache.set("Calculus", True, model="claude-sonnet-4-5", prompt_version="v1")
+>>> cache.get("  calculus ", model="claude-sonnet-4-5", prompt_version="v1")
+True
+>>> cache.stats()["hits"]
+1
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+DEFAULT_CACHE_DIR = Path(
+    os.getenv("MATH_TO_MANIM_CACHE_DIR", Path.home() / ".cache" / "math_to_manim")
+)
+DEFAULT_FOUNDATION_CACHE_PATH = DEFAULT_CACHE_DIR / "foundation_verdicts.sqlite3"
+
+
+def normalize_concept(concept: str) -> str:
+    """Return the canonical lookup key for a concept name.
+
+    Delegates to the shared :mod:`concept_canonicalizer`, so case, Unicode,
+    LaTeX, plural and learned-alias variants share one cache entry.
+    """
+
+    return _get_canonicalizer().resolve(concept)
+
+
+def _get_canonicalizer():
+    # Imported lazily: concept_canonicalizer reads DEFAULT_CACHE_DIR from here.
+    try:
+        from src.agents.concept_canonicalizer import get_canonicalizer
+    except ImportError:
+        from concept_canonicalizer import get_canonicalizer
+    return get_canonicalizer()
+
+
+class FoundationVerdictCache:
+    """SQLite-backed store of ``is_foundation`` verdicts with hit/miss counters.
+
+    The connection is opened lazily on first use, so constructing a cache is
+    free and does not touch the filesystem. A single connection is shared by
+    all threads of the process and guarded by a lock; other processes reach
+    the same file through SQLite's own locking (WAL mode).
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None) -> None:
+        self.path = str(path) if path is not None else str(DEFAULT_FOUNDATION_CACHE_PATH)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # ------------------------------------------------------------------
+    # Connection management
+    # ------------------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS foundation_verdicts (
+                    concept TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    is_foundation INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (concept, model, prompt_version)
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """Close the underlying connection (it is reopened on next use)."""
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def get(self, concept: str, *, model: str, prompt_version: str) -> Optional[bool]:
+        """Return the cached verdict, or ``None`` (and count a miss) if absent."""
+
+        key = normalize_concept(concept)
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT is_foundation FROM foundation_verdicts "
+                "WHERE concept = ? AND model = ? AND prompt_version = ?",
+                (key, model, prompt_version),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return bool(row[0])
+
+    def set(
+        self,
+        concept: str,
+        is_foundation: bool,
+        *,
+        model: str,
+        prompt_version: str,
+    ) -> None:
+        """Store (or overwrite) the verdict for a concept."""
+
+        key = _get_canonicalizer().register(concept)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO foundation_verdicts "
+                "(concept, model, prompt_version, is_foundation, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, prompt_version, int(bool(is_foundation)), time.time()),
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        """Delete every stored verdict and reset the counters."""
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM foundation_verdicts")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM foundation_verdicts"
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process."""
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "path": self.path,
+        }
+
+
+_default_cache: Optional[FoundationVerdictCache] = None
+
+
+def get_foundation_cache() -> FoundationVerdictCache:
+    """Return the process-wide cache shared by every explorer.
+
+    The location can be overridden with ``MATH_TO_MANIM_FOUNDATION_CACHE``
+    (use ``:memory:`` to keep verdicts for the current process only).
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FoundationVerdictCache(
+            os.getenv("MATH_TO_MANIM_FOUNDATION_CACHE") or DEFAULT_FOUNDATION_CACHE_PATH
+        )
+    return _default_cache
+
+
+__all__ = [
+    "DEFAULT_FOUNDATION_CACHE_PATH",
+    "FoundationVerdictCache",
+    "get_foundation_cache",
+    "normalize_concept",
+]
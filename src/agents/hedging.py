@@ -0,0 +1,142 @@
+"""Hedged requests for idempotent LLM calls.
+
+Exploration awaits each node's answers before recursing, so one slow
+completion stalls its whole subtree and shows up directly in p99 pipeline
+latency. For calls that are safe to repeat (foundation checks, prerequisite
+discovery, math enrichment), ``HedgePolicy.run`` starts the request, and if
+it has not finished after the task's observed p95 latency it fires one
+duplicate and takes whichever answer arrives first. The loser is cancelled.
+
+The hedge delay is learned per (task, model) from the latencies callers
+saw: every call records the time from the primary's start to the winning
+answer, so a hedge that wins does not hide the slow primary and drag the
+p95 down. Until ``min_samples`` are recorded, ``initial_delay`` is used.
+Hedging is off unless enabled: pass a policy to ``ModelRouter`` or set
+``MATH_TO_MANIM_HEDGE`` (``1`` for the defaults, or a quantile such as
+``0.9``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import math
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Deque, Dict, FrozenSet, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+HEDGEABLE_TASKS: FrozenSet[str] = frozenset({"foundation", "classify", "prerequisites", "math_content"})
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies per key."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Hashable, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def quantile(self, key: Hashable, q: float) -> Optional[float]:
+        """Nearest-rank quantile of the recorded latencies, or ``None``."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return None
+        rank = max(1, math.ceil(q * len(samples)))
+        return samples[rank - 1]
+
+
+class HedgePolicy:
+    """When and for which tasks to send a duplicate request."""
+
+    def __init__(
+        self,
+        *,
+        quantile: float = 0.95,
+        tasks: FrozenSet[str] = HEDGEABLE_TASKS,
+        initial_delay: float = 2.0,
+        min_delay: float = 0.05,
+        min_samples: int = 20,
+        tracker: Optional[LatencyTracker] = None,
+    ):
+        self.quantile = quantile
+        self.tasks = frozenset(tasks)
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.tracker = tracker or LatencyTracker()
+        self.stats: Dict[str, int] = {"calls": 0, "hedged": 0, "hedge_won": 0}
+
+    def applies_to(self, task: str) -> bool:
+        return task in self.tasks
+
+    def delay(self, key: Hashable) -> float:
+        """Seconds to wait for the first attempt before hedging."""
+        if self.tracker.count(key) < self.min_samples:
+            return self.initial_delay
+        observed = self.tracker.quantile(key, self.quantile)
+        return max(self.min_delay, observed if observed is not None else self.initial_delay)
+
+    async def run(self, key: Hashable, request: Callable[[], Awaitable[T]]) -> T:
+        """Await ``request()``, hedging once with a second call if it runs long."""
+        self.stats["calls"] += 1
+        attempts = []
+
+        def launch() -> "asyncio.Future[T]":
+            attempt = asyncio.ensure_future(request())
+            attempts.append(attempt)
+            return attempt
+
+        started = time.monotonic()
+        primary = launch()
+        try:
+            done, pending = await asyncio.wait({primary}, timeout=self.delay(key))
+            if not done:
+                self.stats["hedged"] += 1
+                pending.add(launch())
+            while True:
+                for attempt in done:
+                    if attempt.exception() is None:
+                        # Measured from the primary's start, whichever attempt won
+                        self.tracker.record(key, time.monotonic() - started)
+                        if attempt is not primary:
+                            self.stats["hedge_won"] += 1
+                        return attempt.result()
+                if not pending:
+                    # Every attempt failed; surface the original request's error
+                    return primary.result()
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+
+
+def hedge_policy_from_env(value: Optional[str] = None) -> Optional[HedgePolicy]:
+    """Build the policy described by ``MATH_TO_MANIM_HEDGE`` (``None`` if off)."""
+    value = (value if value is not None else os.getenv("MATH_TO_MANIM_HEDGE", "")).strip().lower()
+    if value in {"", "0", "off", "false", "no"}:
+        return None
+    if value in {"1", "on", "true", "yes"}:
+        return HedgePolicy()
+    quantile = float(value)
+    if not 0 < quantile < 1:
+        raise ValueError(f"MATH_TO_MANIM_HEDGE quantile must be between 0 and 1, got {value!r}")
+    return HedgePolicy(quantile=quantile)
+
+
+__all__ = ["HEDGEABLE_TASKS", "HedgePolicy", "LatencyTracker", "hedge_policy_from_env"]
@@ -13,13 +13,72 @@ import asyncio
 import json
 import os
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from anthropic import Anthropic
 from dotenv import load_dotenv
 
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict
+except ImportError:
+    from concept_canonicalizer import CanonicalDict
+
+try:
+    from src.agents.foundation_cache import FoundationVerdictCache, get_foundation_cache
+except ImportError:
+    from foundation_cache import FoundationVerdictCache, get_foundation_cache
+
+try:
+    from src.agents.prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+except ImportError:
+    from prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+
+try:
+    from src.agents.run_metrics import llm_call, record_cache_hit
+except ImportError:
+    from run_metrics import llm_call, record_cache_hit
+
+try:
+    from src.agents.llm_cassette import cassette_call
+except ImportError:
+    from llm_cassette import cassette_call
+
+try:
+    from src.agents.llm_transport import usage_tokens
+except ImportError:
+    from llm_transport import usage_tokens
+
+try:
+    from src.agents.rate_limiter import estimate_tokens, get_rate_limiter
+except ImportError:
+    from rate_limiter import estimate_tokens, get_rate_limiter
+
 load_dotenv()
 
+# Bump whenever the is_foundation prompt changes so cached verdicts are re-asked.
+FOUNDATION_PROMPT_VERSION = "improved-foundation-v1"
+
+PREREQUISITES_SYSTEM_PROMPT = """You are an expert educator and curriculum designer.
+
+Your task is to identify the ESSENTIAL prerequisite concepts someone must
+understand BEFORE they can grasp a given concept.
+
+Rules:
+1. Only list concepts that are NECESSARY for understanding
+2. Order from most to least important
+3. Assume high school education as baseline
+4. Be specific - prefer "special relativity" over "relativity"
+5. Limit to 3-5 prerequisites maximum
+
+Return ONLY a JSON array of concept names, nothing else."""
+
+PREREQUISITES_USER_PROMPT = '''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
+
+Return format: ["concept1", "concept2", "concept3"]'''
+
+# Shared PrerequisiteStore entries are keyed by prompt, so editing one starts fresh.
+PREREQUISITES_PROMPT_HASH = prompt_hash(PREREQUISITES_SYSTEM_PROMPT, PREREQUISITES_USER_PROMPT)
+
 
 # ============================================================================
 # VALIDATION FUNCTIONS (extracted from claude_sdk_tools.py)
@@ -197,17 +256,31 @@ class ImprovedPrerequisiteExplorer:
     Integrates validation functions for better error prevention.
     """
 
-    def __init__(self, model: str = "claude-sonnet-4-5", max_depth: int = 4):
+    def __init__(
+        self,
+        model: str = "claude-sonnet-4-5",
+        max_depth: int = 4,
+        foundation_cache: Optional[FoundationVerdictCache] = None,
+        prerequisite_store: Optional[PrerequisiteStore] = None,
+    ):
         self.model = model
         self.max_depth = max_depth
 
         # Caching
-        self.cache = {}  # In-memory cache for prerequisites
+        self.cache = CanonicalDict()  # In-memory cache for prerequisites, keyed by canonical concept
+        if foundation_cache is None:
+            foundation_cache = get_foundation_cache()
+        self.foundation_cache = foundation_cache  # Persistent is_foundation verdicts
+        if prerequisite_store is None:
+            prerequisite_store = get_prerequisite_store()
+        self.prerequisite_store = prerequisite_store  # Decompositions shared across runs and workers
 
         # Statistics
         self.stats = {
             "api_calls": 0,
             "cache_hits": 0,
+            "store_hits": 0,
+            "foundation_cache_hits": 0,
             "concepts_explored": 0
         }
 
@@ -215,7 +288,20 @@ class ImprovedPrerequisiteExplorer:
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
-        self.client = Anthropic(api_key=api_key)
+        # Retries are left to the shared rate limiter, which also honours Retry-After
+        self.client = Anthropic(api_key=api_key, max_retries=0)
+
+    def _create_message(self, request: Dict[str, Any], agent: str) -> Any:
+        """Messages API call through the shared Anthropic rate limiter and the cassette."""
+        prompts = [request["system"], *(message["content"] for message in request["messages"])]
+        with llm_call(self.model, agent=agent) as call:
+            response = get_rate_limiter("anthropic", self.model).call_sync(
+                lambda: cassette_call("anthropic", request, lambda: self.client.messages.create(**request)),
+                estimated_tokens=estimate_tokens(*prompts) + request["max_tokens"],
+                usage=usage_tokens,
+            )
+            call.anthropic_usage(getattr(response, "usage", None))
+        return response
 
     def explore(self, concept: str, depth: int = 0, verbose: bool = True) -> KnowledgeNode:
         """Explore prerequisites recursively with caching."""
@@ -249,6 +335,14 @@ class ImprovedPrerequisiteExplorer:
 
     def is_foundation(self, concept: str) -> bool:
         """Check if a concept is foundational."""
+        cached = self.foundation_cache.get(
+            concept, model=self.model, prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        if cached is not None:
+            self.stats["foundation_cache_hits"] += 1
+            record_cache_hit("foundation_cache", agent="foundation")
+            return cached
+
         system_prompt = """You are an expert educator analyzing whether a concept is foundational.
 
 A concept is foundational if a typical high school graduate would understand it
@@ -270,16 +364,21 @@ Answer with ONLY "yes" or "no"."""
 
         self.stats["api_calls"] += 1
 
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=10,
-            temperature=0,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
-        )
+        request = {
+            "model": self.model,
+            "max_tokens": 10,
+            "temperature": 0,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": user_prompt}],
+        }
+        response = self._create_message(request, agent="foundation")
 
         answer = response.content[0].text
-        return answer.strip().lower().startswith('yes')
+        is_foundation = answer.strip().lower().startswith('yes')
+        self.foundation_cache.set(
+            concept, is_foundation, model=self.model, prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        return is_foundation
 
     def lookup_prerequisites(self, concept: str, verbose: bool = True) -> List[str]:
         """Get prerequisites with caching to reduce API calls."""
@@ -289,45 +388,44 @@ Answer with ONLY "yes" or "no"."""
             if verbose:
                 print(f"  -> Cache hit for '{concept}'")
             self.stats["cache_hits"] += 1
+            record_cache_hit("prerequisite_cache", agent="prerequisites")
             return self.cache[concept]
 
+        # Then the shared store (other runs / workers)
+        stored = self.prerequisite_store.get(
+            concept, model=self.model, prompt_hash=PREREQUISITES_PROMPT_HASH
+        )
+        if stored is not None:
+            if verbose:
+                print(f"  -> Store hit for '{concept}'")
+            self.stats["store_hits"] += 1
+            record_cache_hit("prerequisite_store", agent="prerequisites")
+            self.cache[concept] = stored
+            return stored
+
         # Not in cache - query Claude
         prerequisites = self.discover_prerequisites(concept)
 
         # Cache the result
         self.cache[concept] = prerequisites
+        self.prerequisite_store.set(
+            concept, prerequisites, model=self.model, prompt_hash=PREREQUISITES_PROMPT_HASH
+        )
 
         return prerequisites
 
     def discover_prerequisites(self, concept: str) -> List[str]:
         """Discover prerequisites from Claude."""
-        system_prompt = """You are an expert educator and curriculum designer.
-
-Your task is to identify the ESSENTIAL prerequisite concepts someone must
-understand BEFORE they can grasp a given concept.
-
-Rules:
-1. Only list concepts that are NECESSARY for understanding
-2. Order from most to least important
-3. Assume high school education as baseline
-4. Be specific - prefer "special relativity" over "relativity"
-5. Limit to 3-5 prerequisites maximum
-
-Return ONLY a JSON array of concept names, nothing else."""
-
-        user_prompt = f'''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
-
-Return format: ["concept1", "concept2", "concept3"]'''
-
         self.stats["api_calls"] += 1
 
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=500,
-            temperature=0.3,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
-        )
+        request = {
+            "model": self.model,
+            "max_tokens": 500,
+            "temperature": 0.3,
+            "system": PREREQUISITES_SYSTEM_PROMPT,
+            "messages": [{"role": "user", "content": PREREQUISITES_USER_PROMPT.format(concept=concept)}],
+        }
+        response = self._create_message(request, agent="prerequisites")
 
         content = response.content[0].text
 
@@ -359,12 +457,15 @@ Return format: ["concept1", "concept2", "concept3"]'''
         print(f"Total concepts explored: {self.stats['concepts_explored']}")
         print(f"API calls made: {self.stats['api_calls']}")
         print(f"Cache hits: {self.stats['cache_hits']}")
+        print(f"Prerequisite store hits: {self.stats['store_hits']}")
+        print(f"Foundation verdict cache hits: {self.stats['foundation_cache_hits']}")
 
         if self.stats['api_calls'] > 0:
             cache_rate = (self.stats['cache_hits'] / (self.stats['api_calls'] + self.stats['cache_hits'])) * 100
             print(f"Cache hit rate: {cache_rate:.1f}%")
 
         print(f"Cache size: {len(self.cache)} concepts")
+        print(f"LLM calls avoided by canonicalization: {self.cache.canonicalizer.stats()['calls_avoided']}")
         print("="*70)
 
 
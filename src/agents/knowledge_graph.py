@@ -0,0 +1,300 @@
+"""Deduplicated concept DAG for prerequisite exploration.
+
+``KnowledgeNode`` trees repeat a concept under every branch that needs it:
+"linear algebra" may appear five times in a quantum mechanics tree, and each
+copy is explored, enriched and designed separately. ``KnowledgeGraph`` keeps
+one ``ConceptNode`` per canonical concept instead, with ordered edges to its
+prerequisites and the *minimum* depth at which the concept was reached.
+
+The graph converts to and from the nested ``KnowledgeNode.to_dict()`` format,
+so existing JSON files and downstream agents keep working:
+
+>>> graph = KnowledgeGraph.from_dict({
+...     "concept": "calculus", "depth": 0, "is_foundation": False,
+...     "prerequisites": [
+...         {"concept": "algebra", "depth": 1, "is_foundation": True, "prerequisites": []},
+...         {"concept": "limits", "depth": 1, "is_foundation": False, "prerequisites": [
+...             {"concept": "Algebra", "depth": 2, "is_foundation": True, "prerequisites": []},
+...         ]},
+...     ],
+... })
+>>> len(graph)
+3
+>>> graph.get("algebra").depth
+1
+>>> [node.concept for node in graph.topological_order()]
+['algebra', 'limits', 'calculus']
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    from src.agents.concept_canonicalizer import get_canonicalizer
+except ImportError:
+    from concept_canonicalizer import get_canonicalizer
+
+# Enrichment fields carried over between trees and graphs unchanged.
+ENRICHMENT_FIELDS = ("equations", "definitions", "visual_spec", "narrative")
+
+
+@dataclass
+class ConceptNode:
+    """A unique concept in the graph; prerequisites are canonical keys."""
+    concept: str
+    depth: int
+    is_foundation: bool
+    prerequisites: List[str] = field(default_factory=list)
+
+    equations: Optional[List[str]] = None
+    definitions: Optional[Dict[str, str]] = None
+    visual_spec: Optional[Dict] = None
+    narrative: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return get_canonicalizer().resolve(self.concept)
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'concept': self.concept,
+            'depth': self.depth,
+            'is_foundation': self.is_foundation,
+            'prerequisites': list(self.prerequisites),
+            'equations': self.equations,
+            'definitions': self.definitions,
+            'visual_spec': self.visual_spec,
+            'narrative': self.narrative
+        }
+
+
+class KnowledgeGraph:
+    """
+    Directed acyclic graph of concepts and their prerequisites.
+
+    Edges point from a concept to the concepts it depends on. Edges that
+    would close a cycle (models occasionally answer "A needs B" and "B needs
+    A") are dropped, so the graph can always be expanded into a finite tree.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: Dict[str, ConceptNode] = {}
+        self.root_key: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @staticmethod
+    def key(concept: str) -> str:
+        """Canonical lookup key for a concept name."""
+        return get_canonicalizer().resolve(concept)
+
+    def add_concept(self, concept: str, depth: int, is_foundation: bool = False) -> ConceptNode:
+        """Add a concept (or lower the depth of an existing one) and return it."""
+        key = get_canonicalizer().register(concept)
+        node = self.nodes.get(key)
+        if node is None:
+            node = ConceptNode(concept=concept, depth=depth, is_foundation=is_foundation)
+            self.nodes[key] = node
+            if self.root_key is None:
+                self.root_key = key
+        else:
+            node.depth = min(node.depth, depth)
+        return node
+
+    def add_edge(self, concept: str, prerequisite: str) -> bool:
+        """
+        Record that ``concept`` depends on ``prerequisite``.
+
+        Both concepts must already be in the graph. Returns False (and adds
+        nothing) for duplicate edges and for edges that would create a cycle.
+        """
+        parent_key, child_key = self.key(concept), self.key(prerequisite)
+        parent = self.nodes[parent_key]
+        if child_key in parent.prerequisites or self._reaches(child_key, parent_key):
+            return False
+        parent.prerequisites.append(child_key)
+        return True
+
+    def _reaches(self, start: str, target: str) -> bool:
+        stack, seen = [start], set()
+        while stack:
+            key = stack.pop()
+            if key == target:
+                return True
+            if key in seen:
+                continue
+            seen.add(key)
+            stack.extend(self.nodes[key].prerequisites)
+        return False
+
+    @classmethod
+    def from_tree(cls, root: Any) -> "KnowledgeGraph":
+        """Build a graph from any ``KnowledgeNode``-shaped tree."""
+        graph = cls()
+        seen = set()
+
+        def visit(node: Any) -> None:
+            if id(node) in seen:  # shared node objects (see to_tree) are merged once
+                return
+            seen.add(id(node))
+            graph_node = graph.add_concept(node.concept, node.depth, node.is_foundation)
+            graph._merge_node(graph_node, node.is_foundation, node.prerequisites, node)
+            for prereq in node.prerequisites:
+                visit(prereq)
+                graph.add_edge(node.concept, prereq.concept)
+
+        visit(root)
+        return graph
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KnowledgeGraph":
+        """Build a graph from the nested ``KnowledgeNode.to_dict()`` format."""
+        graph = cls()
+
+        def visit(item: Dict[str, Any]) -> None:
+            prereqs = item.get('prerequisites') or []
+            graph_node = graph.add_concept(item['concept'], item.get('depth', 0), item.get('is_foundation', False))
+            graph._merge_node(graph_node, item.get('is_foundation', False), prereqs, item)
+            for prereq in prereqs:
+                visit(prereq)
+                graph.add_edge(item['concept'], prereq['concept'])
+
+        visit(data)
+        return graph
+
+    @staticmethod
+    def _merge_node(graph_node: ConceptNode, is_foundation: bool, prereqs: List[Any], source: Any) -> None:
+        # A copy that was expanded wins over one cut off as a foundation
+        # (e.g. by max_depth), and enrichment fields fill in where missing.
+        if prereqs:
+            graph_node.is_foundation = False
+        elif not graph_node.prerequisites:
+            graph_node.is_foundation = graph_node.is_foundation and is_foundation
+        for name in ENRICHMENT_FIELDS:
+            value = source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+            if value is not None and getattr(graph_node, name) is None:
+                setattr(graph_node, name, value)
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+    @property
+    def root(self) -> Optional[ConceptNode]:
+        return self.nodes.get(self.root_key) if self.root_key is not None else None
+
+    def get(self, concept: str) -> Optional[ConceptNode]:
+        return self.nodes.get(self.key(concept))
+
+    def __contains__(self, concept: object) -> bool:
+        return isinstance(concept, str) and self.key(concept) in self.nodes
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[ConceptNode]:
+        return iter(self.nodes.values())
+
+    def prerequisites_of(self, concept: str) -> List[ConceptNode]:
+        node = self.nodes[self.key(concept)]
+        return [self.nodes[key] for key in node.prerequisites]
+
+    def edge_count(self) -> int:
+        return sum(len(node.prerequisites) for node in self.nodes.values())
+
+    def topological_order(self) -> List[ConceptNode]:
+        """Concepts ordered so every prerequisite comes before its dependents."""
+        return [self.nodes[key] for key in self._topological_keys()]
+
+    def _topological_keys(self) -> List[str]:
+        ordered: List[str] = []
+        visited = set()
+
+        def dfs(key: str) -> None:
+            if key in visited:
+                return
+            visited.add(key)
+            for prereq_key in self.nodes[key].prerequisites:
+                dfs(prereq_key)
+            ordered.append(key)
+
+        if self.root_key is not None:
+            dfs(self.root_key)
+        for key in self.nodes:
+            dfs(key)
+        return ordered
+
+    # ------------------------------------------------------------------
+    # Conversion back to trees
+    # ------------------------------------------------------------------
+    def to_tree(self, node_factory: Optional[Callable[..., Any]] = None) -> Any:
+        """
+        Expand the graph into ``KnowledgeNode`` objects.
+
+        Each concept becomes exactly one node object that is shared by every
+        parent that lists it, so agents that walk the result and skip nodes
+        they have already handled do one unit of work per unique concept.
+        ``to_dict()`` on the result still yields the familiar nested format.
+        """
+        if node_factory is None:
+            try:
+                from src.agents.prerequisite_explorer_claude import KnowledgeNode
+            except ImportError:
+                from prerequisite_explorer_claude import KnowledgeNode
+            node_factory = KnowledgeNode
+        if self.root_key is None:
+            raise ValueError("Cannot build a tree from an empty KnowledgeGraph")
+
+        built: Dict[str, Any] = {}
+        for key in self._topological_keys():
+            graph_node = self.nodes[key]
+            built[key] = node_factory(
+                concept=graph_node.concept,
+                depth=graph_node.depth,
+                is_foundation=graph_node.is_foundation,
+                prerequisites=[built[key] for key in graph_node.prerequisites],
+                equations=graph_node.equations,
+                definitions=graph_node.definitions,
+                visual_spec=graph_node.visual_spec,
+                narrative=graph_node.narrative,
+            )
+        return built[self.root_key]
+
+    def to_dict(self) -> dict:
+        """Expand into the nested ``KnowledgeNode.to_dict()`` format."""
+        if self.root_key is None:
+            raise ValueError("Cannot build a tree from an empty KnowledgeGraph")
+
+        def expand(key: str) -> dict:
+            data = self.nodes[key].to_dict()
+            data['prerequisites'] = [expand(prereq) for prereq in self.nodes[key].prerequisites]
+            return data
+
+        return expand(self.root_key)
+
+    def to_graph_dict(self) -> dict:
+        """Flat JSON form: one entry per concept, edges as canonical keys."""
+        return {
+            'root': self.root_key,
+            'nodes': {key: node.to_dict() for key, node in self.nodes.items()},
+        }
+
+    @classmethod
+    def from_graph_dict(cls, data: Dict[str, Any]) -> "KnowledgeGraph":
+        graph = cls()
+        for key, item in data['nodes'].items():
+            graph.nodes[key] = ConceptNode(
+                concept=item['concept'],
+                depth=item['depth'],
+                is_foundation=item['is_foundation'],
+                prerequisites=list(item.get('prerequisites') or []),
+                **{name: item.get(name) for name in ENRICHMENT_FIELDS},
+            )
+        graph.root_key = data.get('root')
+        return graph
+
+
+__all__ = ["ConceptNode", "KnowledgeGraph"]
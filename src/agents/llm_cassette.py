@@ -0,0 +1,281 @@
+"""Record/replay cassettes for deterministic offline LLM runs.
+
+Every provider call path sends its request through ``cassette_call_async``
+(or ``cassette_call`` for synchronous clients): the Anthropic transport, the
+OpenAI-compatible providers (DeepSeek, Moonshot; the DeepSeek explorer and
+``app.py`` go through these), the Claude Agent SDK session pool, the improved
+explorer and ``KimiClient``. Without an active cassette the request is simply sent.
+
+A cassette is a gzip-compressed JSON file mapping a request fingerprint (a
+digest of the provider name and the full request parameters) to the
+recorded responses and how long each took. The mode is chosen with
+``MATH_TO_MANIM_CASSETTE``:
+
+- ``record``: send every request and record it, starting a fresh cassette;
+- ``replay``: answer from the cassette and send (and record) only requests
+  it does not hold yet;
+- ``replay-or-fail``: answer from the cassette and raise ``CassetteMiss``
+  for anything else, so a run can never reach the network.
+
+The file is ``MATH_TO_MANIM_CASSETTE_PATH`` (default
+``cassettes/llm.json.gz``). ``MATH_TO_MANIM_CASSETTE_LATENCY`` scales the
+recorded response times that replays wait for: ``1`` reproduces the live
+timing, so orchestration overhead and concurrency gains can be measured
+offline; unset or ``0`` replays instantly. Tests can use ``use_cassette``
+instead of the environment.
+
+A request recorded several times is replayed in recording order. Once its
+responses run out, ``replay`` sends it again and ``replay-or-fail`` reuses
+the last one. Streaming responses and message
+batches are not recorded.
+
+New recordings are written at most every ``SAVE_INTERVAL_SECONDS`` and
+when the cassette is closed (leaving ``use_cassette``, or at exit for the
+environment cassette), so long recording runs do not rewrite the file on
+every call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+CASSETTE_MODES = ("record", "replay", "replay-or-fail")
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "llm.json.gz")
+CASSETTE_VERSION = 1
+SAVE_INTERVAL_SECONDS = 5.0
+
+_active: contextvars.ContextVar[Optional["Cassette"]] = contextvars.ContextVar(
+    "math_to_manim_cassette", default=None
+)
+_env_cassettes: Dict[Tuple[str, str, float], "Cassette"] = {}
+_env_lock = threading.Lock()
+
+
+class CassetteMiss(RuntimeError):
+    """A ``replay-or-fail`` cassette holds no response for the request."""
+
+
+def fingerprint(provider: str, request: Dict[str, Any]) -> str:
+    """Stable digest of ``provider`` and the request parameters."""
+    payload = json.dumps({"provider": provider, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def to_jsonable(value: Any) -> Any:
+    """Plain JSON data for an SDK response object (pydantic or namespace)."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if isinstance(value, SimpleNamespace):
+        value = vars(value)
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def to_namespace(value: Any) -> Any:
+    """Recorded JSON data with attribute access, as the SDK objects offer."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+
+class Cassette:
+    """Recorded responses keyed by request fingerprint, stored gzip-compressed."""
+
+    def __init__(self, path: str, mode: str = "replay", *, latency_scale: float = 0.0):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {', '.join(CASSETTE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = max(0.0, latency_scale)
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if mode != "record" and os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as handle:
+                self._interactions = json.load(handle)["interactions"]
+        self.stats: Dict[str, int] = {"recorded": 0, "replayed": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._interactions.values())
+
+    def lookup(self, provider: str, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The next recorded interaction for the request, or ``None``."""
+        if self.mode == "record":
+            return None
+        key = fingerprint(provider, request)
+        with self._lock:
+            entries = self._interactions.get(key, [])
+            cursor = self._cursors.get(key, 0)
+            if cursor < len(entries) or (entries and self.mode == "replay-or-fail"):
+                self._cursors[key] = cursor + 1
+                self.stats["replayed"] += 1
+                return entries[min(cursor, len(entries) - 1)]
+            self.stats["misses"] += 1
+            if self.mode == "replay-or-fail":
+                raise CassetteMiss(f"No recorded {provider} response for request {key[:12]} in {self.path}")
+            return None
+
+    def record(self, provider: str, request: Dict[str, Any], response: Any, latency: float) -> None:
+        """Add an interaction, rewriting the cassette file if the last save is old enough."""
+        key = fingerprint(provider, request)
+        with self._lock:
+            entries = self._interactions.setdefault(key, [])
+            entries.append(
+                {
+                    "provider": provider,
+                    "request": to_jsonable(request),
+                    "response": to_jsonable(response),
+                    "latency": round(latency, 4),
+                }
+            )
+            self._cursors[key] = len(entries)
+            self.stats["recorded"] += 1
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= SAVE_INTERVAL_SECONDS:
+                self._save()
+
+    def save(self) -> None:
+        """Write any interactions recorded since the last save."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as handle:
+            json.dump({"version": CASSETTE_VERSION, "interactions": self._interactions}, handle, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def replay_delay(self, entry: Dict[str, Any]) -> float:
+        return entry.get("latency", 0.0) * self.latency_scale
+
+    async def call_async(
+        self,
+        provider: str,
+        request: Dict[str, Any],
+        send: Callable[[], Awaitable[Any]],
+        decode: Callable[[Any], Any] = to_namespace,
+    ) -> Any:
+        entry = self.lookup(provider, request)
+        if entry is not None:
+            delay = self.replay_delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            return decode(entry["response"])
+        started = time.monotonic()
+        response = await send()
+        self.record(provider, request, response, time.monotonic() - started)
+        return response
+
+    def call(
+        self,
+        provider: str,
+        request: Dict[str, Any],
+        send: Callable[[], Any],
+        decode: Callable[[Any], Any] = to_namespace,
+    ) -> Any:
+        entry = self.lookup(provider, request)
+        if entry is not None:
+            delay = self.replay_delay(entry)
+            if delay:
+                time.sleep(delay)
+            return decode(entry["response"])
+        started = time.monotonic()
+        response = send()
+        self.record(provider, request, response, time.monotonic() - started)
+        return response
+
+
+def _env_cassette() -> Optional[Cassette]:
+    mode = os.getenv("MATH_TO_MANIM_CASSETTE", "").strip().lower()
+    if not mode or mode == "off":
+        return None
+    path = os.getenv("MATH_TO_MANIM_CASSETTE_PATH", "").strip() or DEFAULT_CASSETTE_PATH
+    scale = float(os.getenv("MATH_TO_MANIM_CASSETTE_LATENCY", "").strip() or 0)
+    key = (os.path.abspath(path), mode, scale)
+    with _env_lock:
+        cassette = _env_cassettes.get(key)
+        if cassette is None:
+            cassette = Cassette(path, mode, latency_scale=scale)
+            _env_cassettes[key] = cassette
+            atexit.register(cassette.save)
+        return cassette
+
+
+def active_cassette() -> Optional[Cassette]:
+    """The cassette set with ``use_cassette``, else the one configured in the environment."""
+    cassette = _active.get()
+    return cassette if cassette is not None else _env_cassette()
+
+
+@contextlib.contextmanager
+def use_cassette(path: str, mode: str = "replay", *, latency_scale: float = 0.0) -> Iterator[Cassette]:
+    """Route the provider calls made in this context through a cassette."""
+    cassette = Cassette(path, mode, latency_scale=latency_scale)
+    token = _active.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active.reset(token)
+        cassette.save()
+
+
+async def cassette_call_async(
+    provider: str,
+    request: Dict[str, Any],
+    send: Callable[[], Awaitable[Any]],
+    decode: Callable[[Any], Any] = to_namespace,
+) -> Any:
+    """Await ``send()``, or replay/record it through the active cassette."""
+    cassette = active_cassette()
+    if cassette is None:
+        return await send()
+    return await cassette.call_async(provider, request, send, decode)
+
+
+def cassette_call(
+    provider: str,
+    request: Dict[str, Any],
+    send: Callable[[], Any],
+    decode: Callable[[Any], Any] = to_namespace,
+) -> Any:
+    """Synchronous ``cassette_call_async``."""
+    cassette = active_cassette()
+    if cassette is None:
+        return send()
+    return cassette.call(provider, request, send, decode)
+
+
+__all__ = [
+    "CASSETTE_MODES",
+    "Cassette",
+    "CassetteMiss",
+    "active_cassette",
+    "cassette_call",
+    "cassette_call_async",
+    "fingerprint",
+    "use_cassette",
+]
@@ -0,0 +1,487 @@
+"""One interface for every LLM backend, plus per-task model routing.
+
+``LLMProvider`` puts the Anthropic (with the Agent SDK fallback, via
+``llm_transport``) and OpenAI-compatible backends behind the same two async
+calls:
+
+- ``complete(...)`` returns the response text of a single-turn request;
+- ``complete_json(...)`` parses that text as JSON, tolerating code fences.
+
+The synchronous DeepSeek callers (``prerequisite_explorer.py`` and the
+Gradio ``app.py``) share the router's ``deepseek`` provider through
+``get_provider`` and ``run_blocking`` instead of keeping module-level
+clients. ``KimiClient`` still owns its Moonshot clients: it needs tool
+calls, thinking mode and multi-turn messages, which ``LLMProvider`` does not
+model.
+
+``ModelRouter`` picks the provider and model per *task*. Cheap binary
+decisions (``foundation``, ``concept_analysis``) and the short narrative
+``transitions`` pass default to a fast model, everything else keeps the
+model the agent was configured with. The route table can be overridden per
+router or with ``MATH_TO_MANIM_MODEL_ROUTES``, either inline::
+
+    MATH_TO_MANIM_MODEL_ROUTES="foundation=deepseek:deepseek-chat,narrative=anthropic:claude-opus-4-1"
+
+or as the path of a JSON file mapping task names to the same route strings.
+A route string is ``provider`` or ``provider:model``; without a model the
+caller's model (or the provider default) is used. The ``default`` key
+replaces the route for tasks not listed.
+
+With a ``HedgePolicy`` the router also hedges idempotent tasks (see
+``hedging``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar, Union
+
+from openai import AsyncOpenAI
+
+try:
+    from src.agents.llm_transport import complete_text, join_few_shot, usage_tokens
+except ImportError:
+    from llm_transport import complete_text, join_few_shot, usage_tokens
+
+try:
+    from src.agents.rate_limiter import estimate_tokens, get_rate_limiter
+except ImportError:
+    from rate_limiter import estimate_tokens, get_rate_limiter
+
+try:
+    from src.agents.run_metrics import default_agent, llm_call
+except ImportError:
+    from run_metrics import default_agent, llm_call
+
+try:
+    from src.agents.llm_cassette import cassette_call_async
+except ImportError:
+    from llm_cassette import cassette_call_async
+
+try:
+    from src.agents.hedging import HedgePolicy, hedge_policy_from_env
+except ImportError:
+    from hedging import HedgePolicy, hedge_policy_from_env
+
+# Tasks the agents route. Unknown task names fall back to the default route.
+TASK_FOUNDATION = "foundation"
+TASK_CONCEPT_ANALYSIS = "concept_analysis"
+TASK_CLASSIFY = "classify"
+TASK_PREREQUISITES = "prerequisites"
+TASK_MATH_CONTENT = "math_content"
+TASK_VISUAL_DESIGN = "visual_design"
+TASK_NARRATIVE = "narrative"
+TASK_TRANSITIONS = "transitions"
+TASK_CODEGEN = "codegen"
+
+FAST_MODEL = os.getenv("MATH_TO_MANIM_FAST_MODEL", "claude-haiku-4-5")
+
+T = TypeVar("T")
+
+
+def parse_json_response(text: str) -> Any:
+    """Parse a model's JSON answer, stripping code fences and stray prose."""
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    if "```" in text:
+        fenced = text.split("```")[1]
+        if fenced.startswith("json"):
+            fenced = fenced[4:]
+        try:
+            return json.loads(fenced.strip())
+        except json.JSONDecodeError:
+            pass
+    match = re.search(r"(\{.*\}|\[.*\])", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    raise ValueError(f"Could not parse JSON from model response: {text[:200]}")
+
+
+class LLMProvider(ABC):
+    """A backend that answers single-turn system/user prompts."""
+
+    name: str = "provider"
+    default_model: str = ""
+
+    @abstractmethod
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        few_shot: Optional[str] = None,
+    ) -> str:
+        """Return the response text for one request.
+
+        ``few_shot`` is static example text that belongs with the system
+        prompt; providers that support prompt caching cache the two together.
+        """
+
+    async def complete_json(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        few_shot: Optional[str] = None,
+    ) -> Any:
+        """Like ``complete`` but returns the parsed JSON payload."""
+        text = await self.complete(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            few_shot=few_shot,
+        )
+        return parse_json_response(text)
+
+    async def aclose(self) -> None:
+        """Release clients bound to the running loop (nothing by default)."""
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic Messages API, falling back to the Agent SDK on model 404s.
+
+    ``prompt_cache`` marks the static system prompt and few-shot block as
+    cacheable (``None``: follow ``MATH_TO_MANIM_PROMPT_CACHE``).
+    """
+
+    name = "anthropic"
+
+    def __init__(self, default_model: str = "claude-sonnet-4-5", prompt_cache: Optional[bool] = None):
+        self.default_model = default_model
+        self.prompt_cache = prompt_cache
+
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        few_shot: Optional[str] = None,
+    ) -> str:
+        return await complete_text(
+            model=model or self.default_model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            few_shot=few_shot,
+            cache=self.prompt_cache,
+        )
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any OpenAI-compatible chat completions endpoint (DeepSeek, Moonshot, ...).
+
+    Keeps one ``AsyncOpenAI`` client per event loop, like ``llm_transport``,
+    and sends requests through the shared rate limiter for the model.
+    """
+
+    def __init__(self, name: str, *, base_url: str, api_key_env: str, default_model: str):
+        self.name = name
+        self.base_url = base_url
+        self.api_key_env = api_key_env
+        self.default_model = default_model
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                api_key = os.getenv(self.api_key_env)
+                if not api_key:
+                    raise RuntimeError(f"{self.api_key_env} environment variable not set.")
+                client = AsyncOpenAI(api_key=api_key, base_url=self.base_url, max_retries=0)
+                self._clients[loop] = client
+            return client
+
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        few_shot: Optional[str] = None,
+    ) -> str:
+        request = {
+            "model": model or self.default_model,
+            "messages": [
+                {"role": "system", "content": join_few_shot(system_prompt, few_shot)},
+                {"role": "user", "content": user_prompt},
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        response = await self.create(request)
+        return response.choices[0].message.content or ""
+
+    async def create(self, request: Dict[str, Any]) -> Any:
+        """Send a raw chat completions ``request`` and return the response object.
+
+        For callers that need more than the response text (multi-turn
+        history, ``reasoning_content``); still rate limited, metered and
+        recorded like ``complete``.
+        """
+        model = request["model"]
+        estimated = estimate_tokens(*(m.get("content") for m in request["messages"]))
+        with llm_call(model) as call:
+            response = await get_rate_limiter(self.name, model).call(
+                lambda: cassette_call_async(
+                    self.name, request, lambda: self._client().chat.completions.create(**request)
+                ),
+                estimated_tokens=estimated + request.get("max_tokens", 1024),
+                usage=usage_tokens,
+            )
+            call.openai_usage(getattr(response, "usage", None))
+        return response
+
+    async def aclose(self) -> None:
+        """Close the client bound to the running loop (call before the loop ends)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+
+
+def default_providers() -> Dict[str, LLMProvider]:
+    return {
+        "anthropic": AnthropicProvider(),
+        "deepseek": OpenAICompatibleProvider(
+            "deepseek",
+            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
+            api_key_env="DEEPSEEK_API_KEY",
+            default_model="deepseek-reasoner",
+        ),
+        "moonshot": OpenAICompatibleProvider(
+            "moonshot",
+            base_url=os.getenv("MOONSHOT_BASE_URL", "https://api.moonshot.ai/v1"),
+            api_key_env="MOONSHOT_API_KEY",
+            default_model=os.getenv("KIMI_MODEL", "moonshot-v1-8k"),
+        ),
+    }
+
+
+@dataclass(frozen=True)
+class Route:
+    """Where a task goes: a provider name and, optionally, a pinned model."""
+
+    provider: str
+    model: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: Union[str, "Route"]) -> "Route":
+        if isinstance(spec, Route):
+            return spec
+        provider, _, model = spec.strip().partition(":")
+        return cls(provider=provider.strip(), model=model.strip() or None)
+
+    def __str__(self) -> str:
+        return f"{self.provider}:{self.model}" if self.model else self.provider
+
+
+DEFAULT_ROUTES: Dict[str, Route] = {
+    TASK_FOUNDATION: Route("anthropic", FAST_MODEL),
+    TASK_CONCEPT_ANALYSIS: Route("anthropic", FAST_MODEL),
+    TASK_TRANSITIONS: Route("anthropic", FAST_MODEL),
+    "default": Route("anthropic"),
+}
+
+
+def load_routes(spec: Optional[str]) -> Dict[str, Route]:
+    """Parse ``MATH_TO_MANIM_MODEL_ROUTES`` (inline pairs or a JSON file path)."""
+    if not spec:
+        return {}
+    path = Path(spec).expanduser()
+    if path.suffix == ".json" or path.is_file():
+        entries = json.loads(path.read_text(encoding="utf-8"))
+    else:
+        entries = {}
+        for pair in spec.split(","):
+            if not pair.strip():
+                continue
+            task, sep, route = pair.partition("=")
+            if not sep:
+                raise ValueError(f"Invalid model route {pair!r}; expected task=provider[:model]")
+            entries[task.strip()] = route
+    return {task: Route.parse(route) for task, route in entries.items()}
+
+
+class ModelRouter:
+    """Send each task to its configured provider and model."""
+
+    def __init__(
+        self,
+        routes: Optional[Mapping[str, Union[str, Route]]] = None,
+        *,
+        providers: Optional[Mapping[str, LLMProvider]] = None,
+        home_provider: str = "anthropic",
+        hedge: Optional[HedgePolicy] = None,
+    ):
+        self.home_provider = home_provider  # Provider the agents' own ``model`` names refer to
+        self.hedge = hedge  # Duplicate slow idempotent calls (off when None)
+        self.providers: Dict[str, LLMProvider] = dict(providers or default_providers())
+        self.routes: Dict[str, Route] = dict(DEFAULT_ROUTES)
+        self.routes.update({task: Route.parse(route) for task, route in (routes or {}).items()})
+        unknown = {r.provider for r in self.routes.values()} - set(self.providers)
+        if unknown:
+            raise ValueError(f"Model routes name unknown providers: {sorted(unknown)}")
+
+    def route(self, task: str) -> Route:
+        return self.routes.get(task, self.routes["default"])
+
+    def resolve(self, task: str, model: Optional[str] = None) -> Tuple[LLMProvider, str]:
+        """Return the provider and model for ``task``.
+
+        A model pinned by the route wins; otherwise the caller's ``model`` is
+        used when the task stays on the home provider, and the provider's own
+        default when it was routed elsewhere.
+        """
+        route = self.route(task)
+        provider = self.providers[route.provider]
+        if route.model:
+            return provider, route.model
+        if model and route.provider == self.home_provider:
+            return provider, model
+        return provider, provider.default_model
+
+    def model_for(self, task: str, model: Optional[str] = None) -> str:
+        """The model ``task`` will run on; use it when keying cached answers."""
+        return self.resolve(task, model)[1]
+
+    async def complete(
+        self,
+        task: str,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        few_shot: Optional[str] = None,
+    ) -> str:
+        provider, resolved = self.resolve(task, model)
+        request = partial(
+            provider.complete,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            model=resolved,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            few_shot=few_shot,
+        )
+        # Run metrics attribute the call to its task unless a pipeline stage names an agent
+        with default_agent(task):
+            if self.hedge is not None and self.hedge.applies_to(task):
+                return await self.hedge.run((task, resolved), request)
+            return await request()
+
+    async def complete_json(
+        self,
+        task: str,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        few_shot: Optional[str] = None,
+    ) -> Any:
+        text = await self.complete(
+            task,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            few_shot=few_shot,
+        )
+        return parse_json_response(text)
+
+
+_DEFAULT_ROUTER: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router configured from ``MATH_TO_MANIM_MODEL_ROUTES``
+    (routes) and ``MATH_TO_MANIM_HEDGE`` (hedging)."""
+    global _DEFAULT_ROUTER
+    if _DEFAULT_ROUTER is None:
+        _DEFAULT_ROUTER = ModelRouter(
+            load_routes(os.getenv("MATH_TO_MANIM_MODEL_ROUTES")),
+            hedge=hedge_policy_from_env(),
+        )
+    return _DEFAULT_ROUTER
+
+
+def get_provider(name: str) -> LLMProvider:
+    """The process-wide router's provider called ``name`` (e.g. ``"deepseek"``)."""
+    return get_model_router().providers[name]
+
+
+def run_blocking(provider: LLMProvider, call: Callable[[], Awaitable[T]]) -> T:
+    """Run ``call()`` to completion for a synchronous caller.
+
+    The call gets a private event loop, and the provider's client for that
+    loop is closed before it ends. From inside a running loop the private
+    loop runs on a worker thread, so the caller blocks as it did with a sync
+    client.
+    """
+
+    async def once() -> T:
+        try:
+            return await call()
+        finally:
+            await provider.aclose()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(once())
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, once()).result()
+
+
+__all__ = [
+    "AnthropicProvider",
+    "DEFAULT_ROUTES",
+    "FAST_MODEL",
+    "LLMProvider",
+    "ModelRouter",
+    "OpenAICompatibleProvider",
+    "Route",
+    "get_model_router",
+    "get_provider",
+    "load_routes",
+    "parse_json_response",
+    "run_blocking",
+]
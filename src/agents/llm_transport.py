@@ -0,0 +1,230 @@
+"""Native async transport for the Anthropic Messages API.
+
+The agents' ``*_async`` methods used to call the synchronous
+``Anthropic().messages.create`` (directly or through a worker thread), which
+blocks the event loop or caps concurrency at the executor size. This module
+hands out ``AsyncAnthropic`` clients instead, so ``asyncio.gather`` over
+several concepts really overlaps the HTTP round trips.
+
+One client (and therefore one pooled HTTP connection set) is kept per process
+and event loop. httpx connections are bound to the loop that opened them, so
+the sync wrappers, which start a fresh loop with ``asyncio.run``, get a fresh
+client; a long-running app with a single loop shares one pool for every
+agent. Forked workers never reuse their parent's sockets.
+
+``complete_text`` is the shared call: it returns the text of a single-turn
+completion and falls back to the Claude Agent SDK when the Messages API
+returns 404 for the model, just like the old synchronous call sites.
+Requests go through the shared ``rate_limiter`` for their model, which owns
+retries (the client's built-in retries are off so 429s reach it).
+
+Requests go through the active record/replay cassette (``llm_cassette``),
+if any, inside the limiter.
+
+Prompt caching is opt-in (``MATH_TO_MANIM_PROMPT_CACHE=1`` or
+``cache=True``). The static system prompt, and an optional static
+``few_shot`` block sent after it, are then marked with ``cache_control`` so
+repeated calls across a tree reuse the prefix instead of paying for it again.
+Anthropic only caches prefixes above a model-specific minimum length (1024
+tokens for Sonnet/Opus, 2048 for Haiku); shorter prefixes are sent uncached
+without error. The enricher's and visual designer's system prompts plus
+``MATH_CONTENT_FEW_SHOT`` / ``VISUAL_DESIGN_FEW_SHOT`` are sized to clear the
+Sonnet/Opus minimum; routing those tasks to Haiku leaves them uncached.
+``prompt_cache_stats()`` reports cached vs uncached input tokens per model,
+so the effect can be measured.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from anthropic import AsyncAnthropic, NotFoundError
+
+try:
+    from src.agents.rate_limiter import estimate_tokens, get_rate_limiter
+except ImportError:
+    from rate_limiter import estimate_tokens, get_rate_limiter
+
+try:
+    from src.agents.run_metrics import llm_call
+except ImportError:
+    from run_metrics import llm_call
+
+try:
+    from src.agents.llm_cassette import cassette_call_async
+except ImportError:
+    from llm_cassette import cassette_call_async
+
+# The Agent SDK bridge is optional; without it a 404 is simply re-raised.
+try:
+    from src.agents.claude_agent_runtime import run_query_via_sdk_async
+except ImportError:
+    try:
+        from claude_agent_runtime import run_query_via_sdk_async
+    except ImportError:
+        run_query_via_sdk_async = None  # type: ignore[assignment]
+
+_cache_stats: Dict[str, Dict[str, int]] = {}
+_cache_stats_lock = threading.Lock()
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncAnthropic]" = weakref.WeakKeyDictionary()
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def get_async_anthropic() -> AsyncAnthropic:
+    """Return the pooled ``AsyncAnthropic`` client for the running event loop."""
+    global _clients_pid
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(loop)
+        if client is None:
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
+            client = AsyncAnthropic(api_key=api_key, max_retries=0)
+            _clients[loop] = client
+        return client
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """Input plus output tokens reported on a response, if any."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        usage = SimpleNamespace(**usage)
+    total = getattr(usage, "total_tokens", None)
+    if total is not None:
+        return total
+    counts = [
+        getattr(usage, name, None)
+        for name in ("input_tokens", "cache_creation_input_tokens", "output_tokens")
+    ]
+    if all(count is None for count in counts):
+        return None
+    return sum(count or 0 for count in counts)
+
+
+def join_few_shot(system_prompt: str, few_shot: Optional[str]) -> str:
+    """System prompt with the few-shot block appended, for single-string APIs."""
+    return f"{system_prompt}\n\n{few_shot}" if few_shot else system_prompt
+
+
+def prompt_cache_enabled() -> bool:
+    return os.getenv("MATH_TO_MANIM_PROMPT_CACHE", "").strip().lower() in {"1", "true", "on", "yes"}
+
+
+def _system_blocks(system_prompt: str, few_shot: Optional[str], cache: bool) -> Any:
+    """The ``system`` parameter: a plain string, or text blocks with a cache breakpoint."""
+    if not cache and not few_shot:
+        return system_prompt
+    blocks: List[Dict[str, Any]] = [{"type": "text", "text": system_prompt}]
+    if few_shot:
+        blocks.append({"type": "text", "text": few_shot})
+    if cache:
+        # One breakpoint after the last static block caches everything before it
+        blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return blocks
+
+
+def record_prompt_cache_usage(model: str, response: Any) -> None:
+    """Accumulate cached vs uncached input tokens reported on ``response``."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    with _cache_stats_lock:
+        stats = _cache_stats.setdefault(
+            model,
+            {"requests": 0, "uncached_input_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        )
+        stats["requests"] += 1
+        stats["uncached_input_tokens"] += getattr(usage, "input_tokens", 0) or 0
+        stats["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", 0) or 0
+        stats["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+
+def prompt_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Per-model input token counts split into cache reads, writes and uncached."""
+    with _cache_stats_lock:
+        return {model: dict(stats) for model, stats in _cache_stats.items()}
+
+
+def reset_prompt_cache_stats() -> None:
+    with _cache_stats_lock:
+        _cache_stats.clear()
+
+
+async def complete_text(
+    *,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int,
+    temperature: float,
+    few_shot: Optional[str] = None,
+    cache: Optional[bool] = None,
+) -> str:
+    """Single-turn completion returning the response text.
+
+    ``few_shot`` is static example text sent after the system prompt (and
+    cached with it); ``cache`` defaults to ``MATH_TO_MANIM_PROMPT_CACHE``.
+    """
+    if cache is None:
+        cache = prompt_cache_enabled()
+    request = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "system": _system_blocks(system_prompt, few_shot, cache),
+        "messages": [{"role": "user", "content": user_prompt}],
+    }
+    try:
+        with llm_call(model) as call:
+            response = await get_rate_limiter("anthropic", model).call(
+                lambda: cassette_call_async(
+                    "anthropic", request, lambda: get_async_anthropic().messages.create(**request)
+                ),
+                estimated_tokens=estimate_tokens(system_prompt, few_shot, user_prompt) + max_tokens,
+                usage=usage_tokens,
+            )
+            call.anthropic_usage(getattr(response, "usage", None))
+        record_prompt_cache_usage(model, response)
+        return response.content[0].text
+    except NotFoundError:
+        if run_query_via_sdk_async is None:
+            raise
+        return await run_query_via_sdk_async(
+            user_prompt,
+            system_prompt=join_few_shot(system_prompt, few_shot),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
+
+async def aclose_clients() -> None:
+    """Close the client bound to the running loop (call before the loop ends)."""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.pop(loop, None)
+    if client is not None:
+        await client.close()
+
+
+__all__ = [
+    "aclose_clients",
+    "complete_text",
+    "get_async_anthropic",
+    "join_few_shot",
+    "prompt_cache_stats",
+    "reset_prompt_cache_stats",
+    "usage_tokens",
+]
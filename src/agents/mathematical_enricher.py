@@ -13,21 +13,17 @@ import os
 import json
 import asyncio
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from anthropic import Anthropic, NotFoundError
 from dotenv import load_dotenv
 
 # Import from same package
-# Import the optional Claude Agent SDK bridge if available. Tests do not need it,
-# so we degrade gracefully when the dependency is missing.
+# Provider-agnostic completions, routed per task
 try:
-    from src.agents.claude_agent_runtime import run_query_via_sdk
+    from src.agents.llm_provider import TASK_MATH_CONTENT, ModelRouter, get_model_router
 except ImportError:
-    try:
-        from claude_agent_runtime import run_query_via_sdk
-    except ImportError:
-        run_query_via_sdk = None  # type: ignore[assignment]
+    from llm_provider import TASK_MATH_CONTENT, ModelRouter, get_model_router
 
 # KnowledgeNode is required for the enricher to operate, so fail fast with a clear
 # error if we cannot import it.
@@ -45,20 +41,129 @@ except ImportError:
             "Ensure the src package is on PYTHONPATH."
         ) from exc
 
+try:
+    from src.agents.single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight
+
+try:
+    from src.agents.message_batches import BatchRequest, BatchRunner, batch_model, tree_levels
+except ImportError:
+    from message_batches import BatchRequest, BatchRunner, batch_model, tree_levels
+
+try:
+    from src.agents.enrichment_cache import EnrichmentCache, get_enrichment_cache
+except ImportError:
+    from enrichment_cache import EnrichmentCache, get_enrichment_cache
+
+try:
+    from src.agents.run_metrics import record_cache_hit
+except ImportError:
+    from run_metrics import record_cache_hit
+
 load_dotenv()
 
-CLI_CLIENT: Optional[Anthropic] = None
+# Part of every enrichment cache address: bump it when the prompts below
+# change, so content generated with the old prompts is no longer served.
+MATH_CONTENT_PROMPT_VERSION = "claude-math-v2"
 
+# Output format and worked examples shared by every request. Sent as a separate
+# system block so Anthropic prompt caching can reuse it across nodes; together
+# with the system prompt it must stay above the 1024-token minimum that
+# Anthropic caches, or every node pays for it again.
+MATH_CONTENT_FEW_SHOT = """Return JSON format:
+{
+  "equations": ["r\\"$equation1$\\"", "r\\"$equation2$\\""],
+  "definitions": {"symbol": "meaning", ...},
+  "interpretation": "What this equation physically/mathematically means",
+  "examples": ["Example 1 calculation", "Example 2 calculation"],
+  "typical_values": {"quantity": "typical value with units", ...}
+}
 
-def _ensure_client() -> Anthropic:
-    global CLI_CLIENT
-    if CLI_CLIENT is None:
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
-        CLI_CLIENT = Anthropic(api_key=api_key)
-    return CLI_CLIENT
+Example response for "Newton's Second Law":
+{
+  "equations": [
+    "r\\"$\\\\vec{F} = m\\\\vec{a}$\\"",
+    "r\\"$F = ma \\\\text{ (1D form)}$\\""
+  ],
+  "definitions": {
+    "F": "Force (Newtons)",
+    "m": "Mass (kilograms)",
+    "a": "Acceleration (m/s²)"
+  },
+  "interpretation": "Force equals mass times acceleration - the acceleration of an object is directly proportional to the net force and inversely proportional to its mass",
+  "examples": [
+    "A 10 kg object with 20 N force: a = F/m = 20/10 = 2 m/s²",
+    "A 2 kg object accelerating at 5 m/s²: F = ma = 2×5 = 10 N"
+  ],
+  "typical_values": {
+    "Human mass": "50-100 kg",
+    "Gravitational acceleration": "9.8 m/s²",
+    "Car acceleration": "0-5 m/s²"
+  }
+}
 
+Match the rigor to the requested complexity level. A "high school level"
+concept gets algebraic equations, plain-language definitions and arithmetic
+examples, as in:
+
+Example response for "Pythagorean Theorem" (high school level):
+{
+  "equations": [
+    "r\\"$a^2 + b^2 = c^2$\\"",
+    "r\\"$c = \\\\sqrt{a^2 + b^2}$\\""
+  ],
+  "definitions": {
+    "a": "Length of one leg of the right triangle",
+    "b": "Length of the other leg",
+    "c": "Length of the hypotenuse, the side opposite the right angle"
+  },
+  "interpretation": "In a right triangle the square built on the hypotenuse has the same area as the squares built on the two legs together, which is why the theorem is usually shown by rearranging those squares",
+  "examples": [
+    "Legs of 3 and 4: c = √(9 + 16) = √25 = 5",
+    "A 10 m ladder with its foot 6 m from a wall reaches √(100 - 36) = 8 m up the wall"
+  ],
+  "typical_values": {
+    "Smallest integer triple": "3, 4, 5",
+    "Diagonal of a unit square": "√2 ≈ 1.414",
+    "Diagonal of a 1920×1080 screen": "≈ 2203 pixels"
+  }
+}
+
+An "undergraduate/graduate level" concept uses calculus, operators and vector
+notation where the subject calls for them, defines every symbol that appears,
+and works an example that exercises the full formulation, as in:
+
+Example response for "Schrödinger Equation" (undergraduate/graduate level):
+{
+  "equations": [
+    "r\\"$i\\\\hbar \\\\frac{\\\\partial}{\\\\partial t} \\\\Psi(\\\\mathbf{r}, t) = \\\\hat{H} \\\\Psi(\\\\mathbf{r}, t)$\\"",
+    "r\\"$\\\\hat{H} = -\\\\frac{\\\\hbar^2}{2m} \\\\nabla^2 + V(\\\\mathbf{r})$\\"",
+    "r\\"$\\\\hat{H} \\\\psi_n = E_n \\\\psi_n$\\"",
+    "r\\"$E_n = \\\\frac{n^2 \\\\pi^2 \\\\hbar^2}{2 m L^2}$\\""
+  ],
+  "definitions": {
+    "Ψ(r, t)": "Wave function; |Ψ|² is the probability density of finding the particle at r",
+    "ħ": "Reduced Planck constant (J·s)",
+    "Ĥ": "Hamiltonian operator, the total energy of the system",
+    "m": "Mass of the particle (kilograms)",
+    "V(r)": "Potential energy as a function of position (joules)",
+    "∇²": "Laplacian, the sum of second spatial derivatives",
+    "ψ_n, E_n": "Stationary states and their allowed energies",
+    "L": "Width of the infinite square well (meters)"
+  },
+  "interpretation": "The Hamiltonian generates the time evolution of the wave function. Separating variables gives the time-independent equation, an eigenvalue problem whose eigenvalues are the only energies the system can have; confining a particle is what quantizes its energy",
+  "examples": [
+    "Electron in a 1 nm infinite well: E_1 = π²ħ²/(2mL²) = (9.87 × 1.11×10⁻⁶⁸)/(2 × 9.11×10⁻³¹ × 10⁻¹⁸) ≈ 6.0×10⁻²⁰ J ≈ 0.38 eV",
+    "The n = 2 level of the same well lies at 4E_1 ≈ 1.5 eV, so the 1 → 2 transition absorbs about 1.1 eV"
+  ],
+  "typical_values": {
+    "Reduced Planck constant": "1.055×10⁻³⁴ J·s",
+    "Electron mass": "9.109×10⁻³¹ kg",
+    "Hydrogen ground state energy": "-13.6 eV",
+    "Atomic length scale (Bohr radius)": "5.29×10⁻¹¹ m"
+  }
+}"""
 
 @dataclass
 class MathematicalContent:
@@ -95,27 +200,169 @@ class MathematicalEnricher:
     Powered by Claude Sonnet 4.5 for mathematical reasoning.
     """
 
-    def __init__(self, model: str = CLAUDE_MODEL):
+    def __init__(
+        self,
+        model: str = CLAUDE_MODEL,
+        router: Optional[ModelRouter] = None,
+        enrichment_cache: Optional[EnrichmentCache] = None,
+    ):
         self.model = model
+        if router is None:
+            router = get_model_router()
+        self.router = router
+        self.single_flight = SingleFlight()  # Concurrent requests for one concept share a call
+        if enrichment_cache is None:
+            enrichment_cache = get_enrichment_cache()
+        self.enrichment_cache = enrichment_cache  # Content shared across runs and processes
 
     async def enrich_node_async(self, node: KnowledgeNode) -> KnowledgeNode:
         """
         Enrich a single node with mathematical content.
 
+        Node objects shared by several parents (as produced by
+        ``KnowledgeGraph.to_tree()``) are enriched only once.
+
         Args:
             node: The knowledge node to enrich
 
         Returns:
             The same node with equations, definitions, and examples added
         """
+        return await self._enrich_node_async(node, set())
+
+    async def _enrich_node_async(self, node: KnowledgeNode, visited: Set[int]) -> KnowledgeNode:
+        if id(node) in visited:
+            return node
+        visited.add(id(node))
+
+        self.apply_math_content(node, await self.generate_content_async(node))
+
+        # Recursively enrich prerequisites
+        enriched_prereqs = []
+        for prereq in node.prerequisites:
+            enriched_prereq = await self._enrich_node_async(prereq, visited)
+            enriched_prereqs.append(enriched_prereq)
+        node.prerequisites = enriched_prereqs
+
+        return node
+
+    async def enrich_tree_async(self, root: KnowledgeNode, max_concurrency: int = 8) -> KnowledgeNode:
+        """
+        Enrich every node of a tree concurrently.
+
+        A node's content depends only on its own concept, complexity and
+        depth, so all nodes are generated at once instead of one after the
+        other, with at most ``max_concurrency`` requests in flight. Nodes
+        that need identical content (the same canonical concept, complexity
+        and depth) share one request. Results are written into the nodes in
+        place.
+
+        Args:
+            root: Root of the knowledge tree
+            max_concurrency: Maximum concurrent LLM calls
+
+        Returns:
+            The same tree, enriched
+        """
+        groups: Dict[Tuple, List[KnowledgeNode]] = {}
+        for nodes in tree_levels(root):
+            for node in nodes:
+                groups.setdefault(self.content_key(node), []).append(node)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def enrich(nodes: List[KnowledgeNode]) -> None:
+            async with semaphore:
+                math_content = await self.generate_content_async(nodes[0])
+            for node in nodes:
+                self.apply_math_content(node, math_content)
+
+        await asyncio.gather(*(enrich(nodes) for nodes in groups.values()))
+        return root
+
+    def content_key(self, node: KnowledgeNode) -> Tuple:
+        """Key shared by nodes that need identical content."""
+        return SingleFlight.concept_key("math_content", node.concept, self._complexity(node), node.depth)
+
+    async def generate_content_async(self, node: KnowledgeNode) -> MathematicalContent:
+        """
+        Generate the mathematical content for one node without writing it.
+
+        Only the node's concept, depth and foundation verdict are read, so
+        this can run before its prerequisites are explored (see
+        ``node_dataflow``). Concurrent requests with the same
+        ``content_key`` share one call, and content generated by an earlier
+        run is read from ``enrichment_cache``.
+        """
         print(f"{'  ' * node.depth}Enriching: {node.concept} (depth {node.depth})")
+        complexity = self._complexity(node)
+        return await self.single_flight.do(
+            self.content_key(node),
+            partial(self._cached_math_content_async, node.concept, complexity, node.depth),
+        )
+
+    async def enrich_tree_batch_async(self, root: KnowledgeNode, runner: BatchRunner) -> KnowledgeNode:
+        """
+        Enrich a tree offline, submitting one message batch per tree level.
 
+        See ``message_batches`` for the runner and its resumable state.
+        Content already in ``enrichment_cache`` is not requested again;
+        requests that error or return unparsable JSON are regenerated
+        interactively.
+
+        Args:
+            root: Root of the knowledge tree
+            runner: Runner that submits and polls the batches
+
+        Returns:
+            The enriched tree
+        """
+        model = batch_model(self.router, TASK_MATH_CONTENT, self.model)
+        for level, nodes in enumerate(tree_levels(root)):
+            print(f"{'  ' * level}Enriching level {level}: {len(nodes)} concepts (batch)")
+            contents: Dict[Tuple[str, str, int], MathematicalContent] = {}
+            keys = []
+            for key in dict.fromkeys((node.concept, self._complexity(node), node.depth) for node in nodes):
+                cached = self._stored_math_content(*key)
+                if cached is not None:
+                    contents[key] = cached
+                else:
+                    keys.append(key)
+            requests = []
+            for index, (concept, complexity, depth) in enumerate(keys):
+                system_prompt, user_prompt = self._math_content_prompts(concept, complexity, depth)
+                requests.append(BatchRequest(
+                    custom_id=f"math-{index:05d}",
+                    model=model,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    max_tokens=2000,
+                    temperature=0.4,
+                    few_shot=MATH_CONTENT_FEW_SHOT,
+                ))
+            results = await runner.run(f"math_content:{root.concept}:level-{level}", requests)
+
+            for key, request in zip(keys, requests):
+                try:
+                    # Errored requests come back as None and fail to parse too
+                    contents[key] = self._parse_math_content(key[0], results.get(request.custom_id))
+                except (TypeError, ValueError):
+                    print(f"  -> Batch answer unusable for {key[0]}, asking individually")
+                    contents[key] = await self._generate_math_content_async(*key)
+                self._store_math_content(contents[key], *key[1:])
+
+            for node in nodes:
+                self.apply_math_content(node, contents[(node.concept, self._complexity(node), node.depth)])
+        return root
+
+    @staticmethod
+    def _complexity(node: KnowledgeNode) -> str:
         # If it's a foundation concept, keep math simple
         # If it's advanced, add more rigor
-        complexity = "high school level" if node.is_foundation else "undergraduate/graduate level"
-
-        math_content = await self._generate_math_content_async(node.concept, complexity, node.depth)
+        return "high school level" if node.is_foundation else "undergraduate/graduate level"
 
+    @staticmethod
+    def apply_math_content(node: KnowledgeNode, math_content: MathematicalContent) -> None:
+        """Write generated content into ``node``."""
         # Update the node with mathematical content
         node.equations = math_content.equations
         node.definitions = math_content.definitions
@@ -127,14 +374,34 @@ class MathematicalEnricher:
         node.visual_spec['examples'] = math_content.examples
         node.visual_spec['typical_values'] = math_content.typical_values
 
-        # Recursively enrich prerequisites
-        enriched_prereqs = []
-        for prereq in node.prerequisites:
-            enriched_prereq = await self.enrich_node_async(prereq)
-            enriched_prereqs.append(enriched_prereq)
-        node.prerequisites = enriched_prereqs
+    def _cache_address(self, complexity: str, depth: int) -> Dict[str, Any]:
+        """Everything besides the concept that shapes the generated content."""
+        return {
+            "model": self.router.model_for(TASK_MATH_CONTENT, self.model),
+            "prompt_version": MATH_CONTENT_PROMPT_VERSION,
+            "complexity": complexity,
+            "context": {"depth": depth},
+        }
 
-        return node
+    def _stored_math_content(self, concept: str, complexity: str, depth: int) -> Optional[MathematicalContent]:
+        payload = self.enrichment_cache.get("math_content", concept, **self._cache_address(complexity, depth))
+        if payload is None:
+            return None
+        record_cache_hit("enrichment_cache", agent=TASK_MATH_CONTENT)
+        return MathematicalContent(**{**payload, "concept": concept})
+
+    def _store_math_content(self, math_content: MathematicalContent, complexity: str, depth: int) -> None:
+        self.enrichment_cache.set(
+            "math_content", math_content.concept, math_content.to_dict(), **self._cache_address(complexity, depth)
+        )
+
+    async def _cached_math_content_async(self, concept: str, complexity: str, depth: int) -> MathematicalContent:
+        """Content from ``enrichment_cache``, generated and stored on a miss."""
+        math_content = self._stored_math_content(concept, complexity, depth)
+        if math_content is None:
+            math_content = await self._generate_math_content_async(concept, complexity, depth)
+            self._store_math_content(math_content, complexity, depth)
+        return math_content
 
     async def _generate_math_content_async(
         self,
@@ -143,7 +410,22 @@ class MathematicalEnricher:
         depth: int
     ) -> MathematicalContent:
         """Generate mathematical content for a concept using Claude"""
+        system_prompt, user_prompt = self._math_content_prompts(concept, complexity, depth)
+
+        content = await self.router.complete(
+            TASK_MATH_CONTENT,
+            few_shot=MATH_CONTENT_FEW_SHOT,
+            model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=2000,
+            temperature=0.4,
+        )
+        return self._parse_math_content(concept, content)
 
+    @staticmethod
+    def _math_content_prompts(concept: str, complexity: str, depth: int) -> Tuple[str, str]:
+        """System and user prompt for one concept."""
         system_prompt = """You are an expert mathematician and physicist who excels at
 presenting mathematical concepts with perfect LaTeX notation.
 
@@ -168,57 +450,11 @@ Return ONLY valid JSON with these exact keys:
 Complexity level: {complexity}
 Depth in knowledge tree: {depth} (0=advanced, higher=more foundational)
 
-Provide the mathematical content for this concept suitable for a Manim animation.
-
-Return JSON format:
-{{
-  "equations": ["r\\"$equation1$\\"", "r\\"$equation2$\\""],
-  "definitions": {{"symbol": "meaning", ...}},
-  "interpretation": "What this equation physically/mathematically means",
-  "examples": ["Example 1 calculation", "Example 2 calculation"],
-  "typical_values": {{"quantity": "typical value with units", ...}}
-}}
-
-Example response for "Newton's Second Law":
-{{
-  "equations": [
-    "r\\"$\\\\vec{{F}} = m\\\\vec{{a}}$\\"",
-    "r\\"$F = ma \\\\text{{ (1D form)}}$\\""
-  ],
-  "definitions": {{
-    "F": "Force (Newtons)",
-    "m": "Mass (kilograms)",
-    "a": "Acceleration (m/s²)"
-  }},
-  "interpretation": "Force equals mass times acceleration - the acceleration of an object is directly proportional to the net force and inversely proportional to its mass",
-  "examples": [
-    "A 10 kg object with 20 N force: a = F/m = 20/10 = 2 m/s²",
-    "A 2 kg object accelerating at 5 m/s²: F = ma = 2×5 = 10 N"
-  ],
-  "typical_values": {{
-    "Human mass": "50-100 kg",
-    "Gravitational acceleration": "9.8 m/s²",
-    "Car acceleration": "0-5 m/s²"
-  }}
-}}'''
-
-        try:
-            response = _ensure_client().messages.create(
-                model=self.model,
-                max_tokens=2000,
-                temperature=0.4,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            content = response.content[0].text
-        except NotFoundError:
-            content = run_query_via_sdk(
-                user_prompt,
-                system_prompt=system_prompt,
-                temperature=0.4,
-                max_tokens=2000,
-            )
+Provide the mathematical content for this concept suitable for a Manim animation.'''
+        return system_prompt, user_prompt
 
+    @staticmethod
+    def _parse_math_content(concept: str, content: str) -> MathematicalContent:
         # Parse JSON response
         try:
             data = json.loads(content)
@@ -252,17 +488,22 @@ Example response for "Newton's Second Law":
         """Synchronous wrapper for enrich_node_async"""
         return asyncio.run(self.enrich_node_async(node))
 
-    def enrich_tree(self, root: KnowledgeNode) -> KnowledgeNode:
+    def enrich_tree_batch(self, root: KnowledgeNode, runner: BatchRunner) -> KnowledgeNode:
+        """Synchronous wrapper for enrich_tree_batch_async"""
+        return asyncio.run(self.enrich_tree_batch_async(root, runner))
+
+    def enrich_tree(self, root: KnowledgeNode, max_concurrency: int = 8) -> KnowledgeNode:
         """
         Enrich an entire knowledge tree with mathematical content.
 
         Args:
             root: Root of the knowledge tree
+            max_concurrency: Maximum concurrent LLM calls
 
         Returns:
             The enriched tree
         """
-        return self.enrich_node(root)
+        return asyncio.run(self.enrich_tree_async(root, max_concurrency))
 
 
 def demo():
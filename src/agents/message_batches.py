@@ -0,0 +1,301 @@
+"""Offline tree builds through the Anthropic Message Batches API.
+
+Overnight curriculum builds do not need interactive latency. The Message
+Batches API processes requests asynchronously at half the per-token price,
+so the batch methods on the agents (``PrerequisiteExplorer.explore_batch_async``,
+``MathematicalEnricher.enrich_tree_batch_async`` and
+``VisualDesigner.design_tree_batch_async``) submit every request for one
+tree level as a single batch, poll until it ends, and move on to the next
+level::
+
+    runner = BatchRunner(AnthropicBatchBackend(), state_path="builds/entropy.json")
+    tree = await explorer.explore_batch_async("entropy", runner)
+    await enricher.enrich_tree_batch_async(tree, runner)
+    await designer.design_tree_batch_async(tree, runner)
+
+``BatchRunner`` saves submitted batch ids and collected answers to
+``state_path`` after every step. Rerunning the same job after a crash
+replays finished levels from disk and resumes polling a batch that was
+already submitted instead of paying for it twice.
+
+``LocalBatchBackend`` is a file-based stand-in that answers requests with a
+local function after a configurable number of polls, for tests and dry runs.
+Requests that error, expire or cannot be parsed are retried interactively by
+the calling agent, so a job always completes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from src.agents.llm_transport import (
+        _system_blocks,
+        get_async_anthropic,
+        prompt_cache_enabled,
+        record_prompt_cache_usage,
+    )
+except ImportError:
+    from llm_transport import (
+        _system_blocks,
+        get_async_anthropic,
+        prompt_cache_enabled,
+        record_prompt_cache_usage,
+    )
+
+try:
+    from src.agents.run_metrics import llm_call
+except ImportError:
+    from run_metrics import llm_call
+
+# Message batches are billed at half the interactive price
+BATCH_PRICE_FACTOR = 0.5
+
+
+@dataclass
+class BatchRequest:
+    """One single-turn completion inside a batch."""
+    custom_id: str
+    model: str
+    system_prompt: str
+    user_prompt: str
+    max_tokens: int
+    temperature: float
+    few_shot: Optional[str] = None
+
+    def params(self, cache: bool = False) -> Dict[str, Any]:
+        """Messages API parameters, as ``messages.create`` would receive them."""
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "system": _system_blocks(self.system_prompt, self.few_shot, cache),
+            "messages": [{"role": "user", "content": self.user_prompt}],
+        }
+
+
+def batch_model(router: Any, task: str, model: str) -> str:
+    """Model to batch ``task`` on: the routed model if it is an Anthropic one."""
+    provider, routed = router.resolve(task, model)
+    return routed if provider.name == "anthropic" else model
+
+
+def tree_levels(root: Any) -> List[List[Any]]:
+    """Nodes of a tree grouped by breadth-first level.
+
+    Node objects shared by several parents appear once, at the first level
+    they are reached, so every parent is handled before its prerequisites.
+    """
+    levels: List[List[Any]] = []
+    seen = {id(root)}
+    frontier = [root]
+    while frontier:
+        levels.append(frontier)
+        next_frontier = []
+        for node in frontier:
+            for prereq in node.prerequisites:
+                if id(prereq) not in seen:
+                    seen.add(id(prereq))
+                    next_frontier.append(prereq)
+        frontier = next_frontier
+    return levels
+
+
+class BatchBackend(ABC):
+    """Where batches are submitted and their results collected."""
+
+    @abstractmethod
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        """Submit ``[{"custom_id": ..., "params": ...}]`` and return the batch id."""
+
+    @abstractmethod
+    async def is_ended(self, batch_id: str) -> bool:
+        """Whether processing of ``batch_id`` has finished."""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        """Response text per custom id; ``None`` for errored or expired requests."""
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """The Anthropic Message Batches API."""
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch = await get_async_anthropic().messages.batches.create(requests=requests)
+        return batch.id
+
+    async def is_ended(self, batch_id: str) -> bool:
+        batch = await get_async_anthropic().messages.batches.retrieve(batch_id)
+        return batch.processing_status == "ended"
+
+    async def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        answers: Dict[str, Optional[str]] = {}
+        async for entry in await get_async_anthropic().messages.batches.results(batch_id):
+            if entry.result.type != "succeeded":
+                answers[entry.custom_id] = None
+                continue
+            message = entry.result.message
+            record_prompt_cache_usage(message.model, message)
+            with llm_call(message.model, timed=False) as call:
+                call.anthropic_usage(message.usage)
+                call.price_factor = BATCH_PRICE_FACTOR
+            answers[entry.custom_id] = message.content[0].text
+        return answers
+
+
+class LocalBatchBackend(BatchBackend):
+    """File-based stand-in for the Message Batches API.
+
+    Each batch is a JSON file in ``directory``. A batch ends on the
+    ``polls_until_ended``-th status check, when every request is answered by
+    ``responder(params)``; a responder that raises or returns ``None`` marks
+    that request as errored. Batches survive process restarts, so resuming
+    a job against the stand-in behaves like resuming against the API.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        responder: Callable[[Dict[str, Any]], Optional[str]],
+        *,
+        polls_until_ended: int = 1,
+    ):
+        self.directory = directory
+        self.responder = responder
+        self.polls_until_ended = max(1, polls_until_ended)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f"{batch_id}.json")
+
+    def _load(self, batch_id: str) -> Dict[str, Any]:
+        with open(self._path(batch_id), "r", encoding="utf-8") as handle:
+            return json.load(handle)
+
+    def _save(self, batch_id: str, record: Dict[str, Any]) -> None:
+        _write_json(self._path(batch_id), record)
+
+    def batch_ids(self) -> List[str]:
+        """Ids of every batch submitted to this directory."""
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"msgbatch_local_{uuid.uuid4().hex[:16]}"
+        self._save(batch_id, {"status": "in_progress", "polls": 0, "requests": requests, "results": {}})
+        return batch_id
+
+    async def is_ended(self, batch_id: str) -> bool:
+        record = self._load(batch_id)
+        if record["status"] == "ended":
+            return True
+        record["polls"] += 1
+        if record["polls"] >= self.polls_until_ended:
+            for request in record["requests"]:
+                try:
+                    answer = self.responder(request["params"])
+                except Exception:  # noqa: BLE001 - a failing request errors, the batch still ends
+                    answer = None
+                record["results"][request["custom_id"]] = answer
+            record["status"] = "ended"
+        self._save(batch_id, record)
+        return record["status"] == "ended"
+
+    async def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        return dict(self._load(batch_id)["results"])
+
+
+class BatchRunner:
+    """Submit, poll and collect batches, checkpointing each step to disk."""
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        state_path: Optional[str] = None,
+        *,
+        poll_interval: float = 30.0,
+        prompt_cache: Optional[bool] = None,
+    ):
+        self.backend = backend
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.prompt_cache = prompt_cache_enabled() if prompt_cache is None else prompt_cache
+        self._state: Dict[str, Dict[str, Any]] = {"batches": {}, "results": {}}
+        self._lock = threading.Lock()
+        if state_path and os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as handle:
+                self._state = json.load(handle)
+        self.stats: Dict[str, int] = {"submitted": 0, "resumed": 0, "replayed": 0, "requests": 0}
+
+    @staticmethod
+    def step_key(step: str, requests: List[BatchRequest]) -> str:
+        """``step`` plus a digest of its requests, so edited prompts are resubmitted."""
+        payload = json.dumps([asdict(request) for request in requests], sort_keys=True)
+        return f"{step}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
+
+    async def run(self, step: str, requests: List[BatchRequest]) -> Dict[str, Optional[str]]:
+        """Answers for ``requests`` keyed by custom id, from disk or a new batch."""
+        if not requests:
+            return {}
+        key = self.step_key(step, requests)
+
+        finished = self._state["results"].get(key)
+        if finished is not None:
+            self.stats["replayed"] += 1
+            return dict(finished)
+
+        batch_id = self._state["batches"].get(key)
+        if batch_id is None:
+            batch_id = await self.backend.submit(
+                [{"custom_id": request.custom_id, "params": request.params(self.prompt_cache)} for request in requests]
+            )
+            self.stats["submitted"] += 1
+            self.stats["requests"] += len(requests)
+            print(f"  -> Submitted batch {batch_id} ({len(requests)} requests) for {step}")
+            self._update("batches", key, batch_id)
+        else:
+            self.stats["resumed"] += 1
+            print(f"  -> Resuming batch {batch_id} for {step}")
+
+        while not await self.backend.is_ended(batch_id):
+            await asyncio.sleep(self.poll_interval)
+
+        results = await self.backend.results(batch_id)
+        answers = {request.custom_id: results.get(request.custom_id) for request in requests}
+        self._update("results", key, answers)
+        return answers
+
+    def _update(self, section: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._state[section][key] = value
+            if self.state_path:
+                _write_json(self.state_path, self._state)
+
+
+def _write_json(path: str, data: Any) -> None:
+    """Replace ``path`` atomically so a crash never leaves half a file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+__all__ = [
+    "AnthropicBatchBackend",
+    "BatchBackend",
+    "BatchRequest",
+    "BatchRunner",
+    "LocalBatchBackend",
+    "batch_model",
+    "tree_levels",
+]
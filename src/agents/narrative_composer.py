@@ -10,22 +10,20 @@ Uses Claude Sonnet 4.5 via the Anthropic Claude Agent SDK.
 """
 
 import os
+import re
 import json
 import asyncio
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from anthropic import Anthropic, NotFoundError
 from dotenv import load_dotenv
 
 # Import from same package
+# Provider-agnostic completions, routed per task
 try:
-    from src.agents.claude_agent_runtime import run_query_via_sdk
+    from src.agents.llm_provider import TASK_NARRATIVE, TASK_TRANSITIONS, ModelRouter, get_model_router
 except ImportError:
-    try:
-        from claude_agent_runtime import run_query_via_sdk
-    except ImportError:
-        run_query_via_sdk = None  # type: ignore[assignment]
+    from llm_provider import TASK_NARRATIVE, TASK_TRANSITIONS, ModelRouter, get_model_router
 
 CLAUDE_MODEL = "claude-sonnet-4-5"
 try:
@@ -43,17 +41,25 @@ except ImportError:
 
 load_dotenv()
 
-CLI_CLIENT: Optional[Anthropic] = None
+# Segments are written independently, so the optional smoothing pass asks a
+# fast model for one bridging sentence per scene boundary in a single request.
+TRANSITIONS_SYSTEM_PROMPT = """You write transition sentences between consecutive scenes
+of an educational Manim animation.
+
+For each numbered boundary you get the two concepts, the last sentence of the
+scene that ends and the first sentence of the scene that begins. Write ONE
+short sentence (under 30 words) that carries the viewer from the first concept
+to the second, describing the visual hand-off.
 
+Return ONLY a JSON array of strings, one per boundary, in order."""
 
-def _ensure_client() -> Anthropic:
-    global CLI_CLIENT
-    if CLI_CLIENT is None:
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
-        CLI_CLIENT = Anthropic(api_key=api_key)
-    return CLI_CLIENT
+
+def _edge_sentences(text: str) -> Tuple[str, str]:
+    """First and last sentence of a segment."""
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+    if not sentences:
+        return "", ""
+    return sentences[0], sentences[-1]
 
 
 @dataclass
@@ -91,11 +97,25 @@ class NarrativeComposer:
     This generates the "verbose LaTeX-rich prompts" that produce
     high-quality Manim code.
 
+    Segments only depend on the node and the names of the concepts before
+    it, so they are generated concurrently and stitched in order.
+
     Powered by Claude Sonnet 4.5 for narrative coherence.
     """
 
-    def __init__(self, model: str = CLAUDE_MODEL):
+    def __init__(
+        self,
+        model: str = CLAUDE_MODEL,
+        router: Optional[ModelRouter] = None,
+        max_concurrency: int = 8,
+        smooth_transitions: bool = False,
+    ):
         self.model = model
+        if router is None:
+            router = get_model_router()
+        self.router = router
+        self.max_concurrency = max(1, max_concurrency)  # Segments generated at once
+        self.smooth_transitions = smooth_transitions  # One extra fast-model call for scene bridges
 
     def compose(self, tree: KnowledgeNode) -> Narrative:
         """
@@ -122,36 +142,41 @@ class NarrativeComposer:
         for i, concept in enumerate(concept_order, 1):
             print(f"  {i}. {concept}")
 
-        # Step 2: Generate narrative segments for each concept
+        # Step 2: Generate narrative segments for each concept. The only
+        # context a segment needs from the others is the concept order, so
+        # they are all requested at once; gather() keeps them in order.
         print("\nGenerating narrative segments...")
-        segments = []
-        total_duration = 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
-        for i, node in enumerate(ordered_nodes):
-            # Get context: what came before
-            previous_concepts = [n.concept for n in ordered_nodes[:i]]
-
-            # Generate segment
-            segment = await self._generate_segment_async(
-                node=node,
-                segment_number=i + 1,
-                total_segments=len(ordered_nodes),
-                previous_concepts=previous_concepts,
-                is_final=(i == 0)  # Root is last in topo sort, first in depth
-            )
+        async def generate(i: int, node: KnowledgeNode) -> str:
+            async with semaphore:
+                return await self._generate_segment_async(
+                    node=node,
+                    segment_number=i + 1,
+                    total_segments=len(ordered_nodes),
+                    previous_concepts=concept_order[:i],  # What came before
+                    is_final=(i == 0)  # Root is last in topo sort, first in depth
+                )
 
-            segments.append(segment)
+        segments = list(await asyncio.gather(*(generate(i, node) for i, node in enumerate(ordered_nodes))))
 
-            # Accumulate duration
+        total_duration = 0
+        for node in ordered_nodes:
             if node.visual_spec and 'duration' in node.visual_spec:
                 total_duration += node.visual_spec['duration']
 
+        # Optional: bridge the independently written segments
+        transitions = None
+        if self.smooth_transitions and len(segments) > 1:
+            transitions = await self._smooth_transitions_async(concept_order, segments)
+
         # Step 3: Stitch segments into final verbose prompt
         verbose_prompt = self._assemble_prompt(
             target_concept=tree.concept,
             segments=segments,
             concept_order=concept_order,
-            total_duration=total_duration
+            total_duration=total_duration,
+            transitions=transitions
         )
 
         return Narrative(
@@ -259,33 +284,76 @@ Use phrases like:
 Format: A single paragraph of 200-300 words with detailed Manim instructions.
 Include all LaTeX equations with double backslashes.'''
 
+        segment = await self.router.complete(
+            TASK_NARRATIVE,
+            model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=1500,
+            temperature=0.7,  # Higher for creative narrative
+        )
+
+        return segment.strip()
+
+    async def _smooth_transitions_async(
+        self,
+        concept_order: List[str],
+        segments: List[str]
+    ) -> Optional[List[str]]:
+        """
+        Ask for one bridging sentence per pair of consecutive segments.
+
+        Only the edge sentences of each segment are sent, so this is one
+        short request on the fast ``transitions`` route. Returns ``None``
+        (segments are stitched as they are) if the request fails or the
+        answer is unusable; smoothing is optional polish.
+        """
+        print(f"  Smoothing {len(segments) - 1} transitions")
+        boundaries = []
+        for i in range(1, len(segments)):
+            ending = _edge_sentences(segments[i - 1])[1]
+            opening = _edge_sentences(segments[i])[0]
+            boundaries.append(
+                f'{i}. From "{concept_order[i - 1]}" to "{concept_order[i]}"\n'
+                f"   Scene ends: {ending}\n"
+                f"   Next scene begins: {opening}"
+            )
+        user_prompt = "Write the transition sentences for these scene boundaries:\n\n" + "\n".join(boundaries)
+
         try:
-            response = _ensure_client().messages.create(
+            transitions = await self.router.complete_json(
+                TASK_TRANSITIONS,
                 model=self.model,
-                max_tokens=1500,
-                temperature=0.7,  # Higher for creative narrative
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            segment = response.content[0].text
-        except NotFoundError:
-            segment = run_query_via_sdk(
-                user_prompt,
-                system_prompt=system_prompt,
-                temperature=0.7,
-                max_tokens=1500,
+                system_prompt=TRANSITIONS_SYSTEM_PROMPT,
+                user_prompt=user_prompt,
+                max_tokens=min(4096, 100 + 60 * len(boundaries)),
+                temperature=0.5,
             )
-
-        return segment.strip()
+        except Exception as e:
+            print(f"  -> Transition pass failed ({type(e).__name__}: {e}), keeping segments as written")
+            return None
+        if (
+            not isinstance(transitions, list)
+            or len(transitions) != len(boundaries)
+            or not all(isinstance(t, str) and t.strip() for t in transitions)
+        ):
+            print("  -> Transition answer unusable, keeping segments as written")
+            return None
+        return [t.strip() for t in transitions]
 
     def _assemble_prompt(
         self,
         target_concept: str,
         segments: List[str],
         concept_order: List[str],
-        total_duration: int
+        total_duration: int,
+        transitions: Optional[List[str]] = None
     ) -> str:
-        """Assemble individual segments into the final verbose prompt"""
+        """
+        Assemble individual segments into the final verbose prompt.
+
+        ``transitions[i]`` bridges scene ``i + 1`` into scene ``i + 2``.
+        """
 
         header = f"""# Manim Animation: {target_concept}
 
@@ -320,11 +388,15 @@ and visual clarity, building from foundational ideas to advanced understanding.
             )
             duration = 15  # default
 
+            bridge = ""
+            if transitions and i < len(segments):
+                bridge = f"\n**Transition**: {transitions[i - 1]}\n"
+
             scene_desc = f"""### Scene {i}: {concept}
 **Timestamp**: {start_time // 60}:{start_time % 60:02d} - {(start_time + duration) // 60}:{(start_time + duration) % 60:02d}
 
 {segment}
-
+{bridge}
 ---
 """
             scene_descriptions.append(scene_desc)
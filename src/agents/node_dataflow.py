@@ -0,0 +1,138 @@
+"""Per-node dataflow scheduling for explore -> enrich -> design.
+
+The pipeline used to run its stages as barriers: every node was explored
+before the first one was enriched, and every node was enriched before the
+first one was designed. The dependencies are much narrower than that:
+
+* a node's mathematical content needs only the node itself (its concept,
+  depth and foundation verdict), which is known as soon as exploration has
+  classified it;
+* a node's visual spec needs its own content and its parent's spec.
+
+``NodeDataflow`` starts each piece of work the moment its inputs exist.
+Explorers report nodes through an ``on_node(node, prerequisites, parent)``
+callback, which is ``NodeDataflow.submit``; enrichment of a node then runs
+while its subtree is still being explored, and its design runs as soon as
+its parent has been designed. Only the narrative, which needs the whole
+tree, waits for ``join()``.
+
+>>> async def demo():
+...     log = []
+...     async def enrich(node):
+...         log.append(f"enrich {node}")
+...         return node.upper()
+...     async def design(node, prerequisites, parent_spec):
+...         log.append(f"design {node} after {parent_spec}")
+...         return node
+...     flow = NodeDataflow(enrich, lambda node, content: None, design)
+...     flow.submit("calculus", ["limits"])
+...     flow.submit("limits", [], parent="calculus")
+...     await flow.join()
+...     return log
+>>> asyncio.run(demo())
+['enrich calculus', 'design calculus after None', 'enrich limits', 'design limits after calculus']
+
+Parents must be submitted before their prerequisites, which is the order
+both exploration strategies discover them in. A node object submitted twice
+(shared nodes from ``KnowledgeGraph.to_tree()``) is processed once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence
+
+
+class NodeDataflow:
+    """Stream nodes through enrichment and design as their inputs become ready.
+
+    Args:
+        enrich: Coroutine function returning the content for a node
+        apply: Writes that content into a node
+        design: Coroutine function ``design(node, prerequisites, parent_spec)``
+            that designs a node and returns its spec
+        content_key: Nodes with equal keys share one ``enrich`` call
+            (defaults to one call per node)
+        max_concurrency: Maximum ``enrich`` and ``design`` calls in flight
+    """
+
+    def __init__(
+        self,
+        enrich: Callable[[Any], Awaitable[Any]],
+        apply: Callable[[Any, Any], None],
+        design: Callable[[Any, List[str], Any], Awaitable[Any]],
+        content_key: Optional[Callable[[Any], Hashable]] = None,
+        max_concurrency: int = 8,
+    ) -> None:
+        self._enrich = enrich
+        self._apply = apply
+        self._design = design
+        self._content_key = content_key
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._contents: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._designs: Dict[int, "asyncio.Task[Any]"] = {}
+        self._tasks: List["asyncio.Task[Any]"] = []
+
+    def submit(self, node: Any, prerequisites: Sequence[str], parent: Any = None) -> None:
+        """Schedule enrichment and design of a classified node.
+
+        ``prerequisites`` are the concepts the node decomposes into; its
+        child nodes may not exist yet. Must be called from the event loop.
+        """
+        if id(node) in self._designs:
+            return
+        parent_design: Optional["asyncio.Task[Any]"] = None
+        if parent is not None:
+            parent_design = self._designs.get(id(parent))
+            if parent_design is None:
+                raise ValueError(f"Parent of {getattr(node, 'concept', node)!r} was not submitted first")
+
+        key = self._content_key(node) if self._content_key is not None else ("node", id(node))
+        content = self._contents.get(key)
+        if content is None:
+            content = self._contents[key] = self._spawn(self._generate(node))
+        self._designs[id(node)] = self._spawn(
+            self._design_when_ready(node, list(prerequisites), content, parent_design)
+        )
+
+    async def join(self) -> None:
+        """Wait for every submitted node; the first failure cancels the rest."""
+        try:
+            while True:
+                pending = [task for task in self._tasks if not task.done()]
+                if not pending:
+                    break
+                await asyncio.gather(*pending)
+            for task in self._tasks:
+                task.result()
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self) -> None:
+        """Cancel outstanding work, e.g. when exploration itself failed."""
+        for task in self._tasks:
+            task.cancel()
+
+    def _spawn(self, coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+        task = asyncio.ensure_future(coro)
+        # Failures surface from join(); mark them retrieved for tasks nobody joins
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._tasks.append(task)
+        return task
+
+    async def _generate(self, node: Any) -> Any:
+        async with self._semaphore:
+            return await self._enrich(node)
+
+    async def _design_when_ready(
+        self,
+        node: Any,
+        prerequisites: List[str],
+        content: "asyncio.Task[Any]",
+        parent_design: Optional["asyncio.Task[Any]"],
+    ) -> Any:
+        self._apply(node, await content)
+        parent_spec = await parent_design if parent_design is not None else None
+        async with self._semaphore:
+            return await self._design(node, prerequisites, parent_spec)
@@ -9,6 +9,10 @@ Coordinates all agents in the proper sequence:
 5. NarrativeComposer - Generate verbose prompt
 6. (External) CodeGenerator - Convert to Manim code
 
+Steps 2-4 are pipelined per node (see node_dataflow): a node is enriched as
+soon as it has been classified and designed as soon as its parent has been,
+so only narrative composition waits for the whole tree.
+
 Uses Claude Sonnet 4.5 via the Anthropic Claude Agent SDK.
 """
 
@@ -19,7 +23,6 @@ from dataclasses import dataclass, field
 from typing import Optional
 from datetime import datetime
 
-from anthropic import Anthropic, NotFoundError
 from dotenv import load_dotenv
 
 # Import all agents
@@ -33,7 +36,9 @@ try:
     from src.agents.mathematical_enricher import MathematicalEnricher
     from src.agents.visual_designer import VisualDesigner
     from src.agents.narrative_composer import NarrativeComposer, Narrative
-    from src.agents.claude_agent_runtime import run_query_via_sdk
+    from src.agents.llm_provider import TASK_CODEGEN, ModelRouter, get_model_router
+    from src.agents.run_metrics import RunMetrics, collect_metrics, metrics_stage
+    from src.agents.node_dataflow import NodeDataflow
 except ImportError:
     try:
         from prerequisite_explorer_claude import (
@@ -45,25 +50,14 @@ except ImportError:
         from mathematical_enricher import MathematicalEnricher
         from visual_designer import VisualDesigner
         from narrative_composer import NarrativeComposer, Narrative
-        from claude_agent_runtime import run_query_via_sdk
+        from llm_provider import TASK_CODEGEN, ModelRouter, get_model_router
+        from run_metrics import RunMetrics, collect_metrics, metrics_stage
+        from node_dataflow import NodeDataflow
     except ImportError:
         raise ImportError("Could not import required agents")
 
 load_dotenv()
 
-CLI_CLIENT: Optional[Anthropic] = None
-
-
-def _ensure_client() -> Anthropic:
-    global CLI_CLIENT
-    if CLI_CLIENT is None:
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
-        CLI_CLIENT = Anthropic(api_key=api_key)
-    return CLI_CLIENT
-
-
 @dataclass
 class AnimationResult:
     """Complete result from the agent pipeline"""
@@ -76,6 +70,7 @@ class AnimationResult:
     total_duration: int = 0
     scene_count: int = 0
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    metrics: Optional[dict] = None  # Token, cost and latency totals (see run_metrics)
 
     def to_dict(self) -> dict:
         """Convert to dictionary for JSON serialization"""
@@ -88,7 +83,8 @@ class AnimationResult:
             'concept_order': self.concept_order,
             'total_duration': self.total_duration,
             'scene_count': self.scene_count,
-            'timestamp': self.timestamp
+            'timestamp': self.timestamp,
+            'metrics': self.metrics
         }
 
     def save(self, output_dir: str = "."):
@@ -142,7 +138,12 @@ class ReverseKnowledgeTreeOrchestrator:
         max_tree_depth: int = 4,
         enable_code_generation: bool = True,
         enable_atlas: bool = False,
-        atlas_dataset: str = "math-to-manim-concepts"
+        atlas_dataset: str = "math-to-manim-concepts",
+        max_concurrency: int = 8,
+        exploration_strategy: str = "depth_first",
+        deduplicate_concepts: bool = False,
+        smooth_transitions: bool = False,
+        router: Optional[ModelRouter] = None
     ):
         """
         Initialize the orchestrator with all agents.
@@ -153,19 +154,42 @@ class ReverseKnowledgeTreeOrchestrator:
             enable_code_generation: Whether to generate Manim code
             enable_atlas: Whether to use Nomic Atlas for caching
             atlas_dataset: Atlas dataset name if enabled
+            max_concurrency: Maximum concurrent LLM calls during tree exploration,
+                again for mathematical enrichment and visual design, and for
+                narrative segments
+            exploration_strategy: "depth_first" or "level" (one batched request per tree level)
+            deduplicate_concepts: Explore a KnowledgeGraph so each unique concept is
+                explored, enriched and designed once instead of once per tree path
+            smooth_transitions: Ask a fast model for a bridging sentence between
+                consecutive narrative scenes (one extra call)
+            router: Per-task provider/model routes shared by every agent
+                (defaults to the process-wide router)
         """
         self.model = model
+        if router is None:
+            router = get_model_router()
+        self.router = router
         self.enable_code_generation = enable_code_generation
+        self.max_concurrency = max_concurrency
+        self.deduplicate_concepts = deduplicate_concepts
 
         # Initialize all agents
-        self.concept_analyzer = ConceptAnalyzer(model=model)
+        self.concept_analyzer = ConceptAnalyzer(model=model, router=router)
         self.prerequisite_explorer = PrerequisiteExplorer(
             model=model,
-            max_depth=max_tree_depth
+            max_depth=max_tree_depth,
+            max_concurrency=max_concurrency,
+            strategy=exploration_strategy,
+            router=router
+        )
+        self.mathematical_enricher = MathematicalEnricher(model=model, router=router)
+        self.visual_designer = VisualDesigner(model=model, router=router)
+        self.narrative_composer = NarrativeComposer(
+            model=model,
+            router=router,
+            max_concurrency=max_concurrency,
+            smooth_transitions=smooth_transitions
         )
-        self.mathematical_enricher = MathematicalEnricher(model=model)
-        self.visual_designer = VisualDesigner(model=model)
-        self.narrative_composer = NarrativeComposer(model=model)
 
         # Enable Atlas integration if requested
         if enable_atlas:
@@ -186,7 +210,10 @@ class ReverseKnowledgeTreeOrchestrator:
 
     async def process_async(self, user_input: str, output_dir: str = ".") -> AnimationResult:
         """Async version of process"""
+        with collect_metrics() as metrics:
+            return await self._run_pipeline_async(user_input, output_dir, metrics)
 
+    async def _run_pipeline_async(self, user_input: str, output_dir: str, metrics: RunMetrics) -> AnimationResult:
         print("""
 ╔═══════════════════════════════════════════════════════════════════╗
 ║  REVERSE KNOWLEDGE TREE PIPELINE - Claude Sonnet 4.5             ║
@@ -203,7 +230,8 @@ class ReverseKnowledgeTreeOrchestrator:
         print("=" * 70)
         print("STEP 1: CONCEPT ANALYSIS")
         print("=" * 70)
-        analysis = self.concept_analyzer.analyze(user_input)
+        with metrics_stage("concept_analysis", agent="ConceptAnalyzer"):
+            analysis = await self.concept_analyzer.analyze_async(user_input)
         print(f"\n✓ Core concept: {analysis['core_concept']}")
         print(f"  Domain: {analysis['domain']}")
         print(f"  Level: {analysis['level']}")
@@ -218,36 +246,69 @@ class ReverseKnowledgeTreeOrchestrator:
         print(f"\nRecursively discovering prerequisites for: {analysis['core_concept']}")
         print("Asking: 'What must I understand BEFORE this concept?'\n")
 
-        knowledge_tree = await self.prerequisite_explorer.explore_async(
-            analysis['core_concept']
-        )
+        dataflow: Optional[NodeDataflow] = None
+        with metrics_stage("prerequisite_exploration", agent="PrerequisiteExplorer"):
+            if self.deduplicate_concepts:
+                knowledge_graph = await self.prerequisite_explorer.explore_graph_async(
+                    analysis['core_concept']
+                )
+                print(f"\n✓ {len(knowledge_graph)} unique concepts, {knowledge_graph.edge_count()} edges")
+                knowledge_tree = knowledge_graph.to_tree()
+            else:
+                # Enrichment and design start on each node as soon as it is classified
+                dataflow = self._node_dataflow()
+                try:
+                    knowledge_tree = await self.prerequisite_explorer.explore_async(
+                        analysis['core_concept'], on_node=dataflow.submit
+                    )
+                except BaseException:
+                    dataflow.cancel()
+                    raise
 
         print("\n✓ Knowledge tree built:")
         knowledge_tree.print_tree()
 
-        # ===================================================================
-        # STEP 3: Mathematical Enrichment
-        # ===================================================================
-        print("\n" + "=" * 70)
-        print("STEP 3: MATHEMATICAL ENRICHMENT")
-        print("=" * 70)
-        print("\nAdding LaTeX equations, definitions, and examples to each node...\n")
+        if dataflow is not None:
+            # ===============================================================
+            # STEPS 3-4: Mathematical Enrichment and Visual Design (streamed)
+            # ===============================================================
+            print("\n" + "=" * 70)
+            print("STEPS 3-4: MATHEMATICAL ENRICHMENT AND VISUAL DESIGN")
+            print("=" * 70)
+            print("\nFinishing equations and visual specifications started during exploration...\n")
 
-        enriched_tree = await self.mathematical_enricher.enrich_node_async(knowledge_tree)
+            await dataflow.join()
+            designed_tree = knowledge_tree
 
-        print("\n✓ Mathematical content added to all nodes")
+            print("\n✓ Mathematical content and visual specifications added to all nodes")
+        else:
+            # ===============================================================
+            # STEP 3: Mathematical Enrichment
+            # ===============================================================
+            print("\n" + "=" * 70)
+            print("STEP 3: MATHEMATICAL ENRICHMENT")
+            print("=" * 70)
+            print("\nAdding LaTeX equations, definitions, and examples to each node...\n")
 
-        # ===================================================================
-        # STEP 4: Visual Design
-        # ===================================================================
-        print("\n" + "=" * 70)
-        print("STEP 4: VISUAL DESIGN")
-        print("=" * 70)
-        print("\nDesigning visual specifications (colors, animations, layout)...\n")
+            with metrics_stage("mathematical_enrichment", agent="MathematicalEnricher"):
+                enriched_tree = await self.mathematical_enricher.enrich_tree_async(
+                    knowledge_tree, max_concurrency=self.max_concurrency
+                )
+
+            print("\n✓ Mathematical content added to all nodes")
 
-        designed_tree = await self.visual_designer.design_node_async(enriched_tree)
+            # ===============================================================
+            # STEP 4: Visual Design
+            # ===============================================================
+            print("\n" + "=" * 70)
+            print("STEP 4: VISUAL DESIGN")
+            print("=" * 70)
+            print("\nDesigning visual specifications (colors, animations, layout)...\n")
 
-        print("\n✓ Visual specifications added to all nodes")
+            with metrics_stage("visual_design", agent="VisualDesigner"):
+                designed_tree = await self.visual_designer.design_node_async(enriched_tree)
+
+            print("\n✓ Visual specifications added to all nodes")
 
         # ===================================================================
         # STEP 5: Narrative Composition
@@ -258,7 +319,8 @@ class ReverseKnowledgeTreeOrchestrator:
         print("\nComposing verbose prompt from knowledge tree...")
         print("Walking from foundation concepts → target concept\n")
 
-        narrative = await self.narrative_composer.compose_async(designed_tree)
+        with metrics_stage("narrative_composition", agent="NarrativeComposer"):
+            narrative = await self.narrative_composer.compose_async(designed_tree)
 
         print(f"\n✓ Verbose prompt generated:")
         print(f"  Length: {len(narrative.verbose_prompt)} characters")
@@ -276,7 +338,8 @@ class ReverseKnowledgeTreeOrchestrator:
             print("=" * 70)
             print("\nGenerating Python code from verbose prompt...\n")
 
-            manim_code = await self._generate_manim_code_async(narrative.verbose_prompt)
+            with metrics_stage("code_generation", agent="CodeGenerator"):
+                manim_code = await self._generate_manim_code_async(narrative.verbose_prompt)
 
             print(f"\n✓ Manim code generated:")
             print(f"  Length: {len(manim_code)} characters")
@@ -285,6 +348,11 @@ class ReverseKnowledgeTreeOrchestrator:
         # ===================================================================
         # Create result
         # ===================================================================
+        metrics.close()
+        totals = metrics.totals
+        print(f"\n📊 {totals['calls']} LLM calls, {totals['total_tokens']} tokens, "
+              f"~${totals['cost_usd']:.4f}, {totals['retries']} retries, {totals['cache_hits']} cache hits")
+
         result = AnimationResult(
             user_input=user_input,
             target_concept=analysis['core_concept'],
@@ -293,7 +361,8 @@ class ReverseKnowledgeTreeOrchestrator:
             manim_code=manim_code,
             concept_order=narrative.concept_order,
             total_duration=narrative.total_duration,
-            scene_count=narrative.scene_count
+            scene_count=narrative.scene_count,
+            metrics=metrics.to_dict()
         )
 
         # Save results
@@ -305,6 +374,27 @@ class ReverseKnowledgeTreeOrchestrator:
 
         return result
 
+    def _node_dataflow(self) -> NodeDataflow:
+        """Per-node enrichment and design, attributed to their own stages"""
+        enricher = self.mathematical_enricher
+        designer = self.visual_designer
+
+        async def enrich(node: KnowledgeNode):
+            with metrics_stage("mathematical_enrichment", agent="MathematicalEnricher"):
+                return await enricher.generate_content_async(node)
+
+        async def design(node: KnowledgeNode, prerequisites: list, parent_spec):
+            with metrics_stage("visual_design", agent="VisualDesigner"):
+                return await designer.design_one_async(node, prerequisites, parent_spec)
+
+        return NodeDataflow(
+            enrich,
+            enricher.apply_math_content,
+            design,
+            content_key=enricher.content_key,
+            max_concurrency=self.max_concurrency,
+        )
+
     async def _generate_manim_code_async(self, verbose_prompt: str) -> str:
         """Generate Manim Python code from the verbose prompt"""
 
@@ -330,22 +420,14 @@ Return ONLY the Python code, no explanations."""
 
 Return complete Python code that can be run directly."""
 
-        try:
-            response = _ensure_client().messages.create(
-                model=self.model,
-                max_tokens=8000,
-                temperature=0.3,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            content = response.content[0].text
-        except NotFoundError:
-            content = run_query_via_sdk(
-                user_prompt,
-                system_prompt=system_prompt,
-                temperature=0.3,
-                max_tokens=8000,
-            )
+        content = await self.router.complete(
+            TASK_CODEGEN,
+            model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=8000,
+            temperature=0.3,
+        )
 
         # Extract code from markdown if needed
         if "```python" in content:
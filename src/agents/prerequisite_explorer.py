@@ -5,29 +5,85 @@ Recursively decomposes concepts by asking "What must I understand BEFORE this?"
 No training data required - uses LLM reasoning to build knowledge trees.
 """
 
-import os
 import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, asdict
 from dotenv import load_dotenv
-from openai import OpenAI
+
+try:
+    from src.agents.foundation_cache import FoundationVerdictCache, get_foundation_cache
+except ImportError:
+    from foundation_cache import FoundationVerdictCache, get_foundation_cache
+
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict
+except ImportError:
+    from concept_canonicalizer import CanonicalDict
+
+try:
+    from src.agents.classify_and_decompose import (
+        CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+        CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        build_classify_and_decompose_prompt,
+        parse_classify_and_decompose,
+    )
+except ImportError:
+    from classify_and_decompose import (
+        CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+        CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        build_classify_and_decompose_prompt,
+        parse_classify_and_decompose,
+    )
+
 try:
+    from src.agents.prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+except ImportError:
+    from prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+
 try:
-    from .nomic_atlas_client import AtlasClient, AtlasConcept, NomicNotInstalledError
-except ImportError:  # pragma: no cover - optional dependency
-    AtlasClient = None  # type: ignore[assignment]
-    AtlasConcept = None  # type: ignore[assignment]
-    NomicNotInstalledError = RuntimeError  # type: ignore[assignment]
+    try:
+        from .nomic_atlas_client import AtlasClient, AtlasConcept, NomicNotInstalledError
+    except ImportError:  # pragma: no cover - optional dependency
+        AtlasClient = None  # type: ignore[assignment]
+        AtlasConcept = None  # type: ignore[assignment]
+        NomicNotInstalledError = RuntimeError  # type: ignore[assignment]
 except Exception:  # pragma: no cover - optional dependency
     AtlasClient = AtlasConcept = NomicNotInstalledError = None  # type: ignore
 
+try:
+    from src.agents.llm_provider import get_provider, run_blocking
+except ImportError:
+    from llm_provider import get_provider, run_blocking
+
 load_dotenv()
 
-# Initialize DeepSeek client
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com"
-)
+
+def _create_completion(model: str, messages: List[Dict[str, str]]):
+    """DeepSeek chat completion through the shared ``deepseek`` provider
+    (rate limited, metered and cassette-recorded)."""
+    deepseek = get_provider("deepseek")
+    return run_blocking(deepseek, lambda: deepseek.create({"model": model, "messages": messages}))
+
+
+# Bump whenever the is_foundation prompt changes so cached verdicts are re-asked.
+FOUNDATION_PROMPT_VERSION = "deepseek-foundation-v1"
+
+PREREQUISITES_PROMPT = """To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts
+that someone must understand first?
+
+Rules:
+1. Only list concepts that are NECESSARY for understanding {concept}
+2. Order from most to least important
+3. Assume high school education as baseline (don't list truly basic things)
+4. Focus on concepts that enable understanding, not just historical context
+5. Be specific - prefer "special relativity" over "relativity"
+
+Return ONLY a JSON array of concept names, nothing else.
+Example format: ["concept1", "concept2", "concept3"]"""
+
+# Shared PrerequisiteStore entries are keyed by prompt, so editing one starts fresh.
+PREREQUISITES_PROMPT_HASH = prompt_hash(PREREQUISITES_PROMPT)
+COMBINED_PROMPT_HASH = prompt_hash(CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT)
 
 
 @dataclass
@@ -72,10 +128,24 @@ class PrerequisiteExplorer:
     This is the key innovation - no training data needed!
     """
 
-    def __init__(self, model: str = "deepseek-reasoner", max_depth: int = 4):
+    def __init__(
+        self,
+        model: str = "deepseek-reasoner",
+        max_depth: int = 4,
+        foundation_cache: Optional[FoundationVerdictCache] = None,
+        combined_mode: bool = False,
+        prerequisite_store: Optional[PrerequisiteStore] = None,
+    ):
         self.model = model
         self.max_depth = max_depth
-        self.cache = {}  # Cache prerequisite queries to avoid redundant LLM calls
+        self.combined_mode = combined_mode  # One classify-and-decompose call per node
+        self.cache = CanonicalDict()  # Prerequisites keyed by canonical concept to avoid redundant LLM calls
+        if foundation_cache is None:
+            foundation_cache = get_foundation_cache()
+        self.foundation_cache = foundation_cache  # Persistent is_foundation verdicts
+        if prerequisite_store is None:
+            prerequisite_store = get_prerequisite_store()
+        self.prerequisite_store = prerequisite_store  # Decompositions shared across runs and workers
         self.atlas_client: Optional[AtlasClient] = None
 
     def enable_atlas_integration(self, dataset_name: str) -> None:
@@ -108,7 +178,15 @@ class PrerequisiteExplorer:
         print(f"{'  ' * depth}Exploring: {concept} (depth {depth})")
 
         # Base case: check if foundation or max depth reached
-        if depth >= self.max_depth or self.is_foundation(concept):
+        cached_prereqs: Optional[List[str]] = None
+        if depth >= self.max_depth:
+            is_foundation = True
+        elif self.combined_mode:
+            is_foundation, cached_prereqs = self.classify_and_decompose(concept)
+        else:
+            is_foundation = self.is_foundation(concept)
+
+        if is_foundation:
             print(f"{'  ' * depth}  -> Foundation concept")
             return KnowledgeNode(
                 concept=concept,
@@ -118,7 +196,8 @@ class PrerequisiteExplorer:
             )
 
         # Check cache
-        cached_prereqs = self.lookup_prerequisites(concept)
+        if cached_prereqs is None:
+            cached_prereqs = self.lookup_prerequisites(concept)
 
         # Recurse on each prerequisite
         prerequisite_nodes = []
@@ -140,6 +219,12 @@ class PrerequisiteExplorer:
         A concept is foundational if a typical high school graduate would
         understand it without further explanation.
         """
+        cached = self.foundation_cache.get(
+            concept, model=self.model, prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        if cached is not None:
+            return cached
+
         prompt = f"""Is "{concept}" a foundational concept that a typical high school graduate
 would understand without further mathematical/scientific explanation?
 
@@ -159,13 +244,75 @@ Examples of non-foundational concepts:
 
 Answer with ONLY "yes" or "no"."""
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        response = _create_completion(self.model, [{"role": "user", "content": prompt}])
 
         answer = response.choices[0].message.content.strip().lower()
-        return answer.startswith('yes')
+        is_foundation = answer.startswith('yes')
+        self.foundation_cache.set(
+            concept, is_foundation, model=self.model, prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        return is_foundation
+
+    def classify_and_decompose(self, concept: str) -> Tuple[bool, List[str]]:
+        """
+        Decide foundation status and list prerequisites in a single LLM call.
+
+        Falls back to ``is_foundation`` followed by ``lookup_prerequisites``
+        when the combined answer cannot be parsed.
+        """
+        cached = self.foundation_cache.get(
+            concept, model=self.model, prompt_version=CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION
+        )
+        if cached is None:
+            # Verdicts recorded by the two-call path are just as good
+            cached = self.foundation_cache.get(
+                concept, model=self.model, prompt_version=FOUNDATION_PROMPT_VERSION
+            )
+        if cached is True:
+            return True, []
+        if cached is False and concept in self.cache:
+            print(f"  -> Using in-memory cache for {concept}")
+            return False, self.cache[concept]
+        if cached is False:
+            stored = self._stored_prerequisites(concept, COMBINED_PROMPT_HASH, PREREQUISITES_PROMPT_HASH)
+            if stored is not None:
+                return False, stored
+
+        response = _create_completion(
+            self.model,
+            [
+                {"role": "system", "content": CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT},
+                {"role": "user", "content": build_classify_and_decompose_prompt(concept)},
+            ],
+        )
+
+        parsed = parse_classify_and_decompose(response.choices[0].message.content)
+        if parsed is None:
+            print(f"  -> Combined response unusable for {concept}, using two-call path")
+            if self.is_foundation(concept):
+                return True, []
+            return False, self.lookup_prerequisites(concept)
+
+        is_foundation, prerequisites = parsed
+        self.foundation_cache.set(
+            concept, is_foundation, model=self.model, prompt_version=CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION
+        )
+        if not is_foundation:
+            self.cache[concept] = prerequisites
+            self.prerequisite_store.set(
+                concept, prerequisites, model=self.model, prompt_hash=COMBINED_PROMPT_HASH
+            )
+        return is_foundation, prerequisites
+
+    def _stored_prerequisites(self, concept: str, *prompt_hashes: str) -> Optional[List[str]]:
+        """Check the shared store and warm the in-memory cache on a hit."""
+        for key in prompt_hashes:
+            stored = self.prerequisite_store.get(concept, model=self.model, prompt_hash=key)
+            if stored is not None:
+                print(f"  -> Using prerequisite store for {concept}")
+                self.cache[concept] = stored
+                return stored
+        return None
 
     def lookup_prerequisites(self, concept: str) -> List[str]:
         """Lookup prerequisites via cache, Atlas, or LLM fallback."""
@@ -175,6 +322,11 @@ Answer with ONLY "yes" or "no"."""
             print(f"  -> Using in-memory cache for {concept}")
             return self.cache[concept]
 
+        # Shared store (other runs / workers)
+        stored = self._stored_prerequisites(concept, PREREQUISITES_PROMPT_HASH, COMBINED_PROMPT_HASH)
+        if stored is not None:
+            return stored
+
         # Atlas cache
         if self.atlas_client is not None:
             atlas_results = self._atlas_fetch_prerequisites(concept)
@@ -186,6 +338,9 @@ Answer with ONLY "yes" or "no"."""
         # LLM fallback
         prerequisites = self.discover_prerequisites(concept)
         self.cache[concept] = prerequisites
+        self.prerequisite_store.set(
+            concept, prerequisites, model=self.model, prompt_hash=PREREQUISITES_PROMPT_HASH
+        )
 
         # Push to Atlas for future reuse
         if self.atlas_client is not None and AtlasConcept is not None:
@@ -199,23 +354,9 @@ Answer with ONLY "yes" or "no"."""
 
         Returns list of 3-5 essential prerequisite concepts.
         """
-        prompt = f"""To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts
-that someone must understand first?
-
-Rules:
-1. Only list concepts that are NECESSARY for understanding {concept}
-2. Order from most to least important
-3. Assume high school education as baseline (don't list truly basic things)
-4. Focus on concepts that enable understanding, not just historical context
-5. Be specific - prefer "special relativity" over "relativity"
+        prompt = PREREQUISITES_PROMPT.format(concept=concept)
 
-Return ONLY a JSON array of concept names, nothing else.
-Example format: ["concept1", "concept2", "concept3"]"""
-
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        response = _create_completion(self.model, [{"role": "user", "content": prompt}])
 
         content = response.choices[0].message.content.strip()
 
@@ -313,10 +454,7 @@ Example response:
 
 Return ONLY valid JSON, nothing else."""
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        response = _create_completion(self.model, [{"role": "user", "content": prompt}])
 
         content = response.choices[0].message.content.strip()
 
@@ -11,21 +11,86 @@ import json
 import asyncio
 from dataclasses import dataclass
 from functools import partial
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
-from anthropic import Anthropic
-from anthropic import NotFoundError
 from dotenv import load_dotenv
 
 # Import from same package using absolute imports
 try:
-    from src.agents.claude_agent_runtime import run_query_via_sdk
+    from src.agents.llm_provider import (
+        TASK_CLASSIFY,
+        TASK_CONCEPT_ANALYSIS,
+        TASK_FOUNDATION,
+        TASK_PREREQUISITES,
+        ModelRouter,
+        get_model_router,
+    )
 except ImportError:
     # Fallback for direct execution
-    try:
-        from claude_agent_runtime import run_query_via_sdk
-    except ImportError:
-        run_query_via_sdk = None  # type: ignore[assignment]
+    from llm_provider import (
+        TASK_CLASSIFY,
+        TASK_CONCEPT_ANALYSIS,
+        TASK_FOUNDATION,
+        TASK_PREREQUISITES,
+        ModelRouter,
+        get_model_router,
+    )
+
+try:
+    from src.agents.foundation_cache import FoundationVerdictCache, get_foundation_cache
+except ImportError:
+    from foundation_cache import FoundationVerdictCache, get_foundation_cache
+
+try:
+    from src.agents.classify_and_decompose import (
+        BATCH_CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+        CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        build_batch_classify_and_decompose_prompt,
+        build_classify_and_decompose_prompt,
+        parse_batch_classify_and_decompose,
+        parse_classify_and_decompose,
+    )
+except ImportError:
+    from classify_and_decompose import (
+        BATCH_CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION,
+        CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+        build_batch_classify_and_decompose_prompt,
+        build_classify_and_decompose_prompt,
+        parse_batch_classify_and_decompose,
+        parse_classify_and_decompose,
+    )
+
+try:
+    from src.agents.concept_canonicalizer import CanonicalDict
+except ImportError:
+    from concept_canonicalizer import CanonicalDict
+
+try:
+    from src.agents.knowledge_graph import KnowledgeGraph
+except ImportError:
+    from knowledge_graph import KnowledgeGraph
+
+try:
+    from src.agents.prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+except ImportError:
+    from prerequisite_store import PrerequisiteStore, get_prerequisite_store, prompt_hash
+
+try:
+    from src.agents.single_flight import SingleFlight
+except ImportError:
+    from single_flight import SingleFlight
+
+try:
+    from src.agents.run_metrics import record_cache_hit
+except ImportError:
+    from run_metrics import record_cache_hit
+
+try:
+    from src.agents.message_batches import BatchRequest, BatchRunner, batch_model
+except ImportError:
+    from message_batches import BatchRequest, BatchRunner, batch_model
 
 try:
     from src.agents.nomic_atlas_client import AtlasClient, AtlasConcept, NomicNotInstalledError
@@ -39,20 +104,43 @@ except ImportError:  # pragma: no cover - optional dependency
 
 load_dotenv()
 
-CLI_CLIENT: Optional[Anthropic] = None
+CLAUDE_MODEL = "claude-sonnet-4-5"  # Claude Sonnet 4.5
 
+# Bump whenever the is_foundation prompt changes so cached verdicts are re-asked.
+FOUNDATION_PROMPT_VERSION = "claude-foundation-v1"
 
-def _ensure_client() -> Anthropic:
-    global CLI_CLIENT
-    if CLI_CLIENT is None:
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
-        CLI_CLIENT = Anthropic(api_key=api_key)
-    return CLI_CLIENT
+PREREQUISITES_SYSTEM_PROMPT = """You are an expert educator and curriculum designer.
 
+Your task is to identify the ESSENTIAL prerequisite concepts someone must
+understand BEFORE they can grasp a given concept.
 
-CLAUDE_MODEL = "claude-sonnet-4-5"  # Claude Sonnet 4.5
+Rules:
+1. Only list concepts that are NECESSARY for understanding (not just helpful)
+2. Order from most to least important
+3. Assume high school education as baseline (don't list truly basic things)
+4. Focus on concepts that enable understanding, not just historical context
+5. Be specific - prefer "special relativity" over "relativity"
+6. Limit to 3-5 prerequisites maximum
+
+Return ONLY a JSON array of concept names, nothing else."""
+
+PREREQUISITES_USER_PROMPT = '''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
+
+Return format: ["concept1", "concept2", "concept3"]'''
+
+# Shared PrerequisiteStore entries are keyed by these, so editing a prompt
+# starts a fresh set of stored decompositions.
+PREREQUISITES_PROMPT_HASH = prompt_hash(PREREQUISITES_SYSTEM_PROMPT, PREREQUISITES_USER_PROMPT)
+COMBINED_PROMPT_HASH = prompt_hash(CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT)
+
+# "depth_first" explores each subtree recursively; "level" sends one batched
+# classify-and-decompose request per tree level (chunked by level_batch_size).
+EXPLORATION_STRATEGIES = ("depth_first", "level")
+
+# Called as on_node(node, prerequisites, parent) once a node is classified:
+# ``prerequisites`` are the concepts it decomposes into, its child nodes are
+# filled in later. Parents are always reported before their prerequisites.
+NodeCallback = Callable[["KnowledgeNode", List[str], Optional["KnowledgeNode"]], None]
 
 
 @dataclass
@@ -99,10 +187,39 @@ class PrerequisiteExplorer:
     Powered by Claude Sonnet 4.5 for superior reasoning capabilities.
     """
 
-    def __init__(self, model: str = CLAUDE_MODEL, max_depth: int = 4):
+    def __init__(
+        self,
+        model: str = CLAUDE_MODEL,
+        max_depth: int = 4,
+        max_concurrency: int = 8,
+        foundation_cache: Optional[FoundationVerdictCache] = None,
+        combined_mode: bool = False,
+        strategy: str = "depth_first",
+        level_batch_size: int = 20,
+        prerequisite_store: Optional[PrerequisiteStore] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        if strategy not in EXPLORATION_STRATEGIES:
+            raise ValueError(
+                f"Unknown exploration strategy {strategy!r}; expected one of {EXPLORATION_STRATEGIES}"
+            )
         self.model = model
         self.max_depth = max_depth
-        self.cache = {}  # Cache prerequisite queries to avoid redundant API calls
+        self.combined_mode = combined_mode  # One classify-and-decompose call per node
+        self.strategy = strategy
+        self.level_batch_size = max(1, level_batch_size)  # Concepts per batched level request
+        self.max_concurrency = max(1, max_concurrency)  # Max LLM calls in flight while exploring siblings
+        self.cache = CanonicalDict()  # Prerequisites keyed by canonical concept to avoid redundant API calls
+        if foundation_cache is None:
+            foundation_cache = get_foundation_cache()
+        self.foundation_cache = foundation_cache  # Persistent is_foundation verdicts
+        if prerequisite_store is None:
+            prerequisite_store = get_prerequisite_store()
+        self.prerequisite_store = prerequisite_store  # Decompositions shared across runs and workers
+        self.single_flight = SingleFlight()  # Concurrent lookups of one concept share a call
+        if router is None:
+            router = get_model_router()
+        self.router = router  # Foundation checks go to a fast model, decomposition to ``model``
         self.atlas_client: Optional[AtlasClient] = None
 
     def enable_atlas_integration(self, dataset_name: str) -> None:
@@ -121,21 +238,348 @@ class PrerequisiteExplorer:
 
         self.atlas_client = client
 
-    async def explore_async(self, concept: str, depth: int = 0) -> KnowledgeNode:
+    async def explore_async(
+        self,
+        concept: str,
+        depth: int = 0,
+        on_node: Optional[NodeCallback] = None,
+    ) -> KnowledgeNode:
+        """
+        Recursively explore prerequisites for a concept.
+
+        Sibling subtrees are explored concurrently; at most ``max_concurrency``
+        LLM calls are in flight at once. Prerequisite order is preserved.
+        With ``strategy="level"`` the tree is built by ``explore_levels_async``.
+        ``on_node`` is told about each node as soon as it is classified, so
+        later stages can start on it while its subtree is still explored.
+        """
+        if self.strategy == "level":
+            return await self.explore_levels_async(concept, depth, on_node)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await self._explore_node_async(concept, depth, semaphore, on_node)
+
+    async def explore_levels_async(
+        self,
+        concept: str,
+        depth: int = 0,
+        on_node: Optional[NodeCallback] = None,
+    ) -> KnowledgeNode:
+        """
+        Build the tree breadth-first, one batched request per level.
+
+        Every unique concept on the frontier at depth d is classified and
+        decomposed in a single JSON-mapped request (split into chunks of
+        ``level_batch_size``), so a depth-4 tree needs a handful of requests
+        instead of one or two per node. Concepts the model leaves out of a
+        batch answer are retried individually via ``classify_and_decompose_async``.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await self._build_levels_async(
+            concept, depth, lambda concepts, level: self._classify_level_async(concepts, semaphore), on_node
+        )
+
+    async def explore_batch_async(self, concept: str, runner: BatchRunner, depth: int = 0) -> KnowledgeNode:
+        """
+        Build the tree breadth-first with one message batch per level.
+
+        Each uncached concept on the frontier gets its own classify-and-decompose
+        request, and the whole level is submitted through ``runner`` (see
+        ``message_batches``). Answers that error or cannot be parsed are
+        asked again interactively.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await self._build_levels_async(
+            concept,
+            depth,
+            lambda concepts, level: self._classify_level_batch_async(
+                concepts, f"classify:{concept}:level-{level}", runner, semaphore
+            ),
+        )
+
+    async def _build_levels_async(
+        self,
+        concept: str,
+        depth: int,
+        classify_level: Callable[[List[str], int], Awaitable[Dict[str, Tuple[bool, List[str]]]]],
+        on_node: Optional[NodeCallback] = None,
+    ) -> KnowledgeNode:
+        root = KnowledgeNode(concept=concept, depth=depth, is_foundation=False, prerequisites=[])
+        frontier = [root]
+        parents: Dict[int, Optional[KnowledgeNode]] = {id(root): None}
+
+        while frontier:
+            level = frontier[0].depth
+            if level >= self.max_depth:
+                for node in frontier:
+                    node.is_foundation = True
+                    if on_node is not None:
+                        on_node(node, [], parents[id(node)])
+                break
+
+            concepts = list(dict.fromkeys(node.concept for node in frontier))
+            print(f"{'  ' * level}Exploring level {level}: {len(concepts)} concepts")
+            answers = await classify_level(concepts, level)
+
+            next_frontier: List[KnowledgeNode] = []
+            for node in frontier:
+                is_foundation, prerequisites = answers[node.concept]
+                node.is_foundation = is_foundation
+                if on_node is not None:
+                    on_node(node, [] if is_foundation else list(prerequisites), parents[id(node)])
+                if is_foundation:
+                    continue
+                node.prerequisites = [
+                    KnowledgeNode(concept=prereq, depth=level + 1, is_foundation=False, prerequisites=[])
+                    for prereq in prerequisites
+                ]
+                parents.update((id(child), node) for child in node.prerequisites)
+                next_frontier.extend(node.prerequisites)
+            frontier = next_frontier
+
+        return root
+
+    async def explore_graph_async(self, concept: str, depth: int = 0) -> KnowledgeGraph:
+        """
+        Build a deduplicated ``KnowledgeGraph`` instead of an exploded tree.
+
+        Exploration runs level by level, so every concept is classified and
+        decomposed once, at the smallest depth it is reached. Levels use the
+        batched request for ``strategy="level"`` and concurrent per-concept
+        calls otherwise. Call ``graph.to_tree()`` for a ``KnowledgeNode`` view.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        graph = KnowledgeGraph()
+        graph.add_concept(concept, depth)
+        frontier = [concept]
+
+        while frontier:
+            level = graph.get(frontier[0]).depth
+            if level >= self.max_depth:
+                for name in frontier:
+                    graph.get(name).is_foundation = True
+                break
+
+            print(f"{'  ' * level}Exploring level {level}: {len(frontier)} unique concepts")
+            if self.strategy == "level":
+                answers = await self._classify_level_async(frontier, semaphore)
+            else:
+                results = await asyncio.gather(
+                    *(self._classify_one_async(name, semaphore) for name in frontier)
+                )
+                answers = dict(zip(frontier, results))
+
+            next_frontier: List[str] = []
+            for name in frontier:
+                is_foundation, prerequisites = answers[name]
+                graph.get(name).is_foundation = is_foundation
+                if is_foundation:
+                    continue
+                for prereq in prerequisites:
+                    is_new = prereq not in graph
+                    graph.add_concept(prereq, level + 1)
+                    if graph.add_edge(name, prereq) and is_new:
+                        next_frontier.append(prereq)
+            frontier = next_frontier
+
+        return graph
+
+    async def _classify_one_async(
+        self,
+        concept: str,
+        semaphore: asyncio.Semaphore,
+    ) -> Tuple[bool, List[str]]:
+        if self.combined_mode:
+            async with semaphore:
+                return await self.classify_and_decompose_async(concept)
+        async with semaphore:
+            if await self.is_foundation_async(concept):
+                return True, []
+        async with semaphore:
+            return False, await self.lookup_prerequisites_async(concept)
+
+    async def _classify_level_async(
+        self,
+        concepts: List[str],
+        semaphore: asyncio.Semaphore,
+    ) -> Dict[str, Tuple[bool, List[str]]]:
+        answers: Dict[str, Tuple[bool, List[str]]] = {}
+        pending: List[str] = []
+        for concept in concepts:
+            cached = self._cached_classification(concept)
+            if cached is not None:
+                answers[concept] = cached
+            else:
+                pending.append(concept)
+
+        chunks = [
+            pending[i:i + self.level_batch_size]
+            for i in range(0, len(pending), self.level_batch_size)
+        ]
+        for result in await asyncio.gather(
+            *(self._classify_chunk_async(chunk, semaphore) for chunk in chunks)
+        ):
+            answers.update(result)
+
+        missing = [concept for concept in pending if concept not in answers]
+        if missing:
+            print(f"  -> {len(missing)} concepts missing from batch answer, asking individually")
+
+        async def classify_one(concept: str) -> Tuple[bool, List[str]]:
+            async with semaphore:
+                return await self.classify_and_decompose_async(concept)
+
+        for concept, answer in zip(missing, await asyncio.gather(*(classify_one(c) for c in missing))):
+            answers[concept] = answer
+        return answers
+
+    async def _classify_level_batch_async(
+        self,
+        concepts: List[str],
+        step: str,
+        runner: BatchRunner,
+        semaphore: asyncio.Semaphore,
+    ) -> Dict[str, Tuple[bool, List[str]]]:
+        answers: Dict[str, Tuple[bool, List[str]]] = {}
+        pending: List[str] = []
+        for concept in concepts:
+            cached = self._cached_classification(concept)
+            if cached is not None:
+                answers[concept] = cached
+            else:
+                pending.append(concept)
+
+        model = batch_model(self.router, TASK_CLASSIFY, self.model)
+        requests = [
+            BatchRequest(
+                custom_id=f"classify-{index:05d}",
+                model=model,
+                system_prompt=CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+                user_prompt=build_classify_and_decompose_prompt(concept),
+                max_tokens=500,
+                temperature=0.3,
+            )
+            for index, concept in enumerate(pending)
+        ]
+        results = await runner.run(step, requests)
+
+        missing: List[str] = []
+        for concept, request in zip(pending, requests):
+            parsed = parse_classify_and_decompose(results.get(request.custom_id))
+            if parsed is None:
+                missing.append(concept)
+                continue
+            self._record_classification(concept, *parsed)
+            answers[concept] = parsed
+
+        if missing:
+            print(f"  -> {len(missing)} concepts failed in batch, asking individually")
+
+        async def classify_one(concept: str) -> Tuple[bool, List[str]]:
+            async with semaphore:
+                return await self.classify_and_decompose_async(concept)
+
+        for concept, answer in zip(missing, await asyncio.gather(*(classify_one(c) for c in missing))):
+            answers[concept] = answer
+        return answers
+
+    async def _classify_chunk_async(
+        self,
+        concepts: List[str],
+        semaphore: asyncio.Semaphore,
+    ) -> Dict[str, Tuple[bool, List[str]]]:
+        async with semaphore:
+            content = await self._complete_async(
+                BATCH_CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+                build_batch_classify_and_decompose_prompt(concepts),
+                max_tokens=min(8192, 200 + 100 * len(concepts)),
+                temperature=0.3,
+                task=TASK_CLASSIFY,
+            )
+
+        answers = parse_batch_classify_and_decompose(content, concepts)
+        for concept, (is_foundation, prerequisites) in answers.items():
+            self._record_classification(concept, is_foundation, prerequisites)
+        return answers
+
+    async def _explore_node_async(
+        self,
+        concept: str,
+        depth: int,
+        semaphore: asyncio.Semaphore,
+        on_node: Optional[NodeCallback] = None,
+        parent: Optional[KnowledgeNode] = None,
+    ) -> KnowledgeNode:
         print(f"{'  ' * depth}Exploring: {concept} (depth {depth})")
 
-        if depth >= self.max_depth or await self.is_foundation_async(concept):
+        prerequisites: Optional[List[str]] = None
+        if depth >= self.max_depth:
+            is_foundation = True
+        elif self.combined_mode:
+            async with semaphore:
+                is_foundation, prerequisites = await self.classify_and_decompose_async(concept)
+        else:
+            async with semaphore:
+                is_foundation = await self.is_foundation_async(concept)
+
+        if is_foundation:
             print(f"{'  ' * depth}  -> Foundation concept")
-            return KnowledgeNode(concept=concept, depth=depth, is_foundation=True, prerequisites=[])
-
-        prerequisites = await self.lookup_prerequisites_async(concept)
-        nodes = []
-        for prereq in prerequisites:
-            nodes.append(await self.explore_async(prereq, depth + 1))
+            node = KnowledgeNode(concept=concept, depth=depth, is_foundation=True, prerequisites=[])
+            if on_node is not None:
+                on_node(node, [], parent)
+            return node
+
+        if prerequisites is None:
+            async with semaphore:
+                prerequisites = await self.lookup_prerequisites_async(concept)
+
+        node = KnowledgeNode(concept=concept, depth=depth, is_foundation=False, prerequisites=[])
+        if on_node is not None:
+            on_node(node, list(prerequisites), parent)
+
+        # gather() returns results in argument order, so the tree layout
+        # matches the order the model listed the prerequisites in.
+        nodes = await asyncio.gather(
+            *(self._explore_node_async(prereq, depth + 1, semaphore, on_node, node) for prereq in prerequisites)
+        )
+        node.prerequisites = list(nodes)
+        return node
+
+    async def _complete_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        *,
+        max_tokens: int,
+        temperature: float,
+        task: str = TASK_PREREQUISITES,
+    ) -> str:
+        """Shared completion call, sent wherever the router maps ``task``."""
+        return await self.router.complete(
+            task,
+            model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
 
-        return KnowledgeNode(concept=concept, depth=depth, is_foundation=False, prerequisites=nodes)
+    def _model_for(self, task: str) -> str:
+        """Model that answers ``task``; cached answers are keyed under it."""
+        return self.router.model_for(task, self.model)
 
     async def is_foundation_async(self, concept: str) -> bool:
+        cached = self.foundation_cache.get(
+            concept, model=self._model_for(TASK_FOUNDATION), prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        if cached is not None:
+            record_cache_hit("foundation_cache", agent=TASK_FOUNDATION)
+            return cached
+        return await self.single_flight.do(
+            SingleFlight.concept_key("foundation", concept),
+            partial(self._ask_is_foundation_async, concept),
+        )
+
+    async def _ask_is_foundation_async(self, concept: str) -> bool:
         system_prompt = """You are an expert educator analyzing whether a concept is foundational.
 
 A concept is foundational if a typical high school graduate would understand it
@@ -159,29 +603,114 @@ Examples of non-foundational concepts:
 
         user_prompt = f'Is "{concept}" a foundational concept?\n\nAnswer with ONLY "yes" or "no".'
 
-        try:
-            response = _ensure_client().messages.create(
-                model=self.model,
-                max_tokens=10,
-                temperature=0,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
+        answer = await self._complete_async(
+            system_prompt,
+            user_prompt,
+            max_tokens=10,
+            temperature=0,
+            task=TASK_FOUNDATION,
+        )
+
+        is_foundation = answer.strip().lower().startswith('yes')
+        self.foundation_cache.set(
+            concept, is_foundation, model=self._model_for(TASK_FOUNDATION), prompt_version=FOUNDATION_PROMPT_VERSION
+        )
+        return is_foundation
+
+    async def classify_and_decompose_async(self, concept: str) -> Tuple[bool, List[str]]:
+        """
+        Decide foundation status and list prerequisites in a single request.
+
+        Cached verdicts and prerequisites are reused first. If the model's
+        answer cannot be parsed, falls back to ``is_foundation_async`` followed
+        by ``lookup_prerequisites_async``.
+        """
+        cached = self._cached_classification(concept)
+        if cached is not None:
+            return cached
+        return await self.single_flight.do(
+            SingleFlight.concept_key("classify", concept),
+            partial(self._ask_classify_and_decompose_async, concept),
+        )
+
+    async def _ask_classify_and_decompose_async(self, concept: str) -> Tuple[bool, List[str]]:
+        content = await self._complete_async(
+            CLASSIFY_AND_DECOMPOSE_SYSTEM_PROMPT,
+            build_classify_and_decompose_prompt(concept),
+            max_tokens=500,
+            temperature=0.3,
+            task=TASK_CLASSIFY,
+        )
+
+        parsed = parse_classify_and_decompose(content)
+        if parsed is None:
+            print(f"  -> Combined response unusable for {concept}, using two-call path")
+            if await self.is_foundation_async(concept):
+                return True, []
+            return False, await self.lookup_prerequisites_async(concept)
+
+        is_foundation, prerequisites = parsed
+        self._record_classification(concept, is_foundation, prerequisites)
+        return is_foundation, prerequisites
+
+    def _cached_classification(self, concept: str) -> Optional[Tuple[bool, List[str]]]:
+        cached = self.foundation_cache.get(
+            concept, model=self._model_for(TASK_CLASSIFY), prompt_version=CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION
+        )
+        if cached is None:
+            # Verdicts recorded by the two-call path are just as good
+            cached = self.foundation_cache.get(
+                concept, model=self._model_for(TASK_FOUNDATION), prompt_version=FOUNDATION_PROMPT_VERSION
             )
-            answer = response.content[0].text
-        except NotFoundError:
-            answer = run_query_via_sdk(
-                user_prompt,
-                system_prompt=system_prompt,
-                temperature=0,
-                max_tokens=10,
+        if cached is True:
+            record_cache_hit("foundation_cache", agent=TASK_CLASSIFY)
+            return True, []
+        if cached is False and concept in self.cache:
+            print(f"  -> Using in-memory cache for {concept}")
+            record_cache_hit("prerequisite_cache", agent=TASK_CLASSIFY)
+            return False, self.cache[concept]
+        if cached is False:
+            stored = self._stored_prerequisites(concept, COMBINED_PROMPT_HASH, PREREQUISITES_PROMPT_HASH)
+            if stored is not None:
+                return False, stored
+        return None
+
+    def _record_classification(self, concept: str, is_foundation: bool, prerequisites: List[str]) -> None:
+        self.foundation_cache.set(
+            concept, is_foundation, model=self._model_for(TASK_CLASSIFY), prompt_version=CLASSIFY_AND_DECOMPOSE_PROMPT_VERSION
+        )
+        if not is_foundation:
+            self.cache[concept] = prerequisites
+            self.prerequisite_store.set(
+                concept, prerequisites, model=self._model_for(TASK_CLASSIFY), prompt_hash=COMBINED_PROMPT_HASH
             )
 
-        return answer.strip().lower().startswith('yes')
+    def _stored_prerequisites(self, concept: str, *prompt_hashes: str) -> Optional[List[str]]:
+        """Check the shared store and warm the in-memory cache on a hit."""
+        for key in prompt_hashes:
+            task = TASK_CLASSIFY if key == COMBINED_PROMPT_HASH else TASK_PREREQUISITES
+            stored = self.prerequisite_store.get(concept, model=self._model_for(task), prompt_hash=key)
+            if stored is not None:
+                print(f"  -> Using prerequisite store for {concept}")
+                record_cache_hit("prerequisite_store", agent=task)
+                self.cache[concept] = stored
+                return stored
+        return None
 
     async def lookup_prerequisites_async(self, concept: str) -> List[str]:
         if concept in self.cache:
             print(f"  -> Using in-memory cache for {concept}")
+            record_cache_hit("prerequisite_cache", agent=TASK_PREREQUISITES)
             return self.cache[concept]
+        return await self.single_flight.do(
+            SingleFlight.concept_key("prerequisites", concept),
+            partial(self._fetch_prerequisites_async, concept),
+        )
+
+    async def _fetch_prerequisites_async(self, concept: str) -> List[str]:
+        stored = self._stored_prerequisites(concept, PREREQUISITES_PROMPT_HASH, COMBINED_PROMPT_HASH)
+        if stored is not None:
+            return stored
 
         if self.atlas_client is not None:
             loop = asyncio.get_running_loop()
@@ -195,6 +724,9 @@ Examples of non-foundational concepts:
 
         prerequisites = await self.discover_prerequisites_async(concept)
         self.cache[concept] = prerequisites
+        self.prerequisite_store.set(
+            concept, prerequisites, model=self._model_for(TASK_PREREQUISITES), prompt_hash=PREREQUISITES_PROMPT_HASH
+        )
 
         if self.atlas_client is not None and AtlasConcept is not None:
             loop = asyncio.get_running_loop()
@@ -205,41 +737,12 @@ Examples of non-foundational concepts:
         return prerequisites
 
     async def discover_prerequisites_async(self, concept: str) -> List[str]:
-        system_prompt = """You are an expert educator and curriculum designer.
-
-Your task is to identify the ESSENTIAL prerequisite concepts someone must
-understand BEFORE they can grasp a given concept.
-
-Rules:
-1. Only list concepts that are NECESSARY for understanding (not just helpful)
-2. Order from most to least important
-3. Assume high school education as baseline (don't list truly basic things)
-4. Focus on concepts that enable understanding, not just historical context
-5. Be specific - prefer "special relativity" over "relativity"
-6. Limit to 3-5 prerequisites maximum
-
-Return ONLY a JSON array of concept names, nothing else."""
-
-        user_prompt = f'''To understand "{concept}", what are the 3-5 ESSENTIAL prerequisite concepts?
-
-Return format: ["concept1", "concept2", "concept3"]'''
-
-        try:
-            response = _ensure_client().messages.create(
-                model=self.model,
-                max_tokens=500,
-                temperature=0.3,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            content = response.content[0].text
-        except NotFoundError:
-            content = run_query_via_sdk(
-                user_prompt,
-                system_prompt=system_prompt,
-                temperature=0.3,
-                max_tokens=500,
-            )
+        content = await self._complete_async(
+            PREREQUISITES_SYSTEM_PROMPT,
+            PREREQUISITES_USER_PROMPT.format(concept=concept),
+            max_tokens=500,
+            temperature=0.3,
+        )
 
         try:
             prerequisites = json.loads(content)
@@ -272,6 +775,15 @@ Return format: ["concept1", "concept2", "concept3"]'''
     def lookup_prerequisites(self, concept: str) -> List[str]:
         return asyncio.run(self.lookup_prerequisites_async(concept))
 
+    def classify_and_decompose(self, concept: str) -> Tuple[bool, List[str]]:
+        return asyncio.run(self.classify_and_decompose_async(concept))
+
+    def explore_batch(self, concept: str, runner: BatchRunner, depth: int = 0) -> KnowledgeNode:
+        return asyncio.run(self.explore_batch_async(concept, runner, depth))
+
+    def explore_graph(self, concept: str, depth: int = 0) -> KnowledgeGraph:
+        return asyncio.run(self.explore_graph_async(concept, depth))
+
     def discover_prerequisites(self, concept: str) -> List[str]:
         return asyncio.run(self.discover_prerequisites_async(concept))
 
@@ -324,10 +836,17 @@ class ConceptAnalyzer:
     Uses Claude Sonnet 4.5 for superior intent understanding.
     """
 
-    def __init__(self, model: str = CLAUDE_MODEL):
+    def __init__(self, model: str = CLAUDE_MODEL, router: Optional[ModelRouter] = None):
         self.model = model
+        if router is None:
+            router = get_model_router()
+        self.router = router  # Analysis is a cheap extraction; routed to the fast model
 
     def analyze(self, user_input: str) -> Dict:
+        """Synchronous wrapper around analyze_async."""
+        return asyncio.run(self.analyze_async(user_input))
+
+    async def analyze_async(self, user_input: str) -> Dict:
         """
         Parse user input to identify:
         - Core concept(s)
@@ -361,38 +880,15 @@ Example:
   "goal": "Understand how entangled particles maintain correlation across distances"
 }}'''
 
-        client = _ensure_client()
-        response = client.messages.create(
+        return await self.router.complete_json(
+            TASK_CONCEPT_ANALYSIS,
             model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
             max_tokens=500,
             temperature=0.3,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
         )
 
-        content = response.content[0].text.strip()
-
-        # Parse JSON
-        try:
-            analysis = json.loads(content)
-        except json.JSONDecodeError:
-            # Try to extract from code blocks
-            if "```" in content:
-                content = content.split("```")[1]
-                if content.startswith("json"):
-                    content = content[4:]
-                analysis = json.loads(content.strip())
-            else:
-                # Fallback: extract JSON object
-                import re
-                match = re.search(r'\{.*?\}', content, re.DOTALL)
-                if match:
-                    analysis = json.loads(match.group(0))
-                else:
-                    raise ValueError(f"Could not parse analysis from: {content}")
-
-        return analysis
-
 
 def demo():
     """Demo the prerequisite explorer on a few examples"""
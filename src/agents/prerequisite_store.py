@@ -0,0 +1,550 @@
+"""Pluggable, process-shared store for discovered prerequisites.
+
+Explorer ``cache`` dicts only live as long as the explorer instance. The
+Gradio apps build new agents on every click, and every worker in a
+multi-worker deployment has its own copy. A ``PrerequisiteStore`` keeps
+decompositions around so nobody pays twice for the same concept.
+
+Entries are keyed by the canonical concept (see :mod:`concept_canonicalizer`),
+the model that answered and a hash of the prompt that asked. Changing an
+explorer's prompt therefore starts a fresh set of entries automatically.
+Every backend supports an optional TTL and an LRU bound on the entry count.
+
+Backends:
+
+- ``InMemoryPrerequisiteStore``: per-process dict, mainly for tests.
+- ``SQLitePrerequisiteStore``: WAL-mode SQLite file, safe for concurrent
+  writers in several processes.
+- ``JSONLPrerequisiteStore``: append-only JSON-lines log that is easy to
+  inspect, ship and merge. Other processes' appends are picked up on a miss.
+
+``get_prerequisite_store()`` returns the process-wide default, configured by
+``MATH_TO_MANIM_PREREQUISITE_STORE`` (``memory``, ``sqlite:<path>`` or
+``jsonl:<path>``), ``MATH_TO_MANIM_PREREQUISITE_TTL`` (seconds) and
+``MATH_TO_MANIM_PREREQUISITE_MAX_ENTRIES``.
+
+>>> store = InMemoryPrerequisiteStore()
+>>> key = prompt_hash("system prompt", "user template")
+>>> store.set("Special Relativity", ["Lorentz transformations"], model="m", prompt_hash=key)
+>>> store.get("special relativity", model="m", prompt_hash=key)
+['Lorentz transformations']
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    from src.agents.concept_canonicalizer import get_canonicalizer
+    from src.agents.foundation_cache import DEFAULT_CACHE_DIR
+except ImportError:
+    from concept_canonicalizer import get_canonicalizer
+    from foundation_cache import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+DEFAULT_PREREQUISITE_STORE_PATH = DEFAULT_CACHE_DIR / "prerequisites.sqlite3"
+
+StoreKey = Tuple[str, str, str]
+
+
+def prompt_hash(*parts: str) -> str:
+    """Short stable hash of the prompt text used to ask for prerequisites."""
+
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+class PrerequisiteStore(ABC):
+    """Base class: canonical keys, TTL expiry, LRU bound and hit counters.
+
+    Subclasses implement the ``_load``/``_save``/``_touch``/``_remove``/
+    ``_evict``/``_count``/``_clear`` primitives; all public methods are
+    thread-safe.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, concept: str, *, model: str, prompt_hash: str) -> Optional[List[str]]:
+        """Return stored prerequisites, or ``None`` if missing or expired."""
+
+        key = (get_canonicalizer().resolve(concept), model, prompt_hash)
+        now = time.time()
+        with self._lock:
+            entry = self._load(key)
+            if entry is not None and self._expired(entry["created_at"], now):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key, now)
+            return list(entry["prerequisites"])
+
+    def set(self, concept: str, prerequisites: List[str], *, model: str, prompt_hash: str) -> None:
+        """Store (or overwrite) the prerequisites for a concept."""
+
+        key = (get_canonicalizer().register(concept), model, prompt_hash)
+        now = time.time()
+        with self._lock:
+            self._save(key, concept, list(prerequisites), now)
+            if self.max_entries is not None:
+                self.evictions += self._evict(self.max_entries)
+
+    def delete(self, concept: str, *, model: str, prompt_hash: str) -> None:
+        key = (get_canonicalizer().resolve(concept), model, prompt_hash)
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Delete every entry and reset the counters."""
+
+        with self._lock:
+            self._clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def close(self) -> None:
+        """Release any open resources (no-op for most backends)."""
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    # ------------------------------------------------------------------
+    # Backend primitives
+    # ------------------------------------------------------------------
+    @abstractmethod
+    def _load(self, key: StoreKey) -> Optional[Dict[str, Any]]:
+        """Return ``{"concept", "prerequisites", "created_at"}`` or ``None``."""
+
+    @abstractmethod
+    def _save(self, key: StoreKey, concept: str, prerequisites: List[str], now: float) -> None:
+        ...
+
+    @abstractmethod
+    def _touch(self, key: StoreKey, now: float) -> None:
+        """Mark an entry as recently used."""
+
+    @abstractmethod
+    def _remove(self, key: StoreKey) -> None:
+        ...
+
+    @abstractmethod
+    def _evict(self, max_entries: int) -> int:
+        """Drop least-recently-used entries beyond ``max_entries``; return count."""
+
+    @abstractmethod
+    def _count(self) -> int:
+        ...
+
+    @abstractmethod
+    def _clear(self) -> None:
+        ...
+
+
+class InMemoryPrerequisiteStore(PrerequisiteStore):
+    """Per-process store backed by an ``OrderedDict`` in LRU order."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        super().__init__(ttl_seconds, max_entries)
+        self._entries: "OrderedDict[StoreKey, Dict[str, Any]]" = OrderedDict()
+
+    def _load(self, key):
+        return self._entries.get(key)
+
+    def _save(self, key, concept, prerequisites, now):
+        self._entries[key] = {"concept": concept, "prerequisites": prerequisites, "created_at": now}
+        self._entries.move_to_end(key)
+
+    def _touch(self, key, now):
+        self._entries.move_to_end(key)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+
+    def _evict(self, max_entries):
+        evicted = 0
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def _count(self):
+        return len(self._entries)
+
+    def _clear(self):
+        self._entries.clear()
+
+
+class SQLitePrerequisiteStore(PrerequisiteStore):
+    """SQLite store in WAL mode; several processes may read and write at once.
+
+    Writes run in ``BEGIN IMMEDIATE`` transactions with a generous busy
+    timeout, so concurrent writers queue up instead of failing.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        super().__init__(ttl_seconds, max_entries)
+        self.path = str(path) if path is not None else str(DEFAULT_PREREQUISITE_STORE_PATH)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS prerequisites (
+                    concept TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    display_name TEXT NOT NULL,
+                    prerequisites TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (concept, model, prompt_hash)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS prerequisites_last_used ON prerequisites (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _load(self, key):
+        row = self._connection().execute(
+            "SELECT display_name, prerequisites, created_at FROM prerequisites "
+            "WHERE concept = ? AND model = ? AND prompt_hash = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        return {"concept": row[0], "prerequisites": json.loads(row[1]), "created_at": row[2]}
+
+    def _save(self, key, concept, prerequisites, now):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO prerequisites "
+                "(concept, model, prompt_hash, display_name, prerequisites, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, concept, json.dumps(prerequisites), now, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _touch(self, key, now):
+        self._connection().execute(
+            "UPDATE prerequisites SET last_used = ? WHERE concept = ? AND model = ? AND prompt_hash = ?",
+            (now, *key),
+        )
+
+    def _remove(self, key):
+        self._connection().execute(
+            "DELETE FROM prerequisites WHERE concept = ? AND model = ? AND prompt_hash = ?", key
+        )
+
+    def _evict(self, max_entries):
+        cursor = self._connection().execute(
+            "DELETE FROM prerequisites WHERE rowid IN ("
+            " SELECT rowid FROM prerequisites ORDER BY last_used DESC LIMIT -1 OFFSET ?"
+            ")",
+            (max_entries,),
+        )
+        return max(cursor.rowcount, 0)
+
+    def _count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM prerequisites").fetchone()[0]
+
+    def _clear(self):
+        self._connection().execute("DELETE FROM prerequisites")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+class JSONLPrerequisiteStore(PrerequisiteStore):
+    """Append-only JSON-lines log with an in-memory index.
+
+    Every ``set`` and ``delete`` appends one record (under an exclusive file
+    lock where ``fcntl`` is available). The index is rebuilt by replaying the
+    log; on a miss, records appended by other processes since the last read
+    are replayed first. ``compact()`` rewrites the log with live entries only.
+
+    ``compact()`` and ``clear()`` hold the same lock while they replace or
+    remove the file, and lock holders check they still have the file at
+    ``path``, so no append lands in a discarded log. A replay that finds a
+    different file (or one shorter than its offset) rebuilds the index from
+    the start.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        super().__init__(ttl_seconds, max_entries)
+        self.path = str(path)
+        self._entries: "OrderedDict[StoreKey, Dict[str, Any]]" = OrderedDict()
+        self._offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None  # (device, inode) of the replayed log
+        self._replay()
+
+    def _reset_index(self, file_id: Optional[Tuple[int, int]]) -> None:
+        self._entries.clear()
+        self._offset = 0
+        self._file_id = file_id
+
+    def _replay(self) -> None:
+        try:
+            handle = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._reset_index(None)  # Cleared by another store
+            return
+        with handle:
+            status = os.fstat(handle.fileno())
+            file_id = (status.st_dev, status.st_ino)
+            if file_id != self._file_id or status.st_size < self._offset:
+                # Compacted or cleared (and rewritten) elsewhere: our offset means nothing here
+                self._reset_index(file_id)
+            handle.seek(self._offset)
+            while True:
+                line = handle.readline()
+                if not line or not line.endswith("\n"):
+                    break  # EOF, or a record still being written
+                self._offset = handle.tell()
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = (record["concept"], record["model"], record["prompt_hash"])
+                if record.get("op") == "delete":
+                    self._entries.pop(key, None)
+                else:
+                    self._entries[key] = {
+                        "concept": record["display_name"],
+                        "prerequisites": record["prerequisites"],
+                        "created_at": record["created_at"],
+                    }
+                    self._entries.move_to_end(key)
+
+    @contextlib.contextmanager
+    def _locked_log(self) -> Iterator[Any]:
+        """Open the log for appending under an exclusive lock.
+
+        The file may be replaced or removed while we wait for the lock, so
+        once it is held we check the handle is still the file at ``path`` and
+        start over on the new one if not.
+        """
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            with open(self.path, "a", encoding="utf-8") as handle:
+                if fcntl is None:
+                    yield handle
+                    return
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    current = os.stat(self.path)
+                except FileNotFoundError:
+                    continue
+                status = os.fstat(handle.fileno())
+                if (status.st_dev, status.st_ino) == (current.st_dev, current.st_ino):
+                    yield handle
+                    return
+                # Closing the handle releases the lock on the discarded file
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self._locked_log() as handle:
+            handle.write(json.dumps(record) + "\n")
+            handle.flush()
+
+    def _load(self, key):
+        if key not in self._entries:
+            self._replay()
+        return self._entries.get(key)
+
+    def _save(self, key, concept, prerequisites, now):
+        self._append({
+            "op": "set",
+            "concept": key[0],
+            "model": key[1],
+            "prompt_hash": key[2],
+            "display_name": concept,
+            "prerequisites": prerequisites,
+            "created_at": now,
+        })
+        self._replay()
+
+    def _touch(self, key, now):
+        self._entries.move_to_end(key)
+
+    def _remove(self, key):
+        if key in self._entries:
+            self._append({"op": "delete", "concept": key[0], "model": key[1], "prompt_hash": key[2]})
+            self._replay()
+
+    def _evict(self, max_entries):
+        evicted = 0
+        while len(self._entries) > max_entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self._entries.pop(key, None)
+            evicted += 1
+        return evicted
+
+    def _count(self):
+        return len(self._entries)
+
+    def _clear(self):
+        if fcntl is None:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        else:
+            with self._locked_log():
+                os.remove(self.path)
+        self._reset_index(None)
+
+    def compact(self) -> None:
+        """Rewrite the log so it only holds live entries.
+
+        Holds the log lock throughout, so records other processes append
+        wait for the new file instead of going to the old one.
+        """
+
+        with self._lock, contextlib.ExitStack() as stack:
+            if fcntl is not None:
+                stack.enter_context(self._locked_log())
+            self._replay()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                for (concept, model, hash_), entry in self._entries.items():
+                    handle.write(json.dumps({
+                        "op": "set",
+                        "concept": concept,
+                        "model": model,
+                        "prompt_hash": hash_,
+                        "display_name": entry["concept"],
+                        "prerequisites": entry["prerequisites"],
+                        "created_at": entry["created_at"],
+                    }) + "\n")
+                handle.flush()
+                offset = handle.tell()
+                status = os.fstat(handle.fileno())
+            os.replace(tmp_path, self.path)
+            self._offset = offset
+            self._file_id = (status.st_dev, status.st_ino)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["path"] = self.path
+        return stats
+
+
+def create_prerequisite_store(
+    spec: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+    max_entries: Optional[int] = None,
+) -> PrerequisiteStore:
+    """Build a store from a spec such as ``memory``, ``sqlite:/path`` or ``jsonl:/path``."""
+
+    if not spec:
+        return SQLitePrerequisiteStore(DEFAULT_PREREQUISITE_STORE_PATH, ttl_seconds, max_entries)
+    backend, _, location = spec.partition(":")
+    backend = backend.lower()
+    if backend in ("memory", "inmemory") or spec == ":memory:":
+        return InMemoryPrerequisiteStore(ttl_seconds, max_entries)
+    if backend == "sqlite":
+        return SQLitePrerequisiteStore(location or DEFAULT_PREREQUISITE_STORE_PATH, ttl_seconds, max_entries)
+    if backend == "jsonl":
+        return JSONLPrerequisiteStore(location or DEFAULT_CACHE_DIR / "prerequisites.jsonl", ttl_seconds, max_entries)
+    raise ValueError(f"Unknown prerequisite store backend: {spec!r}")
+
+
+_default_store: Optional[PrerequisiteStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_prerequisite_store() -> PrerequisiteStore:
+    """Return the process-wide store shared by every explorer."""
+
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            ttl = os.getenv("MATH_TO_MANIM_PREREQUISITE_TTL")
+            max_entries = os.getenv("MATH_TO_MANIM_PREREQUISITE_MAX_ENTRIES")
+            _default_store = create_prerequisite_store(
+                os.getenv("MATH_TO_MANIM_PREREQUISITE_STORE"),
+                ttl_seconds=float(ttl) if ttl else None,
+                max_entries=int(max_entries) if max_entries else None,
+            )
+        return _default_store
+
+
+__all__ = [
+    "DEFAULT_PREREQUISITE_STORE_PATH",
+    "InMemoryPrerequisiteStore",
+    "JSONLPrerequisiteStore",
+    "PrerequisiteStore",
+    "SQLitePrerequisiteStore",
+    "create_prerequisite_store",
+    "get_prerequisite_store",
+    "prompt_hash",
+]
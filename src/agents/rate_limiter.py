@@ -0,0 +1,503 @@
+"""Process-wide rate limiting and adaptive concurrency for LLM calls.
+
+Raising parallelism eventually runs into the provider's limits, and a 429
+used to fail the request (and with it the whole tree). Every LLM call now goes
+through the ``RateLimiter`` for its provider and model, which combines:
+
+- token buckets for requests per minute (RPM) and tokens per minute (TPM);
+  requests wait for budget instead of being sent and rejected;
+- an AIMD concurrency limit: each success raises the limit by ``1/limit``
+  (about one slot per round of requests), each 429/529 halves it, at most
+  once per ``decrease_cooldown`` seconds so one burst of rejections counts
+  as one signal;
+- ``Retry-After`` / ``retry-after-ms`` headers pause the whole limiter until
+  the provider says it is ready again, and the request is retried;
+- retries use jittered backoff bounded by a per-request deadline
+  (``deadline_seconds`` or an enclosing ``request_deadline(...)`` block):
+  an attempt is cut off when the deadline passes and no retry is scheduled
+  past it, so one request can never hold up a pipeline indefinitely.
+
+The result is that throughput converges on the provider's real limit.
+Limiters are shared across agents, threads and event loops, keyed by
+``(provider, model)``. Limits come from ``MATH_TO_MANIM_RATE_LIMITS``, which
+holds JSON (inline or the path of a file) keyed by ``provider:model`` or
+``provider``::
+
+    {"anthropic": {"rpm": 50, "tpm": 40000, "max_concurrency": 16},
+     "moonshot": {"rpm": 20, "initial_concurrency": 4}}
+
+``rate_limiter_stats()`` reports each limiter's current limit, in-flight
+requests, queue depth and counters.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple, TypeVar
+
+try:
+    from src.agents.run_metrics import record_retry
+except ImportError:
+    from run_metrics import record_retry
+
+T = TypeVar("T")
+
+THROTTLE_STATUS_CODES = frozenset({429, 529})  # 529: Anthropic "overloaded"
+
+# Absolute ``time.monotonic()`` deadline for requests issued in this context
+_request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A request could not finish (or be retried) before its deadline."""
+
+
+@contextlib.contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """Bound every limited request made inside the block to ``seconds`` from now.
+
+    Nested blocks can only tighten the deadline. Tasks created inside the
+    block inherit it.
+    """
+    deadline = time.monotonic() + seconds
+    current = _request_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+@dataclass
+class RateLimitConfig:
+    """Limits for one provider/model. ``None`` means unlimited."""
+
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 64
+    max_retries: int = 4
+    deadline_seconds: Optional[float] = None  # Per request, including retries
+    decrease_cooldown: float = 1.0
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RateLimitConfig":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown rate limit settings: {sorted(unknown)}")
+        return cls(**data)
+
+
+def estimate_tokens(*texts: Optional[str]) -> int:
+    """Rough token count (~4 characters per token) for TPM budgeting."""
+    return sum(len(text) for text in texts if text) // 4 + 1
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read ``retry-after-ms`` / ``Retry-After`` from an API error's response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_throttled(error: BaseException) -> bool:
+    """True for rate-limit and overload responses."""
+    return _status_code(error) in THROTTLE_STATUS_CODES
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for server errors and dropped connections worth retrying."""
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500
+    return type(error).__name__ in {"APIConnectionError", "APITimeoutError"}
+
+
+class TokenBucket:
+    """Reservation-based token bucket refilled at ``per_minute`` per minute."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take ``amount`` tokens and return how long to wait before using them."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= amount
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class RateLimiter:
+    """RPM/TPM buckets plus an AIMD concurrency gate for one provider/model."""
+
+    def __init__(self, provider: str, model: str, config: Optional[RateLimitConfig] = None):
+        self.provider = provider
+        self.model = model
+        self.config = config or RateLimitConfig()
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(self.config.rpm) if self.config.rpm else None
+        self._tokens = TokenBucket(self.config.tpm) if self.config.tpm else None
+        self._limit = float(
+            min(max(self.config.initial_concurrency, self.config.min_concurrency), self.config.max_concurrency)
+        )
+        self._in_flight = 0
+        self._waiters: Deque[Callable[[], None]] = collections.deque()
+        self._resume_at = 0.0
+        self._last_decrease = float("-inf")
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "succeeded": 0,
+            "throttled": 0,
+            "retries": 0,
+            "failed": 0,
+            "tokens_reserved": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Concurrency gate
+    # ------------------------------------------------------------------
+    @property
+    def limit(self) -> int:
+        return max(1, int(self._limit))
+
+    def _try_enter(self) -> bool:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return True
+        return False
+
+    def _wake_waiters(self) -> None:
+        """Hand free slots to queued callers (caller holds the lock)."""
+        while self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._waiters.popleft()()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    async def _enter_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[None]" = loop.create_future()
+
+        def deliver() -> None:
+            if future.cancelled():
+                self._release()  # The waiter gave up; pass its slot on
+            else:
+                future.set_result(None)
+
+        def wake() -> None:
+            try:
+                loop.call_soon_threadsafe(deliver)
+            except RuntimeError:
+                self._in_flight -= 1  # The waiter's loop is gone; the slot stays free
+
+        with self._lock:
+            if self._try_enter():
+                return
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if wake in self._waiters:
+                    self._waiters.remove(wake)
+                    raise
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _enter_sync(self) -> None:
+        event = threading.Event()
+        with self._lock:
+            if self._try_enter():
+                return
+            self._waiters.append(event.set)
+        event.wait()
+
+    # ------------------------------------------------------------------
+    # Budgets and feedback
+    # ------------------------------------------------------------------
+    def _reserve(self, tokens: int) -> float:
+        """Take one request and ``tokens`` from the buckets; return the wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.counters["requests"] += 1
+            self.counters["tokens_reserved"] += tokens
+            wait = max(0.0, self._resume_at - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return wait
+
+    def _settle(self, reserved: int, used: Optional[int]) -> None:
+        """Return over-estimated TPM budget once the real usage is known."""
+        if used is None or self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.refund(reserved - used)
+
+    def _on_success(self) -> None:
+        with self._lock:
+            self.counters["succeeded"] += 1
+            self._limit = min(float(self.config.max_concurrency), self._limit + 1.0 / self._limit)
+            self._wake_waiters()
+
+    def _on_throttled(self, retry_after: Optional[float], attempt: int) -> float:
+        """Shrink the limit, pause the limiter and return the delay to retry after."""
+        with self._lock:
+            now = time.monotonic()
+            self.counters["throttled"] += 1
+            if now - self._last_decrease >= self.config.decrease_cooldown:
+                self._limit = max(float(self.config.min_concurrency), self._limit / 2)
+                self._last_decrease = now
+            if retry_after is not None:
+                self._resume_at = max(self._resume_at, now + retry_after)
+                # Spread the retries a little so they do not all land at once
+                return retry_after * random.uniform(1.0, 1.2)
+        return self._backoff(attempt + 1)
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.config.backoff_max, self.config.backoff_base * 2 ** min(attempt, 16))
+        return random.uniform(0, cap)
+
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Delay before retrying ``error``, or ``None`` if it should propagate."""
+        if attempt >= self.config.max_retries:
+            return None
+        if is_throttled(error):
+            return self._on_throttled(retry_after_seconds(error), attempt)
+        if is_transient(error):
+            return self._backoff(attempt + 1)
+        return None
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+    def _deadline(self) -> Optional[float]:
+        deadline = _request_deadline.get()
+        if self.config.deadline_seconds is not None:
+            own = time.monotonic() + self.config.deadline_seconds
+            deadline = own if deadline is None else min(deadline, own)
+        return deadline
+
+    def _failed(self) -> None:
+        with self._lock:
+            self.counters["failed"] += 1
+
+    def _check_retry(self, error: Exception, attempt: int, deadline: Optional[float]) -> float:
+        """Return the delay before the next attempt, or re-raise ``error``."""
+        delay = self._retry_delay(error, attempt)
+        if delay is None or (deadline is not None and time.monotonic() + delay >= deadline):
+            self._failed()
+            raise error
+        with self._lock:
+            self.counters["retries"] += 1
+        record_retry(self.model)
+        return delay
+
+    def _check_wait(self, wait: float, deadline: Optional[float]) -> None:
+        if deadline is not None and time.monotonic() + wait >= deadline:
+            self._failed()
+            raise DeadlineExceeded(f"{self.provider}:{self.model} budget not available before deadline")
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        *,
+        estimated_tokens: int = 1,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """Run ``request()`` within the limits, retrying throttled attempts."""
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            await self._enter_async()
+            try:
+                wait = self._reserve(estimated_tokens)
+                self._check_wait(wait, deadline)
+                if wait:
+                    await asyncio.sleep(wait)
+                if deadline is None:
+                    result = await request()
+                else:
+                    try:
+                        result = await asyncio.wait_for(request(), deadline - time.monotonic())
+                    except asyncio.TimeoutError as error:
+                        self._failed()
+                        raise DeadlineExceeded(f"{self.provider}:{self.model} request passed its deadline") from error
+            except DeadlineExceeded:
+                raise
+            except Exception as error:
+                delay = self._check_retry(error, attempt, deadline)
+            else:
+                self._on_success()
+                self._settle(estimated_tokens, usage(result) if usage else None)
+                return result
+            finally:
+                self._release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def call_sync(
+        self,
+        request: Callable[[], T],
+        *,
+        estimated_tokens: int = 1,
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """Blocking counterpart of ``call`` for synchronous clients.
+
+        A blocking request cannot be interrupted, so the deadline only bounds
+        waiting for budget and scheduling retries.
+        """
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            self._enter_sync()
+            try:
+                wait = self._reserve(estimated_tokens)
+                self._check_wait(wait, deadline)
+                if wait:
+                    time.sleep(wait)
+                result = request()
+            except DeadlineExceeded:
+                raise
+            except Exception as error:
+                delay = self._check_retry(error, attempt, deadline)
+            else:
+                self._on_success()
+                self._settle(estimated_tokens, usage(result) if usage else None)
+                return result
+            finally:
+                self._release()
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "provider": self.provider,
+                "model": self.model,
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "paused_for": max(0.0, self._resume_at - time.monotonic()),
+                **self.counters,
+            }
+
+
+# ----------------------------------------------------------------------
+# Process-wide registry
+# ----------------------------------------------------------------------
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+_configs: Optional[Dict[str, RateLimitConfig]] = None
+
+
+def load_rate_limits(spec: Optional[str]) -> Dict[str, RateLimitConfig]:
+    """Parse ``MATH_TO_MANIM_RATE_LIMITS`` (inline JSON or a JSON file path)."""
+    if not spec:
+        return {}
+    text = spec.strip()
+    if not text.startswith("{"):
+        text = Path(text).expanduser().read_text(encoding="utf-8")
+    return {key: RateLimitConfig.from_dict(value) for key, value in json.loads(text).items()}
+
+
+def rate_limit_config(provider: str, model: str) -> RateLimitConfig:
+    global _configs
+    if _configs is None:
+        _configs = load_rate_limits(os.getenv("MATH_TO_MANIM_RATE_LIMITS"))
+    return _configs.get(f"{provider}:{model}") or _configs.get(provider) or RateLimitConfig()
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Return the shared limiter for ``provider``/``model``."""
+    key = (provider, model)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(provider, model, rate_limit_config(provider, model))
+            _limiters[key] = limiter
+        return limiter
+
+
+def configure_rate_limits(configs: Dict[str, RateLimitConfig]) -> None:
+    """Replace the configured limits; existing limiters are rebuilt on next use."""
+    global _configs
+    with _limiters_lock:
+        _configs = dict(configs)
+        _limiters.clear()
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {f"{l.provider}:{l.model}": l.stats() for l in limiters}
+
+
+__all__ = [
+    "DeadlineExceeded",
+    "RateLimitConfig",
+    "RateLimiter",
+    "configure_rate_limits",
+    "estimate_tokens",
+    "get_rate_limiter",
+    "rate_limiter_stats",
+    "request_deadline",
+    "retry_after_seconds",
+]
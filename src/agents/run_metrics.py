@@ -0,0 +1,352 @@
+"""Per-run token, cost and latency accounting for every LLM call.
+
+A pipeline run opens a collector with ``collect_metrics()`` and marks its
+stages with ``metrics_stage(...)``. The shared call paths record into the
+collector active in the current context: ``llm_transport.complete_text``,
+``OpenAICompatibleProvider``, ``KimiClient``, the Agent SDK session pool and
+the batch backend. The rate limiter adds retries, and the explorers add cache
+hits. Nothing is recorded when no collector is active.
+
+Each call is attributed to the active stage, to the agent (the
+``metrics_stage`` agent name, falling back to the router task or the
+client) and to its model. ``RunMetrics.to_dict()`` gives totals and per-stage, per-agent and
+per-model breakdowns, which the orchestrators attach to their results.
+
+Costs use ``MODEL_PRICES``, list prices in USD per million input and output
+tokens, matched by model-name prefix. Override or extend it with
+``MATH_TO_MANIM_MODEL_PRICES``, a JSON object such as
+``{"my-model": [0.5, 1.5]}``. Calls on unpriced models count tokens but no
+cost. Anthropic cache reads are billed at 0.1x the input price and cache
+writes at 1.25x.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "claude-opus-4": (15.0, 75.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-haiku-4": (1.0, 5.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "kimi-k2": (0.6, 2.5),
+    "deepseek-chat": (0.27, 1.1),
+}
+
+CACHE_READ_PRICE_FACTOR = 0.1
+CACHE_WRITE_PRICE_FACTOR = 1.25
+
+_collector: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar(
+    "math_to_manim_run_metrics", default=None
+)
+_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("math_to_manim_stage", default=None)
+_agent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("math_to_manim_agent", default=None)
+
+UNSCOPED = "unscoped"
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(MODEL_PRICES)
+    spec = os.getenv("MATH_TO_MANIM_MODEL_PRICES", "").strip()
+    if spec:
+        prices.update({model: (float(pair[0]), float(pair[1])) for model, pair in json.loads(spec).items()})
+    return prices
+
+
+def model_price(model: str, prices: Optional[Dict[str, Tuple[float, float]]] = None) -> Optional[Tuple[float, float]]:
+    """Input and output price per million tokens for ``model`` (longest prefix wins)."""
+    prices = prices if prices is not None else _load_prices()
+    matches = [prefix for prefix in prices if model.startswith(prefix)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def _bucket() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "retries": 0,
+        "cache_hits": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+        "cost_usd": 0.0,
+        "unpriced_calls": 0,
+        "latencies": [],
+    }
+
+
+def _quantile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+def _summary(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    summary = {key: value for key, value in bucket.items() if key != "latencies"}
+    latencies = bucket["latencies"]
+    summary["cost_usd"] = round(bucket["cost_usd"], 6)
+    summary["total_tokens"] = bucket["prompt_tokens"] + bucket["completion_tokens"]
+    summary["latency_seconds"] = round(sum(latencies), 3)
+    summary["latency_p50_seconds"] = _quantile(latencies, 0.5)
+    summary["latency_p95_seconds"] = _quantile(latencies, 0.95)
+    return summary
+
+
+class RunMetrics:
+    """Collector for one pipeline run; records propagate to ``parent``."""
+
+    def __init__(self, parent: Optional["RunMetrics"] = None):
+        self.parent = parent
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.prices = _load_prices()
+        self._lock = threading.Lock()
+        self._totals = _bucket()
+        self._by_stage: Dict[str, Dict[str, Any]] = {}
+        self._by_agent: Dict[str, Dict[str, Any]] = {}
+        self._by_model: Dict[str, Dict[str, Any]] = {}
+        self.cache_hits: Dict[str, int] = {}
+
+    def _buckets(self, stage: str, agent: str, model: Optional[str]) -> List[Dict[str, Any]]:
+        buckets = [
+            self._totals,
+            self._by_stage.setdefault(stage, _bucket()),
+            self._by_agent.setdefault(agent, _bucket()),
+        ]
+        if model is not None:
+            buckets.append(self._by_model.setdefault(model, _bucket()))
+        return buckets
+
+    def record_call(
+        self,
+        *,
+        model: str,
+        stage: str,
+        agent: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        latency: Optional[float] = None,
+        error: bool = False,
+        cost_usd: Optional[float] = None,
+        price_factor: float = 1.0,
+    ) -> None:
+        if cost_usd is None:
+            price = model_price(model, self.prices)
+            if price is not None:
+                uncached = max(0, prompt_tokens - cache_read_tokens - cache_write_tokens)
+                cost_usd = price_factor * (
+                    uncached * price[0]
+                    + cache_read_tokens * price[0] * CACHE_READ_PRICE_FACTOR
+                    + cache_write_tokens * price[0] * CACHE_WRITE_PRICE_FACTOR
+                    + completion_tokens * price[1]
+                ) / 1_000_000
+        with self._lock:
+            for bucket in self._buckets(stage, agent, model):
+                bucket["calls"] += 1
+                bucket["errors"] += int(error)
+                bucket["prompt_tokens"] += prompt_tokens
+                bucket["completion_tokens"] += completion_tokens
+                bucket["cache_read_tokens"] += cache_read_tokens
+                bucket["cache_write_tokens"] += cache_write_tokens
+                if cost_usd is None:
+                    bucket["unpriced_calls"] += 1
+                else:
+                    bucket["cost_usd"] += cost_usd
+                if latency is not None:
+                    bucket["latencies"].append(latency)
+        if self.parent is not None:
+            self.parent.record_call(
+                model=model, stage=stage, agent=agent, prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens, cache_read_tokens=cache_read_tokens,
+                cache_write_tokens=cache_write_tokens, latency=latency, error=error, cost_usd=cost_usd,
+            )
+
+    def record_retry(self, *, model: str, stage: str, agent: str) -> None:
+        with self._lock:
+            for bucket in self._buckets(stage, agent, model):
+                bucket["retries"] += 1
+        if self.parent is not None:
+            self.parent.record_retry(model=model, stage=stage, agent=agent)
+
+    def record_cache_hit(self, kind: str, *, stage: str, agent: str) -> None:
+        with self._lock:
+            self.cache_hits[kind] = self.cache_hits.get(kind, 0) + 1
+            for bucket in self._buckets(stage, agent, None):
+                bucket["cache_hits"] += 1
+        if self.parent is not None:
+            self.parent.record_cache_hit(kind, stage=stage, agent=agent)
+
+    def close(self) -> None:
+        if self.finished is None:
+            self.finished = time.monotonic()
+
+    @property
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            return _summary(self._totals)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Totals plus per-stage, per-agent and per-model breakdowns."""
+        end = self.finished if self.finished is not None else time.monotonic()
+        with self._lock:
+            return {
+                "wall_seconds": round(end - self.started, 3),
+                "totals": _summary(self._totals),
+                "by_stage": {name: _summary(bucket) for name, bucket in self._by_stage.items()},
+                "by_agent": {name: _summary(bucket) for name, bucket in self._by_agent.items()},
+                "by_model": {name: _summary(bucket) for name, bucket in self._by_model.items()},
+                "cache_hits": dict(self.cache_hits),
+            }
+
+
+def current_metrics() -> Optional[RunMetrics]:
+    return _collector.get()
+
+
+@contextlib.contextmanager
+def collect_metrics() -> Iterator[RunMetrics]:
+    """Record every LLM call made in this context (and tasks it starts)."""
+    metrics = RunMetrics(parent=_collector.get())
+    token = _collector.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _collector.reset(token)
+        metrics.close()
+
+
+@contextlib.contextmanager
+def metrics_stage(stage: str, agent: Optional[str] = None) -> Iterator[None]:
+    """Attribute calls made in this context to a pipeline stage and agent."""
+    stage_token = _stage.set(stage)
+    agent_token = _agent.set(agent) if agent is not None else None
+    try:
+        yield
+    finally:
+        _stage.reset(stage_token)
+        if agent_token is not None:
+            _agent.reset(agent_token)
+
+
+@contextlib.contextmanager
+def default_agent(agent: str) -> Iterator[None]:
+    """Attribute calls in this context to ``agent`` unless a stage named one."""
+    token = _agent.set(_agent.get() or agent)
+    try:
+        yield
+    finally:
+        _agent.reset(token)
+
+
+def _scope(agent: Optional[str]) -> Dict[str, str]:
+    """Stage and agent a record is attributed to; a stage's agent name wins."""
+    return {"stage": _stage.get() or UNSCOPED, "agent": _agent.get() or agent or UNSCOPED}
+
+
+class _CallRecord:
+    """Usage for one call; filled in by the caller inside ``llm_call``.
+
+    ``model`` may be replaced once the response names the model that ran,
+    ``cost_usd`` set when the API reports a cost, and ``price_factor`` lowered
+    for discounted calls (0.5 for message batches).
+    """
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.cost_usd: Optional[float] = None
+        self.price_factor = 1.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+
+    def anthropic_usage(self, usage: Any) -> None:
+        """Anthropic ``usage``: input tokens exclude cache reads and writes."""
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            usage = SimpleNamespace(**usage)
+        self.cache_read_tokens = getattr(usage, "cache_read_input_tokens", 0) or 0
+        self.cache_write_tokens = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self.prompt_tokens = (getattr(usage, "input_tokens", 0) or 0) + self.cache_read_tokens + self.cache_write_tokens
+        self.completion_tokens = getattr(usage, "output_tokens", 0) or 0
+
+    def openai_usage(self, usage: Any) -> None:
+        """OpenAI-style ``usage`` (object or dict) with prompt/completion tokens."""
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            usage = SimpleNamespace(**usage)
+        self.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+
+@contextlib.contextmanager
+def llm_call(model: str, *, agent: Optional[str] = None, timed: bool = True) -> Iterator[_CallRecord]:
+    """Time one LLM call and record its usage with the active collector.
+
+    ``agent`` is used when the active stage names none. Calls
+    that raise are recorded as errors. ``timed=False`` skips latency, for
+    calls whose wall time says nothing about the model (batch results).
+    """
+    record = _CallRecord(model)
+    metrics = _collector.get()
+    started = time.monotonic()
+    error = False
+    try:
+        yield record
+    except BaseException:
+        error = True
+        raise
+    finally:
+        if metrics is not None:
+            metrics.record_call(
+                model=record.model,
+                **_scope(agent),
+                prompt_tokens=record.prompt_tokens,
+                completion_tokens=record.completion_tokens,
+                cache_read_tokens=record.cache_read_tokens,
+                cache_write_tokens=record.cache_write_tokens,
+                latency=time.monotonic() - started if timed else None,
+                error=error,
+                cost_usd=record.cost_usd,
+                price_factor=record.price_factor,
+            )
+
+
+def record_retry(model: str, *, agent: Optional[str] = None) -> None:
+    metrics = _collector.get()
+    if metrics is not None:
+        metrics.record_retry(model=model, **_scope(agent))
+
+
+def record_cache_hit(kind: str, *, agent: Optional[str] = None) -> None:
+    metrics = _collector.get()
+    if metrics is not None:
+        metrics.record_cache_hit(kind, **_scope(agent))
+
+
+__all__ = [
+    "MODEL_PRICES",
+    "RunMetrics",
+    "collect_metrics",
+    "current_metrics",
+    "default_agent",
+    "llm_call",
+    "metrics_stage",
+    "model_price",
+    "record_cache_hit",
+    "record_retry",
+]
@@ -0,0 +1,104 @@
+"""In-flight request coalescing ("single-flight") for concurrent lookups.
+
+Caches only help once an answer has arrived. While exploration runs
+concurrently, two branches can ask for the same concept at the same moment,
+both miss the cache and both pay for an LLM call. ``SingleFlight`` makes the
+second caller await the first caller's task instead:
+
+>>> async def demo():
+...     flight = SingleFlight()
+...     calls = []
+...     async def fetch():
+...         calls.append(1)
+...         await asyncio.sleep(0)
+...         return ["limits"]
+...     key = SingleFlight.concept_key("prerequisites", "Calculus")
+...     results = await asyncio.gather(flight.do(key, fetch), flight.do(key, fetch))
+...     return results, len(calls), flight.stats()["collapsed"]
+>>> asyncio.run(demo())
+([['limits'], ['limits']], 1, 1)
+
+Keys are tuples whose first element names the kind of call ("prerequisites",
+"foundation", "math_content", ...) so the counters can be broken down by
+kind. ``concept_key`` canonicalizes the concept so spelling variants share a
+flight. Exceptions propagate to every waiter, and cancelling one waiter does
+not cancel the shared task.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+try:
+    from src.agents.concept_canonicalizer import get_canonicalizer
+except ImportError:
+    from concept_canonicalizer import get_canonicalizer
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one shared task."""
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._lock = threading.Lock()
+        self.executed: Counter = Counter()  # Calls that actually ran, by kind
+        self.collapsed: Counter = Counter()  # Duplicate calls that awaited another, by kind
+
+    @staticmethod
+    def concept_key(kind: str, concept: str, *extra: Hashable) -> Tuple[Hashable, ...]:
+        """Build a key for ``kind`` of call on ``concept`` (canonicalized)."""
+        return (kind, get_canonicalizer().resolve(concept), *extra)
+
+    @staticmethod
+    def _kind(key: Hashable) -> str:
+        if isinstance(key, tuple) and key:
+            return str(key[0])
+        return "default"
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run ``factory()`` unless a call with ``key`` is already in flight.
+
+        Tasks are bound to an event loop, so a flight left over from another
+        loop (e.g. a previous ``asyncio.run``) is never joined.
+        """
+        loop = asyncio.get_running_loop()
+        kind = self._kind(key)
+        with self._lock:
+            task = self._inflight.get(key)
+            if task is not None and task.get_loop() is loop and not task.done():
+                self.collapsed[kind] += 1
+            else:
+                task = loop.create_task(factory())
+                self._inflight[key] = task
+                self.executed[kind] += 1
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = set(self.executed) | set(self.collapsed)
+            return {
+                "executed": sum(self.executed.values()),
+                "collapsed": sum(self.collapsed.values()),
+                "by_kind": {
+                    kind: {"executed": self.executed[kind], "collapsed": self.collapsed[kind]}
+                    for kind in sorted(kinds)
+                },
+            }
+
+
+__all__ = ["SingleFlight"]
@@ -14,19 +14,16 @@ import os
 import json
 import asyncio
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from anthropic import Anthropic, NotFoundError
 from dotenv import load_dotenv
 
 # Import from same package
+# Provider-agnostic completions, routed per task
 try:
-    from src.agents.claude_agent_runtime import run_query_via_sdk
+    from src.agents.llm_provider import TASK_VISUAL_DESIGN, ModelRouter, get_model_router
 except ImportError:
-    try:
-        from claude_agent_runtime import run_query_via_sdk
-    except ImportError:
-        run_query_via_sdk = None  # type: ignore[assignment]
+    from llm_provider import TASK_VISUAL_DESIGN, ModelRouter, get_model_router
 
 CLAUDE_MODEL = "claude-sonnet-4-5"
 try:
@@ -42,20 +39,142 @@ except ImportError:
             "Ensure the src package is on PYTHONPATH."
         ) from exc
 
+try:
+    from src.agents.message_batches import BatchRequest, BatchRunner, batch_model, tree_levels
+except ImportError:
+    from message_batches import BatchRequest, BatchRunner, batch_model, tree_levels
+
+try:
+    from src.agents.enrichment_cache import EnrichmentCache, get_enrichment_cache
+except ImportError:
+    from enrichment_cache import EnrichmentCache, get_enrichment_cache
+
+try:
+    from src.agents.run_metrics import record_cache_hit
+except ImportError:
+    from run_metrics import record_cache_hit
+
 load_dotenv()
 
-CLI_CLIENT: Optional[Anthropic] = None
+# Part of every enrichment cache address: bump it when the prompts below
+# change, so specs designed with the old prompts are no longer served.
+VISUAL_DESIGN_PROMPT_VERSION = "claude-visual-v2"
+
+# Output format and worked examples shared by every request. Sent as a separate
+# system block so Anthropic prompt caching can reuse it across nodes; together
+# with the system prompt it must stay above the 1024-token minimum that
+# Anthropic caches, or every node pays for it again.
+VISUAL_DESIGN_FEW_SHOT = """Return JSON format:
+{
+  "elements": ["list", "of", "manim", "objects"],
+  "colors": {"object_name": "MANIM_COLOR"},
+  "animations": ["FadeIn", "Transform", "Write"],
+  "transitions": ["description of how to transition from previous concept"],
+  "camera_movement": "camera movement description or empty string",
+  "duration": 15,
+  "layout": "description of spatial layout"
+}
+
+Example for "Special Relativity":
+{
+  "elements": [
+    "Two reference frames (train and platform)",
+    "Light beam with constant speed c",
+    "Lorentz transformation equations",
+    "Time dilation visualization",
+    "Length contraction diagram"
+  ],
+  "colors": {
+    "train_frame": "BLUE",
+    "platform_frame": "GREEN",
+    "light_beam": "YELLOW",
+    "time_labels": "WHITE",
+    "equations": "TEAL"
+  },
+  "animations": [
+    "FadeIn reference frames",
+    "Create light beam propagating",
+    "Write Lorentz equations",
+    "Transform clocks to show time dilation",
+    "Indicate length contraction with arrows"
+  ],
+  "transitions": [
+    "Build on Galilean reference frames from previous scene",
+    "Show that unlike Galilean case, light speed stays constant",
+    "Fade in new equations while keeping frame visualization"
+  ],
+  "camera_movement": "",
+  "duration": 25,
+  "layout": "Split screen: left shows train frame (blue), right shows platform frame (green). Equations appear at bottom. Light beam travels through both frames."
+}
+
+Foundation concepts get short, flat scenes with few elements and no camera
+movement, as in:
 
+Example for "Pythagorean Theorem" (foundation):
+{
+  "elements": [
+    "Right triangle with legs a, b and hypotenuse c",
+    "Squares built outward on each side",
+    "Unit grid inside the squares to count area",
+    "MathTex a^2 + b^2 = c^2"
+  ],
+  "colors": {
+    "triangle": "WHITE",
+    "square_a": "BLUE",
+    "square_b": "GREEN",
+    "square_c": "YELLOW",
+    "equation": "WHITE"
+  },
+  "animations": [
+    "Create the triangle",
+    "GrowFromEdge each square from its side",
+    "Transform the unit cells of the blue and green squares into the yellow square",
+    "Write the equation, coloring each term like its square"
+  ],
+  "transitions": [
+    "Reuse the triangle from the previous scene and keep its orientation"
+  ],
+  "camera_movement": "",
+  "duration": 12,
+  "layout": "Triangle centered slightly left, squares attached to its sides, equation in the upper right corner."
+}
 
-def _ensure_client() -> Anthropic:
-    global CLI_CLIENT
-    if CLI_CLIENT is None:
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise RuntimeError("ANTHROPIC_API_KEY environment variable not set.")
-        CLI_CLIENT = Anthropic(api_key=api_key)
-    return CLI_CLIENT
+Concepts that live in three dimensions use a ThreeDScene and say how the
+camera moves, as in:
 
+Example for "Gradient of a Scalar Field":
+{
+  "elements": [
+    "ThreeDAxes",
+    "Surface z = f(x, y) for a smooth hill",
+    "Contour lines projected onto the xy-plane",
+    "Gradient vectors on a grid in the xy-plane",
+    "Dot climbing the surface along the gradient",
+    "MathTex for the gradient definition"
+  ],
+  "colors": {
+    "surface": "BLUE",
+    "contours": "TEAL",
+    "gradient_vectors": "RED",
+    "climbing_dot": "YELLOW",
+    "equations": "WHITE"
+  },
+  "animations": [
+    "Create axes and surface",
+    "FadeIn contour lines beneath the surface",
+    "GrowArrow gradient vectors, perpendicular to the contours",
+    "MoveAlongPath the dot up the steepest ascent path",
+    "Write the gradient definition as a fixed-in-frame overlay"
+  ],
+  "transitions": [
+    "Start from the partial derivative slices of the previous scene",
+    "Combine both slopes into a single vector at each point"
+  ],
+  "camera_movement": "Begin at phi=70°, theta=-45°, ambient rotation while the vectors grow, then move to a top-down view to show the vectors crossing contours at right angles",
+  "duration": 28,
+  "layout": "Surface fills the center of the frame; the equation is fixed in the upper left and stays readable while the camera moves."
+}"""
 
 @dataclass
 class VisualSpec:
@@ -98,8 +217,19 @@ class VisualDesigner:
     Powered by Claude Sonnet 4.5 for creative visual design.
     """
 
-    def __init__(self, model: str = CLAUDE_MODEL):
+    def __init__(
+        self,
+        model: str = CLAUDE_MODEL,
+        router: Optional[ModelRouter] = None,
+        enrichment_cache: Optional[EnrichmentCache] = None,
+    ):
         self.model = model
+        if router is None:
+            router = get_model_router()
+        self.router = router
+        if enrichment_cache is None:
+            enrichment_cache = get_enrichment_cache()
+        self.enrichment_cache = enrichment_cache  # Specs shared across runs and processes
         self.color_palette: Dict[str, str] = {}  # Track colors across concepts
         self.previous_elements: List[str] = []  # Track what was shown before
 
@@ -111,6 +241,10 @@ class VisualDesigner:
         """
         Design visual specification for a single node.
 
+        Node objects shared by several parents (as produced by
+        ``KnowledgeGraph.to_tree()``) are designed only once, with the spec of
+        the first parent that reaches them.
+
         Args:
             node: The knowledge node to design visuals for
             parent_spec: Visual spec of parent concept (for continuity)
@@ -118,22 +252,130 @@ class VisualDesigner:
         Returns:
             The same node with visual_spec added
         """
-        print(f"{'  ' * node.depth}Designing visuals: {node.concept} (depth {node.depth})")
+        return await self._design_node_async(node, parent_spec, set())
+
+    async def _design_node_async(
+        self,
+        node: KnowledgeNode,
+        parent_spec: Optional[VisualSpec],
+        visited: Set[int],
+    ) -> KnowledgeNode:
+        if id(node) in visited:
+            return node
+        visited.add(id(node))
+
+        visual_spec = await self.design_one_async(node, [p.concept for p in node.prerequisites], parent_spec)
+
+        # Recursively design prerequisites
+        designed_prereqs = []
+        for prereq in node.prerequisites:
+            designed_prereq = await self._design_node_async(prereq, visual_spec, visited)
+            designed_prereqs.append(designed_prereq)
+        node.prerequisites = designed_prereqs
 
-        # Gather context from the node
-        equations = node.equations if node.equations else []
-        prerequisites = [p.concept for p in node.prerequisites]
+        return node
+
+    async def design_one_async(
+        self,
+        node: KnowledgeNode,
+        prerequisites: List[str],
+        parent_spec: Optional[VisualSpec] = None
+    ) -> VisualSpec:
+        """
+        Design one node without touching its prerequisites.
 
-        # Design visual spec
-        visual_spec = await self._generate_visual_spec_async(
+        ``prerequisites`` names the concepts the node builds on, so a node can
+        be designed before its child nodes exist (see ``node_dataflow``). A
+        spec designed by an earlier run for the same inputs, parent spec
+        included, is read from ``enrichment_cache``.
+
+        Args:
+            node: An enriched knowledge node
+            prerequisites: Concepts the node decomposes into
+            parent_spec: Visual spec of parent concept (for continuity)
+
+        Returns:
+            The spec, which is also written into ``node.visual_spec``
+        """
+        print(f"{'  ' * node.depth}Designing visuals: {node.concept} (depth {node.depth})")
+
+        visual_spec = await self._cached_visual_spec_async(
             concept=node.concept,
-            equations=equations,
+            equations=node.equations if node.equations else [],
             prerequisites=prerequisites,
             depth=node.depth,
             is_foundation=node.is_foundation,
             parent_spec=parent_spec
         )
+        self._apply_visual_spec(node, visual_spec)
+        return visual_spec
+
+    async def design_tree_batch_async(self, root: KnowledgeNode, runner: BatchRunner) -> KnowledgeNode:
+        """
+        Design a tree offline, submitting one message batch per tree level.
+
+        Levels run top-down, so each request still sees its parent's spec,
+        as in ``design_node_async``. See ``message_batches`` for the runner and
+        its resumable state. Specs already in ``enrichment_cache`` are not
+        requested again; requests that error or return unparsable JSON are
+        regenerated interactively.
 
+        Args:
+            root: Root of the knowledge tree
+            runner: Runner that submits and polls the batches
+
+        Returns:
+            The tree with visual specifications added to all nodes
+        """
+        model = batch_model(self.router, TASK_VISUAL_DESIGN, self.model)
+        parent_specs: Dict[int, VisualSpec] = {}
+        for level, nodes in enumerate(tree_levels(root)):
+            print(f"{'  ' * level}Designing level {level}: {len(nodes)} concepts (batch)")
+            arguments = [
+                dict(
+                    concept=node.concept,
+                    equations=node.equations if node.equations else [],
+                    prerequisites=[p.concept for p in node.prerequisites],
+                    depth=node.depth,
+                    is_foundation=node.is_foundation,
+                    parent_spec=parent_specs.get(id(node)),
+                )
+                for node in nodes
+            ]
+            cached = [self._stored_visual_spec(**kwargs) for kwargs in arguments]
+            requests = []
+            for index, kwargs in enumerate(arguments):
+                if cached[index] is not None:
+                    continue
+                system_prompt, user_prompt = self._visual_spec_prompts(**kwargs)
+                requests.append(BatchRequest(
+                    custom_id=f"visual-{index:05d}",
+                    model=model,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    max_tokens=2500,
+                    temperature=0.6,
+                    few_shot=VISUAL_DESIGN_FEW_SHOT,
+                ))
+            results = await runner.run(f"visual_design:{root.concept}:level-{level}", requests)
+
+            pending = iter(requests)
+            for node, kwargs, visual_spec in zip(nodes, arguments, cached):
+                if visual_spec is None:
+                    request = next(pending)
+                    try:
+                        # Errored requests come back as None and fail to parse too
+                        visual_spec = self._parse_visual_spec(node.concept, results.get(request.custom_id))
+                    except (TypeError, ValueError):
+                        print(f"  -> Batch answer unusable for {node.concept}, asking individually")
+                        visual_spec = await self._generate_visual_spec_async(**kwargs)
+                    self._store_visual_spec(visual_spec, **kwargs)
+                self._apply_visual_spec(node, visual_spec)
+                for prereq in node.prerequisites:
+                    parent_specs.setdefault(id(prereq), visual_spec)
+        return root
+
+    def _apply_visual_spec(self, node: KnowledgeNode, visual_spec: VisualSpec) -> None:
         # Update color palette with new colors
         self.color_palette.update(visual_spec.colors)
         self.previous_elements.extend(visual_spec.elements)
@@ -145,14 +387,43 @@ class VisualDesigner:
         # Merge with existing visual_spec (from MathematicalEnricher)
         node.visual_spec.update(visual_spec.to_dict())
 
-        # Recursively design prerequisites
-        designed_prereqs = []
-        for prereq in node.prerequisites:
-            designed_prereq = await self.design_node_async(prereq, visual_spec)
-            designed_prereqs.append(designed_prereq)
-        node.prerequisites = designed_prereqs
+    def _cache_address(
+        self,
+        equations: List[str],
+        prerequisites: List[str],
+        depth: int,
+        is_foundation: bool,
+        parent_spec: Optional[VisualSpec]
+    ) -> Dict[str, Any]:
+        """Everything besides the concept that shapes the designed spec."""
+        parent = None
+        if parent_spec is not None:
+            # The parts of the parent spec the prompt shows
+            parent = {"concept": parent_spec.concept, "elements": parent_spec.elements, "colors": parent_spec.colors}
+        return {
+            "model": self.router.model_for(TASK_VISUAL_DESIGN, self.model),
+            "prompt_version": VISUAL_DESIGN_PROMPT_VERSION,
+            "complexity": "foundation" if is_foundation else "advanced",
+            "context": {"equations": equations, "prerequisites": prerequisites, "depth": depth, "parent": parent},
+        }
 
-        return node
+    def _stored_visual_spec(self, concept: str, **inputs: Any) -> Optional[VisualSpec]:
+        payload = self.enrichment_cache.get("visual_spec", concept, **self._cache_address(**inputs))
+        if payload is None:
+            return None
+        record_cache_hit("enrichment_cache", agent=TASK_VISUAL_DESIGN)
+        return VisualSpec(**{**payload, "concept": concept})
+
+    def _store_visual_spec(self, visual_spec: VisualSpec, concept: str, **inputs: Any) -> None:
+        self.enrichment_cache.set("visual_spec", concept, visual_spec.to_dict(), **self._cache_address(**inputs))
+
+    async def _cached_visual_spec_async(self, concept: str, **inputs: Any) -> VisualSpec:
+        """Spec from ``enrichment_cache``, designed and stored on a miss."""
+        visual_spec = self._stored_visual_spec(concept, **inputs)
+        if visual_spec is None:
+            visual_spec = await self._generate_visual_spec_async(concept=concept, **inputs)
+            self._store_visual_spec(visual_spec, concept, **inputs)
+        return visual_spec
 
     async def _generate_visual_spec_async(
         self,
@@ -164,7 +435,31 @@ class VisualDesigner:
         parent_spec: Optional[VisualSpec]
     ) -> VisualSpec:
         """Generate visual specification for a concept using Claude"""
+        system_prompt, user_prompt = self._visual_spec_prompts(
+            concept, equations, prerequisites, depth, is_foundation, parent_spec
+        )
+
+        content = await self.router.complete(
+            TASK_VISUAL_DESIGN,
+            few_shot=VISUAL_DESIGN_FEW_SHOT,
+            model=self.model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=2500,
+            temperature=0.6,  # Higher temperature for creative visual design
+        )
+        return self._parse_visual_spec(concept, content)
 
+    @staticmethod
+    def _visual_spec_prompts(
+        concept: str,
+        equations: List[str],
+        prerequisites: List[str],
+        depth: int,
+        is_foundation: bool,
+        parent_spec: Optional[VisualSpec]
+    ) -> Tuple[str, str]:
+        """System and user prompt for one concept."""
         # Build context about what came before
         previous_context = ""
         if parent_spec:
@@ -211,69 +506,11 @@ Depth: {depth} (0=target concept, higher=more foundational)
 Is foundation: {is_foundation}
 {previous_context}
 
-Design a Manim animation segment for this concept.
-
-Return JSON format:
-{{
-  "elements": ["list", "of", "manim", "objects"],
-  "colors": {{"object_name": "MANIM_COLOR"}},
-  "animations": ["FadeIn", "Transform", "Write"],
-  "transitions": ["description of how to transition from previous concept"],
-  "camera_movement": "camera movement description or empty string",
-  "duration": 15,
-  "layout": "description of spatial layout"
-}}
-
-Example for "Special Relativity":
-{{
-  "elements": [
-    "Two reference frames (train and platform)",
-    "Light beam with constant speed c",
-    "Lorentz transformation equations",
-    "Time dilation visualization",
-    "Length contraction diagram"
-  ],
-  "colors": {{
-    "train_frame": "BLUE",
-    "platform_frame": "GREEN",
-    "light_beam": "YELLOW",
-    "time_labels": "WHITE",
-    "equations": "TEAL"
-  }},
-  "animations": [
-    "FadeIn reference frames",
-    "Create light beam propagating",
-    "Write Lorentz equations",
-    "Transform clocks to show time dilation",
-    "Indicate length contraction with arrows"
-  ],
-  "transitions": [
-    "Build on Galilean reference frames from previous scene",
-    "Show that unlike Galilean case, light speed stays constant",
-    "Fade in new equations while keeping frame visualization"
-  ],
-  "camera_movement": "",
-  "duration": 25,
-  "layout": "Split screen: left shows train frame (blue), right shows platform frame (green). Equations appear at bottom. Light beam travels through both frames."
-}}'''
-
-        try:
-            response = _ensure_client().messages.create(
-                model=self.model,
-                max_tokens=2500,
-                temperature=0.6,  # Higher temperature for creative visual design
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}],
-            )
-            content = response.content[0].text
-        except NotFoundError:
-            content = run_query_via_sdk(
-                user_prompt,
-                system_prompt=system_prompt,
-                temperature=0.6,
-                max_tokens=2500,
-            )
+Design a Manim animation segment for this concept.'''
+        return system_prompt, user_prompt
 
+    @staticmethod
+    def _parse_visual_spec(concept: str, content: str) -> VisualSpec:
         # Parse JSON response
         try:
             data = json.loads(content)
@@ -309,6 +546,10 @@ Example for "Special Relativity":
         """Synchronous wrapper for design_node_async"""
         return asyncio.run(self.design_node_async(node, parent_spec))
 
+    def design_tree_batch(self, root: KnowledgeNode, runner: BatchRunner) -> KnowledgeNode:
+        """Synchronous wrapper for design_tree_batch_async"""
+        return asyncio.run(self.design_tree_batch_async(root, runner))
+
     def design_tree(self, root: KnowledgeNode) -> KnowledgeNode:
         """
         Design visual specifications for an entire knowledge tree.
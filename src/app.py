@@ -1,16 +1,20 @@
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 import gradio as gr
-from openai import OpenAI
+
+# Support `python src/app.py` as well as imports from the repository root
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+from src.agents.llm_provider import get_provider, run_blocking
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize OpenAI client with DeepSeek base URL
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com"
-)
+# DeepSeek requests go through the shared provider (rate limiting, metrics, cassettes)
+deepseek = get_provider("deepseek")
 
 # Initialize smolagent (commented out until smolagents is available)
 # smolagent = MathToManimAgent()
@@ -80,10 +84,11 @@ def chat_with_deepseek(message, history, use_smolagent=False):
     
     # Call the DeepSeek API
     try:
-        response = client.chat.completions.create(
-            model="deepseek-reasoner",  # Latest: deepseek-r1 or deepseek-chat for stable production
-            messages=messages
-        )
+        request = {
+            "model": "deepseek-reasoner",  # Latest: deepseek-r1 or deepseek-chat for stable production
+            "messages": messages,
+        }
+        response = run_blocking(deepseek, lambda: deepseek.create(request))
         
         # Get both reasoning and final content
         reasoning = format_latex(response.choices[0].message.reasoning_content)
@@ -13,6 +13,12 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Keep foundation verdicts from tests out of the user's on-disk cache
+os.environ.setdefault("MATH_TO_MANIM_FOUNDATION_CACHE", ":memory:")
+os.environ.setdefault("MATH_TO_MANIM_CONCEPT_ALIASES", ":memory:")
+os.environ.setdefault("MATH_TO_MANIM_PREREQUISITE_STORE", "memory")
+os.environ.setdefault("MATH_TO_MANIM_ENRICHMENT_CACHE", ":memory:")
+
 # Add project root to path so we can import from src
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
@@ -32,6 +38,31 @@ def pytest_configure(config):
     )
 
 
+@pytest.fixture(autouse=True)
+def _isolated_prerequisite_store():
+    """Start every test with an empty shared prerequisite store"""
+    from src.agents.prerequisite_store import get_prerequisite_store
+    get_prerequisite_store().clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _isolated_enrichment_cache():
+    """Start every test with an empty shared enrichment cache"""
+    from src.agents.enrichment_cache import get_enrichment_cache
+    get_enrichment_cache().clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _default_rate_limits():
+    """Start and end every test with the default (unconfigured) rate limits"""
+    from src.agents.rate_limiter import configure_rate_limits
+    configure_rate_limits({})
+    yield
+    configure_rate_limits({})
+
+
 @pytest.fixture(scope="session")
 def api_key():
     """Provide API key for tests"""
@@ -0,0 +1,506 @@
+"""
+Local OpenAI- and Anthropic-compatible stand-in for load testing the pipeline.
+
+``FakeLLMServer`` answers ``POST /v1/messages`` (Anthropic Messages API) and
+``POST /v1/chat/completions`` (OpenAI, DeepSeek, Moonshot/Kimi) with
+schema-valid canned content, recognised from the agents' prompts:
+concept analyses, foundation verdicts, classify-and-decompose answers
+(single and batched), prerequisite lists, mathematical content, visual
+specs, narrative segments, scene transitions and Manim code. Kimi tool calls
+(``write_mathematical_content``, ``design_visual_plan``,
+``compose_narrative`` and the ``*_batch`` variants) are answered with
+tool-call arguments.
+
+Generated knowledge trees are finite: every non-foundational concept gets
+``fanout`` prerequisites named ``"<concept> step <i>"``, and concepts
+``tree_depth`` steps below the target concept are foundational.
+
+Latency, server errors and 429s are configurable, so the orchestrators can
+be load-tested at hundreds of concurrent requests on one machine::
+
+    with FakeLLMServer(FakeLLMConfig(latency=uniform(0.05, 0.2), rate_limit_rate=0.05)) as server:
+        os.environ["ANTHROPIC_BASE_URL"] = server.anthropic_base_url
+        client = KimiClient(api_key="fake", base_url=server.openai_base_url)
+        ...
+
+or standalone, printing the environment to point the agents at it::
+
+    python tests/fake_llm_server.py --port 8765 --latency uniform:0.05,0.2 --rate-limit-rate 0.05
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LatencyFn = Callable[[random.Random], float]
+
+
+# ---------------------------------------------------------------------------
+# Latency distributions
+# ---------------------------------------------------------------------------
+
+
+def constant(seconds: float) -> LatencyFn:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> LatencyFn:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float) -> LatencyFn:
+    """Long-tailed latency, like real LLM endpoints."""
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def exponential(mean: float) -> LatencyFn:
+    return lambda rng: rng.expovariate(1.0 / mean)
+
+
+_DISTRIBUTIONS = {"constant": constant, "uniform": uniform, "lognormal": lognormal, "exponential": exponential}
+
+
+def parse_latency(spec: str) -> LatencyFn:
+    """``"uniform:0.05,0.2"``-style latency spec (seconds)."""
+    name, _, args = spec.partition(":")
+    if name not in _DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution {name!r}; expected one of {', '.join(_DISTRIBUTIONS)}")
+    return _DISTRIBUTIONS[name](*(float(arg) for arg in args.split(",") if arg))
+
+
+@dataclass
+class FakeLLMConfig:
+    """Behaviour of the fake server."""
+
+    latency: LatencyFn = field(default_factory=lambda: constant(0.0))
+    error_rate: float = 0.0  # Fraction of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0  # Fraction of requests answered with HTTP 429
+    retry_after: float = 0.0  # Retry-After sent with 429s, in seconds
+    tree_depth: int = 2
+    fanout: int = 3
+    seed: Optional[int] = None
+
+
+# ---------------------------------------------------------------------------
+# Canned content
+# ---------------------------------------------------------------------------
+
+
+_STEP = re.compile(r" step \d+")
+_CONCEPT_PATTERNS = (
+    re.compile(r"# Manim Animation: ([^\n]+)"),
+    re.compile(r'Concept: "?([^"\n]+)"?'),
+    re.compile(r'Is "([^"]+)" a foundational'),
+    re.compile(r'To understand "([^"]+)"'),
+    re.compile(r"Target concept: ([^\n]+)"),
+)
+_QUESTION_PREFIX = re.compile(
+    r"^(?:please\s+)?(?:explain|teach me about|tell me about|describe|how does|how do|what is|what are)\s+",
+    re.IGNORECASE,
+)
+
+
+def _concept(prompt: str) -> str:
+    for pattern in _CONCEPT_PATTERNS:
+        match = pattern.search(prompt)
+        if match:
+            return match.group(1).strip()
+    return "the concept"
+
+
+def _numbered_concepts(prompt: str) -> List[str]:
+    """Concepts listed as ``1. Concept: ...`` (narrative and batched tool prompts)."""
+    return re.findall(r"^\d+\. Concept: ([^\n]+)$", prompt, re.MULTILINE)
+
+
+def _core_concept(question: str) -> str:
+    concept = _QUESTION_PREFIX.sub("", question.strip()).rstrip("?.! ")
+    concept = re.sub(r"\s+(?:work|to me)$", "", concept, flags=re.IGNORECASE)
+    return concept.lower() or "mathematics"
+
+
+class ContentGenerator:
+    """Schema-valid answers for the agents' prompts."""
+
+    def __init__(self, tree_depth: int, fanout: int):
+        self.tree_depth = tree_depth
+        self.fanout = fanout
+
+    def is_foundation(self, concept: str) -> bool:
+        return len(_STEP.findall(concept)) >= self.tree_depth
+
+    def prerequisites(self, concept: str) -> List[str]:
+        if self.is_foundation(concept):
+            return []
+        return [f"{concept} step {i}" for i in range(1, self.fanout + 1)]
+
+    def classification(self, concept: str) -> Dict[str, Any]:
+        return {"is_foundation": self.is_foundation(concept), "prerequisites": self.prerequisites(concept)}
+
+    @staticmethod
+    def math_content(concept: str) -> Dict[str, Any]:
+        return {
+            "equations": [f"E_{{{len(concept)}}} = m c^2", r"\frac{dS}{dt} \geq 0"],
+            "definitions": {"E": f"energy associated with {concept}", "S": "entropy", "t": "time"},
+            "interpretation": f"{concept} relates how quantities change together.",
+            "examples": [f"A worked example of {concept}."],
+            "typical_values": {"c": "3e8 m/s"},
+        }
+
+    @staticmethod
+    def visual_spec(concept: str) -> Dict[str, Any]:
+        return {
+            "elements": [f"{concept} diagram", "axes", "equation"],
+            "colors": {"diagram": "BLUE", "equation": "YELLOW"},
+            "animations": ["FadeIn", "Write", "Transform"],
+            "transitions": ["Transform the previous diagram"],
+            "camera_movement": "slow zoom",
+            "duration": 15,
+            "layout": "diagram left, equation right",
+        }
+
+    @staticmethod
+    def visual_plan(concept: str) -> Dict[str, Any]:
+        return {
+            "visual_description": f"A diagram of {concept} with labelled axes",
+            "color_scheme": "blue and gold",
+            "animation_description": "fade in, then slowly rotate",
+            "transitions": "morph from the previous diagram",
+            "camera_movement": "zoom into origin",
+            "duration": 15,
+            "layout": "centered",
+        }
+
+    @staticmethod
+    def narrative(concept: str) -> str:
+        sentence = (
+            f"Begin by fading in a diagram of {concept} in BLUE, then display the equation "
+            r"$E = mc^2$ with Write and highlight it in YELLOW to emphasize each term. "
+        )
+        return (sentence * 6).strip()
+
+    @staticmethod
+    def manim_code(concept: str) -> str:
+        scene = re.sub(r"\W+", "", concept.title()) or "Concept"
+        return (
+            "```python\nfrom manim import *\n\n\n"
+            f"class {scene}Scene(Scene):\n"
+            "    def construct(self):\n"
+            f"        self.play(Write(Text({concept!r})))\n"
+            "        self.wait()\n```"
+        )
+
+    def reply(self, system: str, user: str) -> Tuple[str, str]:
+        """``(kind, text)`` answering a single-turn prompt."""
+        prompt = f"{system}\n{user}"
+        if "several concepts at once" in system:
+            concepts = [json.loads(item) for item in re.findall(r'^- (".*")$', user, re.MULTILINE)]
+            return "batch_classify", json.dumps({c: self.classification(c) for c in concepts})
+        if 'Answer with ONLY "yes" or "no"' in prompt:
+            return "foundation", "yes" if self.is_foundation(_concept(prompt)) else "no"
+        if "is_foundation" in system:
+            return "classify", json.dumps(self.classification(_concept(user)))
+        if "JSON array of concept names" in system:
+            return "prerequisites", json.dumps(self.prerequisites(_concept(user)))
+        if "core_concept" in system:
+            question = re.search(r'User asked: "([^"]*)"', user)
+            concept = _core_concept(question.group(1) if question else user)
+            return "concept_analysis", json.dumps(
+                {"core_concept": concept, "domain": "physics", "level": "intermediate", "goal": f"Understand {concept}"}
+            )
+        if "equations: List of LaTeX" in system:
+            return "math_content", json.dumps(self.math_content(_concept(user)))
+        if "elements: List of visual objects" in system:
+            return "visual_spec", json.dumps(self.visual_spec(_concept(user)))
+        if "narrative segment" in user:
+            return "narrative", self.narrative(_concept(user))
+        if "transition sentences" in system:
+            pairs = re.findall(r'^\d+\. From "([^"]*)" to "([^"]*)"$', user, re.MULTILINE)
+            return "transitions", json.dumps([f"Morph {a} into {b}." for a, b in pairs])
+        if "Manim Community Edition animator" in system:
+            return "codegen", self.manim_code(_concept(user))
+        return "text", "OK"
+
+    def tool_call(self, name: str, user: str) -> Optional[Dict[str, Any]]:
+        """Arguments for the Kimi enrichment tools, ``None`` for other tools."""
+        concept = _concept(user)
+        if name == "write_mathematical_content":
+            return self.math_content(concept)
+        if name == "design_visual_plan":
+            return self.visual_plan(concept)
+        if name == "write_mathematical_content_batch":
+            return {"items": [{"concept": c, **self.math_content(c)} for c in _numbered_concepts(user)]}
+        if name == "design_visual_plan_batch":
+            return {"items": [{"concept": c, **self.visual_plan(c)} for c in _numbered_concepts(user)]}
+        if name == "compose_narrative":
+            order = _numbered_concepts(user)
+            return {
+                "concept_order": order or [concept],
+                "verbose_prompt": "\n\n".join(self.narrative(c) for c in order or [concept]),
+                "total_duration": 15 * max(1, len(order)),
+                "scene_count": max(1, len(order)),
+            }
+        return None
+
+
+# ---------------------------------------------------------------------------
+# HTTP server
+# ---------------------------------------------------------------------------
+
+
+def _text(content: Any) -> str:
+    """Plain text of a string or a list of content blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body go out separately; don't add delayed-ACK stalls
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # Keep load tests quiet
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        fake = self.server.fake
+        if self.path.rstrip("/").endswith("/messages"):
+            api = "anthropic"
+        elif self.path.rstrip("/").endswith("/chat/completions"):
+            api = "openai"
+        else:
+            self._send(404, {"error": {"type": "not_found_error", "message": self.path}})
+            return
+
+        with fake.track():
+            time.sleep(fake.draw_latency())
+            failure = fake.draw_failure()
+            if failure == 429:
+                self._send(429, _error(api, "rate_limit_error", "Fake rate limit"),
+                           {"retry-after": f"{fake.config.retry_after:g}"})
+            elif failure == 500:
+                self._send(500, _error(api, "api_error", "Fake server error"))
+            elif body.get("stream"):
+                self._send(400, _error(api, "invalid_request_error", "Streaming is not supported"))
+            elif api == "anthropic":
+                self._send(200, fake.anthropic_response(body))
+            else:
+                self._send(200, fake.openai_response(body))
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _error(api: str, kind: str, message: str) -> Dict[str, Any]:
+    if api == "anthropic":
+        return {"type": "error", "error": {"type": kind, "message": message}}
+    return {"error": {"type": kind, "message": message, "code": kind}}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    fake: "FakeLLMServer"
+
+
+class FakeLLMServer:
+    """The fake endpoints on ``127.0.0.1``, served from a background thread."""
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None, port: int = 0):
+        self.config = config or FakeLLMConfig()
+        self.content = ContentGenerator(self.config.tree_depth, self.config.fanout)
+        self._random = random.Random(self.config.seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats: Dict[str, Any] = {"requests": 0, "rate_limited": 0, "errors": 0, "max_in_flight": 0, "kinds": {}}
+        self._httpd = _Server(("127.0.0.1", port), _Handler)
+        self._httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def anthropic_base_url(self) -> str:
+        """For ``ANTHROPIC_BASE_URL`` / ``Anthropic(base_url=...)``."""
+        return self.url
+
+    @property
+    def openai_base_url(self) -> str:
+        """For ``KimiClient(base_url=...)``, ``MOONSHOT_BASE_URL`` and ``DEEPSEEK_BASE_URL``."""
+        return f"{self.url}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Request handling (called from handler threads)
+    # ------------------------------------------------------------------
+    @contextlib.contextmanager
+    def track(self) -> Iterator[None]:
+        """Count a request and the peak number of requests in flight."""
+        with self._lock:
+            self._in_flight += 1
+            self.stats["requests"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def draw_latency(self) -> float:
+        with self._lock:
+            return max(0.0, self.config.latency(self._random))
+
+    def draw_failure(self) -> Optional[int]:
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.config.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return 429
+            if roll < self.config.rate_limit_rate + self.config.error_rate:
+                self.stats["errors"] += 1
+                return 500
+        return None
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.stats["kinds"][kind] = self.stats["kinds"].get(kind, 0) + 1
+
+    def anthropic_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        system = _text(body.get("system", ""))
+        user = _text(body["messages"][-1]["content"])
+        kind, text = self.content.reply(system, user)
+        self._count(kind)
+        return {
+            "id": f"msg_fake_{next(self._ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": _tokens(system + user),
+                "output_tokens": _tokens(text),
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+
+    def openai_response(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body.get("messages", [])
+        system = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+        user = _text(messages[-1].get("content")) if messages else ""
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        for tool in body.get("tools") or []:
+            name = tool.get("function", {}).get("name", "")
+            arguments = self.content.tool_call(name, user)
+            if arguments is not None:
+                self._count(name)
+                message["tool_calls"] = [{
+                    "id": f"call_fake_{next(self._ids)}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }]
+                finish_reason = "tool_calls"
+                output = message["tool_calls"][0]["function"]["arguments"]
+                break
+        else:
+            kind, output = self.content.reply(system, user)
+            self._count(kind)
+            message["content"] = output
+        prompt_tokens, completion_tokens = _tokens(system + user), _tokens(output)
+        return {
+            "id": f"chatcmpl-fake-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Anthropic-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="constant:0", help="constant:S, uniform:A,B, lognormal:MEDIAN,SIGMA or exponential:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    parser.add_argument("--tree-depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=parse_latency(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        tree_depth=args.tree_depth,
+        fanout=args.fanout,
+        seed=args.seed,
+    )
+    server = FakeLLMServer(config, port=args.port)
+    print(f"export ANTHROPIC_BASE_URL={server.anthropic_base_url} ANTHROPIC_API_KEY=fake")
+    print(f"export MOONSHOT_BASE_URL={server.openai_base_url} MOONSHOT_API_KEY=fake")
+    print(f"export DEEPSEEK_BASE_URL={server.openai_base_url} DEEPSEEK_API_KEY=fake")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(json.dumps(server.stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
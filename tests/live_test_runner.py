@@ -8,6 +8,7 @@ Usage:
     python tests/live_test_runner.py
     python tests/live_test_runner.py --concept "cosmology"
     python tests/live_test_runner.py --suite performance
+    python tests/live_test_runner.py --suite benchmark  # Offline pipeline benchmark only
 """
 
 import sys
@@ -425,6 +426,37 @@ class PerformanceTests:
         }
 
 
+class PipelineBenchmarkTests:
+    """End-to-end pipeline benchmark against the fake LLM server (no API calls)"""
+
+    @staticmethod
+    def test_pipeline_benchmark():
+        """Sweep concept sets, depths and concurrency; compare with the stored baseline"""
+        from pipeline_benchmark import (
+            DEFAULT_BASELINE_PATH,
+            BenchmarkConfig,
+            compare_to_baseline,
+            load_report,
+            run_benchmark,
+            save_report,
+        )
+
+        report = run_benchmark(BenchmarkConfig())
+        output = f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        save_report(report, output)
+
+        regressions = []
+        if os.path.exists(DEFAULT_BASELINE_PATH):
+            regressions = compare_to_baseline(report, load_report(DEFAULT_BASELINE_PATH))
+
+        return {
+            'status': 'FAIL' if regressions else 'PASS',
+            'message': (f'{len(regressions)} regression(s) against the baseline' if regressions
+                        else f'{len(report["cases"])} cases within the baseline'),
+            'details': {'report': output, 'regressions': regressions}
+        }
+
+
 def run_test_suite(suite_name: str, test_class):
     """Run all tests in a test class"""
     runner = LiveTestRunner(verbose=True)
@@ -496,6 +528,13 @@ def run_all_suites():
     suite3 = run_test_suite("Performance", PerformanceTests)
     suites.append(suite3)
 
+    # Run the offline pipeline benchmark
+    print("\n" + ">"*40)
+    print("SUITE 4: Pipeline Benchmark")
+    print(">"*40)
+    suite4 = run_test_suite("PipelineBenchmark", PipelineBenchmarkTests)
+    suites.append(suite4)
+
     # Overall summary
     print("\n" + "="*80)
     print("OVERALL SUMMARY")
@@ -561,6 +600,11 @@ def test_specific_concept(concept: str):
 
 
 if __name__ == "__main__":
+    if sys.argv[1:3] == ["--suite", "benchmark"]:
+        # Runs against the fake server; no API key needed
+        suite = run_test_suite("PipelineBenchmark", PipelineBenchmarkTests)
+        sys.exit(1 if suite.failed or suite.errors else 0)
+
     # Check API key
     if not os.getenv("ANTHROPIC_API_KEY"):
         print("[FAIL] Error: ANTHROPIC_API_KEY not set")
@@ -581,12 +625,13 @@ if __name__ == "__main__":
                 run_test_suite("PrerequisiteExplorer", PrerequisiteExplorerTests)
             elif suite_name == "performance":
                 run_test_suite("Performance", PerformanceTests)
+                run_test_suite("PipelineBenchmark", PipelineBenchmarkTests)
             else:
                 run_all_suites()
         else:
             print("Usage:")
             print("  python tests/live_test_runner.py")
             print("  python tests/live_test_runner.py --concept 'cosmology'")
-            print("  python tests/live_test_runner.py --suite [analyzer|explorer|performance|all]")
+            print("  python tests/live_test_runner.py --suite [analyzer|explorer|performance|benchmark|all]")
     else:
         run_all_suites()
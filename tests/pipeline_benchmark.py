@@ -0,0 +1,389 @@
+"""
+End-to-end benchmark of the Reverse Knowledge Tree pipeline.
+
+Runs ``ReverseKnowledgeTreeOrchestrator.process_async`` (concept analysis,
+exploration, enrichment, visual design, narrative and code generation)
+without touching a real provider, against one of two backends:
+
+- ``fake``: a ``FakeLLMServer`` with configurable latency, reached through
+  the DeepSeek route of a ``ModelRouter``;
+- ``replay``: a cassette recorded from an earlier sweep (``--record``),
+  replayed with ``replay-or-fail`` and optionally its recorded latencies.
+
+The sweep covers concept sets x tree depths x concurrency levels. A case
+runs ``--trees`` pipelines, at most ``concurrency`` at a time, each with
+its own orchestrator and empty in-memory caches so every tree is a cold
+run. Each case reports p50/p95/p99 tree latency, requests, tokens and
+cache hits per tree (from the run metrics) and the peak memory allocated
+while the case ran (``tracemalloc``). Raise ``--trees`` for stable tail
+percentiles.
+
+The report is written as JSON and can be compared against a stored
+baseline; the run fails when a tree fails or a gated metric regresses by
+more than the threshold. By default only the deterministic metrics are
+gated (requests, tokens and cache hits per tree), since wall-clock
+latencies depend on the machine and its load. ``--compare-latency`` also
+gates the latency percentiles, and only against a baseline recorded on the
+same host; memory tracing slows allocation, so it is off in that mode.
+Memory is reported, never gated::
+
+    python tests/pipeline_benchmark.py --output benchmark_results.json \\
+        --baseline tests/pipeline_benchmark_baseline.json
+    python tests/pipeline_benchmark.py --compare-latency --baseline my_host_baseline.json
+    python tests/pipeline_benchmark.py --update-baseline
+    python tests/pipeline_benchmark.py --record cassettes/benchmark.json.gz
+    python tests/pipeline_benchmark.py --backend replay --cassette cassettes/benchmark.json.gz
+
+``python tests/live_test_runner.py --suite performance`` runs the default
+sweep as part of the performance suite.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import FakeLLMConfig, FakeLLMServer, parse_latency
+from src.agents.enrichment_cache import EnrichmentCache
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.llm_cassette import use_cassette
+from src.agents.llm_provider import DEFAULT_ROUTES, ModelRouter, OpenAICompatibleProvider
+from src.agents.orchestrator import ReverseKnowledgeTreeOrchestrator
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+
+BACKENDS = ("fake", "replay")
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_benchmark_baseline.json")
+
+CONCEPT_SETS: Dict[str, Sequence[str]] = {
+    "physics": ("Explain entropy", "Explain quantum tunneling", "Explain special relativity"),
+    "mathematics": ("Explain the Fourier transform", "Explain eigenvalues", "Explain Bayes theorem"),
+}
+
+# Deterministic metrics gated by default, and whether a rise (True) or a fall regresses
+GATED_METRICS = {
+    "requests_per_tree": True,
+    "tokens_per_tree": True,
+    "cache_hits_per_tree": False,
+}
+# Wall-clock metrics, gated only with compare_latency against the same host
+LATENCY_METRICS = ("latency_p50_seconds", "latency_p95_seconds", "latency_p99_seconds")
+
+
+@dataclass
+class BenchmarkConfig:
+    """One sweep over concept sets, depths and concurrency levels."""
+
+    backend: str = "fake"
+    concept_sets: Sequence[str] = tuple(CONCEPT_SETS)
+    depths: Sequence[int] = (1, 2)
+    concurrency: Sequence[int] = (1, 4)
+    trees: int = 12  # Pipelines per case
+    latency: str = "constant:0.01"  # Fake server latency spec
+    fanout: int = 2  # Prerequisites per fake concept
+    cassette: Optional[str] = None  # Replay source
+    latency_scale: float = 1.0  # Replay timing: 1 waits the recorded latencies, 0 none
+    record: Optional[str] = None  # Record the fake sweep into this cassette
+    trace_memory: bool = True  # Report each case's peak allocation (slows the run)
+    concepts: Dict[str, Sequence[str]] = field(default_factory=lambda: dict(CONCEPT_SETS))
+
+    def cases(self) -> List[Dict[str, Any]]:
+        return [
+            {"concept_set": name, "depth": depth, "concurrency": level}
+            for name in self.concept_sets
+            for depth in self.depths
+            for level in self.concurrency
+        ]
+
+
+def case_name(case: Dict[str, Any]) -> str:
+    return f"{case['concept_set']}/depth={case['depth']}/concurrency={case['concurrency']}"
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, as in the run metrics."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 4)
+
+
+def host_name() -> str:
+    """Identifies the machine a report was measured on."""
+    return f"{platform.node()}/{platform.machine()}/python-{platform.python_version()}"
+
+
+@contextlib.contextmanager
+def traced_peak_mb(enabled: bool = True):
+    """Yield a dict whose ``peak_mb`` is set to the peak traced allocation of the block.
+
+    The peak covers only what the block allocated, unlike the process-wide
+    ``ru_maxrss``, so cases can be compared regardless of the sweep order.
+    """
+    result: Dict[str, Optional[float]] = {"peak_mb": None}
+    if not enabled or tracemalloc.is_tracing():
+        yield result
+        return
+    tracemalloc.start()
+    try:
+        yield result
+        result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _provider(base_url: str) -> OpenAICompatibleProvider:
+    return OpenAICompatibleProvider(
+        "deepseek", base_url=base_url, api_key_env="DEEPSEEK_API_KEY", default_model="deepseek-chat"
+    )
+
+
+def _orchestrator(router: ModelRouter, depth: int) -> ReverseKnowledgeTreeOrchestrator:
+    orchestrator = ReverseKnowledgeTreeOrchestrator(max_tree_depth=depth, router=router)
+    # Cold caches per tree, so requests per tree do not depend on the sweep order
+    orchestrator.prerequisite_explorer.foundation_cache = FoundationVerdictCache(":memory:")
+    orchestrator.prerequisite_explorer.prerequisite_store = InMemoryPrerequisiteStore()
+    enrichment_cache = EnrichmentCache(":memory:")
+    orchestrator.mathematical_enricher.enrichment_cache = enrichment_cache
+    orchestrator.visual_designer.enrichment_cache = enrichment_cache
+    return orchestrator
+
+
+async def _run_case(provider: OpenAICompatibleProvider, prompts: Sequence[str], depth: int, concurrency: int,
+                    trees: int, output_dir: str) -> Dict[str, Any]:
+    router = ModelRouter({task: "deepseek:deepseek-chat" for task in DEFAULT_ROUTES}, providers={"deepseek": provider})
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_tree(prompt: str) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            result = await _orchestrator(router, depth).process_async(prompt, output_dir=output_dir)
+            return {"latency": time.perf_counter() - started, "totals": result.metrics["totals"]}
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(one_tree(prompts[i % len(prompts)]) for i in range(trees)), return_exceptions=True
+    )
+    wall = time.perf_counter() - started
+    await provider.aclose()
+
+    runs = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+    failures = [f"{type(outcome).__name__}: {outcome}" for outcome in outcomes if isinstance(outcome, BaseException)]
+    latencies = [run["latency"] for run in runs]
+    completed = max(len(runs), 1)
+    return {
+        "trees": trees,
+        "errors": len(failures),
+        "error_messages": failures[:3],
+        "wall_seconds": round(wall, 4),
+        "trees_per_second": round(len(runs) / wall, 3) if wall else None,
+        "latency_p50_seconds": _round(percentile(latencies, 0.50)),
+        "latency_p95_seconds": _round(percentile(latencies, 0.95)),
+        "latency_p99_seconds": _round(percentile(latencies, 0.99)),
+        "requests_per_tree": round(sum(run["totals"]["calls"] for run in runs) / completed, 2),
+        "tokens_per_tree": round(sum(run["totals"]["total_tokens"] for run in runs) / completed, 1),
+        "cache_hits_per_tree": round(sum(run["totals"]["cache_hits"] for run in runs) / completed, 2),
+        "retries": sum(run["totals"]["retries"] for run in runs),
+    }
+
+
+def run_benchmark(config: BenchmarkConfig, verbose: bool = False) -> Dict[str, Any]:
+    """Run the sweep and return the JSON report."""
+    if config.backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {config.backend!r}; expected one of {', '.join(BACKENDS)}")
+    if config.backend == "replay" and not config.cassette:
+        raise ValueError("The replay backend needs a cassette")
+    # Replayed requests never reach a client, but the provider still wants a key
+    os.environ.setdefault("DEEPSEEK_API_KEY", "fake-key")
+
+    report: Dict[str, Any] = {
+        "created": datetime.now().isoformat(),
+        "host": host_name(),
+        "backend": config.backend,
+        "config": {
+            "trees": config.trees,
+            "latency": config.latency if config.backend == "fake" else None,
+            "fanout": config.fanout if config.backend == "fake" else None,
+            "cassette": config.cassette if config.backend == "replay" else None,
+            "latency_scale": config.latency_scale if config.backend == "replay" else None,
+        },
+        "cases": [],
+    }
+
+    with contextlib.ExitStack() as stack:
+        if config.backend == "replay":
+            stack.enter_context(use_cassette(config.cassette, "replay-or-fail", latency_scale=config.latency_scale))
+        elif config.record:
+            stack.enter_context(use_cassette(config.record, "record"))
+        output_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="math_to_manim_bench_"))
+
+        for case in config.cases():
+            prompts = config.concepts[case["concept_set"]]
+            with contextlib.ExitStack() as case_stack:
+                if config.backend == "fake":
+                    server = case_stack.enter_context(FakeLLMServer(FakeLLMConfig(
+                        latency=parse_latency(config.latency), tree_depth=case["depth"], fanout=config.fanout,
+                    )))
+                    base_url = server.openai_base_url
+                else:
+                    base_url = "http://127.0.0.1:9/v1"  # Never contacted
+                if not verbose:
+                    case_stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+                memory = case_stack.enter_context(traced_peak_mb(config.trace_memory))
+                result = asyncio.run(_run_case(
+                    _provider(base_url), prompts, case["depth"], case["concurrency"], config.trees, output_dir
+                ))
+
+            result = {"name": case_name(case), **case, **result, "peak_traced_mb": memory["peak_mb"]}
+            report["cases"].append(result)
+            print(f"  {result['name']:<40} p50 {_seconds(result['latency_p50_seconds'])}  "
+                  f"p99 {_seconds(result['latency_p99_seconds'])}  "
+                  f"{result['requests_per_tree']:>6} req/tree  {result['errors']} errors")
+
+    return report
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "   n/a" if value is None else f"{value:6.3f}s"
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.25,
+                        compare_latency: bool = False, latency_slack: float = 0.05) -> List[str]:
+    """
+    Regressions of ``report`` against ``baseline``.
+
+    A gated metric regresses when it moves the wrong way by more than
+    ``threshold`` (a fraction) of the baseline value. With
+    ``compare_latency`` the latency percentiles are gated too, if the
+    baseline was measured on the same host; they must also grow by more
+    than ``latency_slack`` seconds, so millisecond jitter is not reported.
+    Failed trees are always a regression. Cases missing from the baseline
+    are skipped, and so is every case of a baseline from another backend.
+    """
+    metrics = dict(GATED_METRICS)
+    if compare_latency and baseline.get("host") == report.get("host"):
+        metrics.update((metric, True) for metric in LATENCY_METRICS)
+    regressions = []
+    previous = {}
+    if baseline.get("backend") == report["backend"]:
+        previous = {case["name"]: case for case in baseline.get("cases", [])}
+    for case in report["cases"]:
+        if case["errors"]:
+            regressions.append(f"{case['name']}: {case['errors']} of {case['trees']} trees failed")
+        old = previous.get(case["name"])
+        if old is None:
+            continue
+        for metric, rise_regresses in metrics.items():
+            now, then = case.get(metric), old.get(metric)
+            if now is None or not then:
+                continue
+            if metric in LATENCY_METRICS and now - then <= latency_slack:
+                continue
+            if (now > then * (1 + threshold)) if rise_regresses else (now < then * (1 - threshold)):
+                regressions.append(
+                    f"{case['name']}: {metric} {then} -> {now} ({(now / then - 1) * 100:+.0f}%)"
+                )
+    return regressions
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+
+
+def _csv(value: str, cast=str) -> List[Any]:
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against fake or replayed LLMs")
+    parser.add_argument("--backend", choices=BACKENDS, default="fake")
+    parser.add_argument("--concept-sets", default=",".join(CONCEPT_SETS), help=f"Any of {', '.join(CONCEPT_SETS)}")
+    parser.add_argument("--depths", default="1,2")
+    parser.add_argument("--concurrency", default="1,4", help="Pipelines in flight per case")
+    parser.add_argument("--trees", type=int, default=BenchmarkConfig.trees, help="Pipelines per case")
+    parser.add_argument("--latency", default="constant:0.01", help="Fake server latency, as in fake_llm_server.py")
+    parser.add_argument("--fanout", type=int, default=2)
+    parser.add_argument("--cassette", help="Cassette to replay (--backend replay)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Scale of the replayed latencies")
+    parser.add_argument("--record", help="Record the fake sweep into this cassette")
+    parser.add_argument("--output", default=f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed regression, as a fraction")
+    parser.add_argument("--compare-latency", action="store_true",
+                        help="Also gate latency percentiles (same-host baselines only; disables memory tracing)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the report as the new baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline output")
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(
+        backend=args.backend,
+        concept_sets=_csv(args.concept_sets),
+        depths=_csv(args.depths, int),
+        concurrency=_csv(args.concurrency, int),
+        trees=args.trees,
+        latency=args.latency,
+        fanout=args.fanout,
+        cassette=args.cassette,
+        latency_scale=args.latency_scale,
+        record=args.record,
+        trace_memory=not args.compare_latency,
+    )
+    print(f"Benchmarking {len(config.cases())} cases against the {config.backend} backend...")
+    report = run_benchmark(config, verbose=args.verbose)
+    save_report(report, args.output)
+    print(f"\nReport saved to: {args.output}")
+
+    if args.update_baseline:
+        save_report(report, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; skipping the comparison")
+        return 0
+
+    baseline = load_report(args.baseline)
+    if baseline.get("backend") != report["backend"]:
+        print(f"The baseline at {args.baseline} is from the {baseline.get('backend')} backend; skipping the comparison")
+        return 0
+    if args.compare_latency and baseline.get("host") != report["host"]:
+        print(f"The baseline at {args.baseline} was measured on {baseline.get('host')}, not {report['host']}; "
+              "comparing deterministic metrics only")
+    regressions = compare_to_baseline(report, baseline, threshold=args.threshold, compare_latency=args.compare_latency)
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print(f"\n[OK] No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
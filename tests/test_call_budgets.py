@@ -0,0 +1,228 @@
+"""
+Call-budget regression tests for tree construction
+
+Explores the recorded quantum mechanics tree
+(src/agents/knowledge_tree_quantum_mechanics.json) against an oracle that
+answers every prompt from that fixture, and asserts upper bounds on the
+LLM calls each strategy and each pipeline stage may make, with cold and
+warm caches. A prompt or recursion change that multiplies the calls fails
+here instead of on the invoice.
+
+When a change saves calls, lower the budgets; raising one needs a reason.
+
+Run with: pytest -m call_budget -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import ContentGenerator
+from src.agents.enrichment_cache import EnrichmentCache
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.knowledge_graph import KnowledgeGraph
+from src.agents.llm_provider import DEFAULT_ROUTES, LLMProvider, ModelRouter
+from src.agents.orchestrator import ReverseKnowledgeTreeOrchestrator
+from src.agents.prerequisite_explorer_claude import PrerequisiteExplorer
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+from src.agents.run_metrics import collect_metrics, llm_call
+
+pytestmark = pytest.mark.call_budget
+
+QM_TREE_PATH = os.path.join(project_root, 'src', 'agents', 'knowledge_tree_quantum_mechanics.json')
+FIXTURE_DEPTH = 3
+
+# Maximum LLM calls to explore the fixture at FIXTURE_DEPTH. Warm runs reuse
+# the persistent foundation cache and prerequisite store of a cold run.
+EXPLORATION_BUDGETS = {
+    "depth_first": {"cold": 20, "warm": 0},
+    "combined": {"cold": 12, "warm": 0},
+    "level": {"cold": 3, "warm": 0},
+    "graph": {"cold": 20, "warm": 0},
+}
+
+# Maximum LLM calls per stage of the full pipeline for "Explain quantum mechanics".
+# Warm runs also reuse the content and specs in the enrichment cache.
+PIPELINE_BUDGETS = {
+    "cold": {
+        "concept_analysis": 1,
+        "prerequisite_exploration": 20,
+        "mathematical_enrichment": 30,
+        "visual_design": 31,
+        "narrative_composition": 21,
+        "code_generation": 1,
+    },
+    "warm": {
+        "concept_analysis": 1,
+        "prerequisite_exploration": 0,
+        "mathematical_enrichment": 0,
+        "visual_design": 0,
+        "narrative_composition": 21,
+        "code_generation": 1,
+    },
+}
+
+
+def _load_fixture():
+    with open(QM_TREE_PATH) as f:
+        return json.load(f)
+
+
+def _shape(node):
+    """Concept, depth, verdict and prerequisite order of a tree dict."""
+    return (node["concept"], node["depth"], node["is_foundation"], [_shape(p) for p in node["prerequisites"]])
+
+
+class FixtureContent(ContentGenerator):
+    """Canned answers whose verdicts and prerequisites come from the recorded tree."""
+
+    def __init__(self, fixture):
+        super().__init__(tree_depth=FIXTURE_DEPTH, fanout=0)
+        self.decompositions = {}
+
+        def walk(node):
+            if node["prerequisites"]:
+                self.decompositions.setdefault(node["concept"], [p["concept"] for p in node["prerequisites"]])
+            for prereq in node["prerequisites"]:
+                walk(prereq)
+
+        walk(fixture)
+
+    def is_foundation(self, concept):
+        return concept not in self.decompositions
+
+    def prerequisites(self, concept):
+        return self.decompositions.get(concept, [])
+
+
+class OracleProvider(LLMProvider):
+    name = "oracle"
+    default_model = "oracle"
+
+    def __init__(self, content):
+        self.content = content
+        self.kinds = Counter()
+
+    async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+        kind, text = self.content.reply(system_prompt, user_prompt)
+        self.kinds[kind] += 1
+        with llm_call(model or self.default_model) as call:
+            call.prompt_tokens, call.completion_tokens = len(user_prompt) // 4, len(text) // 4
+        return text
+
+
+@pytest.fixture
+def fixture_tree():
+    return _load_fixture()
+
+
+@pytest.fixture
+def oracle(fixture_tree):
+    return OracleProvider(FixtureContent(fixture_tree))
+
+
+@pytest.fixture
+def stores():
+    """Persistent caches shared by the cold and the warm run"""
+    return {
+        "foundation_cache": FoundationVerdictCache(":memory:"),
+        "prerequisite_store": InMemoryPrerequisiteStore(),
+        "enrichment_cache": EnrichmentCache(":memory:"),
+    }
+
+
+def _router(oracle):
+    return ModelRouter({task: "oracle:oracle" for task in DEFAULT_ROUTES}, providers={"oracle": oracle})
+
+
+def _explore(mode, oracle, stores):
+    explorer = PrerequisiteExplorer(
+        max_depth=FIXTURE_DEPTH,
+        combined_mode=mode == "combined",
+        strategy="level" if mode == "level" else "depth_first",
+        router=_router(oracle),
+        foundation_cache=stores["foundation_cache"],
+        prerequisite_store=stores["prerequisite_store"],
+    )
+
+    async def run():
+        with collect_metrics() as metrics:
+            if mode == "graph":
+                result = await explorer.explore_graph_async("quantum mechanics")
+            else:
+                result = await explorer.explore_async("quantum mechanics")
+        return result, metrics.totals["calls"]
+
+    return asyncio.run(run())
+
+
+def _concepts_above(node, max_depth):
+    """Unique concepts the explorer has to classify: those shallower than ``max_depth``."""
+    if node["depth"] >= max_depth:
+        return set()
+    found = {node["concept"]}
+    for prereq in node["prerequisites"]:
+        found |= _concepts_above(prereq, max_depth)
+    return found
+
+
+class TestExplorationBudgets:
+    """Each exploration strategy stays within its call budget"""
+
+    @pytest.mark.parametrize("mode", ["depth_first", "combined", "level"])
+    def test_tree_matches_fixture_within_budget(self, mode, oracle, stores, fixture_tree):
+        tree, cold_calls = _explore(mode, oracle, stores)
+        assert _shape(tree.to_dict()) == _shape(fixture_tree)
+        assert cold_calls <= EXPLORATION_BUDGETS[mode]["cold"]
+
+        warm_tree, warm_calls = _explore(mode, oracle, stores)
+        assert _shape(warm_tree.to_dict()) == _shape(fixture_tree)
+        assert warm_calls <= EXPLORATION_BUDGETS[mode]["warm"]
+
+    def test_graph_matches_fixture_within_budget(self, oracle, stores, fixture_tree):
+        graph, cold_calls = _explore("graph", oracle, stores)
+        expected = KnowledgeGraph.from_dict(fixture_tree)
+        assert sorted(n.concept for n in graph.topological_order()) == sorted(
+            n.concept for n in expected.topological_order()
+        )
+        assert cold_calls <= EXPLORATION_BUDGETS["graph"]["cold"]
+
+        _, warm_calls = _explore("graph", oracle, stores)
+        assert warm_calls <= EXPLORATION_BUDGETS["graph"]["warm"]
+
+    def test_no_concept_classified_twice_when_cold(self, oracle, stores, fixture_tree):
+        _explore("depth_first", oracle, stores)
+        assert oracle.kinds["foundation"] == len(_concepts_above(fixture_tree, FIXTURE_DEPTH))
+
+
+class TestPipelineBudgets:
+    """Every stage of the full pipeline stays within its call budget"""
+
+    def test_stage_budgets_cold_and_warm(self, oracle, stores, fixture_tree, tmp_path):
+        def run():
+            orchestrator = ReverseKnowledgeTreeOrchestrator(max_tree_depth=FIXTURE_DEPTH, router=_router(oracle))
+            orchestrator.prerequisite_explorer.foundation_cache = stores["foundation_cache"]
+            orchestrator.prerequisite_explorer.prerequisite_store = stores["prerequisite_store"]
+            orchestrator.mathematical_enricher.enrichment_cache = stores["enrichment_cache"]
+            orchestrator.visual_designer.enrichment_cache = stores["enrichment_cache"]
+            return asyncio.run(orchestrator.process_async("Explain quantum mechanics", output_dir=str(tmp_path)))
+
+        for temperature in ("cold", "warm"):
+            result = run()
+            assert _shape(result.knowledge_tree) == _shape(fixture_tree)
+            by_stage = result.metrics["by_stage"]
+            calls = {stage: by_stage.get(stage, {}).get("calls", 0) for stage in PIPELINE_BUDGETS[temperature]}
+            over = {
+                stage: (count, PIPELINE_BUDGETS[temperature][stage])
+                for stage, count in calls.items()
+                if count > PIPELINE_BUDGETS[temperature][stage]
+            }
+            assert not over, f"{temperature} run over budget (calls, budget): {over}"
+            assert result.metrics["totals"]["calls"] <= sum(PIPELINE_BUDGETS[temperature].values())
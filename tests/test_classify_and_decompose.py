@@ -0,0 +1,210 @@
+"""
+Unit Tests for the combined classify-and-decompose exploration mode
+
+Run with: pytest tests/test_classify_and_decompose.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.classify_and_decompose import (
+    parse_batch_classify_and_decompose,
+    parse_classify_and_decompose,
+)
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.prerequisite_explorer_claude import PrerequisiteExplorer
+
+
+class TestParseClassifyAndDecompose:
+    """Test suite for parse_classify_and_decompose"""
+
+    def test_plain_json(self):
+        content = '{"is_foundation": false, "prerequisites": ["algebra", "limits"]}'
+        assert parse_classify_and_decompose(content) == (False, ["algebra", "limits"])
+
+    def test_foundation_ignores_prerequisites(self):
+        content = '{"is_foundation": true, "prerequisites": ["anything"]}'
+        assert parse_classify_and_decompose(content) == (True, [])
+
+    def test_code_block_and_yes_no_strings(self):
+        content = 'Sure:\n```json\n{"is_foundation": "no", "prerequisites": ["vectors"]}\n```'
+        assert parse_classify_and_decompose(content) == (False, ["vectors"])
+
+    def test_limits_to_five(self):
+        content = json.dumps({"is_foundation": False, "prerequisites": list("abcdefg")})
+        assert parse_classify_and_decompose(content) == (False, list("abcde"))
+
+    @pytest.mark.parametrize("content", [
+        "",
+        "yes",
+        '["algebra"]',
+        '{"prerequisites": ["algebra"]}',
+        '{"is_foundation": "maybe", "prerequisites": []}',
+        '{"is_foundation": false, "prerequisites": []}',
+        '{"is_foundation": false, "prerequisites": "algebra"}',
+    ])
+    def test_unusable_output_returns_none(self, content):
+        assert parse_classify_and_decompose(content) is None
+
+
+class TestParseBatchClassifyAndDecompose:
+    """Test suite for parse_batch_classify_and_decompose"""
+
+    def test_keys_matched_case_insensitively(self):
+        content = json.dumps({
+            "Calculus": {"is_foundation": False, "prerequisites": ["limits"]},
+            "algebra": {"is_foundation": True, "prerequisites": []},
+        })
+        answers = parse_batch_classify_and_decompose(content, ["calculus", "algebra"])
+        assert answers == {"calculus": (False, ["limits"]), "algebra": (True, [])}
+
+    def test_missing_and_malformed_entries_are_dropped(self):
+        content = json.dumps({
+            "calculus": {"is_foundation": "unsure"},
+            "unasked": {"is_foundation": True, "prerequisites": []},
+        })
+        assert parse_batch_classify_and_decompose(content, ["calculus", "algebra"]) == {}
+
+
+class TestCombinedModeExplorer:
+    """The Claude explorer should need one call per non-leaf node"""
+
+    @staticmethod
+    def _explorer(responses, calls):
+        explorer = PrerequisiteExplorer(
+            max_depth=3,
+            foundation_cache=FoundationVerdictCache(":memory:"),
+            combined_mode=True,
+        )
+
+        async def fake_complete(system_prompt, user_prompt, *, max_tokens, temperature, task=None):
+            calls.append(user_prompt)
+            for concept, reply in responses.items():
+                if f'"{concept}"' in user_prompt:
+                    return reply
+            return '{"is_foundation": true, "prerequisites": []}'
+
+        explorer._complete_async = fake_complete
+        return explorer
+
+    def test_one_call_per_node(self):
+        calls = []
+        explorer = self._explorer(
+            {"calculus": '{"is_foundation": false, "prerequisites": ["algebra", "functions"]}'},
+            calls,
+        )
+
+        tree = asyncio.run(explorer.explore_async("calculus"))
+
+        assert [p.concept for p in tree.prerequisites] == ["algebra", "functions"]
+        assert all(p.is_foundation for p in tree.prerequisites)
+        assert len(calls) == 3
+
+    def test_falls_back_to_two_calls_on_bad_output(self):
+        calls = []
+        explorer = self._explorer(
+            {"calculus": "I think it depends."},
+            calls,
+        )
+
+        async def fake_complete(system_prompt, user_prompt, *, max_tokens, temperature, task=None):
+            calls.append(user_prompt)
+            if "foundational concept?" in user_prompt:
+                return "no"
+            if "ESSENTIAL prerequisite concepts?" in user_prompt and "Return format: [" in user_prompt:
+                return '["algebra"]'
+            return "not json"
+
+        explorer._complete_async = fake_complete
+
+        is_foundation, prerequisites = asyncio.run(explorer.classify_and_decompose_async("calculus"))
+
+        assert (is_foundation, prerequisites) == (False, ["algebra"])
+        assert len(calls) == 3
+
+    def test_combined_verdict_is_cached(self):
+        calls = []
+        explorer = self._explorer(
+            {"calculus": '{"is_foundation": false, "prerequisites": ["algebra"]}'},
+            calls,
+        )
+
+        first = asyncio.run(explorer.classify_and_decompose_async("calculus"))
+        second = asyncio.run(explorer.classify_and_decompose_async("calculus"))
+
+        assert first == second == (False, ["algebra"])
+        assert len(calls) == 1
+
+
+class TestLevelStrategyExplorer:
+    """The level strategy should issue one batched request per tree level"""
+
+    ANSWERS = {
+        "quantum mechanics": {"is_foundation": False, "prerequisites": ["linear algebra", "waves"]},
+        "linear algebra": {"is_foundation": False, "prerequisites": ["vectors", "matrices"]},
+        "waves": {"is_foundation": True, "prerequisites": []},
+        "vectors": {"is_foundation": True, "prerequisites": []},
+        "matrices": {"is_foundation": False, "prerequisites": ["vectors"]},
+    }
+
+    def _explorer(self, calls, level_batch_size=20, drop=()):
+        explorer = PrerequisiteExplorer(
+            max_depth=4,
+            foundation_cache=FoundationVerdictCache(":memory:"),
+            strategy="level",
+            level_batch_size=level_batch_size,
+        )
+
+        async def fake_complete(system_prompt, user_prompt, *, max_tokens, temperature, task=None):
+            calls.append(user_prompt)
+            asked = [c for c in self.ANSWERS if f'"{c}"' in user_prompt]
+            if user_prompt.startswith("For EACH"):
+                return json.dumps({c: self.ANSWERS[c] for c in asked if c not in drop})
+            return json.dumps(self.ANSWERS[asked[0]])
+
+        explorer._complete_async = fake_complete
+        return explorer
+
+    def test_one_request_per_level(self):
+        calls = []
+        tree = asyncio.run(self._explorer(calls).explore_async("quantum mechanics"))
+
+        assert len(calls) == 3  # root, {linear algebra, waves}, {vectors, matrices}
+        assert [p.concept for p in tree.prerequisites] == ["linear algebra", "waves"]
+        linear_algebra, waves = tree.prerequisites
+        assert waves.is_foundation and waves.depth == 1
+        assert [p.concept for p in linear_algebra.prerequisites] == ["vectors", "matrices"]
+        matrices = linear_algebra.prerequisites[1]
+        assert matrices.prerequisites[0].concept == "vectors"
+        assert matrices.prerequisites[0].depth == 3
+        assert matrices.prerequisites[0].is_foundation
+
+    def test_output_matches_depth_first_format(self):
+        calls = []
+        tree = asyncio.run(self._explorer(calls).explore_async("quantum mechanics"))
+        data = tree.to_dict()
+        assert set(data) == {
+            "concept", "depth", "is_foundation", "prerequisites",
+            "equations", "definitions", "visual_spec", "narrative",
+        }
+
+    def test_frontier_is_chunked(self):
+        calls = []
+        asyncio.run(self._explorer(calls, level_batch_size=1).explore_async("quantum mechanics"))
+        assert len(calls) == 5
+
+    def test_concepts_missing_from_batch_are_asked_individually(self):
+        calls = []
+        tree = asyncio.run(self._explorer(calls, drop=("waves",)).explore_async("quantum mechanics"))
+        assert tree.prerequisites[1].is_foundation
+        assert len(calls) == 4
+
+    def test_unknown_strategy_rejected(self):
+        with pytest.raises(ValueError):
+            PrerequisiteExplorer(strategy="sideways", foundation_cache=FoundationVerdictCache(":memory:"))
@@ -0,0 +1,174 @@
+"""
+Unit Tests for the pooled Claude Agent SDK sessions
+
+Run with: pytest tests/test_claude_session_pool.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from claude_agent_sdk import AssistantMessage, ResultMessage, TextBlock
+
+from src.agents.claude_session_pool import ClaudeSessionPool, get_session_pool, run_in_background_loop
+
+
+class FakeClient:
+    """Stands in for ClaudeSDKClient; answers every prompt with its upper-case."""
+
+    instances = []
+    fail_next_query = False
+
+    def __init__(self, options=None):
+        self.options = options
+        self.connected = False
+        self.session_ids = []
+        self.active = 0
+        self.max_active = 0
+        self.alive = True
+        self._prompt = None
+        FakeClient.instances.append(self)
+
+    async def connect(self, prompt=None):
+        self.connected = True
+
+    async def query(self, prompt, session_id="default"):
+        if FakeClient.fail_next_query:
+            FakeClient.fail_next_query = False
+            raise ConnectionError("CLI process exited")
+        self.session_ids.append(session_id)
+        self._prompt = prompt
+
+    async def receive_response(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        yield AssistantMessage(content=[TextBlock(text=self._prompt.upper())], model="fake")
+        yield ResultMessage(
+            subtype="success", duration_ms=1, duration_api_ms=1, is_error=False,
+            num_turns=1, session_id="fake",
+        )
+
+    async def get_server_info(self):
+        if not self.alive:
+            raise ConnectionError("no response")
+        return {}
+
+    async def disconnect(self):
+        self.connected = False
+
+
+@pytest.fixture(autouse=True)
+def _reset_fake_clients():
+    FakeClient.instances = []
+    FakeClient.fail_next_query = False
+    yield
+
+
+def _pool(**kwargs):
+    return ClaudeSessionPool(client_factory=FakeClient, **kwargs)
+
+
+class TestClaudeSessionPool:
+    """Test suite for ClaudeSessionPool"""
+
+    def test_sequential_queries_reuse_one_session(self):
+        pool = _pool()
+
+        async def run():
+            return [await pool.query_text(p) for p in ["a", "b", "c"]]
+
+        assert asyncio.run(run()) == ["A", "B", "C"]
+        assert len(FakeClient.instances) == 1
+        # Each query is isolated under its own conversation id
+        assert len(set(FakeClient.instances[0].session_ids)) == 3
+        assert pool.stats["sessions_started"] == 1
+        assert pool.stats["sessions_reused"] == 2
+
+    def test_concurrency_is_capped_by_pool_size(self):
+        pool = _pool(size=2)
+
+        async def run():
+            return await asyncio.gather(*(pool.query_text(str(i)) for i in range(6)))
+
+        assert asyncio.run(run()) == [str(i) for i in range(6)]
+        assert len(FakeClient.instances) == 2
+        assert all(client.max_active == 1 for client in FakeClient.instances)
+
+    def test_failed_session_is_discarded_and_query_retried(self):
+        pool = _pool()
+
+        async def run():
+            await pool.query_text("warm")
+            FakeClient.fail_next_query = True
+            return await pool.query_text("again")
+
+        assert asyncio.run(run()) == "AGAIN"
+        assert pool.stats["retries"] == 1
+        assert pool.stats["sessions_discarded"] == 1
+        assert FakeClient.instances[0].connected is False
+        assert FakeClient.instances[1].connected is True
+
+    def test_session_recycled_after_max_queries(self):
+        pool = _pool(max_queries_per_session=2)
+
+        async def run():
+            for prompt in "abcde":
+                await pool.query_text(prompt)
+
+        asyncio.run(run())
+        assert len(FakeClient.instances) == 3
+        assert [len(c.session_ids) for c in FakeClient.instances] == [2, 2, 1]
+
+    def test_health_check_drops_unresponsive_sessions(self):
+        pool = _pool(size=2)
+
+        async def run():
+            await asyncio.gather(pool.query_text("a"), pool.query_text("b"))
+            FakeClient.instances[0].alive = False
+            return await pool.health_check(timeout=1)
+
+        assert asyncio.run(run()) == 1
+        assert pool.idle_sessions() == 1
+        assert FakeClient.instances[0].connected is False
+
+    def test_close_disconnects_and_rejects_new_queries(self):
+        pool = _pool()
+
+        async def run():
+            await pool.query_text("a")
+            await pool.close()
+            with pytest.raises(RuntimeError):
+                await pool.query_text("b")
+
+        asyncio.run(run())
+        assert FakeClient.instances[0].connected is False
+
+
+class TestPoolRegistry:
+    """Test suite for the per-loop registry and background loop"""
+
+    def test_pool_shared_per_loop_and_profile(self):
+        server = object()
+
+        async def run():
+            first = get_session_pool("sys", mcp_servers=[server])
+            # A freshly built servers list still maps to the same pool
+            assert get_session_pool("sys", mcp_servers=[server]) is first
+            assert get_session_pool("other") is not first
+            return first
+
+        assert asyncio.run(run()) is not asyncio.run(run())
+
+    def test_background_loop_keeps_sessions_between_sync_calls(self):
+        pool = _pool()
+
+        assert run_in_background_loop(pool.query_text("a")) == "A"
+        assert run_in_background_loop(pool.query_text("b")) == "B"
+        assert len(FakeClient.instances) == 1
+        run_in_background_loop(pool.close())
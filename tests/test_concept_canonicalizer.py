@@ -0,0 +1,123 @@
+"""
+Unit Tests for concept canonicalization
+
+Run with: pytest tests/test_concept_canonicalizer.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.concept_canonicalizer import CanonicalDict, ConceptCanonicalizer
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.prerequisite_explorer_claude import PrerequisiteExplorer
+
+
+class TestCanonicalize:
+    """Test suite for ConceptCanonicalizer.canonicalize"""
+
+    @pytest.mark.parametrize("variant", [
+        "Special Relativity",
+        "special   relativity",
+        "SPECIAL RELATIVITY",
+        "the special relativity",
+    ])
+    def test_case_whitespace_and_articles(self, variant):
+        assert ConceptCanonicalizer.canonicalize(variant) == "special relativity"
+
+    @pytest.mark.parametrize("variant, expected", [
+        ("Lorentz transformations", "lorentz transformation"),
+        ("matrices", "matrix"),
+        ("probabilities", "probability"),
+        ("Maxwell's equations", "maxwell equation"),
+        ("physics", "physics"),
+        ("calculus", "calculus"),
+    ])
+    def test_plural_and_possessive(self, variant, expected):
+        assert ConceptCanonicalizer.canonicalize(variant) == expected
+
+    def test_unicode_and_latex_agree(self):
+        canon = ConceptCanonicalizer.canonicalize
+        assert canon("ψ function") == canon("$\\psi$ functions") == "psi function"
+        assert canon("\\mathrm{Hilbert} space") == "hilbert space"
+        assert canon("ﬁeld theory") == "field theory"  # NFKC ligature
+
+
+class TestAliasesAndFuzzy:
+    """Alias table and fuzzy matching"""
+
+    def test_explicit_alias(self):
+        canon = ConceptCanonicalizer(aliases={"SR": "special relativity"})
+        assert canon.resolve("sr") == "special relativity"
+
+    def test_fuzzy_match_is_learned_and_persisted(self, tmp_path):
+        path = tmp_path / "aliases.json"
+        canon = ConceptCanonicalizer(alias_path=path, fuzzy_threshold=0.8)
+        canon.register("special relativity")
+
+        assert canon.resolve("special relativity theory") == "special relativity"
+        assert canon.stats()["fuzzy_hits"] == 1
+
+        reloaded = ConceptCanonicalizer(alias_path=path)
+        assert reloaded.resolve("Special Relativity Theory") == "special relativity"
+        assert json.loads(path.read_text()) == {"special relativity theory": "special relativity"}
+
+    def test_fuzzy_disabled_by_default(self):
+        canon = ConceptCanonicalizer()
+        canon.register("special relativity")
+        assert canon.resolve("special relativity theory") == "special relativity theory"
+
+    def test_fuzzy_threshold_rejects_distant_concepts(self):
+        canon = ConceptCanonicalizer(fuzzy_threshold=0.9)
+        canon.register("group theory")
+        assert canon.resolve("gauge theory") == "gauge theory"
+
+    def test_invalid_threshold(self):
+        with pytest.raises(ValueError):
+            ConceptCanonicalizer(fuzzy_threshold=1.5)
+
+
+class TestCanonicalDict:
+    """CanonicalDict keeps display names and counts avoided calls"""
+
+    def test_display_name_preserved(self):
+        cache = CanonicalDict(ConceptCanonicalizer())
+        cache["Special Relativity"] = ["Lorentz transformations"]
+        cache["special relativity"] = ["time dilation"]
+
+        assert list(cache) == ["Special Relativity"]
+        assert cache.display_name("SPECIAL RELATIVITY") == "Special Relativity"
+        assert cache["special relativity"] == ["time dilation"]
+
+    def test_calls_avoided_counter(self):
+        canon = ConceptCanonicalizer()
+        cache = CanonicalDict(canon)
+        cache["Vectors"] = []
+
+        assert cache["Vectors"] == []
+        assert canon.stats()["calls_avoided"] == 0
+        assert cache.get("vector") == []
+        assert canon.stats()["calls_avoided"] == 1
+
+    def test_explorer_reuses_prerequisites_across_spellings(self):
+        canon = ConceptCanonicalizer()
+        explorer = PrerequisiteExplorer(foundation_cache=FoundationVerdictCache(":memory:"))
+        explorer.cache = CanonicalDict(canon)
+        calls = []
+
+        async def fake_discover(concept):
+            calls.append(concept)
+            return ["algebra"]
+
+        explorer.discover_prerequisites_async = fake_discover
+
+        asyncio.run(explorer.lookup_prerequisites_async("Special Relativity"))
+        asyncio.run(explorer.lookup_prerequisites_async("special relativity"))
+
+        assert calls == ["Special Relativity"]
+        assert canon.stats()["calls_avoided"] == 1
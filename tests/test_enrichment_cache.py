@@ -0,0 +1,201 @@
+"""
+Unit Tests for the persistent enrichment cache
+
+Run with: pytest tests/test_enrichment_cache.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from agents.enrichment_chain import KimiMathematicalEnricher, KimiVisualDesigner
+from agents.enrichment_chain import MathematicalContent as KimiMathematicalContent
+from agents.enrichment_chain import VisualSpec as KimiVisualSpec
+from agents.prerequisite_explorer_kimi import KnowledgeNode as KimiNode
+from src.agents.enrichment_cache import EnrichmentCache, main
+from src.agents.mathematical_enricher import MathematicalContent, MathematicalEnricher
+from src.agents.prerequisite_explorer_claude import KnowledgeNode
+from src.agents.visual_designer import VisualDesigner, VisualSpec
+
+ADDRESS = {"model": "m", "prompt_version": "v1", "complexity": "high school level", "context": {"depth": 2}}
+
+
+def _tree(node_cls=KnowledgeNode):
+    """calculus -> (limits -> algebra, derivatives)"""
+    return node_cls(concept="calculus", depth=0, is_foundation=False, prerequisites=[
+        node_cls(concept="limits", depth=1, is_foundation=False, prerequisites=[
+            node_cls(concept="algebra", depth=2, is_foundation=True, prerequisites=[]),
+        ]),
+        node_cls(concept="derivatives", depth=1, is_foundation=True, prerequisites=[]),
+    ])
+
+
+def _nodes(node):
+    yield node
+    for prereq in node.prerequisites:
+        yield from _nodes(prereq)
+
+
+class TestEnrichmentCache:
+    """Content addressing, LRU bounds and invalidation"""
+
+    def test_every_input_is_part_of_the_address(self):
+        cache = EnrichmentCache(":memory:")
+        cache.set("math_content", "Limits", {"equations": ["a"]}, **ADDRESS)
+
+        assert cache.get("math_content", "  limits ", **ADDRESS) == {"equations": ["a"]}
+        for field, other in [
+            ("model", "other-model"),
+            ("prompt_version", "v2"),
+            ("complexity", "graduate level"),
+            ("context", {"depth": 3}),
+        ]:
+            assert cache.get("math_content", "limits", **{**ADDRESS, field: other}) is None
+        assert cache.get("visual_spec", "limits", **ADDRESS) is None
+        assert cache.stats()["hits"] == 1
+
+    def test_least_recently_used_entries_evicted_first(self):
+        cache = EnrichmentCache(":memory:", max_entries=2)
+        cache.set("math_content", "a", {"n": 1}, **ADDRESS)
+        cache.set("math_content", "b", {"n": 2}, **ADDRESS)
+        assert cache.get("math_content", "a", **ADDRESS) == {"n": 1}  # Now b is the oldest
+        cache.set("math_content", "c", {"n": 3}, **ADDRESS)
+
+        assert len(cache) == 2
+        assert cache.get("math_content", "b", **ADDRESS) is None
+        assert cache.get("math_content", "a", **ADDRESS) == {"n": 1}
+        assert cache.stats()["evictions"] == 1
+
+    def test_payload_bytes_bounded(self):
+        cache = EnrichmentCache(":memory:", max_bytes=250)
+        for concept in ["a", "b", "c"]:
+            cache.set("visual_spec", concept, {"layout": "x" * 100}, **ADDRESS)
+
+        assert len(cache) == 2
+        assert cache.stats()["bytes"] <= 250
+        assert cache.get("visual_spec", "a", **ADDRESS) is None
+
+    def test_entries_persist_across_instances(self, tmp_path):
+        path = tmp_path / "enrichment.sqlite3"
+        first = EnrichmentCache(path)
+        first.set("math_content", "entropy", {"equations": ["S"]}, **ADDRESS)
+        first.close()
+
+        assert EnrichmentCache(path).get("math_content", "Entropy", **ADDRESS) == {"equations": ["S"]}
+
+    def test_invalidate_matches_every_filter(self):
+        cache = EnrichmentCache(":memory:")
+        cache.set("math_content", "limits", {}, **ADDRESS)
+        cache.set("visual_spec", "limits", {}, **ADDRESS)
+        cache.set("math_content", "algebra", {}, **ADDRESS)
+
+        assert cache.invalidate() == 0
+        assert cache.invalidate(concept="Limits", kind="visual_spec") == 1
+        assert cache.invalidate(concept="limits") == 1
+        assert cache.invalidate(older_than=3600) == 0
+        assert cache.stats()["by_kind"] == {"math_content": 1}
+
+    def test_cli_invalidates_and_clears(self, tmp_path, capsys):
+        path = tmp_path / "enrichment.sqlite3"
+        cache = EnrichmentCache(path)
+        cache.set("math_content", "limits", {}, **ADDRESS)
+        cache.set("math_content", "algebra", {}, **ADDRESS)
+        cache.close()
+
+        assert main(["--path", str(path), "invalidate", "--concept", "limits"]) == 0
+        assert "Invalidated 1 entries" in capsys.readouterr().out
+        with pytest.raises(SystemExit):
+            main(["--path", str(path), "invalidate"])
+        assert main(["--path", str(path), "clear"]) == 0
+        assert len(EnrichmentCache(path)) == 0
+
+
+class TestCachedEnrichment:
+    """A second run with the same cache makes no math or visual calls"""
+
+    @staticmethod
+    def _agents(cache, calls):
+        enricher = MathematicalEnricher(enrichment_cache=cache)
+        designer = VisualDesigner(enrichment_cache=cache)
+
+        async def fake_math(concept, complexity, depth):
+            calls.append(("math", concept))
+            return MathematicalContent(concept=concept, equations=[f"{concept}@{depth}"])
+
+        async def fake_design(concept, equations, prerequisites, depth, is_foundation, parent_spec):
+            calls.append(("design", concept))
+            return VisualSpec(concept=concept, elements=[concept], colors={concept: "BLUE"})
+
+        enricher._generate_math_content_async = fake_math
+        designer._generate_visual_spec_async = fake_design
+        return enricher, designer
+
+    def test_rerun_reads_content_and_specs_from_cache(self, tmp_path):
+        path = tmp_path / "enrichment.sqlite3"
+
+        def run():
+            calls = []
+            enricher, designer = self._agents(EnrichmentCache(path), calls)
+            tree = _tree()
+            asyncio.run(enricher.enrich_tree_async(tree))
+            asyncio.run(designer.design_node_async(tree))
+            return tree, calls
+
+        cold, cold_calls = run()
+        warm, warm_calls = run()
+
+        assert len(cold_calls) == 8
+        assert warm_calls == []
+        for cold_node, warm_node in zip(_nodes(cold), _nodes(warm)):
+            assert warm_node.equations == cold_node.equations
+            assert warm_node.visual_spec == cold_node.visual_spec
+
+    def test_changed_parent_spec_redesigns_only_its_children(self):
+        cache = EnrichmentCache(":memory:")
+        calls = []
+        enricher, designer = self._agents(cache, calls)
+        tree = asyncio.run(enricher.enrich_tree_async(_tree()))
+        asyncio.run(designer.design_node_async(tree))
+
+        calls.clear()
+        limits = tree.prerequisites[0]
+        asyncio.run(designer.design_node_async(limits, VisualSpec(concept="calculus", elements=["new"])))
+        assert calls == [("design", "limits")]  # algebra sees the same limits spec as before
+
+
+class TestKimiCachedEnrichment:
+    """The Kimi agents share the persistent cache across instances"""
+
+    def test_new_instances_reuse_stored_results(self):
+        cache = EnrichmentCache(":memory:")
+        calls = []
+
+        def agents():
+            enricher = KimiMathematicalEnricher(client=object(), enrichment_cache=cache)
+            designer = KimiVisualDesigner(client=object(), enrichment_cache=cache)
+
+            async def fake_math(concept, depth, complexity):
+                calls.append(("math", concept))
+                return KimiMathematicalContent(equations=[concept], interpretation=concept)
+
+            async def fake_design(node, parent_spec):
+                calls.append(("design", node.concept))
+                return KimiVisualSpec(concept=node.concept, visual_description=node.concept, duration=12)
+
+            enricher._generate_math_content = fake_math
+            designer._generate_visual_spec = fake_design
+            return enricher, designer
+
+        for _ in range(2):
+            enricher, designer = agents()
+            tree = _tree(KimiNode)
+            asyncio.run(enricher.enrich_tree(tree, max_concurrency=4))
+            asyncio.run(designer.design_tree(tree))
+
+        assert len(calls) == 8
+        assert all(node.visual_spec["duration"] == 12 for node in _nodes(tree))
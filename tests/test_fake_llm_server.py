@@ -0,0 +1,110 @@
+"""
+Load tests against the local fake LLM server
+
+Run with: pytest tests/test_fake_llm_server.py -v
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents.enrichment_chain import KimiEnrichmentPipeline
+from agents.prerequisite_explorer_kimi import KnowledgeNode
+from fake_llm_server import FakeLLMConfig, FakeLLMServer, parse_latency, uniform
+from kimi_client import KimiClient
+from src.agents.llm_provider import DEFAULT_ROUTES, ModelRouter, OpenAICompatibleProvider
+from src.agents.orchestrator import ReverseKnowledgeTreeOrchestrator
+from src.agents.rate_limiter import RateLimitConfig, configure_rate_limits
+
+FAST_RETRIES = RateLimitConfig(initial_concurrency=256, max_concurrency=512, backoff_base=0.01, max_retries=8)
+
+
+@pytest.fixture(autouse=True)
+def _fast_limits():
+    configure_rate_limits({"deepseek": FAST_RETRIES, "moonshot": FAST_RETRIES})
+
+
+class TestFakeLLMServer:
+    """Test suite for the fake endpoints"""
+
+    def test_latency_specs(self):
+        rng = random.Random(1)
+        assert parse_latency("constant:0.25")(rng) == 0.25
+        assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+        with pytest.raises(ValueError):
+            parse_latency("gaussian:1")
+
+    def test_reverse_tree_pipeline_runs_against_fake(self, tmp_path, monkeypatch):
+        with FakeLLMServer(FakeLLMConfig(tree_depth=2, fanout=2)) as server:
+            monkeypatch.setenv("DEEPSEEK_API_KEY", "fake-key")
+            provider = OpenAICompatibleProvider(
+                "deepseek", base_url=server.openai_base_url, api_key_env="DEEPSEEK_API_KEY",
+                default_model="deepseek-chat",
+            )
+            router = ModelRouter({task: "deepseek:deepseek-chat" for task in DEFAULT_ROUTES},
+                                 providers={"deepseek": provider})
+            orchestrator = ReverseKnowledgeTreeOrchestrator(max_tree_depth=4, router=router)
+            result = asyncio.run(orchestrator.process_async("Explain entropy", output_dir=str(tmp_path)))
+
+        assert result.target_concept == "entropy"
+        assert len(result.concept_order) == 7  # 1 + 2 + 4 nodes
+        assert "class EntropyScene(Scene)" in result.manim_code
+        assert result.knowledge_tree["prerequisites"][0]["visual_spec"]["elements"]
+        assert server.stats["kinds"]["narrative"] == 7
+        assert result.metrics["totals"]["calls"] == server.stats["requests"]
+
+    def test_anthropic_messages_endpoint(self):
+        from anthropic import AsyncAnthropic, RateLimitError
+
+        async def ask(server):
+            client = AsyncAnthropic(api_key="fake-key", base_url=server.anthropic_base_url, max_retries=0)
+            try:
+                return await client.messages.create(
+                    model="fake-model", max_tokens=10,
+                    system=[{"type": "text", "text": 'Answer with ONLY "yes" or "no".'}],
+                    messages=[{"role": "user", "content": 'Is "entropy step 1 step 2" a foundational concept?'}],
+                )
+            finally:
+                await client.close()
+
+        with FakeLLMServer() as server:
+            message = asyncio.run(ask(server))
+        assert message.content[0].text == "yes"
+        assert message.usage.output_tokens > 0
+
+        with FakeLLMServer(FakeLLMConfig(rate_limit_rate=1.0, retry_after=2)) as server:
+            with pytest.raises(RateLimitError) as excinfo:
+                asyncio.run(ask(server))
+        assert excinfo.value.response.headers["retry-after"] == "2"
+
+    def test_kimi_pipeline_under_load_with_throttling(self):
+        config = FakeLLMConfig(latency=uniform(0.05, 0.1), rate_limit_rate=0.1, error_rate=0.05,
+                               tree_depth=1, fanout=3, seed=7)
+        with FakeLLMServer(config) as server:
+            client = KimiClient(api_key="fake-key", base_url=server.openai_base_url, model="kimi-k2-thinking")
+
+            async def run_many():
+                roots = [
+                    KnowledgeNode(f"concept {i}", 0, False, [
+                        KnowledgeNode(f"concept {i} step {j}", 1, True, []) for j in range(1, 4)
+                    ])
+                    for i in range(50)
+                ]
+                return await asyncio.gather(*(KimiEnrichmentPipeline(client=client).run_async(r) for r in roots))
+
+            results = asyncio.run(run_many())
+
+        assert all(r.enriched_tree.prerequisites[2].equations for r in results)
+        assert all(r.enriched_tree.visual_spec["visual_description"] for r in results)
+        assert results[0].narrative.concept_order[-1] == "concept 0"
+        # 50 trees x (4 math + 4 visual + 1 narrative), plus every injected failure retried
+        assert server.stats["requests"] == 450 + server.stats["rate_limited"] + server.stats["errors"]
+        assert server.stats["rate_limited"] > 0 and server.stats["errors"] > 0
+        assert server.stats["max_in_flight"] >= 50
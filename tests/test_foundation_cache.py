@@ -0,0 +1,79 @@
+"""
+Unit Tests for the persistent foundation verdict cache
+
+Run with: pytest tests/test_foundation_cache.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.foundation_cache import FoundationVerdictCache, normalize_concept
+from src.agents.prerequisite_explorer_claude import PrerequisiteExplorer
+
+
+@pytest.fixture
+def cache():
+    return FoundationVerdictCache(":memory:")
+
+
+class TestFoundationVerdictCache:
+    """Test suite for FoundationVerdictCache"""
+
+    def test_miss_then_hit(self, cache):
+        assert cache.get("calculus", model="m", prompt_version="v1") is None
+        cache.set("calculus", True, model="m", prompt_version="v1")
+        assert cache.get("calculus", model="m", prompt_version="v1") is True
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_key_is_normalized(self, cache):
+        cache.set("  Linear   Algebra ", False, model="m", prompt_version="v1")
+        assert cache.get("linear algebra", model="m", prompt_version="v1") is False
+        assert normalize_concept("  Linear   Algebra ") == "linear algebra"
+
+    def test_model_and_prompt_version_are_part_of_key(self, cache):
+        cache.set("vectors", True, model="m", prompt_version="v1")
+        assert cache.get("vectors", model="other", prompt_version="v1") is None
+        assert cache.get("vectors", model="m", prompt_version="v2") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "verdicts.sqlite3"
+        first = FoundationVerdictCache(path)
+        first.set("velocity", True, model="m", prompt_version="v1")
+        first.close()
+
+        second = FoundationVerdictCache(path)
+        assert second.get("velocity", model="m", prompt_version="v1") is True
+        assert len(second) == 1
+
+    def test_no_file_until_used(self, tmp_path):
+        path = tmp_path / "lazy.sqlite3"
+        FoundationVerdictCache(path)
+        assert not path.exists()
+
+
+class TestExplorerUsesFoundationCache:
+    """The explorer must consult the cache before calling the model"""
+
+    def test_second_lookup_skips_network(self, cache):
+        explorer = PrerequisiteExplorer(max_depth=2, foundation_cache=cache)
+        calls = []
+
+        async def fake_complete(system_prompt, user_prompt, *, max_tokens, temperature, task=None):
+            calls.append(user_prompt)
+            return "yes"
+
+        explorer._complete_async = fake_complete
+
+        assert asyncio.run(explorer.is_foundation_async("Calculus")) is True
+        assert asyncio.run(explorer.is_foundation_async("calculus")) is True
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
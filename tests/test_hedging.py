@@ -0,0 +1,134 @@
+"""
+Unit Tests for hedged requests
+
+Run with: pytest tests/test_hedging.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.hedging import HedgePolicy, LatencyTracker, hedge_policy_from_env
+from src.agents.llm_provider import LLMProvider, ModelRouter
+
+
+def _requests(*delays, error=None):
+    """Request factory whose n-th call sleeps ``delays[n]`` seconds."""
+    calls = []
+    cancelled = []
+
+    async def request():
+        index = len(calls)
+        calls.append(index)
+        try:
+            await asyncio.sleep(delays[index])
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+        if error is not None:
+            raise error
+        return f"answer {index}"
+
+    return request, calls, cancelled
+
+
+class TestLatencyTracker:
+    """Test suite for LatencyTracker"""
+
+    def test_quantile_over_window(self):
+        tracker = LatencyTracker(window=100)
+        for ms in range(1, 101):
+            tracker.record("k", ms / 1000)
+        assert tracker.quantile("k", 0.95) == pytest.approx(0.095)
+        assert tracker.quantile("other", 0.95) is None
+
+
+class TestHedgePolicy:
+    """Test suite for HedgePolicy"""
+
+    def test_fast_request_is_not_hedged(self):
+        policy = HedgePolicy(initial_delay=0.2)
+        request, calls, _ = _requests(0.0)
+
+        assert asyncio.run(policy.run("k", request)) == "answer 0"
+        assert calls == [0]
+        assert policy.stats["hedged"] == 0
+
+    def test_slow_request_is_hedged_and_loser_cancelled(self):
+        policy = HedgePolicy(initial_delay=0.02)
+        request, calls, cancelled = _requests(1.0, 0.01)
+
+        assert asyncio.run(policy.run("k", request)) == "answer 1"
+        assert calls == [0, 1]
+        assert cancelled == [0]
+        assert policy.stats == {"calls": 1, "hedged": 1, "hedge_won": 1}
+
+    def test_hedge_wins_do_not_lower_tracked_p95(self):
+        policy = HedgePolicy(min_samples=10, tracker=LatencyTracker(window=10))
+        for _ in range(10):
+            policy.tracker.record("k", 0.02)
+
+        async def hedged_calls():
+            for _ in range(10):
+                request, _, _ = _requests(1.0, 0.0)
+                assert await policy.run("k", request) == "answer 1"
+                # The caller waited at least the hedge delay, so the p95 cannot fall below it
+                assert policy.tracker.quantile("k", 0.95) >= 0.02
+
+        asyncio.run(hedged_calls())
+        assert policy.stats["hedge_won"] == 10
+
+    def test_delay_follows_observed_p95(self):
+        policy = HedgePolicy(quantile=0.95, initial_delay=5.0, min_samples=20)
+        for _ in range(19):
+            policy.tracker.record("k", 0.1)
+        assert policy.delay("k") == 5.0
+        policy.tracker.record("k", 0.3)
+        assert policy.delay("k") == pytest.approx(0.1)
+
+    def test_all_attempts_failing_raises(self):
+        policy = HedgePolicy(initial_delay=0.01)
+        request, calls, _ = _requests(0.05, 0.05, error=ValueError("bad"))
+
+        with pytest.raises(ValueError):
+            asyncio.run(policy.run("k", request))
+        assert len(calls) == 2
+
+    def test_env_parsing(self):
+        assert hedge_policy_from_env("") is None
+        assert hedge_policy_from_env("off") is None
+        assert hedge_policy_from_env("1").quantile == 0.95
+        assert hedge_policy_from_env("0.9").quantile == 0.9
+        with pytest.raises(ValueError):
+            hedge_policy_from_env("2")
+
+
+class TestRouterHedging:
+    """The router hedges idempotent tasks only"""
+
+    def test_only_hedgeable_tasks_are_duplicated(self):
+        class SlowThenFast(LLMProvider):
+            name = "anthropic"
+            default_model = "m"
+
+            def __init__(self):
+                self.calls = 0
+
+            async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+                self.calls += 1
+                await asyncio.sleep(0.2 if self.calls == 1 else 0)
+                return "yes"
+
+        provider = SlowThenFast()
+        router = ModelRouter(providers={"anthropic": provider}, hedge=HedgePolicy(initial_delay=0.01))
+
+        asyncio.run(router.complete("foundation", system_prompt="s", user_prompt="u"))
+        assert provider.calls == 2
+
+        provider.calls = 0
+        asyncio.run(router.complete("narrative", system_prompt="s", user_prompt="u"))
+        assert provider.calls == 1
@@ -0,0 +1,195 @@
+"""
+Unit Tests for batched Kimi enrichment and visual design requests
+
+Run with: pytest tests/test_kimi_batched_enrichment.py -v
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents.enrichment_chain import (
+    MATH_CONTENT_BATCH_PROMPT_VERSION,
+    MATHEMATICAL_CONTENT_BATCH_TOOL,
+    KimiEnrichmentPipeline,
+    KimiMathematicalEnricher,
+    KimiVisualDesigner,
+    _pack_batches,
+)
+from agents.prerequisite_explorer_kimi import KnowledgeNode
+from fake_llm_server import FakeLLMConfig, FakeLLMServer
+from kimi_client import KimiClient
+from src.agents.enrichment_cache import EnrichmentCache
+
+
+def _tool_response(name, arguments):
+    call = {"id": "call_1", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+    return {"choices": [{"message": {"role": "assistant", "content": None, "tool_calls": [call]}}]}
+
+
+class ScriptedKimiClient:
+    """Answers single and batched tool calls; ``drop`` and ``corrupt`` spoil batch items"""
+
+    def __init__(self, drop=(), corrupt=()):
+        self.drop = set(drop)
+        self.corrupt = set(corrupt)
+        self.requests = []
+
+    @staticmethod
+    def math(concept):
+        return {"equations": [f"E_{{{concept}}}"], "definitions": {"E": "energy"}, "interpretation": concept}
+
+    @staticmethod
+    def visual(concept):
+        return {"visual_description": f"diagram of {concept}", "animation_description": "fade in", "duration": 12}
+
+    async def chat_completion_async(self, messages, system=None, tools=None, tool_choice=None, **kwargs):
+        await asyncio.sleep(0)
+        name = tools[0]["function"]["name"]
+        user = messages[-1]["content"]
+        assert f"'{name}'" in system  # Each system prompt names the tool it is sent with
+        if name.endswith("_batch"):
+            concepts = re.findall(r"^\d+\. Concept: ([^\n]+)$", user, re.MULTILINE)
+            self.requests.append((name, concepts))
+            payload = self.math if name.startswith("write") else self.visual
+            items = []
+            for concept in concepts:
+                if concept in self.drop:
+                    continue
+                item = {"concept": concept.upper(), **payload(concept)}  # Echoed in another spelling
+                if concept in self.corrupt:
+                    item.pop("equations" if name.startswith("write") else "duration")
+                items.append(item)
+            return _tool_response(name, {"items": items})
+
+        concept = re.search(r"^Concept: (.*)$", user, re.MULTILINE).group(1)
+        self.requests.append((name, [concept]))
+        return _tool_response(name, self.math(concept) if name.startswith("write") else self.visual(concept))
+
+    def get_text_content(self, response):
+        return ""
+
+
+def _tree():
+    """calculus -> (limits -> algebra, derivatives -> (Algebra, functions))"""
+    return KnowledgeNode("calculus", 0, False, [
+        KnowledgeNode("limits", 1, False, [KnowledgeNode("algebra", 2, True, [])]),
+        KnowledgeNode("derivatives", 1, False, [
+            KnowledgeNode("Algebra", 2, True, []),
+            KnowledgeNode("functions", 2, True, []),
+        ]),
+    ])
+
+
+def _nodes(node):
+    yield node
+    for prereq in node.prerequisites:
+        yield from _nodes(prereq)
+
+
+class TestBatchedMathematicalContent:
+    """KimiMathematicalEnricher(batch_size=K)"""
+
+    @pytest.mark.parametrize("max_concurrency", [None, 4])
+    def test_concepts_packed_and_failed_items_asked_individually(self, max_concurrency):
+        client = ScriptedKimiClient(drop={"derivatives"}, corrupt={"limits"})
+        enricher = KimiMathematicalEnricher(client=client, batch_size=2)
+        tree = asyncio.run(enricher.enrich_tree(_tree(), max_concurrency=max_concurrency))
+
+        batches = [concepts for name, concepts in client.requests if name == "write_mathematical_content_batch"]
+        singles = sorted(concepts[0] for name, concepts in client.requests if name == "write_mathematical_content")
+        # Five unique concepts in preorder, two per request
+        assert batches == [["calculus", "limits"], ["algebra", "derivatives"], ["functions"]]
+        assert singles == ["derivatives", "limits"]
+        for node in _nodes(tree):
+            assert node.equations == [f"E_{{{node.concept.lower()}}}"]
+
+    def test_cached_concepts_not_requested_again(self):
+        client = ScriptedKimiClient()
+        enricher = KimiMathematicalEnricher(client=client, batch_size=8)
+        asyncio.run(enricher.enrich_tree(_tree()))
+        asyncio.run(enricher.enrich_tree(_tree()))
+        assert len(client.requests) == 1
+
+    def test_batched_content_cached_under_batch_prompt_version(self):
+        cache = EnrichmentCache(":memory:")
+        client = ScriptedKimiClient(drop={"derivatives"})
+        asyncio.run(KimiMathematicalEnricher(client=client, batch_size=8, enrichment_cache=cache).enrich_tree(_tree()))
+
+        # Retiring the batch prompt leaves the content asked for individually
+        assert cache.invalidate(prompt_version=MATH_CONTENT_BATCH_PROMPT_VERSION) == 4
+        client = ScriptedKimiClient()
+        asyncio.run(KimiMathematicalEnricher(client=client, batch_size=8, enrichment_cache=cache).enrich_tree(_tree()))
+        assert client.requests == [("write_mathematical_content_batch", ["calculus", "limits", "algebra", "functions"])]
+
+    def test_token_budget_limits_each_request(self):
+        blocks = [(None, "x" * 400) for _ in range(5)]  # ~100 prompt tokens each
+        packed = _pack_batches(blocks, batch_size=10, token_budget=250, answer_tokens=20)
+        assert [len(batch) for batch in packed] == [2, 2, 1]
+        assert [len(batch) for batch in _pack_batches(blocks, 10, 50, 20)] == [1, 1, 1, 1, 1]
+
+    def test_batch_schema_is_an_array_keyed_by_concept(self):
+        items = MATHEMATICAL_CONTENT_BATCH_TOOL["function"]["parameters"]["properties"]["items"]
+        assert items["type"] == "array"
+        assert items["items"]["required"][0] == "concept"
+        assert "equations" in items["items"]["properties"]
+
+
+class TestBatchedVisualDesign:
+    """KimiVisualDesigner(batch_size=K) designs one level per round"""
+
+    def test_levels_batched_with_parent_context(self):
+        client = ScriptedKimiClient(drop={"functions"}, corrupt={"algebra"})
+        designer = KimiVisualDesigner(client=client, batch_size=8)
+        tree = asyncio.run(designer.design_tree(_tree()))
+
+        assert client.requests == [
+            ("design_visual_plan_batch", ["calculus"]),
+            ("design_visual_plan_batch", ["limits", "derivatives"]),
+            ("design_visual_plan_batch", ["algebra", "functions"]),
+            ("design_visual_plan", ["algebra"]),
+            ("design_visual_plan", ["functions"]),
+        ]
+        for node in _nodes(tree):
+            assert node.visual_spec["visual_description"] == f"diagram of {node.concept.lower()}"
+            assert node.visual_spec["concept"].lower() == node.concept.lower()
+
+    def test_prompt_carries_previous_concept(self):
+        client = ScriptedKimiClient()
+        prompts = []
+        original = client.chat_completion_async
+
+        async def capture(messages, **kwargs):
+            prompts.append(messages[-1]["content"])
+            return await original(messages, **kwargs)
+
+        client.chat_completion_async = capture
+        asyncio.run(KimiVisualDesigner(client=client, batch_size=8).design_tree(_tree()))
+        assert "1. Concept: limits\n" in prompts[1]
+        assert "   Previous concept: calculus\n" in prompts[1]
+
+
+class TestBatchedPipelineAgainstFakeServer:
+    """End to end through KimiClient and the fake server"""
+
+    def test_batched_pipeline_sends_fewer_requests(self):
+        tree = KnowledgeNode("entropy", 0, False, [
+            KnowledgeNode(f"entropy step {j}", 1, True, []) for j in range(1, 4)
+        ])
+        with FakeLLMServer(FakeLLMConfig(tree_depth=1, fanout=3)) as server:
+            client = KimiClient(api_key="fake-key", base_url=server.openai_base_url, model="kimi-k2-thinking")
+            result = KimiEnrichmentPipeline(client=client, batch_size=8).run(tree)
+
+        # One math request, one visual request per level and the narrative, instead of 9
+        assert server.stats["requests"] == 4
+        assert server.stats["kinds"]["write_mathematical_content_batch"] == 1
+        assert server.stats["kinds"]["design_visual_plan_batch"] == 2
+        assert all(node.equations and node.visual_spec["visual_description"] for node in _nodes(result.enriched_tree))
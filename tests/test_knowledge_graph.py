@@ -0,0 +1,144 @@
+"""
+Unit Tests for the deduplicated KnowledgeGraph
+
+Run with: pytest tests/test_knowledge_graph.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.enrichment_cache import EnrichmentCache
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.knowledge_graph import KnowledgeGraph
+from src.agents.mathematical_enricher import MathematicalContent, MathematicalEnricher
+from src.agents.prerequisite_explorer_claude import KnowledgeNode, PrerequisiteExplorer
+
+QM_TREE_PATH = os.path.join(project_root, 'src', 'agents', 'knowledge_tree_quantum_mechanics.json')
+
+
+def _leaf(concept, depth):
+    return KnowledgeNode(concept=concept, depth=depth, is_foundation=True, prerequisites=[])
+
+
+@pytest.fixture
+def diamond_tree():
+    """calculus -> (limits -> algebra, derivatives -> (limits -> algebra, Algebra))"""
+    return KnowledgeNode(
+        concept="calculus", depth=0, is_foundation=False, prerequisites=[
+            KnowledgeNode(concept="limits", depth=1, is_foundation=False, prerequisites=[_leaf("algebra", 2)]),
+            KnowledgeNode(concept="derivatives", depth=1, is_foundation=False, prerequisites=[
+                KnowledgeNode(concept="limits", depth=2, is_foundation=False, prerequisites=[_leaf("algebra", 3)]),
+                _leaf("Algebra", 2),
+            ]),
+        ],
+    )
+
+
+class TestKnowledgeGraph:
+    """Test suite for KnowledgeGraph"""
+
+    def test_one_node_per_concept_with_min_depth(self, diamond_tree):
+        graph = KnowledgeGraph.from_tree(diamond_tree)
+
+        assert len(graph) == 4
+        assert graph.get("limits").depth == 1
+        assert graph.get("ALGEBRA").depth == 2
+        assert [n.concept for n in graph.prerequisites_of("derivatives")] == ["limits", "algebra"]
+
+    def test_topological_order_puts_prerequisites_first(self, diamond_tree):
+        order = [n.concept for n in KnowledgeGraph.from_tree(diamond_tree).topological_order()]
+        assert order.index("algebra") < order.index("limits") < order.index("derivatives")
+        assert order[-1] == "calculus"
+
+    def test_cycles_are_dropped(self):
+        graph = KnowledgeGraph()
+        graph.add_concept("a", 0)
+        graph.add_concept("b", 1)
+        assert graph.add_edge("a", "b")
+        assert not graph.add_edge("b", "a")
+        assert not graph.add_edge("a", "a")
+        assert graph.edge_count() == 1
+
+    def test_dict_round_trip(self, diamond_tree):
+        graph = KnowledgeGraph.from_dict(diamond_tree.to_dict())
+        again = KnowledgeGraph.from_dict(graph.to_dict())
+
+        assert again.to_graph_dict() == graph.to_graph_dict()
+        assert KnowledgeGraph.from_graph_dict(graph.to_graph_dict()).to_dict() == graph.to_dict()
+
+    def test_to_tree_shares_node_objects(self, diamond_tree):
+        tree = KnowledgeGraph.from_tree(diamond_tree).to_tree()
+        limits, derivatives = tree.prerequisites
+
+        assert derivatives.prerequisites[0] is limits
+        assert set(tree.to_dict()) == set(diamond_tree.to_dict())
+
+    def test_quantum_mechanics_tree_deduplicates(self):
+        with open(QM_TREE_PATH) as f:
+            data = json.load(f)
+
+        def count(item):
+            return 1 + sum(count(p) for p in item['prerequisites'])
+
+        graph = KnowledgeGraph.from_dict(data)
+        assert len(graph) < count(data)
+        assert graph.root.concept == "quantum mechanics"
+
+
+class TestDownstreamScalesWithUniqueConcepts:
+    """Shared nodes from to_tree() must only be enriched once"""
+
+    def test_enricher_calls_once_per_unique_concept(self, diamond_tree):
+        calls = []
+
+        def enricher():
+            # A cold cache per run: only the tree shape decides the calls
+            enricher = MathematicalEnricher(enrichment_cache=EnrichmentCache(":memory:"))
+
+            async def fake_generate(concept, complexity, depth):
+                calls.append(concept)
+                return MathematicalContent(concept=concept)
+
+            enricher._generate_math_content_async = fake_generate
+            return enricher
+
+        asyncio.run(enricher().enrich_node_async(diamond_tree))
+        # Seven nodes; "Algebra" at depth 2 reads the content stored for "algebra" at depth 2
+        assert len(calls) == 6
+
+        calls.clear()
+        asyncio.run(enricher().enrich_node_async(KnowledgeGraph.from_tree(diamond_tree).to_tree()))
+        assert sorted(calls) == ["algebra", "calculus", "derivatives", "limits"]
+
+
+class TestExploreGraph:
+    """PrerequisiteExplorer.explore_graph_async visits each concept once"""
+
+    def test_shared_prerequisite_explored_once(self):
+        answers = {
+            "calculus": (False, ["limits", "derivatives"]),
+            "limits": (False, ["algebra"]),
+            "derivatives": (False, ["limits", "algebra"]),
+            "algebra": (True, []),
+        }
+        explorer = PrerequisiteExplorer(max_depth=4, foundation_cache=FoundationVerdictCache(":memory:"))
+        calls = []
+
+        async def fake_classify(concept, semaphore):
+            calls.append(concept)
+            return answers[concept]
+
+        explorer._classify_one_async = fake_classify
+
+        graph = asyncio.run(explorer.explore_graph_async("calculus"))
+
+        assert sorted(calls) == ["algebra", "calculus", "derivatives", "limits"]
+        assert graph.get("algebra").depth == 2
+        assert graph.get("algebra").is_foundation
+        assert [n.concept for n in graph.prerequisites_of("derivatives")] == ["limits", "algebra"]
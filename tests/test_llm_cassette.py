@@ -0,0 +1,179 @@
+"""
+Unit Tests for the record/replay LLM cassettes
+
+Run with: pytest tests/test_llm_cassette.py -v
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from claude_agent_sdk import AssistantMessage, ResultMessage, TextBlock
+
+from kimi_client import KimiClient
+from src.agents import llm_cassette, llm_transport
+from src.agents.claude_session_pool import ClaudeSessionPool
+from src.agents.llm_cassette import Cassette, CassetteMiss, use_cassette
+from src.agents.run_metrics import collect_metrics
+
+
+def _message(text, input_tokens=12):
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=text)],
+        usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=3),
+    )
+
+
+class FakeAnthropic:
+    def __init__(self, delay=0.0):
+        self.prompts = []
+        self.delay = delay
+        self.messages = SimpleNamespace(create=self.create)
+
+    async def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][0]["content"])
+        await asyncio.sleep(self.delay)
+        return _message(f"answer {len(self.prompts)}")
+
+
+def _no_network():
+    raise AssertionError("a replayed request reached the client")
+
+
+def _complete(prompt):
+    return asyncio.run(llm_transport.complete_text(
+        model="claude-sonnet-4-5", system_prompt="s", user_prompt=prompt, max_tokens=10, temperature=0
+    ))
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch):
+    monkeypatch.delenv("MATH_TO_MANIM_CASSETTE", raising=False)
+
+
+class TestCassette:
+    """Test suite for recording and replaying through the Anthropic transport"""
+
+    def test_recorded_run_replays_without_network(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "run.json.gz")
+        fake = FakeAnthropic()
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: fake)
+        with use_cassette(path, "record") as cassette:
+            assert [_complete("a"), _complete("b")] == ["answer 1", "answer 2"]
+        assert cassette.stats["recorded"] == 2
+
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            stored = json.load(handle)
+        assert len(stored["interactions"]) == 2
+
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", _no_network)
+        with use_cassette(path, "replay-or-fail") as cassette:
+            with collect_metrics() as metrics:
+                assert _complete("b") == "answer 2"
+            with pytest.raises(CassetteMiss):
+                _complete("c")
+        assert metrics.totals["prompt_tokens"] == 12
+        assert cassette.stats == {"recorded": 0, "replayed": 1, "misses": 1}
+
+    def test_repeated_requests_replayed_in_order(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "run.json.gz")
+        fake = FakeAnthropic()
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: fake)
+        with use_cassette(path, "replay"):
+            assert [_complete("a"), _complete("a")] == ["answer 1", "answer 2"]
+
+        with use_cassette(path, "replay"):
+            assert [_complete("a"), _complete("a"), _complete("a")] == ["answer 1", "answer 2", "answer 3"]
+        assert fake.prompts == ["a", "a", "a"]
+        assert len(Cassette(path)) == 3
+
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", _no_network)
+        with use_cassette(path, "replay-or-fail"):
+            assert [_complete("a") for _ in range(4)] == ["answer 1", "answer 2", "answer 3", "answer 3"]
+
+    def test_replay_waits_recorded_latency_when_scaled(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "run.json.gz")
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: FakeAnthropic(delay=0.1))
+        with use_cassette(path, "record"):
+            _complete("a")
+
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", _no_network)
+        for scale, check in ((0.0, lambda s: s < 0.05), (1.0, lambda s: s >= 0.09)):
+            with use_cassette(path, "replay-or-fail", latency_scale=scale):
+                started = time.monotonic()
+                _complete("a")
+                assert check(time.monotonic() - started)
+
+    def test_mode_from_environment(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "env.json.gz")
+        monkeypatch.setenv("MATH_TO_MANIM_CASSETTE", "replay-or-fail")
+        monkeypatch.setenv("MATH_TO_MANIM_CASSETTE_PATH", path)
+
+        cassette = llm_cassette.active_cassette()
+        assert (cassette.mode, cassette.path) == ("replay-or-fail", path)
+        assert llm_cassette.active_cassette() is cassette
+        with pytest.raises(ValueError):
+            Cassette(path, "rewind")
+
+
+class TestProviderCoverage:
+    """The Agent SDK pool and the Kimi client go through the cassette too"""
+
+    def test_agent_sdk_queries_replayed_without_sessions(self, tmp_path):
+        class FakeSDKClient:
+            started = 0
+
+            def __init__(self, options=None):
+                FakeSDKClient.started += 1
+
+            async def connect(self):
+                pass
+
+            async def query(self, prompt, session_id="default"):
+                self.prompt = prompt
+
+            async def receive_response(self):
+                yield AssistantMessage(content=[TextBlock(text=self.prompt.upper())], model="fake")
+                yield ResultMessage(
+                    subtype="success", duration_ms=1, duration_api_ms=1, is_error=False, num_turns=1,
+                    session_id="fake", total_cost_usd=0.01, usage={"input_tokens": 5, "output_tokens": 2},
+                )
+
+            async def disconnect(self):
+                pass
+
+        path = str(tmp_path / "sdk.json.gz")
+        with use_cassette(path, "record"):
+            assert asyncio.run(ClaudeSessionPool(client_factory=FakeSDKClient).query_text("hi")) == "HI"
+
+        with use_cassette(path, "replay-or-fail"):
+            with collect_metrics() as metrics:
+                assert asyncio.run(ClaudeSessionPool(client_factory=FakeSDKClient).query_text("hi")) == "HI"
+        assert FakeSDKClient.started == 1
+        assert metrics.totals["cost_usd"] == pytest.approx(0.01)
+
+    def test_kimi_completion_replayed(self, tmp_path):
+        response = SimpleNamespace(
+            id="r", model="kimi-k2-thinking",
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content="hi", tool_calls=None))],
+            usage=SimpleNamespace(prompt_tokens=4, completion_tokens=1, total_tokens=5),
+        )
+        client = KimiClient(api_key="test-key", model="kimi-k2-thinking")
+        client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: response)))
+        path = str(tmp_path / "kimi.json.gz")
+        with use_cassette(path, "record"):
+            recorded = client.chat_completion([{"role": "user", "content": "hello"}])
+
+        client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_no_network)))
+        with use_cassette(path, "replay-or-fail"):
+            assert client.chat_completion([{"role": "user", "content": "hello"}]) == recorded
@@ -0,0 +1,165 @@
+"""
+Unit Tests for LLM providers and per-task model routing
+
+Run with: pytest tests/test_llm_provider.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.llm_provider import (
+    FAST_MODEL,
+    LLMProvider,
+    ModelRouter,
+    Route,
+    load_routes,
+    parse_json_response,
+    run_blocking,
+)
+from src.agents.prerequisite_explorer_claude import ConceptAnalyzer, PrerequisiteExplorer
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+
+
+class RecordingProvider(LLMProvider):
+    """Provider that records each call and replies with a canned answer."""
+
+    def __init__(self, name, reply="yes", default_model="default-model"):
+        self.name = name
+        self.reply = reply
+        self.default_model = default_model
+        self.calls = []
+
+    async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+        self.calls.append(model)
+        return self.reply
+
+    async def aclose(self):
+        self.calls.append("closed")
+
+
+def _router(routes=None, **replies):
+    providers = {
+        name: RecordingProvider(name, reply=replies.get(name, "yes"))
+        for name in ("anthropic", "deepseek")
+    }
+    return ModelRouter(routes, providers=providers), providers
+
+
+class TestParseJsonResponse:
+    """Test suite for parse_json_response"""
+
+    def test_plain_fenced_and_embedded(self):
+        assert parse_json_response('{"a": 1}') == {"a": 1}
+        assert parse_json_response('```json\n["x", "y"]\n```') == ["x", "y"]
+        assert parse_json_response('Sure! {"a": [1, 2]} Hope that helps.') == {"a": [1, 2]}
+
+    def test_unparsable_raises_value_error(self):
+        with pytest.raises(ValueError):
+            parse_json_response("no json here")
+
+
+class TestModelRouter:
+    """Test suite for ModelRouter"""
+
+    def test_cheap_tasks_go_to_fast_model(self):
+        router, _ = _router()
+        assert router.model_for("foundation", "claude-opus-4-1") == FAST_MODEL
+        assert router.model_for("concept_analysis", "claude-opus-4-1") == FAST_MODEL
+        # Expensive tasks keep the agent's configured model
+        assert router.model_for("narrative", "claude-opus-4-1") == "claude-opus-4-1"
+        assert router.model_for("codegen", "claude-opus-4-1") == "claude-opus-4-1"
+
+    def test_routes_can_move_tasks_to_other_providers(self):
+        router, providers = _router({"foundation": "deepseek"}, deepseek="no")
+
+        answer = asyncio.run(router.complete(
+            "foundation", model="claude-sonnet-4-5", system_prompt="s", user_prompt="u"
+        ))
+
+        assert answer == "no"
+        # The Anthropic model name is not sent to another provider
+        assert providers["deepseek"].calls == ["default-model"]
+        assert providers["anthropic"].calls == []
+
+    def test_unknown_provider_rejected(self):
+        with pytest.raises(ValueError):
+            _router({"narrative": "nowhere:model"})
+
+    def test_complete_json(self):
+        router, _ = _router(anthropic='```json\n{"core_concept": "entropy"}\n```')
+        result = asyncio.run(router.complete_json("concept_analysis", system_prompt="s", user_prompt="u"))
+        assert result == {"core_concept": "entropy"}
+
+
+class TestRunBlocking:
+    """Test suite for run_blocking, the bridge for synchronous callers"""
+
+    def _ask(self, provider):
+        return run_blocking(provider, lambda: provider.complete(system_prompt="", user_prompt="q", model="m"))
+
+    def test_without_running_loop(self):
+        provider = RecordingProvider("deepseek", reply="answer")
+        assert self._ask(provider) == "answer"
+        assert provider.calls == ["m", "closed"]
+
+    def test_inside_running_loop(self):
+        provider = RecordingProvider("deepseek", reply="answer")
+
+        async def caller():
+            return self._ask(provider)
+
+        assert asyncio.run(caller()) == "answer"
+        assert provider.calls == ["m", "closed"]
+
+
+class TestLoadRoutes:
+    """Test suite for MATH_TO_MANIM_MODEL_ROUTES parsing"""
+
+    def test_inline_spec(self):
+        routes = load_routes("foundation=deepseek:deepseek-chat, narrative=anthropic")
+        assert routes == {
+            "foundation": Route("deepseek", "deepseek-chat"),
+            "narrative": Route("anthropic"),
+        }
+
+    def test_json_file(self, tmp_path):
+        path = tmp_path / "routes.json"
+        path.write_text(json.dumps({"default": "deepseek", "codegen": "anthropic:claude-opus-4-1"}))
+        routes = load_routes(str(path))
+        assert routes["default"] == Route("deepseek")
+        assert str(routes["codegen"]) == "anthropic:claude-opus-4-1"
+
+    def test_malformed_inline_spec(self):
+        with pytest.raises(ValueError):
+            load_routes("foundation")
+
+
+class TestAgentsUseRouter:
+    """Agents send each call through the router under its task name"""
+
+    def test_foundation_check_uses_fast_model_and_keys_cache_by_it(self):
+        router, providers = _router()
+        cache = FoundationVerdictCache(":memory:")
+        explorer = PrerequisiteExplorer(
+            foundation_cache=cache, prerequisite_store=InMemoryPrerequisiteStore(), router=router
+        )
+
+        assert asyncio.run(explorer.is_foundation_async("velocity")) is True
+
+        assert providers["anthropic"].calls == [FAST_MODEL]
+        assert cache.get("velocity", model=FAST_MODEL, prompt_version="claude-foundation-v1") is True
+
+    def test_concept_analysis_parses_json(self):
+        router, providers = _router(
+            anthropic='{"core_concept": "entropy", "domain": "physics", "level": "beginner", "goal": "g"}'
+        )
+        analysis = asyncio.run(ConceptAnalyzer(router=router).analyze_async("What is entropy?"))
+        assert analysis["core_concept"] == "entropy"
+        assert providers["anthropic"].calls == [FAST_MODEL]
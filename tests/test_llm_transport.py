@@ -0,0 +1,127 @@
+"""
+Unit Tests for the native async LLM transport
+
+Run with: pytest tests/test_llm_transport.py -v
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from anthropic import NotFoundError
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from src.agents import llm_transport
+from kimi_client import KimiClient
+
+DELAY = 0.1
+
+
+class _FakeMessages:
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(DELAY)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(content=[SimpleNamespace(text=f"answer to {kwargs['messages'][0]['content']}")])
+
+
+class _FakeCompletions:
+    async def create(self, **params):
+        await asyncio.sleep(DELAY)
+        message = SimpleNamespace(role="assistant", content="ok", tool_calls=None)
+        return SimpleNamespace(
+            id="1",
+            model=params["model"],
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=None,
+        )
+
+
+def _complete(prompt):
+    return llm_transport.complete_text(
+        model="m", system_prompt="s", user_prompt=prompt, max_tokens=10, temperature=0
+    )
+
+
+class TestAnthropicTransport:
+    """Test suite for llm_transport"""
+
+    def test_one_client_per_event_loop(self, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+        async def grab():
+            return llm_transport.get_async_anthropic(), llm_transport.get_async_anthropic()
+
+        first, again = asyncio.run(grab())
+        second, _ = asyncio.run(grab())
+        assert first is again
+        assert first is not second
+
+    def test_missing_key(self, monkeypatch):
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        with pytest.raises(RuntimeError):
+            asyncio.run(_complete("x"))
+
+    def test_calls_overlap_instead_of_blocking(self, monkeypatch):
+        fake = SimpleNamespace(messages=_FakeMessages())
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: fake)
+
+        async def run():
+            return await asyncio.gather(*(_complete(str(i)) for i in range(5)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        assert results == [f"answer to {i}" for i in range(5)]
+        assert elapsed < DELAY * 3  # sequential would take 5 * DELAY
+
+    def test_not_found_falls_back_to_agent_sdk(self, monkeypatch):
+        response = SimpleNamespace(status_code=404, headers={}, request=None)
+        error = NotFoundError("model not found", response=response, body=None)
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: SimpleNamespace(messages=_FakeMessages(error)))
+
+        async def fake_sdk(prompt, **kwargs):
+            return f"sdk: {prompt}"
+
+        monkeypatch.setattr(llm_transport, "run_query_via_sdk_async", fake_sdk)
+        assert asyncio.run(_complete("hello")) == "sdk: hello"
+
+
+class TestKimiAsyncClient:
+    """KimiClient.chat_completion_async"""
+
+    def test_async_completions_overlap(self, monkeypatch):
+        client = KimiClient(api_key="test-key")
+        fake = SimpleNamespace(chat=SimpleNamespace(completions=_FakeCompletions()))
+        monkeypatch.setattr(client, "_get_async_client", lambda: fake)
+
+        async def run():
+            return await asyncio.gather(*(
+                client.chat_completion_async(messages=[{"role": "user", "content": "hi"}], system="s")
+                for _ in range(5)
+            ))
+
+        start = time.perf_counter()
+        responses = asyncio.run(run())
+        assert time.perf_counter() - start < DELAY * 3
+        assert [client.get_text_content(r) for r in responses] == ["ok"] * 5
+
+    def test_async_client_is_pooled_per_loop(self):
+        client = KimiClient(api_key="test-key")
+
+        async def grab():
+            return client._get_async_client(), client._get_async_client()
+
+        first, again = asyncio.run(grab())
+        assert first is again
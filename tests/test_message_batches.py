@@ -0,0 +1,200 @@
+"""
+Unit Tests for the offline message-batch backend
+
+Run with: pytest tests/test_message_batches.py -v
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.llm_provider import LLMProvider, ModelRouter
+from src.agents.mathematical_enricher import MathematicalEnricher
+from src.agents.message_batches import BatchRequest, BatchRunner, LocalBatchBackend, tree_levels
+from src.agents.prerequisite_explorer_claude import KnowledgeNode, PrerequisiteExplorer
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+from src.agents.visual_designer import VisualDesigner
+
+PREREQUISITES = {
+    "entropy": ["heat", "probability"],
+    "heat": ["energy"],
+}
+
+
+class InteractiveProvider(LLMProvider):
+    """Provider for the interactive fallback; records every prompt."""
+
+    name = "anthropic"
+    default_model = "m"
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+        self.prompts.append(user_prompt)
+        return self.reply
+
+
+def _concept(params):
+    return re.search(r'Concept: "?([^"\n]+)', params["messages"][0]["content"]).group(1)
+
+
+def classify_responder(params):
+    concept = _concept(params)
+    prerequisites = PREREQUISITES.get(concept, [])
+    return json.dumps({"is_foundation": not prerequisites, "prerequisites": prerequisites})
+
+
+def _requests(*prompts):
+    return [
+        BatchRequest(custom_id=f"r-{i}", model="m", system_prompt="s", user_prompt=p, max_tokens=10, temperature=0)
+        for i, p in enumerate(prompts)
+    ]
+
+
+def _explorer(reply='{"is_foundation": true}'):
+    provider = InteractiveProvider(reply)
+    explorer = PrerequisiteExplorer(
+        max_depth=4,
+        foundation_cache=FoundationVerdictCache(":memory:"),
+        prerequisite_store=InMemoryPrerequisiteStore(),
+        router=ModelRouter(providers={"anthropic": provider}),
+    )
+    return explorer, provider
+
+
+class TestBatchRunner:
+    """Test suite for BatchRunner with the local stand-in"""
+
+    def test_answers_collected_after_batch_ends(self, tmp_path):
+        backend = LocalBatchBackend(str(tmp_path / "batches"), lambda params: params["messages"][0]["content"].upper(),
+                                    polls_until_ended=3)
+        runner = BatchRunner(backend, poll_interval=0)
+
+        answers = asyncio.run(runner.run("step", _requests("a", "b")))
+
+        assert answers == {"r-0": "A", "r-1": "B"}
+        assert runner.stats["submitted"] == 1
+        assert len(backend.batch_ids()) == 1
+
+    def test_failed_requests_come_back_as_none(self, tmp_path):
+        def responder(params):
+            if params["messages"][0]["content"] == "bad":
+                raise RuntimeError("overloaded")
+            return "ok"
+
+        runner = BatchRunner(LocalBatchBackend(str(tmp_path), responder), poll_interval=0)
+        assert asyncio.run(runner.run("step", _requests("good", "bad"))) == {"r-0": "ok", "r-1": None}
+
+    def test_finished_steps_replayed_from_state(self, tmp_path):
+        state = str(tmp_path / "state.json")
+        asyncio.run(BatchRunner(LocalBatchBackend(str(tmp_path / "b"), lambda p: "done"), state, poll_interval=0)
+                    .run("step", _requests("a")))
+
+        def must_not_run(params):
+            raise AssertionError("finished step was resubmitted")
+
+        backend = LocalBatchBackend(str(tmp_path / "b"), must_not_run)
+        runner = BatchRunner(backend, state, poll_interval=0)
+
+        assert asyncio.run(runner.run("step", _requests("a"))) == {"r-0": "done"}
+        assert runner.stats == {"submitted": 0, "resumed": 0, "replayed": 1, "requests": 0}
+        # A changed request set is a different step
+        asyncio.run(BatchRunner(LocalBatchBackend(str(tmp_path / "b"), lambda p: "x"), state, poll_interval=0)
+                    .run("step", _requests("a", "b")))
+        assert len(backend.batch_ids()) == 2
+
+    def test_resumes_submitted_batch_after_crash(self, tmp_path):
+        state = str(tmp_path / "state.json")
+        directory = str(tmp_path / "batches")
+        slow = LocalBatchBackend(directory, lambda p: "late", polls_until_ended=10 ** 6)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(BatchRunner(slow, state, poll_interval=0.01).run("step", _requests("a")), 0.05))
+
+        runner = BatchRunner(LocalBatchBackend(directory, lambda p: "late"), state, poll_interval=0)
+        assert asyncio.run(runner.run("step", _requests("a"))) == {"r-0": "late"}
+        assert runner.stats["resumed"] == 1
+        assert len(slow.batch_ids()) == 1
+
+
+class TestTreeLevels:
+    """Test suite for tree_levels"""
+
+    def test_shared_nodes_listed_once_at_first_level(self):
+        shared = KnowledgeNode("energy", 2, True, [])
+        heat = KnowledgeNode("heat", 1, False, [shared])
+        root = KnowledgeNode("entropy", 0, False, [heat, shared])
+
+        assert [[n.concept for n in level] for level in tree_levels(root)] == [["entropy"], ["heat", "energy"]]
+
+
+class TestExploreBatch:
+    """PrerequisiteExplorer.explore_batch_async submits one batch per level"""
+
+    def test_tree_built_from_level_batches(self, tmp_path):
+        explorer, provider = _explorer()
+        backend = LocalBatchBackend(str(tmp_path), classify_responder)
+
+        tree = asyncio.run(explorer.explore_batch_async("entropy", BatchRunner(backend, poll_interval=0)))
+
+        assert [p.concept for p in tree.prerequisites] == ["heat", "probability"]
+        assert tree.prerequisites[0].prerequisites[0].concept == "energy"
+        assert tree.prerequisites[1].is_foundation
+        assert len(backend.batch_ids()) == 3
+        assert provider.prompts == []
+        # Answers were recorded like interactive ones
+        assert explorer.classify_and_decompose("heat") == (False, ["energy"])
+
+    def test_unusable_answers_asked_individually(self, tmp_path):
+        explorer, provider = _explorer()
+
+        def responder(params):
+            return "I am not sure" if _concept(params) == "heat" else classify_responder(params)
+
+        tree = asyncio.run(explorer.explore_batch_async(
+            "entropy", BatchRunner(LocalBatchBackend(str(tmp_path), responder), poll_interval=0)
+        ))
+
+        assert tree.prerequisites[0].is_foundation
+        assert len(provider.prompts) == 1 and '"heat"' in provider.prompts[0]
+
+
+class TestEnrichAndDesignBatch:
+    """The enrichers submit one batch per level and keep parent context"""
+
+    def test_enrich_and_design_tree(self, tmp_path):
+        tree = KnowledgeNode("entropy", 0, False, [KnowledgeNode("heat", 1, True, [])])
+        prompts = []
+
+        def responder(params):
+            prompts.append(params["messages"][0]["content"])
+            concept = _concept(params)
+            if params["max_tokens"] == 2000:
+                return json.dumps({"equations": [f"{concept} eq"], "interpretation": concept})
+            return json.dumps({"elements": [f"{concept} diagram"], "colors": {concept: "BLUE"}})
+
+        backend = LocalBatchBackend(str(tmp_path), responder)
+        runner = BatchRunner(backend, poll_interval=0)
+        provider = InteractiveProvider("{}")
+        router = ModelRouter(providers={"anthropic": provider})
+
+        asyncio.run(MathematicalEnricher(router=router).enrich_tree_batch_async(tree, runner))
+        asyncio.run(VisualDesigner(router=router).design_tree_batch_async(tree, runner))
+
+        heat = tree.prerequisites[0]
+        assert heat.equations == ["heat eq"]
+        assert heat.visual_spec["interpretation"] == "heat"
+        assert heat.visual_spec["elements"] == ["heat diagram"]
+        # The child's design request saw the parent's spec
+        assert "Previous concept: entropy" in prompts[-1]
+        assert len(backend.batch_ids()) == 4
+        assert provider.prompts == []
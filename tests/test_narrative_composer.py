@@ -0,0 +1,107 @@
+"""
+Unit Tests for concurrent narrative composition
+
+Run with: pytest tests/test_narrative_composer.py -v
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.llm_provider import DEFAULT_ROUTES, TASK_TRANSITIONS, LLMProvider, ModelRouter
+from src.agents.narrative_composer import NarrativeComposer, TRANSITIONS_SYSTEM_PROMPT
+from src.agents.prerequisite_explorer_claude import KnowledgeNode
+
+
+class ScriptedProvider(LLMProvider):
+    """Writes one segment per concept and bridges for the transitions pass"""
+
+    name = "scripted"
+    default_model = "scripted"
+
+    def __init__(self, transitions=None, transitions_error=None):
+        self.transitions = transitions
+        self.transitions_error = transitions_error
+        self.current = 0
+        self.peak = 0
+        self.calls = []
+
+    async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+        if system_prompt == TRANSITIONS_SYSTEM_PROMPT:
+            self.calls.append(("transitions", model))
+            if self.transitions_error is not None:
+                raise self.transitions_error
+            pairs = re.findall(r'^\d+\. From "([^"]*)" to "([^"]*)"$', user_prompt, re.MULTILINE)
+            answer = self.transitions if self.transitions is not None else [f"{a} becomes {b}." for a, b in pairs]
+            return json.dumps(answer)
+
+        concept = re.search(r"^Concept: (.*)$", user_prompt, re.MULTILINE).group(1)
+        self.calls.append(("segment", concept))
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        # Later segments finish first, so stitching cannot rely on completion order
+        await asyncio.sleep(0.05 if concept == "algebra" else 0.01)
+        self.current -= 1
+        return f"Show {concept}. Then pause."
+
+
+def _tree():
+    """calculus -> (limits -> algebra, derivatives)"""
+    return KnowledgeNode(concept="calculus", depth=0, is_foundation=False, prerequisites=[
+        KnowledgeNode(concept="limits", depth=1, is_foundation=False, prerequisites=[
+            KnowledgeNode(concept="algebra", depth=2, is_foundation=True, prerequisites=[]),
+        ]),
+        KnowledgeNode(concept="derivatives", depth=1, is_foundation=True, prerequisites=[]),
+    ])
+
+
+def _composer(provider, **kwargs):
+    routes = {task: "scripted" for task in DEFAULT_ROUTES}
+    routes[TASK_TRANSITIONS] = "scripted:fast"
+    router = ModelRouter(routes, providers={"scripted": provider})
+    return NarrativeComposer(router=router, **kwargs)
+
+
+class TestNarrativeComposer:
+    """Segments are generated at once and stitched in concept order"""
+
+    def test_segments_generated_concurrently_and_stitched_in_order(self):
+        provider = ScriptedProvider()
+        narrative = asyncio.run(_composer(provider, max_concurrency=3).compose_async(_tree()))
+
+        assert narrative.concept_order == ["algebra", "limits", "derivatives", "calculus"]
+        assert provider.peak == 3
+        assert len(provider.calls) == 4
+        positions = [narrative.verbose_prompt.index(f"Show {c}.") for c in narrative.concept_order]
+        assert positions == sorted(positions)
+        assert "### Scene 1: algebra" in narrative.verbose_prompt
+        assert "**Transition**" not in narrative.verbose_prompt
+
+    def test_transition_pass_bridges_each_boundary(self):
+        provider = ScriptedProvider()
+        narrative = asyncio.run(_composer(provider, smooth_transitions=True).compose_async(_tree()))
+
+        assert provider.calls.count(("transitions", "fast")) == 1
+        prompt = narrative.verbose_prompt
+        bridges = re.findall(r"\*\*Transition\*\*: (.*)", prompt)
+        assert bridges == ["algebra becomes limits.", "limits becomes derivatives.", "derivatives becomes calculus."]
+        assert prompt.index("Show limits.") < prompt.index(bridges[1]) < prompt.index("Show derivatives.")
+
+    @pytest.mark.parametrize("answer", [["only one."], "not a list", ["a.", "", "c."]])
+    def test_unusable_transitions_are_dropped(self, answer):
+        provider = ScriptedProvider(transitions=answer)
+        narrative = asyncio.run(_composer(provider, smooth_transitions=True).compose_async(_tree()))
+        assert "**Transition**" not in narrative.verbose_prompt
+        assert narrative.scene_count == 4
+
+    def test_failed_transition_request_keeps_unsmoothed_narrative(self):
+        provider = ScriptedProvider(transitions_error=ConnectionError("transitions route down"))
+        narrative = asyncio.run(_composer(provider, smooth_transitions=True).compose_async(_tree()))
+        assert "**Transition**" not in narrative.verbose_prompt
+        assert all(f"Show {c}." in narrative.verbose_prompt for c in narrative.concept_order)
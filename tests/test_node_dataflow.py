@@ -0,0 +1,219 @@
+"""
+Unit Tests for per-node dataflow scheduling (explore -> enrich -> design)
+
+Run with: pytest tests/test_node_dataflow.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from agents.enrichment_chain import KimiEnrichmentPipeline
+from agents.enrichment_chain import MathematicalContent as KimiMathematicalContent
+from agents.enrichment_chain import VisualSpec as KimiVisualSpec
+from agents.prerequisite_explorer_kimi import KnowledgeNode as KimiNode
+from src.agents.enrichment_cache import EnrichmentCache
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.node_dataflow import NodeDataflow
+from src.agents.prerequisite_explorer_claude import PrerequisiteExplorer
+
+ANSWERS = {
+    "quantum mechanics": {"is_foundation": False, "prerequisites": ["linear algebra", "waves"]},
+    "linear algebra": {"is_foundation": False, "prerequisites": ["vectors", "matrices"]},
+    "waves": {"is_foundation": True, "prerequisites": []},
+    "vectors": {"is_foundation": True, "prerequisites": []},
+    "matrices": {"is_foundation": False, "prerequisites": ["vectors"]},
+}
+
+
+def _nodes(node):
+    yield node
+    for prereq in node.prerequisites:
+        yield from _nodes(prereq)
+
+
+def _explorer(strategy, events):
+    explorer = PrerequisiteExplorer(
+        max_depth=4,
+        foundation_cache=FoundationVerdictCache(":memory:"),
+        combined_mode=True,
+        strategy=strategy,
+    )
+
+    async def fake_complete(system_prompt, user_prompt, *, max_tokens, temperature, task=None):
+        await asyncio.sleep(0.02)
+        asked = [c for c in ANSWERS if f'"{c}"' in user_prompt]
+        events.append(("classify", tuple(asked)))
+        if user_prompt.startswith("For EACH"):
+            return json.dumps({c: ANSWERS[c] for c in asked})
+        return json.dumps(ANSWERS[asked[0]])
+
+    explorer._complete_async = fake_complete
+    return explorer
+
+
+def _dataflow(events, fail_on=None, max_concurrency=8):
+    async def enrich(node):
+        await asyncio.sleep(0.01)
+        if node.concept == fail_on:
+            raise RuntimeError(f"no content for {node.concept}")
+        events.append(("enrich", node.concept))
+        return f"{node.concept}@{node.depth}"
+
+    def apply(node, content):
+        node.equations = [content]
+
+    async def design(node, prerequisites, parent_spec):
+        assert node.equations == [f"{node.concept}@{node.depth}"]
+        await asyncio.sleep(0.01)
+        events.append(("design", node.concept))
+        node.visual_spec = {"after": parent_spec, "prerequisites": prerequisites}
+        return node.concept
+
+    return NodeDataflow(enrich, apply, design, max_concurrency=max_concurrency)
+
+
+class TestNodeDataflow:
+    """Nodes flow through enrichment and design while exploration runs"""
+
+    @pytest.mark.parametrize("strategy", ["depth_first", "level"])
+    def test_stages_overlap_with_exploration(self, strategy):
+        events = []
+
+        async def run():
+            dataflow = _dataflow(events)
+            tree = await _explorer(strategy, events).explore_async("quantum mechanics", on_node=dataflow.submit)
+            explored = len(events)
+            await dataflow.join()
+            return tree, explored
+
+        tree, explored = asyncio.run(run())
+
+        kinds = [kind for kind, _ in events]
+        # The root was enriched and designed before its subtree was fully explored
+        assert kinds.index("enrich") < kinds.index("classify", 1)
+        assert events.index(("design", "quantum mechanics")) < explored
+        for node in _nodes(tree):
+            assert node.visual_spec["prerequisites"] == [p.concept for p in node.prerequisites]
+            for prereq in node.prerequisites:
+                assert prereq.visual_spec["after"] == node.concept
+        assert kinds.count("design") == len(list(_nodes(tree))) == 6
+
+    def test_equal_content_keys_share_one_call(self):
+        events = []
+
+        async def enrich(node):
+            events.append(("enrich", node.concept))
+            return node.concept
+
+        async def design(node, prerequisites, parent_spec):
+            events.append(("design", node.concept))
+            return node.concept
+
+        async def run():
+            dataflow = NodeDataflow(
+                enrich,
+                lambda node, content: setattr(node, "equations", [content]),
+                design,
+                content_key=lambda node: node.concept.lower(),
+            )
+            root = KimiNode("calculus", 0, False, [KimiNode("limits", 1, False, []), KimiNode("Limits", 1, False, [])])
+            dataflow.submit(root, ["limits", "Limits"])
+            for prereq in root.prerequisites:
+                dataflow.submit(prereq, [], parent=root)
+            dataflow.submit(root, ["limits", "Limits"])  # Shared node objects are processed once
+            await dataflow.join()
+            return root
+
+        root = asyncio.run(run())
+        assert [p.equations for p in root.prerequisites] == [["limits"], ["limits"]]
+        assert sorted(events) == [
+            ("design", "Limits"), ("design", "calculus"), ("design", "limits"),
+            ("enrich", "calculus"), ("enrich", "limits"),
+        ]
+
+    def test_parent_must_be_submitted_first(self):
+        async def run():
+            dataflow = _dataflow([])
+            dataflow.submit(KimiNode("limits", 1, False, []), [], parent=KimiNode("calculus", 0, False, []))
+
+        with pytest.raises(ValueError):
+            asyncio.run(run())
+
+    def test_failure_cancels_outstanding_work(self):
+        events = []
+
+        async def run():
+            dataflow = _dataflow(events, fail_on="waves", max_concurrency=1)
+            await _explorer("depth_first", events).explore_async("quantum mechanics", on_node=dataflow.submit)
+            with pytest.raises(RuntimeError, match="no content for waves"):
+                await dataflow.join()
+            seen = len(events)
+            await asyncio.sleep(0.1)
+            return seen
+
+        seen = asyncio.run(run())
+        assert len(events) == seen  # Nothing ran after the failure
+        assert ("design", "waves") not in events
+        assert sum(kind == "design" for kind, _ in events) < 6
+
+
+class TestKimiPipelineDataflow:
+    """KimiEnrichmentPipeline streams nodes unless max_concurrency is None"""
+
+    @staticmethod
+    def _pipeline(max_concurrency, calls):
+        # Each run starts cold, so both modes make their own calls
+        pipeline = KimiEnrichmentPipeline(
+            client=object(), max_concurrency=max_concurrency, enrichment_cache=EnrichmentCache(":memory:")
+        )
+
+        async def fake_math(concept, depth, complexity):
+            await asyncio.sleep(0.01)
+            calls.append(("math", concept))
+            return KimiMathematicalContent(equations=[concept], interpretation=concept)
+
+        async def fake_design(node, parent_spec):
+            assert node.equations
+            await asyncio.sleep(0.01)
+            calls.append(("design", node.concept))
+            return KimiVisualSpec(concept=node.concept, visual_description=parent_spec.concept if parent_spec else "")
+
+        pipeline.math._generate_math_content = fake_math
+        pipeline.visual._generate_visual_spec = fake_design
+        return pipeline
+
+    @staticmethod
+    def _tree():
+        return KimiNode("calculus", 0, False, [
+            KimiNode("limits", 1, False, [KimiNode("algebra", 2, True, [])]),
+            KimiNode("derivatives", 1, False, [KimiNode("Algebra", 2, True, [])]),
+        ])
+
+    def test_streamed_run_matches_stage_by_stage_run(self):
+        async def design_tree(max_concurrency, calls):
+            pipeline = self._pipeline(max_concurrency, calls)
+            tree = self._tree()
+            if max_concurrency is None:
+                await pipeline.math.enrich_tree(tree)
+                await pipeline.visual.design_tree(tree)
+            else:
+                await pipeline._stream_nodes(tree)
+            return tree
+
+        staged_calls, streamed_calls = [], []
+        staged = asyncio.run(design_tree(None, staged_calls))
+        streamed = asyncio.run(design_tree(4, streamed_calls))
+
+        # Each canonical concept is generated and designed once either way
+        assert sorted(streamed_calls) == sorted(staged_calls)
+        assert len(streamed_calls) == 8
+        for staged_node, streamed_node in zip(_nodes(staged), _nodes(streamed)):
+            assert streamed_node.equations == staged_node.equations
+            assert streamed_node.visual_spec == staged_node.visual_spec
@@ -0,0 +1,141 @@
+"""
+Unit Tests for concurrent tree enrichment
+
+Run with: pytest tests/test_parallel_enrichment.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from agents.enrichment_chain import KimiMathematicalEnricher
+from agents.enrichment_chain import MathematicalContent as KimiMathematicalContent
+from agents.prerequisite_explorer_kimi import KnowledgeNode as KimiNode
+from src.agents.enrichment_cache import EnrichmentCache
+from src.agents.mathematical_enricher import MathematicalContent, MathematicalEnricher
+from src.agents.prerequisite_explorer_claude import KnowledgeNode
+
+
+class InFlight:
+    """Counts concurrent calls"""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    async def __aenter__(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        await asyncio.sleep(0.01)
+
+    async def __aexit__(self, *exc_info):
+        self.current -= 1
+
+
+def _tree(node_cls):
+    """calculus -> (limits -> algebra, derivatives -> (limits -> algebra, Algebra), functions)"""
+    def leaf(concept, depth):
+        return node_cls(concept=concept, depth=depth, is_foundation=True, prerequisites=[])
+
+    return node_cls(concept="calculus", depth=0, is_foundation=False, prerequisites=[
+        node_cls(concept="limits", depth=1, is_foundation=False, prerequisites=[leaf("algebra", 2)]),
+        node_cls(concept="derivatives", depth=1, is_foundation=False, prerequisites=[
+            node_cls(concept="limits", depth=2, is_foundation=False, prerequisites=[leaf("algebra", 3)]),
+            leaf("Algebra", 2),
+        ]),
+        leaf("functions", 1),
+    ])
+
+
+def _nodes(node):
+    yield node
+    for prereq in node.prerequisites:
+        yield from _nodes(prereq)
+
+
+class TestMathematicalEnricherTree:
+    """enrich_tree_async fans out over every node"""
+
+    def test_all_nodes_enriched_concurrently_with_identical_requests_shared(self):
+        enricher = MathematicalEnricher()
+        in_flight = InFlight()
+        calls = []
+
+        async def fake_generate(concept, complexity, depth):
+            async with in_flight:
+                calls.append((concept, depth))
+            return MathematicalContent(concept=concept, equations=[f"{concept}@{depth}"])
+
+        enricher._generate_math_content_async = fake_generate
+        root = _tree(KnowledgeNode)
+
+        assert asyncio.run(enricher.enrich_tree_async(root, max_concurrency=3)) is root
+
+        # "algebra" and "Algebra" at depth 2 are one request; algebra at depth 3 is another
+        assert sorted(calls) == [
+            ("algebra", 2), ("algebra", 3), ("calculus", 0), ("derivatives", 1),
+            ("functions", 1), ("limits", 1), ("limits", 2),
+        ]
+        assert in_flight.peak == 3
+        for node in _nodes(root):
+            assert node.equations == [f"{node.concept.lower()}@{node.depth}"]
+            assert "interpretation" in node.visual_spec
+
+    def test_sync_wrapper(self):
+        enricher = MathematicalEnricher()
+
+        async def fake_generate(concept, complexity, depth):
+            return MathematicalContent(concept=concept, equations=[complexity])
+
+        enricher._generate_math_content_async = fake_generate
+        root = enricher.enrich_tree(_tree(KnowledgeNode))
+        assert root.equations == ["undergraduate/graduate level"]
+        assert root.prerequisites[2].equations == ["high school level"]
+
+
+class TestKimiMathematicalEnricherTree:
+    """KimiMathematicalEnricher.enrich_tree(max_concurrency=N)"""
+
+    @staticmethod
+    def _enricher(in_flight, calls):
+        # A cache of its own, so every enricher starts cold
+        enricher = KimiMathematicalEnricher(client=object(), enrichment_cache=EnrichmentCache(":memory:"))
+
+        async def fake_generate(concept, depth, complexity):
+            async with in_flight:
+                calls.append((concept, depth))
+            return KimiMathematicalContent(equations=[f"{concept}@{depth}"], interpretation=concept)
+
+        enricher._generate_math_content = fake_generate
+        return enricher
+
+    def test_concurrent_mode_matches_sequential_walk(self):
+        sequential_calls, concurrent_calls = [], []
+        sequential = _tree(KimiNode)
+        asyncio.run(self._enricher(InFlight(), sequential_calls).enrich_tree(sequential))
+
+        in_flight = InFlight()
+        concurrent = _tree(KimiNode)
+        asyncio.run(self._enricher(in_flight, concurrent_calls).enrich_tree(concurrent, max_concurrency=2))
+
+        # One request per canonical concept, for the node the sequential walk reaches first
+        assert sorted(concurrent_calls) == sorted(sequential_calls) == [
+            ("algebra", 2), ("calculus", 0), ("derivatives", 1), ("functions", 1), ("limits", 1),
+        ]
+        assert in_flight.peak == 2
+        for seq_node, con_node in zip(_nodes(sequential), _nodes(concurrent)):
+            assert con_node.equations == seq_node.equations
+            assert con_node.visual_spec == seq_node.visual_spec
+
+    @pytest.mark.parametrize("max_concurrency", [None, 4])
+    def test_cached_concepts_not_regenerated(self, max_concurrency):
+        calls = []
+        enricher = self._enricher(InFlight(), calls)
+        asyncio.run(enricher.enrich_tree(_tree(KimiNode), max_concurrency=max_concurrency))
+        asyncio.run(enricher.enrich_tree(_tree(KimiNode), max_concurrency=max_concurrency))
+        assert len(calls) == 5
@@ -0,0 +1,82 @@
+"""
+Tests for the end-to-end pipeline benchmark
+
+Run with: pytest tests/test_pipeline_benchmark.py -v
+"""
+
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pipeline_benchmark import BenchmarkConfig, compare_to_baseline, main, percentile, run_benchmark
+
+SMALL_SWEEP = dict(concept_sets=["physics"], depths=[1], concurrency=[2], trees=2, latency="constant:0")
+
+
+def _case(**metrics):
+    case = {"name": "physics/depth=1/concurrency=2", "trees": 2, "errors": 0,
+            "latency_p50_seconds": 1.0, "latency_p95_seconds": 1.0, "latency_p99_seconds": 1.0,
+            "requests_per_tree": 10.0, "tokens_per_tree": 1000.0, "cache_hits_per_tree": 4.0,
+            "peak_traced_mb": 100.0}
+    case.update(metrics)
+    return case
+
+
+class TestPipelineBenchmark:
+    """Test suite for the sweep and the baseline comparison"""
+
+    def test_fake_sweep_recorded_and_replayed(self, tmp_path):
+        cassette = str(tmp_path / "bench.json.gz")
+        fake = run_benchmark(BenchmarkConfig(record=cassette, **SMALL_SWEEP))
+        replayed = run_benchmark(BenchmarkConfig(backend="replay", cassette=cassette, latency_scale=0, **SMALL_SWEEP))
+
+        [case] = fake["cases"]
+        assert case["name"] == "physics/depth=1/concurrency=2"
+        assert case["errors"] == 0
+        # Depth 1, fanout 2: three nodes from analysis to code generation
+        assert case["requests_per_tree"] == 13
+        assert case["latency_p50_seconds"] <= case["latency_p99_seconds"]
+        assert case["tokens_per_tree"] > 0
+        assert case["peak_traced_mb"] > 0
+        assert replayed["cases"][0]["requests_per_tree"] == case["requests_per_tree"]
+        assert replayed["cases"][0]["tokens_per_tree"] == case["tokens_per_tree"]
+        assert compare_to_baseline(replayed, {**fake, "backend": "replay"}, latency_slack=1.0) == []
+
+    def test_regressions_beyond_threshold(self):
+        baseline = {"backend": "fake", "cases": [_case()]}
+        report = {"backend": "fake", "cases": [_case(requests_per_tree=12.0, latency_p99_seconds=1.04)]}
+        [regression] = compare_to_baseline(report, baseline, threshold=0.1)
+        assert "requests_per_tree 10.0 -> 12.0 (+20%)" in regression
+
+        fewer_hits = {"backend": "fake", "cases": [_case(cache_hits_per_tree=2.0)]}
+        [regression] = compare_to_baseline(fewer_hits, baseline, threshold=0.1)
+        assert "cache_hits_per_tree 4.0 -> 2.0 (-50%)" in regression
+
+        failing = {"backend": "fake", "cases": [_case(errors=1)]}
+        assert compare_to_baseline(failing, baseline) == ["physics/depth=1/concurrency=2: 1 of 2 trees failed"]
+        assert compare_to_baseline(report, {**baseline, "backend": "replay"}, threshold=0.1) == []
+
+    def test_latency_gated_only_on_request_and_same_host(self):
+        baseline = {"backend": "fake", "host": "a", "cases": [_case()]}
+        slower = {"backend": "fake", "host": "a", "cases": [_case(latency_p99_seconds=2.0, peak_traced_mb=500.0)]}
+        assert compare_to_baseline(slower, baseline) == []
+        [regression] = compare_to_baseline(slower, baseline, compare_latency=True)
+        assert "latency_p99_seconds 1.0 -> 2.0" in regression
+        assert compare_to_baseline({**slower, "host": "b"}, baseline, compare_latency=True) == []
+
+    def test_cli_fails_on_regression(self, tmp_path):
+        baseline = str(tmp_path / "baseline.json")
+        args = ["--concept-sets", "physics", "--depths", "1", "--concurrency", "1", "--trees", "1",
+                "--latency", "constant:0", "--output", str(tmp_path / "report.json"), "--baseline", baseline]
+        assert main(args + ["--update-baseline"]) == 0
+        assert main(args) == 0
+        assert main(args + ["--fanout", "3"]) == 1  # More prerequisites, more requests per tree
+
+    def test_nearest_rank_percentile(self):
+        assert percentile([], 0.5) is None
+        assert percentile([3.0, 1.0, 2.0, 4.0], 0.5) == 2.0
+        assert percentile(list(range(1, 101)), 0.99) == 99
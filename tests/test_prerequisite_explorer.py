@@ -393,6 +393,59 @@ class TestAsyncExploration:
             assert len(prereqs) > 0
 
 
+class TestConcurrentSiblingExploration:
+    """Test that sibling subtrees are explored concurrently (mocked, no API)"""
+
+    PREREQS = {
+        "quantum mechanics": ["linear algebra", "waves", "probability"],
+        "linear algebra": ["vectors", "matrices"],
+        "probability": ["counting"],
+    }
+
+    def _make_explorer(self, max_concurrency, delay=0.02):
+        explorer = PrerequisiteExplorer(max_depth=3, max_concurrency=max_concurrency)
+        stats = {"in_flight": 0, "peak": 0}
+
+        async def track():
+            stats["in_flight"] += 1
+            stats["peak"] = max(stats["peak"], stats["in_flight"])
+            await asyncio.sleep(delay)
+            stats["in_flight"] -= 1
+
+        async def fake_is_foundation(concept):
+            await track()
+            return concept not in self.PREREQS
+
+        async def fake_lookup(concept):
+            await track()
+            return self.PREREQS[concept]
+
+        explorer.is_foundation_async = fake_is_foundation
+        explorer.lookup_prerequisites_async = fake_lookup
+        return explorer, stats
+
+    def test_prerequisite_order_preserved(self):
+        explorer, _ = self._make_explorer(max_concurrency=8)
+        tree = asyncio.run(explorer.explore_async("quantum mechanics"))
+
+        assert [p.concept for p in tree.prerequisites] == self.PREREQS["quantum mechanics"]
+        assert [p.concept for p in tree.prerequisites[0].prerequisites] == ["vectors", "matrices"]
+        assert tree.prerequisites[1].is_foundation
+        assert tree.prerequisites[0].prerequisites[0].depth == 2
+
+    def test_concurrency_limit_respected(self):
+        explorer, stats = self._make_explorer(max_concurrency=2)
+        asyncio.run(explorer.explore_async("quantum mechanics"))
+
+        assert stats["peak"] == 2
+
+    def test_siblings_overlap(self):
+        explorer, stats = self._make_explorer(max_concurrency=8)
+        asyncio.run(explorer.explore_async("quantum mechanics"))
+
+        assert stats["peak"] >= len(self.PREREQS["quantum mechanics"])
+
+
 class TestErrorHandling:
     """Test error handling and edge cases"""
 
@@ -0,0 +1,190 @@
+"""
+Unit Tests for the shared PrerequisiteStore backends
+
+Run with: pytest tests/test_prerequisite_store.py -v
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.prerequisite_explorer_claude import PREREQUISITES_PROMPT_HASH, PrerequisiteExplorer
+from src.agents.prerequisite_store import (
+    InMemoryPrerequisiteStore,
+    JSONLPrerequisiteStore,
+    SQLitePrerequisiteStore,
+    create_prerequisite_store,
+    prompt_hash,
+)
+
+KEY = {"model": "test-model", "prompt_hash": "abc123"}
+
+
+@pytest.fixture(params=["memory", "sqlite", "jsonl"])
+def make_store(request, tmp_path):
+    """Factory building a fresh store of each backend"""
+    def factory(**kwargs):
+        if request.param == "memory":
+            return InMemoryPrerequisiteStore(**kwargs)
+        if request.param == "sqlite":
+            return SQLitePrerequisiteStore(tmp_path / "store.sqlite3", **kwargs)
+        return JSONLPrerequisiteStore(tmp_path / "store.jsonl", **kwargs)
+    return factory
+
+
+def _write_entries(path, start, count, backend="sqlite"):
+    store = SQLitePrerequisiteStore(path) if backend == "sqlite" else JSONLPrerequisiteStore(path)
+    for i in range(start, start + count):
+        store.set(f"concept {i}", [f"prereq {i}"], **KEY)
+    store.close()
+
+
+class TestPrerequisiteStore:
+    """Behaviour shared by every backend"""
+
+    def test_round_trip_with_canonical_key(self, make_store):
+        store = make_store()
+        store.set("Lorentz Transformations", ["special relativity"], **KEY)
+
+        assert store.get("lorentz transformation", **KEY) == ["special relativity"]
+        assert store.get("lorentz transformation", model="other", prompt_hash="abc123") is None
+        assert store.get("lorentz transformation", model="test-model", prompt_hash="changed") is None
+        assert store.stats()["hits"] == 1
+
+    def test_ttl_expires_entries(self, make_store, monkeypatch):
+        store = make_store(ttl_seconds=60)
+        store.set("calculus", ["limits"], **KEY)
+
+        real_time = time.time
+        monkeypatch.setattr(time, "time", lambda: real_time() + 120)
+        assert store.get("calculus", **KEY) is None
+        assert len(store) == 0
+
+    def test_lru_eviction(self, make_store):
+        store = make_store(max_entries=2)
+        store.set("a concept", ["x"], **KEY)
+        store.set("b concept", ["y"], **KEY)
+        assert store.get("a concept", **KEY) == ["x"]  # b becomes least recently used
+        store.set("c concept", ["z"], **KEY)
+
+        assert len(store) == 2
+        assert store.get("b concept", **KEY) is None
+        assert store.get("a concept", **KEY) == ["x"]
+        assert store.stats()["evictions"] == 1
+
+    def test_create_from_spec(self, tmp_path):
+        assert isinstance(create_prerequisite_store("memory"), InMemoryPrerequisiteStore)
+        assert isinstance(create_prerequisite_store(f"sqlite:{tmp_path / 'a.db'}"), SQLitePrerequisiteStore)
+        assert isinstance(create_prerequisite_store(f"jsonl:{tmp_path / 'a.jsonl'}"), JSONLPrerequisiteStore)
+        with pytest.raises(ValueError):
+            create_prerequisite_store("redis://localhost")
+
+    def test_prompt_hash_changes_with_prompt(self):
+        assert prompt_hash("a", "b") == prompt_hash("a", "b")
+        assert prompt_hash("a", "b") != prompt_hash("a", "c")
+
+
+class TestSharedAcrossProcesses:
+    """Entries written by one worker are visible to the others"""
+
+    def test_sqlite_concurrent_writers(self, tmp_path):
+        path = tmp_path / "shared.sqlite3"
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=_write_entries, args=(path, i * 20, 20)) for i in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        store = SQLitePrerequisiteStore(path)
+        assert len(store) == 60
+        assert store.get("concept 42", **KEY) == ["prereq 42"]
+
+    def test_jsonl_picks_up_other_writers_and_compacts(self, tmp_path):
+        path = tmp_path / "shared.jsonl"
+        reader = JSONLPrerequisiteStore(path)
+        writer = JSONLPrerequisiteStore(path)
+        writer.set("calculus", ["limits"], **KEY)
+        writer.set("calculus", ["limits", "functions"], **KEY)
+        writer.delete("calculus", **KEY)
+        writer.set("algebra", ["arithmetic"], **KEY)
+
+        assert reader.get("algebra", **KEY) == ["arithmetic"]
+        assert reader.get("calculus", **KEY) is None
+
+        writer.compact()
+        assert len(path.read_text().splitlines()) == 1
+        assert JSONLPrerequisiteStore(path).get("algebra", **KEY) == ["arithmetic"]
+
+    def test_jsonl_other_store_follows_compaction_and_clear(self, tmp_path):
+        path = tmp_path / "shared.jsonl"
+        compactor = JSONLPrerequisiteStore(path)
+        other = JSONLPrerequisiteStore(path)
+        for i in range(5):
+            other.set("calculus", [f"limits {i}"], **KEY)
+        compactor.set("algebra", ["arithmetic"], **KEY)
+        assert compactor.get("calculus", **KEY) == ["limits 4"]
+
+        # The log is now far shorter than the other store's offset
+        compactor.compact()
+        other.set("geometry", ["points"], **KEY)
+        assert other.get("geometry", **KEY) == ["points"]
+        assert compactor.get("geometry", **KEY) == ["points"]
+        other.set("trigonometry", ["angles"], **KEY)
+        assert compactor.get("trigonometry", **KEY) == ["angles"]
+        assert JSONLPrerequisiteStore(path).get("algebra", **KEY) == ["arithmetic"]
+
+        compactor.clear()
+        compactor.set("topology", ["sets"], **KEY)
+        assert other.get("topology", **KEY) == ["sets"]
+        assert other.get("algebra", **KEY) is None
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs fcntl locks")
+    def test_jsonl_compaction_loses_no_concurrent_appends(self, tmp_path):
+        path = tmp_path / "shared.jsonl"
+        compactor = JSONLPrerequisiteStore(path)
+        ctx = multiprocessing.get_context("spawn")
+        workers = [ctx.Process(target=_write_entries, args=(path, i * 50, 50, "jsonl")) for i in range(2)]
+        for worker in workers:
+            worker.start()
+        while any(worker.is_alive() for worker in workers):
+            compactor.compact()
+            time.sleep(0.001)
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+
+        compactor.compact()
+        store = JSONLPrerequisiteStore(path)
+        assert len(store) == 100
+        assert store.get("concept 92", **KEY) == ["prereq 92"]
+
+
+class TestExplorerUsesStore:
+    """A second explorer (another run or worker) never pays twice"""
+
+    def test_second_explorer_hits_store(self):
+        store = InMemoryPrerequisiteStore()
+        calls = []
+
+        async def fake_discover(concept):
+            calls.append(concept)
+            return ["algebra"]
+
+        for _ in range(2):
+            explorer = PrerequisiteExplorer(
+                foundation_cache=FoundationVerdictCache(":memory:"), prerequisite_store=store
+            )
+            explorer.discover_prerequisites_async = fake_discover
+            assert asyncio.run(explorer.lookup_prerequisites_async("Calculus")) == ["algebra"]
+
+        assert calls == ["Calculus"]
+        assert store.get("calculus", model=explorer.model, prompt_hash=PREREQUISITES_PROMPT_HASH) == ["algebra"]
@@ -0,0 +1,226 @@
+"""
+Unit Tests for Anthropic prompt caching of static system prompts
+
+Run with: pytest tests/test_prompt_cache.py -v
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents import llm_transport
+from src.agents.llm_provider import AnthropicProvider, LLMProvider, ModelRouter, OpenAICompatibleProvider
+from src.agents.mathematical_enricher import MATH_CONTENT_FEW_SHOT, MathematicalEnricher
+from src.agents.prerequisite_explorer_claude import KnowledgeNode
+from src.agents.rate_limiter import estimate_tokens
+from src.agents.visual_designer import VISUAL_DESIGN_FEW_SHOT, VisualDesigner
+
+# Shortest prefix Anthropic caches for Sonnet/Opus
+MIN_CACHEABLE_TOKENS = 1024
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.delenv("MATH_TO_MANIM_PROMPT_CACHE", raising=False)
+    llm_transport.reset_prompt_cache_stats()
+    yield
+    llm_transport.reset_prompt_cache_stats()
+
+
+def _fake_anthropic(monkeypatch, usage):
+    """Install a fake AsyncAnthropic client that records each request."""
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return SimpleNamespace(content=[SimpleNamespace(text="done")], usage=SimpleNamespace(**usage))
+
+    fake = SimpleNamespace(messages=SimpleNamespace(create=create))
+    monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: fake)
+    return requests
+
+
+class TestSystemBlocks:
+    """Test suite for the system parameter sent to the Messages API"""
+
+    def test_plain_string_without_cache_or_few_shot(self):
+        assert llm_transport._system_blocks("sys", None, False) == "sys"
+
+    def test_breakpoint_on_last_static_block(self):
+        blocks = llm_transport._system_blocks("sys", "examples", True)
+        assert [block["text"] for block in blocks] == ["sys", "examples"]
+        assert "cache_control" not in blocks[0]
+        assert blocks[1]["cache_control"] == {"type": "ephemeral"}
+
+    def test_few_shot_without_cache_has_no_breakpoint(self):
+        blocks = llm_transport._system_blocks("sys", "examples", False)
+        assert all("cache_control" not in block for block in blocks)
+
+
+class TestCompleteText:
+    """Test suite for caching in complete_text"""
+
+    def test_env_toggle_and_usage_recorded(self, monkeypatch):
+        requests = _fake_anthropic(monkeypatch, {
+            "input_tokens": 20,
+            "output_tokens": 5,
+            "cache_read_input_tokens": 1500,
+            "cache_creation_input_tokens": 0,
+        })
+        monkeypatch.setenv("MATH_TO_MANIM_PROMPT_CACHE", "1")
+
+        async def run():
+            for _ in range(2):
+                await llm_transport.complete_text(
+                    model="m", system_prompt="sys", user_prompt="u",
+                    max_tokens=10, temperature=0, few_shot="examples",
+                )
+
+        asyncio.run(run())
+
+        assert requests[0]["system"][-1]["cache_control"] == {"type": "ephemeral"}
+        # The per-node content stays in the user turn, after the cached prefix
+        assert requests[0]["messages"] == [{"role": "user", "content": "u"}]
+        assert llm_transport.prompt_cache_stats()["m"] == {
+            "requests": 2,
+            "uncached_input_tokens": 40,
+            "cache_read_input_tokens": 3000,
+            "cache_creation_input_tokens": 0,
+        }
+
+    def test_disabled_by_default(self, monkeypatch):
+        requests = _fake_anthropic(monkeypatch, {"input_tokens": 3, "output_tokens": 2})
+
+        asyncio.run(llm_transport.complete_text(
+            model="m", system_prompt="sys", user_prompt="u", max_tokens=10, temperature=0
+        ))
+
+        assert requests[0]["system"] == "sys"
+
+    def test_provider_setting_overrides_env(self, monkeypatch):
+        requests = _fake_anthropic(monkeypatch, {"input_tokens": 3, "output_tokens": 2})
+
+        asyncio.run(AnthropicProvider(prompt_cache=True).complete(
+            system_prompt="sys", user_prompt="u", model="m"
+        ))
+
+        assert requests[0]["system"][-1]["cache_control"] == {"type": "ephemeral"}
+
+
+class TestFewShotPlumbing:
+    """Static few-shot blocks reach every provider"""
+
+    def test_openai_compatible_joins_few_shot_into_system_message(self):
+        provider = OpenAICompatibleProvider(
+            "deepseek", base_url="http://localhost", api_key_env="UNUSED", default_model="m"
+        )
+        requests = []
+
+        async def create(**kwargs):
+            requests.append(kwargs)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+                usage=SimpleNamespace(total_tokens=5),
+            )
+
+        fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        provider._client = lambda: fake
+
+        asyncio.run(provider.complete(system_prompt="sys", user_prompt="u", model="m", few_shot="examples"))
+
+        assert requests[0]["messages"][0] == {"role": "system", "content": "sys\n\nexamples"}
+
+    def test_enricher_sends_examples_as_few_shot(self):
+        class Recording(LLMProvider):
+            name = "anthropic"
+            default_model = "m"
+
+            def __init__(self):
+                self.calls = []
+
+            async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+                self.calls.append((user_prompt, few_shot))
+                return '{"equations": ["E = mc^2"]}'
+
+        provider = Recording()
+        enricher = MathematicalEnricher(router=ModelRouter(providers={"anthropic": provider}))
+        node = KnowledgeNode(concept="mass-energy equivalence", depth=0, is_foundation=False, prerequisites=[])
+
+        asyncio.run(enricher.enrich_node_async(node))
+
+        user_prompt, few_shot = provider.calls[0]
+        assert few_shot == MATH_CONTENT_FEW_SHOT
+        assert "Newton's Second Law" not in user_prompt
+        assert node.equations == ["E = mc^2"]
+
+
+class TestCachedPrefixes:
+    """The agents' static prefixes are long enough to be cached"""
+
+    def test_enricher_prefix_reaches_minimum(self):
+        system_prompt, _ = MathematicalEnricher._math_content_prompts("limits", "high school level", 2)
+        other_prompt, _ = MathematicalEnricher._math_content_prompts("entropy", "undergraduate/graduate level", 0)
+
+        assert other_prompt == system_prompt
+        assert estimate_tokens(system_prompt, MATH_CONTENT_FEW_SHOT) >= MIN_CACHEABLE_TOKENS
+
+    def test_visual_designer_prefix_reaches_minimum(self):
+        system_prompt, _ = VisualDesigner._visual_spec_prompts("limits", [], [], 2, True, None)
+        other_prompt, _ = VisualDesigner._visual_spec_prompts("entropy", ["S = k ln W"], ["probability"], 0, False, None)
+
+        assert other_prompt == system_prompt
+        assert estimate_tokens(system_prompt, VISUAL_DESIGN_FEW_SHOT) >= MIN_CACHEABLE_TOKENS
+
+    def test_multi_node_tree_reads_cached_prefixes(self, monkeypatch):
+        written = set()
+        requests = []
+
+        async def create(**kwargs):
+            # Mimic the API: a prefix above the minimum is written once, then read
+            requests.append(kwargs)
+            prefix = "".join(block["text"] for block in kwargs["system"])
+            prefix_tokens = estimate_tokens(prefix)
+            usage = {
+                "input_tokens": estimate_tokens(kwargs["messages"][0]["content"]),
+                "output_tokens": 20,
+                "cache_read_input_tokens": 0,
+                "cache_creation_input_tokens": 0,
+            }
+            if "cache_control" not in kwargs["system"][-1] or prefix_tokens < MIN_CACHEABLE_TOKENS:
+                usage["input_tokens"] += prefix_tokens
+            elif prefix in written:
+                usage["cache_read_input_tokens"] = prefix_tokens
+            else:
+                written.add(prefix)
+                usage["cache_creation_input_tokens"] = prefix_tokens
+            text = '{"equations": ["x = 1"], "elements": ["Dot"]}'
+            return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=SimpleNamespace(**usage))
+
+        fake = SimpleNamespace(messages=SimpleNamespace(create=create))
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: fake)
+        router = ModelRouter(providers={"anthropic": AnthropicProvider(prompt_cache=True)})
+        enricher = MathematicalEnricher(router=router)
+        designer = VisualDesigner(router=router)
+        leaves = [
+            KnowledgeNode(concept=concept, depth=1, is_foundation=True, prerequisites=[])
+            for concept in ("distance", "time")
+        ]
+        root = KnowledgeNode(concept="velocity", depth=0, is_foundation=False, prerequisites=leaves)
+
+        async def run():
+            await enricher.enrich_tree_async(root)
+            await designer.design_node_async(root)
+
+        asyncio.run(run())
+
+        math_prefix = estimate_tokens(requests[0]["system"][0]["text"], MATH_CONTENT_FEW_SHOT)
+        visual_prefix = estimate_tokens(requests[-1]["system"][0]["text"], VISUAL_DESIGN_FEW_SHOT)
+        stats = llm_transport.prompt_cache_stats()[enricher.model]
+        assert stats["requests"] == 6
+        assert stats["cache_creation_input_tokens"] == math_prefix + visual_prefix
+        assert stats["cache_read_input_tokens"] == 2 * (math_prefix + visual_prefix)
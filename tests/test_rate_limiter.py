@@ -0,0 +1,247 @@
+"""
+Unit Tests for the shared rate limiter and AIMD concurrency controller
+
+Run with: pytest tests/test_rate_limiter.py -v
+"""
+
+import asyncio
+import os
+import sys
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from src.agents import llm_transport
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.improved_prerequisite_explorer import ImprovedPrerequisiteExplorer
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+from src.agents.rate_limiter import (
+    DeadlineExceeded,
+    RateLimitConfig,
+    RateLimiter,
+    TokenBucket,
+    configure_rate_limits,
+    get_rate_limiter,
+    load_rate_limits,
+    rate_limiter_stats,
+    request_deadline,
+    retry_after_seconds,
+)
+
+
+class FakeAPIError(Exception):
+    """Mimics anthropic/openai APIStatusError: status_code plus response headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def _flaky(failures):
+    """Request factory that raises the given errors before succeeding."""
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return "ok"
+
+    return request, calls
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket"""
+
+    def test_burst_then_wait_for_refill(self):
+        bucket = TokenBucket(per_minute=60)  # One token per second, burst of 60
+        assert bucket.reserve(60, now=bucket._updated) == 0.0
+        assert bucket.reserve(1, now=bucket._updated) == pytest.approx(1.0)
+        # Refund returns over-estimated budget
+        bucket.refund(1)
+        assert bucket.reserve(1, now=bucket._updated) == pytest.approx(1.0)
+
+
+class TestRetryAfter:
+    """Test suite for Retry-After parsing"""
+
+    def test_seconds_milliseconds_and_date(self):
+        assert retry_after_seconds(FakeAPIError(429, {"retry-after": "3"})) == 3.0
+        assert retry_after_seconds(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+        later = formatdate(timeval=None, usegmt=True)
+        assert retry_after_seconds(FakeAPIError(429, {"retry-after": later})) <= 1.0
+        assert retry_after_seconds(FakeAPIError(429)) is None
+
+
+class TestRateLimiter:
+    """Test suite for RateLimiter"""
+
+    def test_throttled_request_is_retried_and_limit_halved(self):
+        limiter = RateLimiter("p", "m", RateLimitConfig(initial_concurrency=8))
+        request, calls = _flaky([FakeAPIError(429, {"retry-after": "0"})])
+
+        assert asyncio.run(limiter.call(request)) == "ok"
+        assert len(calls) == 2
+        stats = limiter.stats()
+        assert stats["throttled"] == 1
+        assert stats["retries"] == 1
+        # Halved to 4, then one success adds 1/4
+        assert stats["limit"] == 4
+
+    def test_additive_increase_up_to_max(self):
+        limiter = RateLimiter("p", "m", RateLimitConfig(initial_concurrency=2, max_concurrency=3))
+
+        async def ok():
+            return "ok"
+
+        async def run():
+            for _ in range(10):
+                await limiter.call(ok)
+
+        asyncio.run(run())
+        assert limiter.limit == 3
+
+    def test_concurrency_capped_by_limit(self):
+        limiter = RateLimiter("p", "m", RateLimitConfig(initial_concurrency=2, max_concurrency=2))
+        active = []
+        peak = []
+        depths = []
+
+        async def request():
+            active.append(1)
+            peak.append(len(active))
+            depths.append(limiter.stats()["queue_depth"])
+            await asyncio.sleep(0.01)
+            active.pop()
+            return "ok"
+
+        async def run():
+            return await asyncio.gather(*(limiter.call(request) for _ in range(6)))
+
+        assert asyncio.run(run()) == ["ok"] * 6
+        assert max(peak) == 2
+        assert max(depths) > 0
+        assert limiter.stats()["in_flight"] == 0
+
+    def test_client_errors_are_not_retried(self):
+        limiter = RateLimiter("p", "m")
+        request, calls = _flaky([FakeAPIError(400)])
+
+        with pytest.raises(FakeAPIError):
+            asyncio.run(limiter.call(request))
+        assert len(calls) == 1
+        assert limiter.stats()["failed"] == 1
+
+    def test_gives_up_after_max_retries(self):
+        limiter = RateLimiter("p", "m", RateLimitConfig(max_retries=2))
+        error = FakeAPIError(429, {"retry-after": "0"})
+        request, calls = _flaky([error, error, error, error])
+
+        with pytest.raises(FakeAPIError):
+            asyncio.run(limiter.call(request))
+        assert len(calls) == 3
+
+    def test_sync_call_retries_throttled_request(self):
+        limiter = RateLimiter("p", "m")
+        attempts = []
+
+        def request():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise FakeAPIError(529, {"retry-after-ms": "0"})
+            return "ok"
+
+        assert limiter.call_sync(request) == "ok"
+        assert len(attempts) == 2
+
+
+class TestDeadlines:
+    """Retries and attempts are bounded by the request deadline"""
+
+    def test_no_retry_scheduled_past_deadline(self):
+        limiter = RateLimiter("p", "m")
+        error = FakeAPIError(429, {"retry-after": "5"})
+        request, calls = _flaky([error, error])
+
+        async def run():
+            with request_deadline(0.5):
+                await limiter.call(request)
+
+        with pytest.raises(FakeAPIError):
+            asyncio.run(run())
+        assert len(calls) == 1
+
+    def test_slow_attempt_cut_off_at_deadline(self):
+        limiter = RateLimiter("p", "m", RateLimitConfig(deadline_seconds=0.05))
+
+        async def slow():
+            await asyncio.sleep(5)
+
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(limiter.call(slow))
+        assert limiter.stats()["failed"] == 1
+        assert limiter.stats()["in_flight"] == 0
+
+
+class TestRegistry:
+    """Test suite for the process-wide limiter registry"""
+
+    def test_limiters_shared_and_configured_per_model(self):
+        configure_rate_limits(load_rate_limits(
+            '{"anthropic": {"rpm": 50}, "anthropic:claude-haiku-4-5": {"rpm": 500}}'
+        ))
+        assert get_rate_limiter("anthropic", "claude-sonnet-4-5") is get_rate_limiter("anthropic", "claude-sonnet-4-5")
+        assert get_rate_limiter("anthropic", "claude-sonnet-4-5").config.rpm == 50
+        assert get_rate_limiter("anthropic", "claude-haiku-4-5").config.rpm == 500
+        assert set(rate_limiter_stats()) == {"anthropic:claude-sonnet-4-5", "anthropic:claude-haiku-4-5"}
+
+    def test_unknown_setting_rejected(self):
+        with pytest.raises(ValueError):
+            load_rate_limits('{"anthropic": {"requests_per_minute": 50}}')
+
+    def test_transport_retries_429(self, monkeypatch):
+        responses = [FakeAPIError(429, {"retry-after": "0"})]
+
+        async def create(**kwargs):
+            if responses:
+                raise responses.pop()
+            return SimpleNamespace(
+                content=[SimpleNamespace(text="done")],
+                usage=SimpleNamespace(input_tokens=3, output_tokens=2),
+            )
+
+        fake = SimpleNamespace(messages=SimpleNamespace(create=create))
+        monkeypatch.setattr(llm_transport, "get_async_anthropic", lambda: fake)
+
+        text = asyncio.run(llm_transport.complete_text(
+            model="m", system_prompt="s", user_prompt="u", max_tokens=10, temperature=0
+        ))
+
+        assert text == "done"
+        assert get_rate_limiter("anthropic", "m").stats()["throttled"] == 1
+
+    def test_improved_explorer_goes_through_shared_limiter(self, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+        explorer = ImprovedPrerequisiteExplorer(
+            model="m", foundation_cache=FoundationVerdictCache(":memory:"),
+            prerequisite_store=InMemoryPrerequisiteStore(),
+        )
+        assert explorer.client.max_retries == 0
+        responses = [FakeAPIError(429, {"retry-after": "0"})]
+
+        def create(**kwargs):
+            if responses:
+                raise responses.pop()
+            return SimpleNamespace(
+                content=[SimpleNamespace(text="yes")],
+                usage=SimpleNamespace(input_tokens=3, output_tokens=1),
+            )
+
+        explorer.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+        assert explorer.is_foundation("addition") is True
+        assert get_rate_limiter("anthropic", "m").stats()["throttled"] == 1
@@ -0,0 +1,185 @@
+"""
+Unit Tests for per-run token, cost and latency accounting
+
+Run with: pytest tests/test_run_metrics.py -v
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from kimi_client import KimiClient
+from src.agents import agent_orchestrator, llm_transport
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.llm_provider import AnthropicProvider, LLMProvider, ModelRouter
+from src.agents.orchestrator import AnimationResult
+from src.agents.prerequisite_explorer_claude import PrerequisiteExplorer
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+from src.agents.run_metrics import collect_metrics, llm_call, metrics_stage, model_price
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={"retry-after": "0"})
+
+
+class CannedProvider(LLMProvider):
+    name = "anthropic"
+    default_model = "claude-sonnet-4-5"
+
+    def __init__(self, reply="no"):
+        self.reply = reply
+
+    async def complete(self, *, system_prompt, user_prompt, model=None, max_tokens=1024, temperature=0.7, few_shot=None):
+        with llm_call(model) as call:
+            call.prompt_tokens, call.completion_tokens = 100, 10
+        return self.reply
+
+
+class TestRunMetrics:
+    """Test suite for the collector"""
+
+    def test_calls_attributed_to_stage_agent_and_model(self):
+        with collect_metrics() as metrics:
+            with metrics_stage("narrative_composition", agent="NarrativeComposer"):
+                with llm_call("claude-sonnet-4-5") as call:
+                    call.prompt_tokens, call.completion_tokens = 1_000_000, 100_000
+            with llm_call("unknown-model", agent="kimi") as call:
+                call.prompt_tokens = 5
+
+        report = metrics.to_dict()
+        assert report["totals"]["calls"] == 2
+        assert report["totals"]["unpriced_calls"] == 1
+        stage = report["by_stage"]["narrative_composition"]
+        assert stage["cost_usd"] == pytest.approx(3.0 + 1.5)
+        assert report["by_agent"]["NarrativeComposer"]["total_tokens"] == 1_100_000
+        assert report["by_agent"]["kimi"]["prompt_tokens"] == 5
+        assert set(report["by_model"]) == {"claude-sonnet-4-5", "unknown-model"}
+
+    def test_errors_recorded_and_nothing_without_collector(self):
+        with llm_call("m"):
+            pass  # No collector: a no-op
+
+        with collect_metrics() as metrics:
+            with pytest.raises(RuntimeError):
+                with llm_call("m"):
+                    raise RuntimeError("boom")
+        assert metrics.totals["errors"] == 1
+
+    def test_nested_collectors_propagate(self):
+        with collect_metrics() as outer:
+            with collect_metrics() as inner:
+                with llm_call("m") as call:
+                    call.completion_tokens = 7
+        assert inner.totals["completion_tokens"] == outer.totals["completion_tokens"] == 7
+
+    def test_price_lookup_by_prefix_and_override(self, monkeypatch):
+        assert model_price("claude-haiku-4-5-20251001") == (1.0, 5.0)
+        assert model_price("mystery") is None
+        monkeypatch.setenv("MATH_TO_MANIM_MODEL_PRICES", json.dumps({"mystery": [2, 4]}))
+        assert model_price("mystery") == (2.0, 4.0)
+
+
+class TestCallPaths:
+    """The shared call paths report into the active collector"""
+
+    def test_anthropic_transport_records_usage_cache_and_retries(self, monkeypatch):
+        responses = [FakeAPIError(429)]
+
+        async def create(**kwargs):
+            if responses:
+                raise responses.pop()
+            return SimpleNamespace(
+                content=[SimpleNamespace(text="yes")],
+                usage=SimpleNamespace(
+                    input_tokens=10, output_tokens=2, cache_read_input_tokens=90, cache_creation_input_tokens=0
+                ),
+            )
+
+        monkeypatch.setattr(
+            llm_transport, "get_async_anthropic", lambda: SimpleNamespace(messages=SimpleNamespace(create=create))
+        )
+        router = ModelRouter(providers={"anthropic": AnthropicProvider()})
+
+        async def run():
+            with collect_metrics() as metrics:
+                await router.complete("narrative", model="claude-sonnet-4-5", system_prompt="s", user_prompt="u")
+            return metrics
+
+        report = asyncio.run(run()).to_dict()
+
+        narrative = report["by_agent"]["narrative"]
+        assert narrative["calls"] == 1
+        assert narrative["retries"] == 1
+        assert narrative["prompt_tokens"] == 100
+        assert narrative["cache_read_tokens"] == 90
+        assert report["totals"]["latency_p50_seconds"] is not None
+
+    def test_kimi_usage_is_recorded(self):
+        client = KimiClient(api_key="test-key", model="kimi-k2-thinking")
+        response = SimpleNamespace(
+            id="r", model="kimi-k2-thinking",
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content="hi", tool_calls=None))],
+            usage=SimpleNamespace(prompt_tokens=40, completion_tokens=8, total_tokens=48),
+        )
+        client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: response)))
+
+        with collect_metrics() as metrics:
+            client.chat_completion([{"role": "user", "content": "hello"}])
+
+        kimi = metrics.to_dict()["by_agent"]["kimi"]
+        assert (kimi["prompt_tokens"], kimi["completion_tokens"]) == (40, 8)
+        assert kimi["cost_usd"] > 0
+
+    def test_explorer_cache_hits_counted(self):
+        explorer = PrerequisiteExplorer(
+            foundation_cache=FoundationVerdictCache(":memory:"),
+            prerequisite_store=InMemoryPrerequisiteStore(),
+            router=ModelRouter(providers={"anthropic": CannedProvider("yes")}),
+        )
+
+        async def run():
+            with collect_metrics() as metrics:
+                await explorer.is_foundation_async("velocity")
+                await explorer.is_foundation_async("velocity")
+            return metrics
+
+        report = asyncio.run(run()).to_dict()
+        assert report["cache_hits"] == {"foundation_cache": 1}
+        assert report["by_agent"]["foundation"]["calls"] == 1
+
+
+class TestResultsCarryMetrics:
+    """Totals are attached to the pipeline results"""
+
+    def test_animation_result_serializes_metrics(self):
+        result = AnimationResult("q", "entropy", {}, "prompt", metrics={"totals": {"calls": 3}})
+        assert result.to_dict()["metrics"] == {"totals": {"calls": 3}}
+
+    def test_agent_orchestrator_result_has_per_stage_metrics(self, monkeypatch):
+        class FakePool:
+            async def query_text(self, prompt):
+                with llm_call("claude-agent-sdk", agent="claude_agent_sdk") as call:
+                    call.prompt_tokens, call.completion_tokens = 50, 20
+                return '{"core_concept": "entropy", "domain": "physics", "level": "beginner", "goal": "g"}'
+
+        monkeypatch.setattr(agent_orchestrator, "get_session_pool", lambda *args, **kwargs: FakePool())
+        orchestrator = agent_orchestrator.AgentOrchestrator(use_tools=False, verbose=False)
+        orchestrator.prerequisite_explorer = None
+
+        result = asyncio.run(orchestrator.process_async("What is entropy?"))
+
+        metrics = result["metrics"]
+        assert metrics["totals"]["total_tokens"] == 70
+        assert metrics["by_stage"]["concept_analysis"]["calls"] == 1
+        assert metrics["by_agent"]["AgentOrchestrator"]["completion_tokens"] == 20
@@ -0,0 +1,187 @@
+"""
+Unit Tests for in-flight request coalescing
+
+Run with: pytest tests/test_single_flight.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'KimiK2Thinking'))
+
+from agents import prerequisite_explorer_kimi
+from src.agents.foundation_cache import FoundationVerdictCache
+from src.agents.mathematical_enricher import MathematicalContent, MathematicalEnricher
+from src.agents.prerequisite_explorer_claude import KnowledgeNode, PrerequisiteExplorer
+from src.agents.prerequisite_store import InMemoryPrerequisiteStore
+from src.agents.single_flight import SingleFlight
+
+
+def _explorer():
+    return PrerequisiteExplorer(
+        foundation_cache=FoundationVerdictCache(":memory:"),
+        prerequisite_store=InMemoryPrerequisiteStore(),
+    )
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        async def run():
+            key = SingleFlight.concept_key("prerequisites", "Vectors")
+            other = SingleFlight.concept_key("prerequisites", "the vector")
+            return await asyncio.gather(*(flight.do(k, fetch) for k in [key, other, key]))
+
+        assert asyncio.run(run()) == ["answer"] * 3
+        assert len(calls) == 1
+        assert flight.stats()["by_kind"]["prerequisites"] == {"executed": 1, "collapsed": 2}
+        assert flight.in_flight() == 0
+
+    def test_sequential_calls_are_not_collapsed(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            return 1
+
+        async def run():
+            await flight.do(("k",), fetch)
+            await flight.do(("k",), fetch)
+
+        asyncio.run(run())
+        assert flight.stats() == {"executed": 2, "collapsed": 0, "by_kind": {"k": {"executed": 2, "collapsed": 0}}}
+
+    def test_exception_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def run():
+            return await asyncio.gather(flight.do(("k",), fail), flight.do(("k",), fail), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.stats()["collapsed"] == 1
+
+    def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(flight.do(("k",), fetch))
+            second = asyncio.ensure_future(flight.do(("k",), fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "done"
+
+
+class TestAgentsCoalesce:
+    """Concurrent branches asking for one concept pay for one call"""
+
+    def test_lookup_prerequisites(self):
+        explorer = _explorer()
+        calls = []
+
+        async def fake_discover(concept):
+            calls.append(concept)
+            await asyncio.sleep(0.01)
+            return ["algebra"]
+
+        explorer.discover_prerequisites_async = fake_discover
+
+        async def run():
+            return await asyncio.gather(
+                explorer.lookup_prerequisites_async("Calculus"),
+                explorer.lookup_prerequisites_async("calculus"),
+            )
+
+        assert asyncio.run(run()) == [["algebra"], ["algebra"]]
+        assert calls == ["Calculus"]
+        assert explorer.single_flight.stats()["collapsed"] == 1
+
+    def test_foundation_check(self):
+        explorer = _explorer()
+        calls = []
+
+        async def fake_complete(system_prompt, user_prompt, **kwargs):
+            calls.append(user_prompt)
+            await asyncio.sleep(0.01)
+            return "yes"
+
+        explorer._complete_async = fake_complete
+
+        async def run():
+            return await asyncio.gather(*(explorer.is_foundation_async("velocity") for _ in range(3)))
+
+        assert asyncio.run(run()) == [True, True, True]
+        assert len(calls) == 1
+        assert explorer.single_flight.stats()["by_kind"]["foundation"]["collapsed"] == 2
+
+    def test_math_content_generation(self):
+        enricher = MathematicalEnricher()
+        calls = []
+
+        async def fake_generate(concept, complexity, depth):
+            calls.append(concept)
+            await asyncio.sleep(0.01)
+            return MathematicalContent(concept=concept, equations=["x"])
+
+        enricher._generate_math_content_async = fake_generate
+        nodes = [KnowledgeNode(concept="limits", depth=1, is_foundation=False, prerequisites=[]) for _ in range(2)]
+
+        async def run():
+            await asyncio.gather(*(enricher.enrich_node_async(node) for node in nodes))
+
+        asyncio.run(run())
+        assert calls == ["limits"]
+        assert all(node.equations == ["x"] for node in nodes)
+
+    def test_kimi_combined_classification(self, monkeypatch):
+        class CombinedKimiClient:
+            model = "kimi-test"
+
+            def __init__(self):
+                self.prompts = []
+
+            async def chat_completion_async(self, messages, **kwargs):
+                self.prompts.append(messages[-1]["content"])
+                await asyncio.sleep(0.01)
+                return {"text": '{"is_foundation": true, "prerequisites": []}'}
+
+            def get_text_content(self, response):
+                return response["text"]
+
+        client = CombinedKimiClient()
+        monkeypatch.setattr(prerequisite_explorer_kimi, "get_kimi_client", lambda: client)
+        explorer = prerequisite_explorer_kimi.KimiPrerequisiteExplorer(
+            use_tools=False,
+            foundation_cache=FoundationVerdictCache(":memory:"),
+            combined_mode=True,
+            prerequisite_store=InMemoryPrerequisiteStore(),
+        )
+
+        async def run():
+            return await asyncio.gather(*(explorer.explore_async("velocity", verbose=False) for _ in range(2)))
+
+        assert all(node.is_foundation for node in asyncio.run(run()))
+        assert len(client.prompts) == 1
+        assert explorer.single_flight.stats()["by_kind"]["classify"] == {"executed": 1, "collapsed": 1}